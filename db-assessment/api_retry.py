@@ -0,0 +1,87 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Retries of the Big Query API calls of import_db_assessment.py. A call failing with a retryable error (rate limits, quotas,
+# server and connection errors, see bigquery_backend.RETRYABLE_ERRORS) is run again after an exponential backoff with full jitter:
+# the wait before the retry n is a random time between 0 and min(maxDelay, baseDelay * 2 ** (n - 1)) seconds, so the parallel
+# load jobs hitting the same limit do not retry all at the same time. Any other error is fatal and raised at once.
+
+import time
+import random
+import threading
+
+# Backend errors
+import bigquery_backend
+
+# Default number of retries of a call after its first attempt
+DEFAULT_MAX_RETRIES = 5
+
+# Default wait before the first retry and highest wait between two retries, in seconds
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+
+class RetryPolicy:
+# Runs the calls with the retries of the policy. A single policy is shared by all threads of the import
+
+    def __init__(self, maxRetries=DEFAULT_MAX_RETRIES, baseDelay=DEFAULT_BASE_DELAY, maxDelay=DEFAULT_MAX_DELAY, seed=None):
+
+        self.maxRetries = maxRetries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+
+        self.lock = threading.Lock()
+        self.randomGenerator = random.Random(seed)
+
+        # Number of retries and of calls given up after all their retries, for the import summary
+        self.retries = 0
+        self.exhaustedCalls = 0
+
+    def getDelay(self, retryCounter):
+    # This function returns the wait in seconds before the retry retryCounter (starting at 1)
+
+        with self.lock:
+            return self.randomGenerator.uniform(0, min(self.maxDelay, self.baseDelay * 2 ** (retryCounter - 1)))
+
+    def call(self, callName, function, *args, retryableErrors=bigquery_backend.RETRYABLE_ERRORS, **kwargs):
+    # This function returns the result of function(*args, **kwargs), retrying it on the retryableErrors (by default the retryable API errors)
+    # The last error is raised if the call still fails after maxRetries retries. callName is used in the messages
+
+        retryCounter = 0
+
+        while True:
+
+            try:
+                return function(*args, **kwargs)
+
+            except retryableErrors as error:
+
+                retryCounter = retryCounter + 1
+
+                if retryCounter > self.maxRetries:
+
+                    with self.lock:
+                        self.exhaustedCalls = self.exhaustedCalls + 1
+
+                    print ('ERROR: {} failed after {} attempts: {}'.format(callName, retryCounter, error))
+                    raise
+
+                retryDelay = self.getDelay(retryCounter)
+
+                with self.lock:
+                    self.retries = self.retries + 1
+
+                print ('WARNING: {} failed ({}). Retry {} of {} in {:.2f}s'.format(callName, error, retryCounter, self.maxRetries, retryDelay))
+
+                time.sleep(retryDelay)
@@ -0,0 +1,204 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# End to end benchmark of the import path: consolidation (consolidateLos), normalization into Avro (normalizeAllCSVs), pivot of the
+# AWR metric tables (pivotAllMetrics, rows/s of the whole collection even if only the metric tables are read) and the Big Query load of the CSV and Avro files (importAllCSVsToBQ/importCSVToBQ). Big Query is replaced by the local stand-in of local_bigquery.py
+# without row storage: it reads every upload like the API would and answers instantly, so only the work done by Optimus Prime is measured.
+# The collected files are generated by generate_dbresults.py, or read from -fileslocation. Every stage runs in its own process,
+# so its peak RSS is not hidden by the previous stages. It reports the elapsed time, MB/s and rows/s of the collected files, and the peak RSS.
+# Run it from the db-assessment directory:
+#   python benchmark_import.py [-databases 10 -instances 2 -days 30] [-fileslocation dbResults] [-jobs 4] [-output import_benchmark.jsonl]
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import resource
+import contextlib
+import concurrent.futures
+
+# Loose files and archive members
+import file_sources
+
+# Streaming helpers to read the collected files
+import log_streams
+
+# Synthetic collected files
+import generate_dbresults
+
+# Local stand-in of Big Query
+import local_bigquery
+
+# Benchmark stages, in order. import avro loads the Avro files written by normalize
+BENCHMARK_STAGES = ['consolidate', 'normalize', 'pivot metrics', 'import csv', 'import csv gzip', 'import avro']
+
+# Dataset name given to the import functions. Nothing is created
+BENCHMARK_DATASET = 'optimus_benchmark'
+
+
+def getCollectedFiles(filesLocation):
+# This function returns the collected files (opdb__*.log) of the files location, archive members included
+
+    return [fileName for fileName in file_sources.listFiles(filesLocation) if file_sources.getBaseName(fileName).startswith('opdb__') and file_sources.getBaseName(fileName).endswith('.log')]
+
+
+def countDataRows(fileList):
+# This function returns the number of data rows of the collected files (padding, blank lines and headers removed), outside of the timed stages
+
+    import import_db_assessment
+
+    tableFiles = {}
+    for fileName in fileList:
+        tableFiles.setdefault(import_db_assessment.getObjNameFromFiles(file_sources.getBaseName(fileName),'__',1), []).append(fileName)
+
+    dataRows = 0
+
+    for tableFileList in tableFiles.values():
+        for lines in log_streams.iterChunkLines(log_streams.iterNormalizedTableChunks(tableFileList)):
+            dataRows = dataRows + len(lines)
+
+        dataRows = dataRows - log_streams.NORMALIZED_HEADER_LINES
+
+    return dataRows
+
+
+def runStage(stageName, filesLocation, fileList, jobs, loadJobs):
+# This function runs a benchmark stage in the current process (a worker process started by benchmarkImport) with the messages of Optimus Prime discarded
+# Returns the elapsed seconds, the peak RSS in bytes and the number of bytes uploaded to the stand-in
+
+    import import_db_assessment
+
+    standIn = local_bigquery.LocalBigQueryBackend(storeRows=False)
+    import_db_assessment.setBigQueryBackend(standIn)
+
+    startTime = time.time()
+
+    with open(os.devnull, 'w') as devNull, contextlib.redirect_stdout(devNull):
+
+        if stageName == 'consolidate':
+            stageSucceeded = import_db_assessment.consolidateLos(argparse.Namespace(fileslocation=filesLocation, jobs=jobs))
+
+        elif stageName == 'normalize':
+            stageSucceeded = len(import_db_assessment.normalizeAllCSVs(fileList, jobs)) > 0
+
+        elif stageName == 'pivot metrics':
+            stageSucceeded = len(import_db_assessment.pivotAllMetrics(fileList, jobs)[0]) > 0
+
+        elif stageName in ('import csv', 'import csv gzip'):
+            stageSucceeded = import_db_assessment.importAllCSVsToBQ(None, BENCHMARK_DATASET, fileList, log_streams.HEADER_LINES, loadJobs, compressUpload=stageName.endswith('gzip'))
+
+        else:
+            avroFileList = [os.path.join(filesLocation, avroFileName) for avroFileName in sorted(os.listdir(filesLocation)) if avroFileName.startswith('opnormalized__')]
+            stageSucceeded = import_db_assessment.importAllCSVsToBQ(None, BENCHMARK_DATASET, avroFileList, log_streams.HEADER_LINES, loadJobs)
+
+    elapsedSeconds = time.time() - startTime
+
+    if not stageSucceeded:
+        raise RuntimeError('The benchmark stage {} failed'.format(stageName))
+
+    # ru_maxrss is in kilobytes on Linux
+    return elapsedSeconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, standIn.uploadedBytes
+
+
+def benchmarkImport(filesLocation, jobs=1, loadJobs=1):
+# This function runs every stage on the collected files of the files location and returns a list with the results of every stage
+# The consolidated and Avro files are written in the files location
+
+    fileList = getCollectedFiles(filesLocation)
+
+    if not fileList:
+        raise ValueError('There are no collected files (opdb__*.log) in {}'.format(filesLocation))
+
+    inputBytes = sum(file_sources.getFileSize(fileName) for fileName in fileList)
+    dataRows = countDataRows(fileList)
+
+    stageResults = []
+
+    for stageName in BENCHMARK_STAGES:
+
+        # A new process per stage: its peak RSS only covers the stage
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            elapsedSeconds, peakRssBytes, uploadedBytes = executor.submit(runStage, stageName, filesLocation, fileList, jobs, loadJobs).result()
+
+        elapsedSeconds = max(elapsedSeconds, 0.000001)
+
+        stageResults.append({
+            'stage': stageName,
+            'files': len(fileList),
+            'inputBytes': inputBytes,
+            'rows': dataRows,
+            'seconds': round(elapsedSeconds, 3),
+            'mbPerSec': round(inputBytes / 1024 / 1024 / elapsedSeconds, 2),
+            'rowsPerSec': round(dataRows / elapsedSeconds),
+            'uploadedBytes': uploadedBytes,
+            'peakRssMb': round(peakRssBytes / 1024 / 1024, 1),
+        })
+
+    return stageResults
+
+
+def argumentsParser():
+# Function to handle the arguments of the benchmark
+
+    parser = argparse.ArgumentParser(description='End to end benchmark of the Optimus Prime import path with a local Big Query stand-in')
+
+    parser.add_argument("-fl", "-fileslocation", dest="fileslocation", type=str, default=None, help="collected files to be used. The consolidated and Avro files are written there. Default is a temporary directory with generated files")
+    parser.add_argument("-db", "-databases", dest="databases", type=int, default=4, help="number of databases of the generated files")
+    parser.add_argument("-in", "-instances", dest="instances", type=int, default=2, help="number of RAC instances of every generated database")
+    parser.add_argument("-d", "-days", dest="days", type=int, default=30, help="days of AWR history of the generated files")
+    parser.add_argument("-j", "-jobs", dest="jobs", type=int, default=1, help="tables consolidated and normalized in parallel (-jobs of import_db_assessment.py)")
+    parser.add_argument("-lj", "-loadjobs", dest="loadjobs", type=int, default=1, help="tables loaded in parallel (-loadjobs of import_db_assessment.py)")
+    parser.add_argument("-o", "-output", dest="output", type=str, default=None, help="JSON lines file where the results are appended")
+
+    args = parser.parse_args()
+
+    if args.jobs < 1 or args.loadjobs < 1:
+        sys.exit('\nERROR: The parameters -jobs and -loadjobs must be greater than zero.\n')
+
+    return args
+
+
+def runMain(args):
+# Main function
+
+    with tempfile.TemporaryDirectory() as temporaryDirectory:
+
+        filesLocation = args.fileslocation
+
+        if filesLocation is None:
+            filesLocation = temporaryDirectory
+            generationStats = generate_dbresults.generateDbResults(filesLocation, args.databases, args.instances, args.days)
+            print ('Generated {} collections, {} files, {} rows, {} bytes'.format(generationStats['collections'], generationStats['files'], generationStats['rows'], generationStats['bytes']))
+
+        stageResults = benchmarkImport(filesLocation, args.jobs, args.loadjobs)
+
+    print ('\n{} files, {:.1f} MB, {} rows\n'.format(stageResults[0]['files'], stageResults[0]['inputBytes'] / 1024 / 1024, stageResults[0]['rows']))
+    print ('{:<16} {:>10} {:>10} {:>12} {:>14} {:>13}'.format('stage', 'seconds', 'MB/s', 'rows/s', 'uploaded MB', 'peak RSS MB'))
+
+    for stageResult in stageResults:
+        print ('{:<16} {:>10.3f} {:>10.2f} {:>12} {:>14.1f} {:>13.1f}'.format(stageResult['stage'], stageResult['seconds'], stageResult['mbPerSec'], stageResult['rowsPerSec'], stageResult['uploadedBytes'] / 1024 / 1024, stageResult['peakRssMb']))
+
+    if args.output is not None:
+
+        with open(args.output, 'a') as outputFile:
+            outputFile.write(json.dumps({'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'python': sys.version.split()[0], 'jobs': args.jobs, 'loadJobs': args.loadjobs, 'stages': stageResults}) + '\n')
+
+        print ('\nThe results were appended to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+
+    runMain(argumentsParser())
@@ -0,0 +1,157 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Start up benchmark of import_db_assessment.py. Every CLI mode is run several times with python -X importtime and the benchmark reports
+# the median elapsed time, the time spent importing modules and the number of modules imported.
+# The modes that do not call Big Query must not import google.cloud.bigquery: the benchmark fails if one of them does.
+# Run it from the db-assessment directory:
+#   python benchmark_startup.py [-repeat 5] [-fileslocation dbResults] [-output startup_benchmark.jsonl]
+# With -output the results are appended as a JSON line, so the start up time can be tracked between versions.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Module whose import means that the Big Query library was loaded
+BIGQUERY_MODULE = 'google.cloud.bigquery'
+
+# CLI modes: name, arguments of python (after -X importtime) and whether the mode is allowed to import the Big Query library
+# {filesLocation} and {localDatabase} are replaced by the files location and a temporary SQLite database file
+STARTUP_MODES = [
+    ('help', ['import_db_assessment.py', '-h'], False),
+    ('argument error', ['import_db_assessment.py'], False),
+    ('consolidate', ['import_db_assessment.py', '-cl', '-fl', '{filesLocation}'], False),
+    ('list collections', ['import_db_assessment.py', '-lc', '-fl', '{filesLocation}'], False),
+    ('validate schemas', ['import_db_assessment.py', '-vs', '-fl', '{filesLocation}'], False),
+    ('local database', ['import_db_assessment.py', '-lo', '{localDatabase}', '-ocid', 'all', '-fl', '{filesLocation}'], False),
+    ('big query library', ['-c', 'from google.cloud import bigquery'], True),
+]
+
+
+def parseImportTime(importTimeOutput):
+# This function returns the total import time in microseconds and the names of the modules imported, from the python -X importtime output
+# Every module has a line import time: <self us> | <cumulative us> | <indented module name>. Adding up the self times gives the total
+
+    importMicroseconds = 0
+    moduleNames = []
+
+    for line in importTimeOutput.splitlines():
+
+        if not line.startswith('import time:'):
+            continue
+
+        importFields = line[len('import time:'):].split('|')
+
+        # Column titles line
+        if len(importFields) != 3 or not importFields[0].strip().isdigit():
+            continue
+
+        importMicroseconds = importMicroseconds + int(importFields[0])
+        moduleNames.append(importFields[2].strip())
+
+    return importMicroseconds, moduleNames
+
+
+def runStartupMode(modeArguments):
+# This function runs python -X importtime with the given arguments and returns the elapsed time in seconds, the import time in microseconds and the imported modules
+# The exit code is not checked: some modes (argument error) end with an error on purpose
+
+    startTime = time.time()
+
+    completedProcess = subprocess.run([sys.executable, '-X', 'importtime'] + modeArguments, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+
+    elapsedSeconds = time.time() - startTime
+
+    importMicroseconds, moduleNames = parseImportTime(completedProcess.stderr)
+
+    return elapsedSeconds, importMicroseconds, moduleNames
+
+
+def benchmarkStartup(filesLocation, repeat):
+# This function runs every CLI mode repeat times and returns a list with the median elapsed time, median import time,
+# number of modules and whether the Big Query library was imported, per mode
+
+    modeResults = []
+
+    with tempfile.TemporaryDirectory() as temporaryDirectory:
+
+        localDatabase = os.path.join(temporaryDirectory, 'startup_benchmark.db')
+
+        for modeName, modeArguments, bigQueryAllowed in STARTUP_MODES:
+
+            modeArguments = [modeArgument.format(filesLocation=filesLocation, localDatabase=localDatabase) for modeArgument in modeArguments]
+
+            modeRuns = [runStartupMode(modeArguments) for runCounter in range(repeat)]
+
+            modeResults.append({
+                'mode': modeName,
+                'elapsedMs': round(statistics.median(elapsedSeconds for elapsedSeconds, importMicroseconds, moduleNames in modeRuns) * 1000, 1),
+                'importMs': round(statistics.median(importMicroseconds for elapsedSeconds, importMicroseconds, moduleNames in modeRuns) / 1000, 1),
+                'modules': len(modeRuns[-1][2]),
+                'bigQueryImported': BIGQUERY_MODULE in modeRuns[-1][2],
+                'bigQueryAllowed': bigQueryAllowed,
+            })
+
+    return modeResults
+
+
+def argumentsParser():
+# Function to handle the arguments of the benchmark
+
+    parser = argparse.ArgumentParser(description='Start up benchmark of the Optimus Prime import CLI modes (python -X importtime)')
+
+    parser.add_argument("-r", "-repeat", dest="repeat", type=int, default=5, help="number of runs of every mode. The median is reported")
+    parser.add_argument("-fl", "-fileslocation", dest="fileslocation", type=str, default=None, help="files location used by the modes reading collected files. Default is an empty temporary directory")
+    parser.add_argument("-o", "-output", dest="output", type=str, default=None, help="JSON lines file where the results are appended")
+
+    args = parser.parse_args()
+
+    if args.repeat < 1:
+        sys.exit('\nERROR: The parameter -repeat must be greater than zero.\n')
+
+    return args
+
+
+def runMain(args):
+# Main function
+
+    with tempfile.TemporaryDirectory() as emptyFilesLocation:
+        modeResults = benchmarkStartup(args.fileslocation or emptyFilesLocation, args.repeat)
+
+    print ('\n{:<20} {:>12} {:>12} {:>9}  {}'.format('mode', 'elapsed ms', 'import ms', 'modules', 'big query imported'))
+
+    for modeResult in modeResults:
+        print ('{:<20} {:>12.1f} {:>12.1f} {:>9}  {}'.format(modeResult['mode'], modeResult['elapsedMs'], modeResult['importMs'], modeResult['modules'], 'yes' if modeResult['bigQueryImported'] else 'no'))
+
+    if args.output is not None:
+
+        with open(args.output, 'a') as outputFile:
+            outputFile.write(json.dumps({'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'python': sys.version.split()[0], 'repeat': args.repeat, 'modes': modeResults}) + '\n')
+
+        print ('\nThe results were appended to {}'.format(args.output))
+
+    unexpectedModes = [modeResult['mode'] for modeResult in modeResults if modeResult['bigQueryImported'] and not modeResult['bigQueryAllowed']]
+
+    if unexpectedModes:
+        sys.exit('\nERROR: The Big Query library is imported by the modes that do not call Big Query: {}\n'.format(', '.join(unexpectedModes)))
+
+
+if __name__ == '__main__':
+
+    runMain(argumentsParser())
@@ -0,0 +1,320 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Big Query backend of import_db_assessment.py: the dataset, load job and view API calls go through a backend object, so the import
+# can run against Big Query (BigQueryBackend) or against the local stand-in of local_bigquery.py (LocalBigQueryBackend) without GCP.
+# A backend has the attributes project and location and the methods below. Table, view and dataset ids are project.dataset[.name]
+#   createDataset(datasetId)                                     raises AlreadyExists if the dataset exists
+#   loadTableFromFile(sourceFile, tableId, schemaFields, sourceFormat, skipLeadingRows=0, size=None, dayPartitioned=False, clusteringFields=(), jobId=None)
+#                                                                returns a load job with job_id and result() (waits for the job). A table
+#                                                                created by the job is partitioned by ingestion day if dayPartitioned and
+#                                                                clustered on clusteringFields. tableId can end with a partition $YYYYMMDD
+#                                                                Once done, the job has output_rows (rows loaded) and queue_seconds (wait
+#                                                                from its creation to its start in Big Query, None if unknown)
+#                                                                Raises AlreadyExists if a job with the id jobId was already submitted
+#   getLoadJob(jobId)                                            load job already submitted with the id jobId
+#   getTable(tableId)                                            existing table: hash table with schemaFields (tuple of (column name, Big Query
+#                                                                type)), dayPartitioned (partitioned by ingestion day) and clusteringFields
+#                                                                (tuple), or None if it does not exist
+#   migrateTable(tableId, schemaFields)                          rewrites the rows of an existing table into the columns and types of schemaFields
+#                                                                (see schema_registry.getMigrationProblems) in a single job, so the table is left
+#                                                                as it was if it fails. The STRING values are trimmed and cast, the empty ones
+#                                                                are NULL. The partitioning and clustering of the table are kept. Returns the
+#                                                                number of rows
+#   getTableRows(tableId)                                        number of rows of a table
+#   listTableLabels(datasetId)                                   hash table table name -> labels of the tables and views of a dataset
+#   createView(viewId, viewQuery, labels)                        raises AlreadyExists if the view exists
+#   updateView(viewId, viewQuery, labels)                        replaces the text and labels of an existing view
+#   materializeQuery(tableId, query, clusteringFields, labels, replace=False)
+#                                                                writes the rows of a query into a table (created if needed, partitioned
+#                                                                by ingestion day and clustered), appended or replacing its rows, and
+#                                                                sets its labels. Returns the number of rows written
+# schemaFields is a tuple of (column name, Big Query type) of the table schema registry (see schema_registry.py)
+# Rate limit and quota errors are raised as QuotaExceeded and the server and connection errors as TransientError: both are retryable
+# (RETRYABLE_ERRORS, see api_retry.py). The other API errors are fatal and raised as they are.
+# The result() of a load job raises the retryable errors of its polling, so it can be called again to wait for the same job, and JobFailed
+# when the job itself ran and failed with a retryable error: it loaded nothing and only a new job can load its rows.
+
+import functools
+import contextlib
+
+# Source formats of the load jobs
+SOURCE_FORMAT_CSV = 'CSV'
+SOURCE_FORMAT_AVRO = 'AVRO'
+
+# Reasons of the Big Query errors caused by rate limits and quotas
+QUOTA_ERROR_REASONS = ('quotaExceeded', 'rateLimitExceeded')
+
+# Reasons of the Big Query errors caused by a temporary failure of the service (the load jobs failing with them can be run again)
+TRANSIENT_ERROR_REASONS = ('backendError', 'internalError')
+
+
+class BackendError(Exception):
+# Base class of the errors raised by the backends
+    pass
+
+
+class AlreadyExists(BackendError):
+# The dataset or view to be created already exists
+    pass
+
+
+class QuotaExceeded(BackendError):
+# A rate limit or quota was exceeded. The same call can succeed later
+    pass
+
+
+class TransientError(BackendError):
+# The service failed or could not be reached. The same call can succeed later
+    pass
+
+
+class JobFailed(BackendError):
+# A job ran and failed with a rate limit, quota or service failure. Nothing was written and the same job can be submitted again with a new id
+    pass
+
+
+# Errors of the calls that can be retried, any other error is fatal
+RETRYABLE_ERRORS = (QuotaExceeded, TransientError)
+
+
+@contextlib.contextmanager
+def translateApiErrors():
+# This context manager raises the Big Query conflict errors as AlreadyExists, the rate limit and quota errors as QuotaExceeded
+# and the server (5xx, backendError reasons) and connection errors as TransientError
+
+    import requests
+    from google.api_core import exceptions
+
+    try:
+        yield
+
+    except exceptions.Conflict as error:
+        raise AlreadyExists(str(error))
+
+    except exceptions.TooManyRequests as error:
+        raise QuotaExceeded(str(error))
+
+    except exceptions.ServerError as error:
+        raise TransientError(str(error))
+
+    except exceptions.GoogleAPICallError as error:
+
+        errorReasons = [apiError.get('reason') for apiError in (error.errors or []) if isinstance(apiError, dict)]
+
+        if any(errorReason in QUOTA_ERROR_REASONS for errorReason in errorReasons):
+            raise QuotaExceeded(str(error))
+
+        # A load job failed by the service is reported as a 400 error with the reason backendError
+        if any(errorReason in TRANSIENT_ERROR_REASONS for errorReason in errorReasons):
+            raise TransientError(str(error))
+
+        raise
+
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError, TimeoutError) as error:
+        raise TransientError(str(error))
+
+
+@functools.lru_cache(maxsize=None)
+def getSchemaFields(schemaFields):
+# This function returns the list of bigquery.SchemaField of a tuple of (column name, Big Query type)
+# The lists are built once per table schema and shared by all load jobs, so they must not be changed
+
+    from google.cloud import bigquery
+
+    return [bigquery.SchemaField(fieldName, fieldType) for fieldName, fieldType in schemaFields]
+
+
+class BigQueryLoadJob:
+# Load job of BigQueryBackend. result() waits for the job to complete and reads its statistics
+
+    def __init__(self, loadJob):
+        self.loadJob = loadJob
+        self.job_id = loadJob.job_id
+        self.output_rows = None
+        self.queue_seconds = None
+
+    def result(self):
+
+        try:
+            with translateApiErrors():
+                self.loadJob.result()
+
+        except RETRYABLE_ERRORS as error:
+
+            # The job is done with an error: the error is its own failure, not a failure to poll it
+            if self.loadJob.state == 'DONE' and self.loadJob.error_result is not None:
+                raise JobFailed(str(error))
+
+            raise
+
+        self.output_rows = self.loadJob.output_rows
+
+        # Load jobs wait in the queue of the project when its concurrent jobs are over the quota
+        if self.loadJob.created is not None and self.loadJob.started is not None:
+            self.queue_seconds = max((self.loadJob.started - self.loadJob.created).total_seconds(), 0)
+
+        return self
+
+
+class BigQueryBackend:
+# Backend calling the Big Query API with the google.cloud.bigquery client
+
+    def __init__(self, httpPoolSize):
+
+        from google.cloud import bigquery
+        from requests.adapters import HTTPAdapter
+
+        # Setting client info for Google APIs
+        import set_client_info
+
+        self.client = bigquery.Client(client_info=set_client_info.get_http_client_info())
+
+        # Keeping enough connections alive to serve all concurrent load jobs without opening new ones
+        httpAdapter = HTTPAdapter(pool_connections=httpPoolSize, pool_maxsize=httpPoolSize)
+        self.client._http.mount('https://', httpAdapter)
+        self.client._http.mount('http://', httpAdapter)
+
+        self.project = self.client.project
+        self.location = self.client.location
+
+    def createDataset(self, datasetId):
+
+        from google.cloud import bigquery
+
+        dataset = bigquery.Dataset(datasetId)
+        dataset.location = self.location
+
+        with translateApiErrors():
+            self.client.create_dataset(dataset)
+
+    def loadTableFromFile(self, sourceFile, tableId, schemaFields, sourceFormat, skipLeadingRows=0, size=None, dayPartitioned=False, clusteringFields=(), jobId=None):
+
+        from google.cloud import bigquery
+
+        if sourceFormat == SOURCE_FORMAT_AVRO:
+            # Avro files already have the declared schema and types
+            jobConfig = bigquery.LoadJobConfig(source_format=bigquery.SourceFormat.AVRO, use_avro_logical_types=True)
+        else:
+            # The declared table schema is enforced, so Big Query does not need to infer the columns and their types
+            jobConfig = bigquery.LoadJobConfig(schema=getSchemaFields(schemaFields), skip_leading_rows=skipLeadingRows, source_format=bigquery.SourceFormat.CSV)
+
+        # Only valid when the job creates the table, or for an existing table with the same partitioning and clustering (see getTable)
+        if dayPartitioned:
+            jobConfig.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY)
+
+        if clusteringFields:
+            jobConfig.clustering_fields = list(clusteringFields)
+
+        with translateApiErrors():
+            return BigQueryLoadJob(self.client.load_table_from_file(sourceFile, tableId, size=size, job_id=jobId, job_config=jobConfig))
+
+    def getLoadJob(self, jobId):
+
+        with translateApiErrors():
+            return BigQueryLoadJob(self.client.get_job(jobId, location=self.location))
+
+    def getTable(self, tableId):
+
+        from google.api_core import exceptions
+
+        try:
+            with translateApiErrors():
+                table = self.client.get_table(tableId)
+        except exceptions.NotFound:
+            return None
+
+        timePartitioning = table.time_partitioning
+
+        return {
+            'schemaFields': tuple((schemaField.name, schemaField.field_type) for schemaField in table.schema),
+            'dayPartitioned': timePartitioning is not None and timePartitioning.type_ == 'DAY' and timePartitioning.field is None,
+            'clusteringFields': tuple(table.clustering_fields or ()),
+        }
+
+    def migrateTable(self, tableId, schemaFields):
+
+        from google.cloud import bigquery
+
+        with translateApiErrors():
+            tableTypes = {schemaField.name.lower(): schemaField.field_type.upper() for schemaField in self.client.get_table(tableId).schema}
+
+        selectList = []
+
+        for fieldName, fieldType in schemaFields:
+
+            if fieldName.lower() not in tableTypes:
+                selectList.append('CAST(NULL AS {}) AS `{}`'.format(fieldType, fieldName))
+            elif tableTypes[fieldName.lower()] == 'STRING':
+                selectList.append('CAST(NULLIF(TRIM(`{}`), \'\') AS {}) AS `{}`'.format(fieldName, fieldType, fieldName))
+            else:
+                selectList.append('`{}`'.format(fieldName))
+
+        # A query job replacing its own source table: the rows and the schema are replaced when the job is done
+        jobConfig = bigquery.QueryJobConfig(destination=tableId, write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE)
+
+        with translateApiErrors():
+            return self.client.query('SELECT {} FROM `{}`'.format(', '.join(selectList), tableId), job_config=jobConfig).result().total_rows
+
+    def getTableRows(self, tableId):
+
+        with translateApiErrors():
+            return self.client.get_table(tableId).num_rows
+
+    def listTableLabels(self, datasetId):
+
+        with translateApiErrors():
+            return {table.table_id: table.labels or {} for table in self.client.list_tables(datasetId)}
+
+    def createView(self, viewId, viewQuery, labels):
+
+        from google.cloud import bigquery
+
+        view = bigquery.Table(viewId)
+        view.view_query = viewQuery
+        view.labels = labels
+
+        with translateApiErrors():
+            self.client.create_table(view)
+
+    def updateView(self, viewId, viewQuery, labels):
+
+        from google.cloud import bigquery
+
+        view = bigquery.Table(viewId)
+        view.view_query = viewQuery
+        view.labels = labels
+
+        with translateApiErrors():
+            self.client.update_table(view, ['view_query', 'labels'])
+
+    def materializeQuery(self, tableId, query, clusteringFields, labels, replace=False):
+
+        from google.cloud import bigquery
+
+        jobConfig = bigquery.QueryJobConfig(
+            destination=tableId,
+            create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE if replace else bigquery.WriteDisposition.WRITE_APPEND,
+            time_partitioning=bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY),
+            clustering_fields=list(clusteringFields))
+
+        with translateApiErrors():
+            queryRows = self.client.query(query, job_config=jobConfig).result()
+
+            table = self.client.get_table(tableId)
+            table.labels = labels
+            self.client.update_table(table, ['labels'])
+
+        return queryRows.total_rows
@@ -0,0 +1,226 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Bare Metal Solution sizing computed with numpy/pandas over all hosts, databases and PDBs at once.
+# It produces the same results of the views optimus_createView05__vbms_sizing_detailperpdb.sql to optimus_createView09__vbms_sizing_report.sql,
+# but the sizing factors and the machine catalog are parameters, so what-if scenarios do not need a new query per scenario.
+# numpy and pandas are optional dependencies (pip install oracle-db-assessment[sizing]), only needed by this module.
+
+import numpy
+import pandas
+
+# Share of the peak CPU used to size the Bare Metal Solution cores
+CORE_FACTOR = 0.8
+
+# IOPS served by each TB of Bare Metal Solution disk and margin added to the peak IOPS
+IOPS_PER_TB = 6000
+IOPS_DISK_FACTOR = 1.2
+
+# Estimated monthly price of each TB of disk
+STORAGE_MONTHLY_PRICE_PER_TB = 60
+
+# A machine is offered only if more than this percentage of its cores is left after the sizing
+MIN_CORES_HEADROOM_PERC = 30
+
+# Raw inputs of vbms_sizing_detailperpdb (same joins) read from the local database created with -localdb
+SIZING_INPUTS_QUERY = '''
+SELECT a.ckey,
+       b.db_name,
+       b.dbversion,
+       a.con_id,
+       a.dbid,
+       a.instance_number,
+       e.hostname,
+       a.hour,
+       c.num_cpu_cores,
+       c.host_cpu_utilization_perc,
+       a.cpu_usage_per_sec_perc95,
+       a.bkgr_cpu_usage_per_sec_perc95,
+       a.host_cpu_usage_per_sec_perc95,
+       a.io_req_per_sec_perc95,
+       b.db_size_allocated_gb,
+       d.db_total_memory_gb
+FROM   vsysmetric_hist a
+       INNER JOIN vdbsummary b
+               ON a.ckey = b.ckey
+       INNER JOIN vosstat_metrics c
+               ON a.ckey = c.ckey
+                  AND a.dbid = c.dbid
+                  AND a.instance_number = c.instance_number
+                  AND a.hour = c.hour
+       INNER JOIN vdbmemory_usageperpdb d
+               ON a.ckey = d.ckey
+                  AND a.instance_number = d.inst_id
+                  AND a.con_id = d.con_id
+       INNER JOIN vinstsummary e
+               ON a.ckey = e.ckey
+                  AND a.instance_number = e.inst_id
+'''
+
+# Columns of the machine catalog (opConfig/optconfig__optimusconfig_bms_machinesizes__.csv) used by the sizing
+MACHINE_SIZE_COLUMNS = ['cores', 'machine_size', 'processor', 'est_price']
+
+# Columns of the sizing report, the same of vbms_sizing_report
+REPORT_COLUMNS = [
+    'bms_sizing_description',
+    'hostname',
+    'db_name',
+    'dbversion',
+    'max_source_num_cpu_cores',
+    'bms_machine_offer',
+    'bms_machine_offer_cores',
+    'bms_offer_processor',
+    'bms_offer_est_price',
+    'bms_database_memory_gb',
+    'bms_db_tb_disk_for_iops',
+    'bms_est_monthly_storage_bill',
+]
+
+# Sizing columns aggregated by the vbms_sizing_summper* views
+BMS_COLUMNS = ['bms_host_machine_cores', 'bms_database_cores', 'bms_database_memory_gb', 'bms_db_tb_disk_for_iops', 'bms_est_monthly_storage_bill']
+
+
+def roundHalfAway(values, digits=0):
+# This function rounds the values the same way Big Query ROUND does: halves are rounded away from zero
+# numpy.round rounds halves to the nearest even number, which would change some of the sizing results
+
+    scale = 10.0 ** digits
+
+    return numpy.sign(values) * numpy.floor(numpy.abs(values) * scale + 0.5) / scale
+
+
+def readMachineSizes(fileName):
+# This function reads a machine catalog CSV file with the same columns of opConfig/optconfig__optimusconfig_bms_machinesizes__.csv
+
+    return pandas.read_csv(fileName, skipinitialspace=True)
+
+
+def readLocalSizingInputs(connection):
+# This function reads the sizing inputs from the local database created with -localdb (see local_engine.py)
+
+    return pandas.read_sql_query(SIZING_INPUTS_QUERY, connection)
+
+
+def getSizingDetailPerPdb(sizingInputs, coreFactor=CORE_FACTOR, iopsPerTB=IOPS_PER_TB):
+# This function computes vbms_sizing_detailperpdb: the sizing of every PDB and hour
+# sizingInputs is a DataFrame with the columns of SIZING_INPUTS_QUERY
+
+    numCpuCores = sizingInputs['num_cpu_cores'].to_numpy(dtype=float)
+    hostCpuUtilizationPerc = sizingInputs['host_cpu_utilization_perc'].to_numpy(dtype=float)
+    ioReqPerSec = sizingInputs['io_req_per_sec_perc95'].to_numpy(dtype=float)
+
+    # Division by zero gives inf/nan (Big Query would fail the query instead)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        hostCpuUsage = roundHalfAway(sizingInputs['host_cpu_usage_per_sec_perc95'].to_numpy(dtype=float) / hostCpuUtilizationPerc, 1)
+        sourceDbCpuUtilizationPerc = roundHalfAway((sizingInputs['cpu_usage_per_sec_perc95'].to_numpy(dtype=float) + sizingInputs['bkgr_cpu_usage_per_sec_perc95'].to_numpy(dtype=float)) / hostCpuUsage)
+
+    detailPerPdb = sizingInputs[['ckey', 'db_name', 'dbversion', 'con_id', 'dbid', 'instance_number', 'hostname', 'hour']].copy()
+
+    detailPerPdb['source_num_cpu_cores'] = sizingInputs['num_cpu_cores']
+    detailPerPdb['source_host_cpu_utilization_perc'] = sizingInputs['host_cpu_utilization_perc']
+    detailPerPdb['source_db_cpu_utilization_perc'] = sourceDbCpuUtilizationPerc
+    detailPerPdb['source_db_size_allocated_tb'] = roundHalfAway(sizingInputs['db_size_allocated_gb'].to_numpy(dtype=float) / 1024, 1)
+    detailPerPdb['source_database_memory_gb'] = sizingInputs['db_total_memory_gb']
+    detailPerPdb['source_io_rep_per_sec'] = sizingInputs['io_req_per_sec_perc95']
+    detailPerPdb['bms_host_machine_cores'] = roundHalfAway(numCpuCores / 100 * hostCpuUtilizationPerc * coreFactor)
+    detailPerPdb['bms_database_cores'] = roundHalfAway(numCpuCores / 100 * sourceDbCpuUtilizationPerc * coreFactor)
+    detailPerPdb['bms_database_memory_gb'] = sizingInputs['db_total_memory_gb']
+    detailPerPdb['bms_db_tb_disk_for_iops'] = roundHalfAway(ioReqPerSec * IOPS_DISK_FACTOR / iopsPerTB)
+    detailPerPdb['bms_est_monthly_storage_bill'] = roundHalfAway(ioReqPerSec / iopsPerTB) * STORAGE_MONTHLY_PRICE_PER_TB
+
+    return detailPerPdb
+
+
+def getSizingDetailPerDb(detailPerPdb):
+# This function computes vbms_sizing_detailperdb: the sizing of every database and hour (sum of its PDBs and instances)
+# Sums use min_count=1 so a sum of missing values is missing (NULL in SQL) instead of 0
+
+    sumColumns = ['source_num_cpu_cores', 'source_host_cpu_utilization_perc', 'source_db_cpu_utilization_perc', 'source_database_memory_gb', 'source_io_rep_per_sec'] + BMS_COLUMNS
+
+    return detailPerPdb.groupby(['ckey', 'db_name', 'dbid', 'dbversion', 'hour', 'source_db_size_allocated_tb'], as_index=False, sort=False, dropna=False)[sumColumns].sum(min_count=1)
+
+
+def getSizingDetailPerHost(detailPerPdb, coreFactor=CORE_FACTOR):
+# This function computes vbms_sizing_detailperhost: the sizing of every host and hour
+
+    detailPerHost = detailPerPdb.groupby(['hostname', 'hour', 'source_num_cpu_cores', 'source_host_cpu_utilization_perc'], as_index=False, sort=False, dropna=False)[['source_db_size_allocated_tb', 'source_database_memory_gb', 'source_io_rep_per_sec', 'bms_database_memory_gb', 'bms_db_tb_disk_for_iops', 'bms_est_monthly_storage_bill']].sum(min_count=1)
+
+    detailPerHost['bms_host_machine_cores'] = roundHalfAway(detailPerHost['source_num_cpu_cores'].to_numpy(dtype=float) / 100 * detailPerHost['source_host_cpu_utilization_perc'].to_numpy(dtype=float) * coreFactor)
+
+    return detailPerHost.rename(columns={
+        'bms_database_memory_gb': 'bms_total_database_memory_gb',
+        'bms_db_tb_disk_for_iops': 'bms_total_db_tb_disk_for_iops',
+        'bms_est_monthly_storage_bill': 'bms_est_monthly_total_storage_bill',
+    })
+
+
+def selectMachineSizes(sizingSummary, partitionColumns, machineSizes, minHeadroomPerc=MIN_CORES_HEADROOM_PERC):
+# This function offers a machine of the catalog to every row of sizingSummary (vbms_sizing_bmsserverper* views):
+# among the machines with more than minHeadroomPerc % of their cores left, the one with the least cores left in the rows of the same partitionColumns
+# All rows of sizingSummary are compared to all machines at once (rows x machines arrays). Rows without any machine big enough are dropped
+
+    hostMachineCores = sizingSummary['bms_host_machine_cores'].to_numpy(dtype=float)
+    machineCores = machineSizes['cores'].to_numpy(dtype=float)
+
+    coresLeft = machineCores[numpy.newaxis, :] - hostMachineCores[:, numpy.newaxis]
+
+    with numpy.errstate(invalid='ignore'):
+        rowIndexes, machineIndexes = numpy.nonzero(coresLeft / machineCores[numpy.newaxis, :] * 100 > minHeadroomPerc)
+
+    machineOffers = sizingSummary.iloc[rowIndexes].reset_index(drop=True)
+
+    machineOffers['bms_host_machine_cores_left'] = coresLeft[rowIndexes, machineIndexes]
+    machineOffers['bms_machine_offer'] = machineSizes['machine_size'].to_numpy()[machineIndexes]
+    machineOffers['bms_machine_offer_cores'] = machineSizes['cores'].to_numpy()[machineIndexes]
+    machineOffers['bms_offer_processor'] = machineSizes['processor'].to_numpy()[machineIndexes]
+    machineOffers['bms_offer_est_price'] = machineSizes['est_price'].to_numpy()[machineIndexes]
+    machineOffers['bms_est_cpu_usage_peak'] = roundHalfAway(hostMachineCores[rowIndexes] / machineCores[machineIndexes] * 100)
+
+    minCoresLeft = machineOffers.groupby(partitionColumns, sort=False, dropna=False)['bms_host_machine_cores_left'].transform('min')
+
+    return machineOffers[machineOffers['bms_host_machine_cores_left'] == minCoresLeft].drop(columns='bms_host_machine_cores_left').reset_index(drop=True)
+
+
+def getSizingReport(sizingInputs, machineSizes, coreFactor=CORE_FACTOR, iopsPerTB=IOPS_PER_TB, minHeadroomPerc=MIN_CORES_HEADROOM_PERC):
+# This function computes vbms_sizing_report: the machine offered to every database (all instances included) and to every host (all databases included)
+# Returns a DataFrame with REPORT_COLUMNS
+
+    detailPerPdb = getSizingDetailPerPdb(sizingInputs, coreFactor, iopsPerTB)
+    detailPerDb = getSizingDetailPerDb(detailPerPdb)
+    detailPerHost = getSizingDetailPerHost(detailPerPdb, coreFactor)
+
+    # vbms_sizing_summperpdb, vbms_sizing_summperdb and vbms_sizing_summperhost
+    summPerPdb = detailPerPdb.groupby(['ckey', 'db_name', 'dbversion', 'dbid', 'instance_number', 'hostname', 'con_id'], as_index=False, sort=False, dropna=False)[BMS_COLUMNS].max()
+    summPerDb = detailPerDb.groupby(['ckey', 'db_name', 'dbversion', 'dbid'], as_index=False, sort=False, dropna=False)[BMS_COLUMNS].max()
+    summPerHost = summPerPdb.groupby(['hostname'], as_index=False, sort=False, dropna=False)[BMS_COLUMNS].sum(min_count=1)
+
+    # vbms_sizing_bmsserverperdb and vbms_sizing_bmsserverperhost
+    machineSizes = machineSizes[MACHINE_SIZE_COLUMNS]
+    bmsServerPerDb = selectMachineSizes(summPerDb, ['db_name', 'dbid'], machineSizes, minHeadroomPerc)
+    bmsServerPerHost = selectMachineSizes(summPerHost, ['hostname'], machineSizes, minHeadroomPerc)
+
+    maxCoresPerDb = detailPerDb.groupby(['db_name', 'dbversion', 'dbid'], as_index=False, sort=False, dropna=False)['source_num_cpu_cores'].max().rename(columns={'source_num_cpu_cores': 'max_source_num_cpu_cores'})
+    maxCoresPerHost = detailPerHost.groupby(['hostname'], as_index=False, sort=False, dropna=False)['source_num_cpu_cores'].max().rename(columns={'source_num_cpu_cores': 'max_source_num_cpu_cores'})
+
+    # As in a SQL inner join, missing keys do not match
+    reportPerDb = bmsServerPerDb.merge(maxCoresPerDb.dropna(subset=['db_name', 'dbversion', 'dbid']), on=['db_name', 'dbversion', 'dbid'])
+    reportPerDb['bms_sizing_description'] = 'BMS Sizing Per Database (All Instances Included)'
+    reportPerDb['hostname'] = None
+
+    reportPerHost = bmsServerPerHost.merge(maxCoresPerHost.dropna(subset=['hostname']), on=['hostname'])
+    reportPerHost['bms_sizing_description'] = 'BMS Sizing Per Host (All Databases Included)'
+    reportPerHost['db_name'] = None
+    reportPerHost['dbversion'] = None
+
+    return pandas.concat([reportPerDb[REPORT_COLUMNS], reportPerHost[REPORT_COLUMNS]], ignore_index=True)
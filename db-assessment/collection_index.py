@@ -0,0 +1,143 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Index of the collections found in the files location, built from the names of the collected files.
+# The collector (oracle_db_assessment.sql) spools every table to opdb__<tableName>__&v_tag where
+# v_tag = <dbversion>_<version>_<host>.<dbname>.<instance>.<hora>.log and hora is the collection time (mmddrrhh24miss).
+# A collection is identified by its tag without .log, for instance 122_0.1.0_dbhost.ORCL.ORCL1.051721143005
+
+import re
+import datetime
+
+# Loose files and archive members
+import file_sources
+
+# Name of a collected file. The host name can have dots, so it is everything between the version and the last 3 parts
+COLLECTION_FILE_PATTERN = re.compile(r'^opdb__(?P<tableName>[A-Za-z0-9_]+?)__(?P<collectionId>(?P<dbversion>[^_]*)_(?P<version>[^_]*)_(?P<host>.+)\.(?P<dbname>[^.]+)\.(?P<instance>[^.]+)\.(?P<hora>\d{12}))\.log$')
+
+# Format of the collection time in the file names (TO_CHAR(SYSDATE, 'mmddrrhh24miss'))
+HORA_FORMAT = '%m%d%y%H%M%S'
+
+# Formats accepted for the collection time range arguments
+COLLECTION_TIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']
+
+
+def parseCollectionFileName(fileName):
+# This function returns the table name and the collection attributes of a collected file name, or None if the name does not follow the collector naming
+
+    fileNameMatch = COLLECTION_FILE_PATTERN.match(file_sources.getBaseName(fileName))
+
+    if fileNameMatch is None:
+        return None
+
+    collectionFile = fileNameMatch.groupdict()
+
+    try:
+        collectionFile['collectedAt'] = datetime.datetime.strptime(collectionFile['hora'], HORA_FORMAT)
+    except ValueError:
+        collectionFile['collectedAt'] = None
+
+    return collectionFile
+
+
+def parseCollectionTime(collectionTime, endOfDay=False):
+# This function converts a collection time range argument (YYYY-MM-DD, YYYY-MM-DD HH:MM or YYYY-MM-DD HH:MM:SS) into a datetime
+# If endOfDay is True a date without time is the last second of the day, so it can be used as the end of a range
+
+    for timeFormat in COLLECTION_TIME_FORMATS:
+
+        try:
+            parsedTime = datetime.datetime.strptime(collectionTime.strip(), timeFormat)
+        except ValueError:
+            continue
+
+        if endOfDay and timeFormat == '%Y-%m-%d':
+            parsedTime = parsedTime + datetime.timedelta(days=1, seconds=-1)
+
+        return parsedTime
+
+    raise ValueError('{} is not a valid collection time. Expected formats: YYYY-MM-DD, YYYY-MM-DD HH:MM or YYYY-MM-DD HH:MM:SS'.format(collectionTime))
+
+
+def buildCollectionIndex(filesLocation):
+# This function scans the files location once (loose files and archive members, see file_sources.py) and returns the index
+# collection id -> collection attributes and files, where the files are a hash table tableName -> list of files
+# Also returns the list of the opdb files that do not follow the collector naming
+
+    collectionIndex = {}
+    unknownFiles = []
+
+    for fileName in file_sources.listFiles(filesLocation):
+
+        baseName = file_sources.getBaseName(fileName)
+
+        if not baseName.startswith('opdb') or not baseName.endswith('.log'):
+            continue
+
+        collectionFile = parseCollectionFileName(baseName)
+
+        if collectionFile is None:
+            unknownFiles.append(fileName)
+            continue
+
+        collection = collectionIndex.setdefault(collectionFile['collectionId'], {
+            'collectionId': collectionFile['collectionId'],
+            'dbversion': collectionFile['dbversion'],
+            'version': collectionFile['version'],
+            'host': collectionFile['host'],
+            'dbname': collectionFile['dbname'],
+            'instance': collectionFile['instance'],
+            'hora': collectionFile['hora'],
+            'collectedAt': collectionFile['collectedAt'],
+            'files': {},
+        })
+
+        collection['files'].setdefault(collectionFile['tableName'], []).append(fileName)
+
+    return collectionIndex, unknownFiles
+
+
+def selectCollections(collectionIndex, collectionIds=None, collectedFrom=None, collectedTo=None):
+# This function returns the sorted ids of the collections selected by:
+# - collectionIds: None for all collections, otherwise a list of ids. As with the file names, an id selects the collections whose tag ends with it
+#   (the full tag, or only its collection time for instance)
+# - collectedFrom/collectedTo: datetimes limiting the collection time (both included). Collections with an unknown time are not selected by a range
+
+    selectedIds = []
+
+    for collectionId, collection in collectionIndex.items():
+
+        if collectionIds is not None and not any(collectionId.endswith(selectedId) for selectedId in collectionIds):
+            continue
+
+        if collectedFrom is not None or collectedTo is not None:
+
+            if collection['collectedAt'] is None:
+                continue
+
+            if collectedFrom is not None and collection['collectedAt'] < collectedFrom:
+                continue
+
+            if collectedTo is not None and collection['collectedAt'] > collectedTo:
+                continue
+
+        selectedIds.append(collectionId)
+
+    return sorted(selectedIds)
+
+
+def getCollectionsFiles(collectionIndex, collectionIds):
+# This function returns the list of the files of the given collections, all tables included
+
+    return [fileName for collectionId in collectionIds for tableFiles in collectionIndex[collectionId]['files'].values() for fileName in tableFiles]
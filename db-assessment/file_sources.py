@@ -0,0 +1,274 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Sources of the collected files: loose files in the OS and members of .tar, .tar.gz/.tgz and .zip archives.
+# A member of an archive is named <archive file>!<member name>, for instance dbResults/dbassess_host_db_PROD.tar!opdb__dbsummary__...log,
+# so its base name is the collected file name and the table name detection is the same. Members are streamed out of the archives, never extracted to disk.
+# A compressed tar cannot seek: opening a member decompresses the archive from its start up to the member. So the open tar files are kept in a pool
+# (TAR_POOL_SIZE) and a member is read from an open tar file positioned before it, which only decompresses the data between them. The members read
+# in the archive order (the collector tars the files of a table next to each other) decompress the archive once instead of once per member.
+# New archive types are added to ARCHIVE_TYPES.
+
+import os
+import glob
+import time
+import fnmatch
+import tarfile
+import zipfile
+import threading
+import functools
+import contextlib
+
+# Separates the archive file name from the member name
+ARCHIVE_MEMBER_SEPARATOR = '!'
+
+# Number of archives whose member list is kept in memory
+ARCHIVE_CACHE_SIZE = 1024
+
+# Number of open tar files kept in the pool, all archives together (see TarArchive.openMember)
+TAR_POOL_SIZE = 64
+
+
+class TarArchive:
+# Members of a tar file, compressed or not. With a compressed tar, opening a member decompresses the archive up to the member
+# from the position of the open tar file used (see the header of this file)
+
+    # Open tar files not used by any member, oldest first: list of (archive name, tar file). The tar files being read are out of the pool
+    # A worker process forked by -jobs shares the file offsets of the tar files of its parent, so it starts with an empty pool
+    openTarFiles = []
+    poolProcess = os.getpid()
+    poolLock = threading.Lock()
+
+    @staticmethod
+    def listMembers(archiveName):
+    # Returns a hash table member name -> (size, mtime in ns, member info) of the regular files of the archive
+
+        with tarfile.open(archiveName, 'r:*') as archiveFile:
+            return {tarInfo.name: (tarInfo.size, tarInfo.mtime * 1000000000, tarInfo) for tarInfo in archiveFile.getmembers() if tarInfo.isfile()}
+
+    @classmethod
+    def getTarFile(cls, archiveName, memberOffset):
+    # This function takes out of the pool the open tar file of the archive with the highest position before memberOffset, or opens a new one
+
+        with cls.poolLock:
+
+            if cls.poolProcess != os.getpid():
+                cls.openTarFiles = []
+                cls.poolProcess = os.getpid()
+
+            poolPositions = [(tarFile.fileobj.tell(), poolCounter) for poolCounter, (poolArchiveName, tarFile) in enumerate(cls.openTarFiles) if poolArchiveName == archiveName]
+            forwardPositions = [poolPosition for poolPosition in poolPositions if poolPosition[0] <= memberOffset]
+
+            # Reading backwards decompresses from the start again, like a new tar file
+            if forwardPositions:
+                return cls.openTarFiles.pop(max(forwardPositions)[1])[1]
+
+        return tarfile.open(archiveName, 'r:*')
+
+    @classmethod
+    def releaseTarFile(cls, archiveName, tarFile):
+    # This function puts back a tar file in the pool, closing the oldest one if the pool is full
+
+        with cls.poolLock:
+            cls.openTarFiles.append((archiveName, tarFile))
+            closedTarFiles = cls.openTarFiles[:-TAR_POOL_SIZE]
+            del cls.openTarFiles[:-TAR_POOL_SIZE]
+
+        for poolArchiveName, closedTarFile in closedTarFiles:
+            closedTarFile.close()
+
+    @classmethod
+    @contextlib.contextmanager
+    def openMember(cls, archiveName, memberInfo):
+
+        archiveFile = cls.getTarFile(archiveName, memberInfo.offset)
+
+        try:
+            with archiveFile.extractfile(memberInfo) as memberFile:
+                yield memberFile
+
+        except BaseException:
+            archiveFile.close()
+            raise
+
+        cls.releaseTarFile(archiveName, archiveFile)
+
+
+class ZipArchive:
+# Members of a zip file
+
+    @staticmethod
+    def listMembers(archiveName):
+    # Returns a hash table member name -> (size, mtime in ns, member info) of the regular files of the archive
+
+        with zipfile.ZipFile(archiveName) as archiveFile:
+            return {zipInfo.filename: (zipInfo.file_size, int(time.mktime(zipInfo.date_time + (0, 0, -1))) * 1000000000, zipInfo) for zipInfo in archiveFile.infolist() if not zipInfo.is_dir()}
+
+    @staticmethod
+    @contextlib.contextmanager
+    def openMember(archiveName, memberInfo):
+
+        with zipfile.ZipFile(archiveName) as archiveFile:
+            with archiveFile.open(memberInfo) as memberFile:
+                yield memberFile
+
+
+# Archive file name suffixes and the class reading them
+ARCHIVE_TYPES = [
+    ('.tar', TarArchive),
+    ('.tar.gz', TarArchive),
+    ('.tgz', TarArchive),
+    ('.zip', ZipArchive),
+]
+
+
+def getArchiveType(fileName):
+# This function returns the class reading the archive file, or None if the file is not an archive
+
+    for archiveSuffix, archiveType in ARCHIVE_TYPES:
+        if fileName.lower().endswith(archiveSuffix):
+            return archiveType
+
+    return None
+
+
+def splitArchiveMember(fileName):
+# This function returns the archive file name and the member name of an archive member, or (None, None) for a loose file
+
+# The separator is the first one following an archive suffix, so a directory name may contain the separator too.
+# When several separators follow an archive suffix (an archive name containing one), the existing archive file is taken
+
+    archiveNames = []
+    separatorPosition = fileName.find(ARCHIVE_MEMBER_SEPARATOR)
+
+    while separatorPosition >= 0:
+        if getArchiveType(fileName[:separatorPosition]) is not None:
+            archiveNames.append(fileName[:separatorPosition])
+        separatorPosition = fileName.find(ARCHIVE_MEMBER_SEPARATOR, separatorPosition + 1)
+
+    if not archiveNames:
+        return None, None
+
+    archiveName = next((archiveName for archiveName in archiveNames if os.path.isfile(archiveName)), archiveNames[0])
+
+    return archiveName, fileName[len(archiveName) + len(ARCHIVE_MEMBER_SEPARATOR):]
+
+
+@functools.lru_cache(maxsize=ARCHIVE_CACHE_SIZE)
+def getArchiveMembers(archiveName):
+# This function returns the members of an archive (see listMembers). The list is read once per archive and process
+
+    return getArchiveType(archiveName).listMembers(archiveName)
+
+
+def getArchiveMember(fileName):
+# This function returns the archive file name and the member (size, mtime, member info) of an archive member name
+
+    archiveName, memberName = splitArchiveMember(fileName)
+
+    try:
+        return archiveName, getArchiveMembers(archiveName)[memberName]
+    except KeyError:
+        raise FileNotFoundError('There is no member {} in the archive {}'.format(memberName, archiveName))
+
+
+def openFile(fileName):
+# This function opens a loose file or an archive member for binary reading. It is used as a context manager
+
+    archiveName, memberName = splitArchiveMember(fileName)
+
+    if archiveName is None:
+        return open(fileName, 'rb')
+
+    archiveName, archiveMember = getArchiveMember(fileName)
+
+    return getArchiveType(archiveName).openMember(archiveName, archiveMember[2])
+
+
+def getFileState(fileName):
+# This function returns the size in bytes and the modification time in ns of a loose file or an archive member
+
+    archiveName, memberName = splitArchiveMember(fileName)
+
+    if archiveName is None:
+        fileStat = os.stat(fileName)
+        return fileStat.st_size, fileStat.st_mtime_ns
+
+    archiveName, archiveMember = getArchiveMember(fileName)
+
+    return archiveMember[0], archiveMember[1]
+
+
+def getBaseName(fileName):
+# This function returns the base name of a loose file or of an archive member (without the archive name and the member directories)
+
+    archiveName, memberName = splitArchiveMember(fileName)
+
+    return os.path.basename(fileName if archiveName is None else memberName)
+
+
+def getFileDirectory(fileName):
+# This function returns the directory of a loose file, or the directory of the archive of an archive member
+
+    archiveName, memberName = splitArchiveMember(fileName)
+
+    return os.path.dirname(fileName if archiveName is None else archiveName)
+
+
+def getFileSize(fileName):
+# This function returns the size in bytes of a loose file or an archive member
+
+    return getFileState(fileName)[0]
+
+
+def listFiles(filesLocation):
+# This function returns the sorted names of the loose files found in the directory and of the members of the archives found in it
+
+    fileList = []
+
+    for dirEntry in os.scandir(filesLocation):
+
+        if not dirEntry.is_file():
+            continue
+
+        filePath = os.path.join(filesLocation, dirEntry.name)
+
+        if getArchiveType(dirEntry.name) is None:
+            fileList.append(filePath)
+        else:
+            fileList.extend(filePath + ARCHIVE_MEMBER_SEPARATOR + memberName for memberName in getArchiveMembers(filePath))
+
+    return sorted(fileList)
+
+
+def globFiles(filePattern):
+# This function returns the loose files matching the pattern (see glob.glob), plus the members of the archives found in the pattern directory
+# whose base name matches the pattern base name. Archive files themselves are not returned
+
+    fileList = [fileName for fileName in glob.glob(filePattern) if getArchiveType(fileName) is None]
+
+    baseNamePattern = os.path.basename(filePattern)
+
+    for archiveName in glob.glob(os.path.join(glob.escape(os.path.dirname(filePattern)) or '.', '*')):
+
+        if getArchiveType(archiveName) is None or not os.path.isfile(archiveName):
+            continue
+
+        # Archives can be found with the directory prefix ./ when the pattern has no directory
+        if not os.path.dirname(filePattern):
+            archiveName = os.path.basename(archiveName)
+
+        fileList.extend(archiveName + ARCHIVE_MEMBER_SEPARATOR + memberName for memberName in getArchiveMembers(archiveName) if fnmatch.fnmatchcase(os.path.basename(memberName), baseNamePattern))
+
+    return fileList
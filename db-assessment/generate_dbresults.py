@@ -0,0 +1,387 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Synthetic collected files for benchmarks and trials without a real database (see benchmark_import.py).
+# Every database is a collection with a file per table spooled by the collector script of its version (schema_coverage.COLLECTOR_SCRIPTS),
+# named opdb__<tableName>__<dbversion>_<version>_<host>.<dbname>.<instance>.<hora>.log, in the SQL*Plus spool format of the collector:
+# a blank line, the column names, and the rows with every column padded to its width and separated by commas (set colsep ,).
+# The column names are repeated every SPOOL_PAGE_ROWS rows (set pages). The columns come from the table schema registry and their names
+# from the queries of the collector script (schema_coverage.getSpooledColumns), so the files have the aliases of real files (HH24, COUNT...).
+# The AWR tables have a row per instance and hour of the day (awrhistsysmetrichist, awrhistosstat, awrhistcmdtypes) or per instance and
+# hourly snapshot of the days of AWR history (dbahistsysstat, dbahistsystimemodel), with the metric and statistic names used by the views.
+#   python generate_dbresults.py -fileslocation /tmp/dbResults -databases 10 -instances 2 -days 30
+
+import os
+import sys
+import random
+import argparse
+import datetime
+
+# Table schemas of the collected files
+import schema_registry
+
+# Tables spooled by the collector scripts
+import schema_coverage
+
+# Collector file naming
+import collection_index
+
+# Rows of a spool page (set pages 50000 of the collector), the column names are repeated on every page
+SPOOL_PAGE_ROWS = 50000
+
+# Padded width of the columns of every type, as printed by SQL*Plus (col ... for a30, col ... for 99999999999999999999 and numwidth 10)
+COLUMN_WIDTHS = {'STRING': 30, 'INT64': 20, 'NUMERIC': 20, 'FLOAT64': 10}
+
+# Number of rows of the tables without a specific row generator
+GENERIC_TABLE_ROWS = 20
+
+# Tool version written in the file names by the collector shell script
+COLLECTOR_VERSION = '0.1.0'
+
+# Metrics of dba_hist_sysmetric_history used by the views (metric name, metric unit, typical value)
+SYSMETRICS = [
+    ('Average Active Sessions', 'Active Sessions', 8),
+    ('Background CPU Usage Per Sec', 'CentiSeconds Per Second', 20),
+    ('CPU Usage Per Sec', 'CentiSeconds Per Second', 300),
+    ('Executions Per Sec', 'Executes Per Second', 2000),
+    ('Host CPU Usage Per Sec', 'CentiSeconds Per Second', 800),
+    ('I/O Megabytes per Second', 'Megabtyes per Second', 150),
+    ('I/O Requests per Second', 'Requests per Second', 3000),
+    ('Logons Per Sec', 'Logons Per Second', 5),
+    ('Physical Reads Per Sec', 'Reads Per Second', 4000),
+    ('Physical Writes Per Sec', 'Writes Per Second', 600),
+    ('Redo Generated Per Sec', 'Bytes Per Second', 2000000),
+    ('SQL Service Response Time', 'CentiSeconds Per Call', 2),
+    ('User Transaction Per Sec', 'Transactions Per Second', 80),
+]
+
+# Statistics of dba_hist_osstat used by the views. The values of the sizes depend on the instance (see getOsStatValue)
+OSSTATS = ['NUM_CPUS', 'NUM_CPU_CORES', 'NUM_CPU_SOCKETS', 'PHYSICAL_MEMORY_BYTES', 'FREE_MEMORY_BYTES', 'BUSY_TIME', 'IDLE_TIME', 'SYS_TIME', 'VM_IN_BYTES', 'VM_OUT_BYTES', 'LOAD']
+
+# Statistics of dba_hist_sysstat spooled by the collector (a subset of its list)
+SYSSTATS = [
+    'CPU used by this session', 'DB time', 'consistent gets', 'db block changes', 'db block gets', 'execute count', 'logons cumulative',
+    'parse time cpu', 'physical read IO requests', 'physical read bytes', 'physical read total IO requests', 'physical read total bytes',
+    'physical reads', 'physical writes', 'redo size', 'redo writes', 'user I/O wait time', 'user calls', 'user commits', 'user rollbacks',
+]
+
+# Statistics of dba_hist_sys_time_model
+TIME_MODEL_STATS = [
+    'DB time', 'DB CPU', 'background cpu time', 'background elapsed time', 'connection management call elapsed time', 'hard parse elapsed time',
+    'parse time elapsed', 'PL/SQL execution elapsed time', 'sequence load elapsed time', 'sql execute elapsed time',
+]
+
+# Command types of dba_hist_sqltext (SELECT, INSERT, UPDATE, DELETE, PL/SQL EXECUTE)
+COMMAND_TYPES = ['3', '2', '6', '7', '47']
+
+
+def formatValue(value, fieldType):
+# This function returns the text SQL*Plus prints for a value of the given Big Query type. Numbers without format
+# (numwidth 10, FLOAT64 columns) wider than 10 digits are printed in scientific notation
+
+    if value is None:
+        return ''
+
+    if fieldType == 'FLOAT64':
+        valueText = '{:.0f}'.format(value)
+        return valueText if len(valueText) <= 10 else '{:.4E}'.format(value)
+
+    if fieldType in ('INT64', 'NUMERIC'):
+        return str(int(value))
+
+    return str(value)
+
+
+def getGenericValue(fieldName, fieldType, randomGenerator):
+# This function returns a random value for a column of a table without specific row generator
+
+    if fieldType in ('INT64', 'NUMERIC', 'FLOAT64'):
+        return randomGenerator.randint(0, 100000)
+
+    if fieldName == 'owner':
+        return randomGenerator.choice(['SYS', 'SYSTEM', 'APP', 'HR', 'SALES', 'BILLING'])
+
+    if fieldName.startswith('in_'):
+        return randomGenerator.choice(['0', '1'])
+
+    if fieldName.endswith('_gb') or fieldName in ('coun', 'value', 'highwater', 'last_value'):
+        return str(randomGenerator.randint(0, 5000))
+
+    return '{}_{}'.format(fieldName.upper(), randomGenerator.randint(0, 99))
+
+
+def getOsStatValue(statName, collection, randomGenerator):
+# This function returns a value of a dba_hist_osstat statistic of an instance
+
+    cpus = collection['cpus']
+
+    osStatValues = {
+        'NUM_CPUS': cpus,
+        'NUM_CPU_CORES': cpus // 2,
+        'NUM_CPU_SOCKETS': 2,
+        'PHYSICAL_MEMORY_BYTES': collection['memoryGb'] * 1024 * 1024 * 1024,
+        'FREE_MEMORY_BYTES': randomGenerator.randint(1, collection['memoryGb'] // 4) * 1024 * 1024 * 1024,
+        'BUSY_TIME': randomGenerator.randint(10000, 300000) * cpus,
+        'IDLE_TIME': randomGenerator.randint(100000, 300000) * cpus,
+        'SYS_TIME': randomGenerator.randint(1000, 30000) * cpus,
+        'VM_IN_BYTES': randomGenerator.randint(0, 1000000),
+        'VM_OUT_BYTES': randomGenerator.randint(0, 1000000),
+        'LOAD': randomGenerator.randint(0, cpus),
+    }
+
+    return osStatValues[statName]
+
+
+def getAggregateValues(typicalValue, randomGenerator):
+# This function returns the aggregates of a metric in an hour (avg_value, mode_value, median_value, min_value, max_value, sum_value and percentiles)
+
+    samples = sorted(randomGenerator.randint(0, typicalValue * 2) for sampleCounter in range(12))
+
+    return {
+        'avg_value': sum(samples) // len(samples),
+        'mode_value': samples[0],
+        'median_value': samples[len(samples) // 2],
+        'min_value': samples[0],
+        'max_value': samples[-1],
+        'sum_value': sum(samples),
+        'perc50': samples[len(samples) // 2],
+        'perc75': samples[len(samples) * 3 // 4],
+        'perc90': samples[len(samples) * 9 // 10],
+        'perc95': samples[-2],
+        'perc100': samples[-1],
+        'coun': len(samples),
+    }
+
+
+def getTableRows(tableName, collection, randomGenerator):
+# This function yields the rows of a table of a collection as hash tables column name -> value
+# Columns not set by the table generator get a generic value (see getGenericValue)
+
+    instances = collection['instances']
+    common = {'pkey': collection['pkey'], 'dbid': collection['dbid'], 'con_id': '0'}
+
+    if tableName == 'dbsummary':
+        yield dict(common, db_name=collection['dbname'], cdb=collection['cdb'], dbversion=collection['fullVersion'], dbfullversion='Oracle Database {} Enterprise Edition Release'.format(collection['fullVersion']),
+                   log_mode='ARCHIVELOG', force_logging='NO', redo_gb_per_day=randomGenerator.randint(1, 200), rac_dbinstaces=len(instances), characterset='AMERICAN_AMERICA.AL32UTF8',
+                   platform_name='Linux x86 64-bit', startup_time='01/01/21 00:00:00', user_schemas=randomGenerator.randint(5, 200), buffer_cache_mb=randomGenerator.randint(1000, 64000),
+                   shared_pool_mb=randomGenerator.randint(500, 8000), total_pga_allocated_mb=randomGenerator.randint(500, 16000), db_size_allocated_gb=collection['sizeGb'],
+                   db_size_in_use_gb=collection['sizeGb'] * 3 // 4, db_long_size_gb='0', dg_database_role='PRIMARY', dg_protection_mode='MAXIMUM PERFORMANCE', dg_protection_level='MAXIMUM PERFORMANCE')
+
+    elif tableName == 'dbinstances':
+        for instanceNumber, instanceName, hostName in instances:
+            yield dict(common, inst_id=instanceNumber, instance_name=instanceName, host_name=hostName, version=collection['fullVersion'], status='OPEN', database_status='ACTIVE', instance_role='PRIMARY_INSTANCE')
+
+    elif tableName == 'pdbsinfo':
+        for pdbId in collection['pdbIds']:
+            yield dict(common, pdb_id=pdbId, pdb_name='PDB{}'.format(pdbId), status='NORMAL', logging='LOGGING')
+
+    elif tableName == 'pdbsopenmode':
+        for pdbId in collection['pdbIds']:
+            yield dict(common, con_id=pdbId, name='PDB{}'.format(pdbId), open_mode='READ WRITE', total_gb=randomGenerator.randint(1, collection['sizeGb']))
+
+    elif tableName == 'dbparameters':
+        for instanceNumber, instanceName, hostName in instances:
+            for parameterName, parameterValue in [('sga_target', collection['memoryGb'] // 2), ('sga_max_size', collection['memoryGb'] // 2), ('pga_aggregate_target', collection['memoryGb'] // 8),
+                                                  ('memory_target', 0), ('memory_max_target', 0), ('cpu_count', collection['cpus']), ('compatible', collection['fullVersion'])]:
+                if parameterName.endswith(('_target', '_size')):
+                    parameterValue = parameterValue * 1024 * 1024 * 1024
+                yield dict(common, inst_id=instanceNumber, name=parameterName, value=parameterValue, default_value='', isdefault_value='FALSE')
+
+    elif tableName == 'cpucoresusage':
+        for dayCounter in range(collection['days']):
+            yield dict(common, dt=(collection['collectedAt'] - datetime.timedelta(days=dayCounter)).strftime('%m/%d/%y %H:%M'), cpu_count=collection['cpus'], cpu_core_count=collection['cpus'] // 2, cpu_socket_count=2)
+
+    elif tableName == 'awrhistsysmetrichist':
+        for instanceNumber, instanceName, hostName in instances:
+            for metricName, metricUnit, typicalValue in SYSMETRICS:
+                for hour in range(24):
+                    yield dict(common, instance_number=instanceNumber, hour='{:02d}'.format(hour), metric_name=metricName, metric_unit=metricUnit, **getAggregateValues(typicalValue, randomGenerator))
+
+    elif tableName == 'awrhistosstat':
+        for instanceNumber, instanceName, hostName in instances:
+            for statName in OSSTATS:
+                for hour in range(24):
+                    statValue = getOsStatValue(statName, collection, randomGenerator)
+                    aggregateValues = getAggregateValues(max(statValue, 1), randomGenerator)
+                    # The sizes of the host do not change
+                    if statName.startswith(('NUM_', 'PHYSICAL_')):
+                        aggregateValues.update({valueName: statValue for valueName in ('avg_value', 'mode_value', 'median_value', 'min_value', 'max_value', 'perc50', 'perc75', 'perc90', 'perc95', 'perc100')})
+                    yield dict(common, total_awr_secs=collection['days'] * 86400, instance_number=instanceNumber, hour='{:02d}'.format(hour), stat_name=statName,
+                               hour_total_secs=collection['days'] * 3600, **aggregateValues)
+
+    elif tableName == 'awrhistcmdtypes':
+        for hour in range(24):
+            for commandType in COMMAND_TYPES:
+                yield dict(common, hour='{:02d}'.format(hour), command_type=commandType, coun=randomGenerator.randint(1, 5000))
+
+    elif tableName in ('dbahistsysstat', 'dbahistsystimemodel'):
+        statNames = SYSSTATS if tableName == 'dbahistsysstat' else TIME_MODEL_STATS
+        for instanceNumber, instanceName, hostName in instances:
+            cumulativeValues = dict.fromkeys(statNames, 0)
+            for snapCounter in range(collection['days'] * 24):
+                beginTime = collection['collectedAt'] - datetime.timedelta(hours=collection['days'] * 24 - snapCounter)
+                for statName in statNames:
+                    delta = randomGenerator.randint(0, 10 ** randomGenerator.randint(3, 12))
+                    cumulativeValues[statName] = cumulativeValues[statName] + delta
+                    yield dict(common, snap_id=collection['firstSnapId'] + snapCounter, instance_number=instanceNumber, begin_interval_time=beginTime.strftime('%d-%b-%y %I.%M.%S.000 %p').upper(),
+                               hour=beginTime.strftime('%H'), stat_name=statName, value=cumulativeValues[statName], delta=delta)
+
+    else:
+        for rowCounter in range(GENERIC_TABLE_ROWS):
+            yield dict(common)
+
+
+def writeSpoolFile(fileName, schemaFields, rows, randomGenerator, columnHeadings=None):
+# This function writes the rows of a table in the SQL*Plus spool format of the collector and returns the number of rows written
+# The header has the columnHeadings spooled by the collector, by default the column names of the table schema
+
+    if columnHeadings is None:
+        columnHeadings = [fieldName.upper() for fieldName, fieldType in schemaFields]
+
+    columnWidths = [max(len(columnHeading), COLUMN_WIDTHS.get(fieldType, 30)) for columnHeading, (fieldName, fieldType) in zip(columnHeadings, schemaFields)]
+    headerLine = ','.join(columnHeading.ljust(columnWidth) for columnHeading, columnWidth in zip(columnHeadings, columnWidths)).rstrip()
+
+    rowCounter = 0
+
+    with open(fileName, 'w') as spoolFile:
+
+        for row in rows:
+
+            # Every page starts with a blank line and the column names
+            if rowCounter % SPOOL_PAGE_ROWS == 0:
+                spoolFile.write('\n' + headerLine + '\n')
+
+            fieldValues = []
+
+            for (fieldName, fieldType), columnWidth in zip(schemaFields, columnWidths):
+
+                fieldValue = formatValue(row[fieldName] if fieldName in row else getGenericValue(fieldName, fieldType, randomGenerator), fieldType)
+
+                # Numbers are right aligned and text left aligned
+                fieldValues.append(fieldValue.rjust(columnWidth) if fieldType in ('INT64', 'NUMERIC', 'FLOAT64') else fieldValue.ljust(columnWidth))
+
+            # set trimspool on removes the trailing blanks
+            spoolFile.write(','.join(fieldValues).rstrip() + '\n')
+            rowCounter = rowCounter + 1
+
+    return rowCounter
+
+
+def generateCollection(filesLocation, collection, randomGenerator):
+# This function writes the files of all tables spooled by the collector script of the collection version
+# Returns a hash table with the number of files, rows and bytes written
+
+    schemaVariant = schema_registry.getSchemaVariant(collection['dbversion'])
+    collectorScript = [scriptFileName for scriptFileName, scriptVariant in schema_coverage.COLLECTOR_SCRIPTS if scriptVariant == schemaVariant][0]
+
+    spooledColumns = schema_coverage.getSpooledColumns(collectorScript)
+
+    collectionStats = {'files': 0, 'rows': 0, 'bytes': 0}
+
+    for tableName in schema_coverage.getSpooledTables(collectorScript):
+
+        schemaFields = schema_registry.getTableSchema(tableName, schemaVariant)
+
+        if schemaFields is None:
+            continue
+
+        # The headings of a query not matching its table schema (see -validateschemas) are not used
+        columnHeadings = spooledColumns.get(tableName)
+
+        if columnHeadings is not None and len(columnHeadings) != len(schemaFields):
+            columnHeadings = None
+
+        fileName = os.path.join(filesLocation, 'opdb__{}__{}.log'.format(tableName, collection['collectionId']))
+
+        collectionStats['rows'] = collectionStats['rows'] + writeSpoolFile(fileName, schemaFields, getTableRows(tableName, collection, randomGenerator), randomGenerator, columnHeadings)
+        collectionStats['files'] = collectionStats['files'] + 1
+        collectionStats['bytes'] = collectionStats['bytes'] + os.path.getsize(fileName)
+
+    return collectionStats
+
+
+def generateDbResults(filesLocation, databases=1, instances=1, days=30, dbVersion='190', seed=1):
+# This function writes the collections of the given number of databases, each one with the given number of RAC instances and days of AWR history
+# The same seed always produces the same files. Returns a hash table with the number of collections, files, rows and bytes written
+
+    randomGenerator = random.Random(seed)
+
+    os.makedirs(filesLocation, exist_ok=True)
+
+    fullVersion = '{}.{}.0.0.0'.format(dbVersion[:2], dbVersion[2:] or '0')
+    collectedAt = datetime.datetime(2021, 5, 17, 14, 30, 5)
+
+    generationStats = {'collections': 0, 'files': 0, 'rows': 0, 'bytes': 0}
+
+    for databaseCounter in range(1, databases + 1):
+
+        dbname = 'DB{:03d}'.format(databaseCounter)
+        hosts = ['dbhost{:03d}-{}.example.com'.format(databaseCounter, instanceCounter) for instanceCounter in range(1, instances + 1)]
+        hora = (collectedAt + datetime.timedelta(minutes=databaseCounter)).strftime(collection_index.HORA_FORMAT)
+
+        collection = {
+            'collectionId': '{}_{}_{}.{}.{}{}.{}'.format(dbVersion, COLLECTOR_VERSION, hosts[0], dbname, dbname, 1, hora),
+            'dbversion': dbVersion,
+            'fullVersion': fullVersion,
+            'pkey': '{}_{}_{}'.format(hosts[0], dbname, hora),
+            'dbid': str(randomGenerator.randint(10 ** 9, 10 ** 10 - 1)),
+            'dbname': dbname,
+            'cdb': 'NO' if schema_registry.getSchemaVariant(dbVersion) == '11g' else 'YES',
+            'pdbIds': [] if schema_registry.getSchemaVariant(dbVersion) == '11g' else list(range(3, 3 + randomGenerator.randint(1, 4))),
+            'instances': [(str(instanceCounter), '{}{}'.format(dbname, instanceCounter), hosts[instanceCounter - 1]) for instanceCounter in range(1, instances + 1)],
+            'cpus': randomGenerator.choice([8, 16, 32, 64]),
+            'memoryGb': randomGenerator.choice([64, 128, 256, 512]),
+            'sizeGb': randomGenerator.randint(50, 20000),
+            'days': days,
+            'collectedAt': collectedAt,
+            'firstSnapId': randomGenerator.randint(1000, 90000),
+        }
+
+        collectionStats = generateCollection(filesLocation, collection, randomGenerator)
+
+        generationStats['collections'] = generationStats['collections'] + 1
+
+        for statName in ('files', 'rows', 'bytes'):
+            generationStats[statName] = generationStats[statName] + collectionStats[statName]
+
+    return generationStats
+
+
+def argumentsParser():
+# Function to handle the arguments of the generator
+
+    parser = argparse.ArgumentParser(description='Generates synthetic Optimus Prime collected files (opdb__<table>__<tag>.log)')
+
+    parser.add_argument("-fl", "-fileslocation", dest="fileslocation", type=str, required=True, help="directory where the files are written")
+    parser.add_argument("-db", "-databases", dest="databases", type=int, default=1, help="number of databases (collections)")
+    parser.add_argument("-in", "-instances", dest="instances", type=int, default=1, help="number of RAC instances of every database")
+    parser.add_argument("-d", "-days", dest="days", type=int, default=30, help="days of AWR history (hourly snapshots)")
+    parser.add_argument("-dv", "-dbversion", dest="dbversion", type=str, default='190', help="database version of the file names, for instance 190 or 112 (11g collector)")
+    parser.add_argument("-s", "-seed", dest="seed", type=int, default=1, help="random seed, the same seed produces the same files")
+
+    args = parser.parse_args()
+
+    if args.databases < 1 or args.instances < 1 or args.days < 1:
+        sys.exit('\nERROR: The parameters -databases, -instances and -days must be greater than zero.\n')
+
+    return args
+
+
+if __name__ == '__main__':
+
+    args = argumentsParser()
+
+    generationStats = generateDbResults(args.fileslocation, args.databases, args.instances, args.days, args.dbversion, args.seed)
+
+    print ('Generated {} collections, {} files, {} rows, {} bytes in {}'.format(generationStats['collections'], generationStats['files'], generationStats['rows'], generationStats['bytes'], args.fileslocation))
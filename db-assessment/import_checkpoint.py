@@ -0,0 +1,124 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Checkpoint of a Big Query import run, used by -resume to continue a failed run from its failure.
+# Every table loaded (all its files in a single load job) and every view created is written to the checkpoint file of the files location
+# as soon as it is done. A run started with -resume skips the files whose size and modification time did not change since they were
+# loaded, and the views whose text did not change since they were created. The checkpoint is removed when a run completes.
+# {"version": 1, "datasetId": "<project>.<dataset>", "files": {"<path>": {"size": ..., "mtime": ..., "tableName": ..., "jobIds": [...], "loadedAt": ...}},
+#  "views": {"<view name>": "<view hash>"}}
+
+import os
+import json
+import time
+
+# Loose files and archive members
+import file_sources
+
+# Name of the checkpoint file written in the files location (-fileslocation)
+CHECKPOINT_FILE_NAME = 'opimport_checkpoint.json'
+
+CHECKPOINT_VERSION = 1
+
+
+class ImportCheckpoint:
+# Checkpoint of the import of a dataset. Only the main thread records the tables and views, as their load jobs and creations complete
+
+    def __init__(self, checkpointFileName, datasetId, resume=False):
+    # With resume the checkpoint left by the failed run is read (a new one is started if there is none)
+    # Otherwise a new checkpoint is started and the one of a previous run is removed
+
+        self.checkpointFileName = checkpointFileName
+        self.checkpoint = {'version': CHECKPOINT_VERSION, 'datasetId': datasetId, 'files': {}, 'views': {}}
+
+        if not resume:
+            self.remove()
+            return
+
+        if not os.path.exists(checkpointFileName):
+            return
+
+        with open(checkpointFileName, 'r') as checkpointFile:
+            checkpoint = json.load(checkpointFile)
+
+        if checkpoint.get('version') != CHECKPOINT_VERSION:
+            raise ValueError('The checkpoint {} has version {} but version {} is expected'.format(checkpointFileName, checkpoint.get('version'), CHECKPOINT_VERSION))
+
+        if checkpoint['datasetId'] != datasetId:
+            raise ValueError('The checkpoint {} is the import of {}, not of {}. It cannot be resumed'.format(checkpointFileName, checkpoint['datasetId'], datasetId))
+
+        self.checkpoint = checkpoint
+
+    def save(self):
+    # This function writes the checkpoint file. A temporary file is renamed over the old one, so an interrupted run never leaves a truncated checkpoint
+
+        temporaryFileName = self.checkpointFileName + '.tmp'
+
+        with open(temporaryFileName, 'w') as checkpointFile:
+            json.dump(self.checkpoint, checkpointFile, indent=1, sort_keys=True)
+
+        os.replace(temporaryFileName, self.checkpointFileName)
+
+    def remove(self):
+
+        if os.path.exists(self.checkpointFileName):
+            os.remove(self.checkpointFileName)
+
+    def getDoneCounters(self):
+    # This function returns the number of files loaded and of views created in the checkpoint
+
+        return len(self.checkpoint['files']), len(self.checkpoint['views'])
+
+    def selectPendingFiles(self, fileList):
+    # This function returns the files of fileList not loaded yet and the files already loaded (same size and modification time)
+
+        pendingFiles = []
+        loadedFiles = []
+
+        for fileName in fileList:
+
+            fileSize, fileMTime = file_sources.getFileState(os.path.abspath(fileName))
+            fileEntry = self.checkpoint['files'].get(os.path.abspath(fileName))
+
+            if fileEntry is not None and fileEntry['size'] == fileSize and fileEntry['mtime'] == fileMTime:
+                loadedFiles.append(fileName)
+            else:
+                pendingFiles.append(fileName)
+
+        return pendingFiles, loadedFiles
+
+    def recordLoadedFiles(self, fileList, tableName, jobIds):
+    # This function records the files loaded to a table by the given load jobs and writes the checkpoint file
+
+        loadedAt = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+        for fileName in fileList:
+
+            fileSize, fileMTime = file_sources.getFileState(os.path.abspath(fileName))
+
+            self.checkpoint['files'][os.path.abspath(fileName)] = {'size': fileSize, 'mtime': fileMTime, 'tableName': tableName, 'jobIds': list(jobIds), 'loadedAt': loadedAt}
+
+        self.save()
+
+    def isViewCreated(self, viewName, viewHash):
+    # This function returns True if the view was created with the same text (hash of the final view text)
+
+        return self.checkpoint['views'].get(viewName) == viewHash
+
+    def recordCreatedViews(self, viewHashes):
+    # This function records the views created (view name -> hash of the final view text) and writes the checkpoint file
+
+        self.checkpoint['views'].update(viewHashes)
+
+        self.save()
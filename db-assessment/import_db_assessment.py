@@ -15,20 +15,106 @@
 
 # Basic python built-in libraries to enable read, write and manipulate files in the OS
 import os
-import glob
+import re
 import sys
+import io
+import glob
+import time
+import uuid
+import hashlib
+import itertools
+import functools
+import threading
+
+# Local database used by -localdb
+import sqlite3
+
+# Runs independent tasks (like the consolidation of each table) in parallel
+import concurrent.futures
 
 # Manages command line flags and arguments
 import argparse
 
-# Big Query Library Used to Import CSV files
-from google.cloud import bigquery
-from google.api_core.exceptions import Conflict
+# The Big Query library (google.cloud.bigquery), the HTTP connection pool of its client (requests) and the client info (set_client_info)
+# are imported by the Big Query backend when it is built (see bigquery_backend.py). Their import takes most of the start up time, so the runs
+# without Big Query (-consolidatelogs, -localdb, -listcollections, -validateschemas and argument errors) do not import them. See benchmark_startup.py
+
+client = None # Declare this at the top after import statements. Big Query backend (see bigquery_backend.py)
+
+# Only one Big Query backend is built and shared by all threads and API calls
+clientLock = threading.Lock()
+
+# Tables whose partitioning and clustering differ from the table schema registry, already reported (see getLoadStorage)
+storageWarnings = set()
+
+# Default number of HTTP connections kept alive by the shared Big Query client
+DEFAULT_HTTP_POOL_SIZE = 10
+
+# Default number of views created at the same time (-viewjobs). A view creation is a metadata API call, not a Big Query job slot
+DEFAULT_VIEW_JOBS = 4
+
+# Label storing the hash of the deployed view text, used by -updateviews to find out which views changed
+VIEW_HASH_LABEL = 'optimus_view_hash'
+
+# Uploads up to this size are sent in a single multipart request, bigger ones use a resumable upload (same limit of the Big Query client)
+MULTIPART_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+
+# Consolidated and normalized files of a collection day (YYYYMMDD) of a table partitioned by collection day (see getFileCollectionDay)
+COLLECTION_DAY_FILE_PATTERN = re.compile(r'^op(?:alldb|normalized)__[A-Za-z0-9_]+?__(?P<collectionDay>\d{8})(?:_consolidate\.log|\.avro)$')
+
+# Streaming helpers to read the collected files
+import log_streams
+
+# Loose files and archive members (.tar, .tar.gz and .zip)
+import file_sources
+
+# Normalization of the collected files into compressed Avro files
+import normalize_logs
+
+# Creation order of the Optimus Prime views
+import view_dependencies
+
+# Manifest of the files already imported (-incremental)
+import import_manifest
+
+# Index of the collections found in the files location
+import collection_index
+
+# Table schemas of the collected files (opConfig/optprimeConfig__tableSchemas.json)
+import schema_registry
+
+# Coverage of the collector scripts and files by the table schemas (-validateschemas)
+import schema_coverage
+
+# Local SQLite database used to run the Optimus Prime views without Big Query
+import local_engine
+
+# Big Query API calls (datasets, load jobs and views) and their errors
+import bigquery_backend
+
+# Local stand-in of Big Query (-localbigquery)
+import local_bigquery
+
+# Retries of the Big Query API calls on rate limit, quota and transient errors
+import api_retry
+
+# Checkpoint of the tables loaded and views created, to continue a failed import (-resume)
+import import_checkpoint
+
+# Materialized tables of the heavy views (-materializeviews)
+import materialized_views
+
+# Pivot of the AWR metric tables into wide tables while reading the files (-pivotmetrics)
+import pivot_metrics
+
+# Retry policy shared by all Big Query API calls. Set from -maxretries and -retrydelay by setRetryPolicy
+retryPolicy = api_retry.RetryPolicy()
 
-client = None # Declare this at the top after import statements
+# Spans, counters and profile of the import run (--tracefile, --metricsfile and --profile)
+import pipeline_trace
 
-# Setting client info for Google APIs
-import set_client_info
+# Tracer shared by all stages of the run. Set from --tracefile, --metricsfile and --profile by setTracer
+tracer = pipeline_trace.PipelineTracer()
 
 # Importing Optimus Prime Version
 import version
@@ -43,246 +129,758 @@ logging.getLogger().setLevel(level=logging.INFO)
 
 
 
-def get_bigqueryClient():
+def get_bigqueryClient(httpPoolSize=DEFAULT_HTTP_POOL_SIZE):
+# This function returns the Big Query backend shared by every dataset, import and view operation (see bigquery_backend.py)
+# The Big Query client (credentials discovery and HTTP session) is built only once. httpPoolSize is used only when it is built
+# A backend set by setBigQueryBackend (the local stand-in of -localbigquery for instance) is returned instead
     global client
-    if not client:
-        client = bigquery.Client(client_info=set_client_info.get_http_client_info())
+    with clientLock:
+        if not client:
+            client = bigquery_backend.BigQueryBackend(httpPoolSize)
     return client
 
+def setBigQueryBackend(backend):
+# This function replaces the Big Query backend used by every dataset, import and view operation, for instance by local_bigquery.LocalBigQueryBackend
+    global client
+    with clientLock:
+        client = backend
+
+def setRetryPolicy(policy):
+# This function replaces the retry policy of the Big Query API calls (see api_retry.py)
+    global retryPolicy
+    retryPolicy = policy
+
+def setTracer(pipelineTracer):
+# This function replaces the tracer of the import run (see pipeline_trace.py)
+    global tracer
+    tracer = pipelineTracer
+
 def getVersion():
 
     return __version__
 
-def consolidate_logs(args):
+def consolidateLos(args):
+# This function intents to consolidate the collected files into a single large file per table to facilidate importing the data to Big Query
+# Every source file is streamed in fixed size chunks through a single open writer per table (see log_streams.py)
+# Tables are independent from each other, so with -jobs N they are consolidated in parallel by N worker processes
+
+    filesLocation = str(getattr(args,'fileslocation'))
+
+    # Number of tables consolidated at the same time
+    jobs = getattr(args,'jobs',1) or 1
 
-    tableSchemas = getBQJobConfig()
-    file_counter = 0
+    # For all expected tables we will look for related OS files. So, we will process all files related to a given expected tableName
+    tableNames = schema_registry.getTableNames()
 
-    # For all expected tables we will look for related OS files. So, we will process all files related to a given expected tableName, then move to the next
-    for tablename in tableSchemas:
+    if jobs > 1:
+        # executor.map returns the results in the same order of tableNames, so the report is always the same regardless of which table finishes first
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            consolidationResults = list(executor.map(consolidateTableLogs, [filesLocation] * len(tableNames), tableNames))
+    else:
+        consolidationResults = [consolidateTableLogs(filesLocation,tableName) for tableName in tableNames]
 
-        table_csvfiles = os.path.join(args.filelocation, 'opdb*', tablename, '*.log')
-        consolidated_filepath = os.path.join(args.filelocation, 'opalldb__', tablename, '__consolidate.log')
+    # Counting all processed tables
+    fileCounter = 0
 
-        # Remove file if exists already for given table
-        if os.path.exists(consolidated_filepath):
-            print('The file {} already exists. It is going to be overwritten.'.format(consolidated_filepath))
-            os.remove(consolidated_filepath)
+    # Printing the table consolidation results: a consolidated file per table, or per collection day of the tables partitioned by collection day
+    for tableName, tableConsolidationResults in zip(tableNames, consolidationResults):
 
-        file_counter += 1
-        table_file_counter = 0  # Counter for number of files per table
+        fileCounter = fileCounter + 1
 
-        for file_name in getAllFilesByPattern(table_csvfiles):
+        if tableConsolidationResults is None:
+            continue
 
-            if getAllFilesByPattern(file_name, '__', 1):
+        for removedFileName in tableConsolidationResults['removedFiles']:
+            print('The file {} of a previous consolidation is removed.'.format(removedFileName))
 
-                table_file_counter += 1
-                # Skip headers starting second file
-                start_line = 2 if table_file_counter > 1 else 0
+        for consolidationStats in tableConsolidationResults['targetFiles']:
 
-                with open(consolidated_filepath, 'a') as target_file:
-                    
-                    with open(file_name, 'r') as source_file:
-                        
-                        for line in source_file.readlines()[start_line:]:
-                            target_file.write(line)
-            else:
-                raise Exception("<<appropriate error messsage>>")
-                
+            # The tables can be consolidated by worker processes, their spans are recorded from their results
+            tracer.addSpan('consolidate table',consolidationStats['startTime'],consolidationStats['seconds'],table=tableName,files=consolidationStats['files'],bytes=consolidationStats['bytes'],rows=consolidationStats['rows'],listSeconds=round(consolidationStats['listSeconds'],6))
+            tracer.addCounter('consolidated_files',consolidationStats['files'],table=tableName)
+            tracer.addCounter('consolidated_bytes',consolidationStats['bytes'],table=tableName)
+            tracer.addCounter('consolidated_rows',consolidationStats['rows'],table=tableName)
 
-    logging.info('The total files consolidated are %s. \nAll files are located in %s', file_counter, args.fileslocation)
+            if consolidationStats['overwritten']:
+                print('The file {} already exists. It is going to be overwritten.'.format(consolidationStats['targetFileName']))
+
+            print('Consolidated {} files of {} ({} bytes, {} rows) into {} in {:.2f}s'.format(consolidationStats['files'],tableName,consolidationStats['bytes'],consolidationStats['rows'],consolidationStats['targetFileName'],consolidationStats['seconds']))
+
+    print ('\nThe total files consolidated are {}. \nAll files are located in {}'.format(str(fileCounter),filesLocation))
 
     return True
 
-def consolidateLos(args):
-# This function intents to consolidate the collected files into a single large file to facilidate importing the data to Big Query
+def consolidateTableLogs(filesLocation,tableName):
+# This function consolidates all OS files found for a given expected tableName into opalldb__<tableName>__consolidate.log
+# The files of a table partitioned by collection day (see getTableLoadGroups) are consolidated into a file per collection day,
+# opalldb__<tableName>__<YYYYMMDD>_consolidate.log, so their rows are still loaded into the partition of their collection day
+# The consolidated files of the table left by a previous consolidation and not written again are removed: they would be imported as well
+# Returns None if there is no file to be consolidated for the tableName, otherwise the results of the files written (targetFiles) and the files removed (removedFiles)
+# It does not print anything because it can run in a worker process. consolidateLos reports the returned results
 
-    # Creating Hash Table with all expected tableName schemas to be imported
-    tableSchemas = {}
-    tableSchemas = getBQJobConfig()
+    startTime = time.time()
 
-    # Counting all processed files
-    fileCounter = 0
+    # Using the expected tableName to look for files in the OS in the directory passed in -fileslocation (default dbResults)
+    csvFilesLocationPattern = str(filesLocation) + '/opdb*' + str(tableName) + '*.log'
 
-    # For all expected tables we will look for related OS files. So, we will process all files related to a given expected tableName, then move to the next
-    for tableName in tableSchemas:
+    # Generating a list with all found OS filenames. Sorting it to always produce the same consolidated file
+    # Only files whose final table name matches the expected tableName are consolidated together
+    fileList = sorted(fileName for fileName in getAllFilesByPattern(csvFilesLocationPattern) if getObjNameFromFiles(file_sources.getBaseName(fileName),'__',1) == tableName)
 
-        fileCounter = fileCounter + 1
+    listSeconds = time.time() - startTime
 
-        # Using the expected tableName to look for files in the OS in the directory passed in -fileslocation (default dbResults)
-        csvFilesLocationPattern = str(getattr(args,'fileslocation')) + '/opdb*' + str(tableName) + '*.log'
+    if len(fileList) == 0:
+        return None
 
-        # Generating a list with all found OS filenames
-        fileList = getAllFilesByPattern(csvFilesLocationPattern)
+    tableConsolidationResults = {'targetFiles': [], 'removedFiles': []}
 
-        # To control how many files are being processed and identify the first processed file since it needs to bring the headers
-        fileTableCounter = 0
+    for collectionDay, dayFileList in getTableLoadGroups(tableName,fileList):
 
-        # Processing one file at a time for the expected tableName
-        for fileName in fileList:
+        partitionStartTime = time.time()
 
-            # File Counter
-            fileTableCounter = fileTableCounter + 1
+        # Filename to be used to name consolidated file
+        targetFileNameConsolidated = str(filesLocation) + '/opalldb__' + str(tableName) + '__' + (collectionDay + '_' if collectionDay is not None else '') + 'consolidate.log'
 
-            # Final table name from the CSV file names
-            tableName = getObjNameFromFiles(fileName,'__',1)
+        # If already exists the file is overwritten
+        overwritten = os.path.exists(targetFileNameConsolidated)
 
-            # Filename to be used to name consolidated file
-            targetFileNameConsolidated = str(getattr(args,'fileslocation')) + '/opalldb__' + str(tableName) + '__consolidate.log'
+        consolidationStats = log_streams.consolidateTable(tableName,dayFileList,targetFileNameConsolidated)
+        consolidationStats['overwritten'] = overwritten
+        consolidationStats['startTime'] = partitionStartTime
+        consolidationStats['listSeconds'] = listSeconds
+        consolidationStats['seconds'] = time.time() - partitionStartTime
 
-            # Checks if file already exists in the first matching file found because the other files need to append to existent one.
-            if fileTableCounter == 1:
+        tableConsolidationResults['targetFiles'].append(consolidationStats)
 
-                # If already exists delete the file
-                if os.path.exists(targetFileNameConsolidated):
-                    
-                    print('The file {} already exists. It is going to be overwritten.'.format(targetFileNameConsolidated))
-                    os.remove(targetFileNameConsolidated)
+    targetFileNames = [consolidationStats['targetFileName'] for consolidationStats in tableConsolidationResults['targetFiles']]
 
-            # This is the file that will be used to be consolidated
-            fileConsolidated = open(targetFileNameConsolidated,'a')
+    for consolidatedFileName in sorted(glob.glob(str(filesLocation) + '/opalldb__' + str(tableName) + '__*consolidate.log')):
+        if consolidatedFileName not in targetFileNames and getObjNameFromFiles(os.path.basename(consolidatedFileName),'__',1) == tableName:
+            os.remove(consolidatedFileName)
+            tableConsolidationResults['removedFiles'].append(consolidatedFileName)
 
-            # This file was found in the OS. The content of this file will be merged/consolidated into fileConsolidated
-            fileToBeConsolidated = open(fileName, 'r')
+    return tableConsolidationResults
 
-            # Breaking it down into lines because first two lines must be skipped for all of the files (expect first file merged)
-            # Since those files are expected to be small (< 10k lines) no performance issue is expected
-            linesToBeConsolidated = []
-            linesToBeConsolidated = fileToBeConsolidated.readlines()
+def normalizeAllCSVs(fileList,jobs=1):
+# This function converts the given CSV files into a single compressed Avro file per table, typed with the declared table schema
+# The Avro files (opnormalized__<tableName>__.avro) are written in the same directory of the CSV files. Tables are converted in parallel by -jobs N worker processes
+# A table partitioned by collection day gets an Avro file per collection day (opnormalized__<tableName>__<YYYYMMDD>.avro, see getTableLoadGroups)
+# Returns the list of files to be imported: the Avro files, plus the CSV files without table schema (they are skipped later by importCSVToBQ)
 
-            # To control how many lines are being processed and identify the first processed lines since it needs to skip it eventually
-            lineCounter = 0
-            for line in linesToBeConsolidated:
+    print ('\nPreparing to normalize CSV files\n')
 
-                # Line counters to be used to skip unecessary lines
-                lineCounter = lineCounter + 1
+    # Grouping the files by the target table_name
+    tableFiles = {}
+    for fileName in fileList:
+        tableFiles.setdefault(getObjNameFromFiles(file_sources.getBaseName(fileName),'__',1), []).append(fileName)
 
-                # Not processing first lines due to expected CSV headers. Except for the first file.
-                if lineCounter <= 2 and fileTableCounter > 1:
-                    
-                    continue
-                
-                # Writting up the line from linesToBeConsolidated into fileConsolidated
-                fileConsolidated.write(line)
+    normalizedFileList = []
+    tableNames = []
+    normalizeTasks = []
 
+    for tableName, tableFileList in tableFiles.items():
 
-            # Closing file handle
-            fileToBeConsolidated.close()
+        schemaFields = schema_registry.getTableSchema(tableName,getTableSchemaVariant(tableName,tableFileList))
 
-            # Closing file handle
-            fileConsolidated.close()
+        if schemaFields is None:
+            normalizedFileList.extend(tableFileList)
+            continue
 
-    print ('\nThe total files consolidated are {}. \nAll files are located in {}'.format(str(fileCounter),str(getattr(args,'fileslocation'))))
+        for collectionDay, dayFileList in getTableLoadGroups(tableName,tableFileList):
 
-    return True
+            targetFileName = os.path.join(file_sources.getFileDirectory(dayFileList[0]), 'opnormalized__' + tableName + '__' + (collectionDay or '') + '.avro')
+
+            tableNames.append(tableName)
+            normalizeTasks.append((tableName, sorted(dayFileList), schemaFields, targetFileName))
+
+    with tracer.span('normalize',tables=len(normalizeTasks),jobs=jobs):
+
+        if jobs > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+                normalizationResults = list(executor.map(normalize_logs.normalizeTableToAvro, *zip(*normalizeTasks)))
+        else:
+            normalizationResults = [normalize_logs.normalizeTableToAvro(*normalizeTask) for normalizeTask in normalizeTasks]
+
+    for normalizationStats in normalizationResults:
+
+        print('Normalized {} files of {} ({} rows, {} bytes to {} bytes, {:.1f}x smaller) into {}'.format(normalizationStats['files'],normalizationStats['tableName'],normalizationStats['rows'],normalizationStats['bytesRead'],normalizationStats['bytesWritten'],normalizationStats['bytesRead'] / max(normalizationStats['bytesWritten'], 1),normalizationStats['targetFileName']))
+
+        tracer.addCounter('normalized_rows',normalizationStats['rows'],table=normalizationStats['tableName'])
+        tracer.addCounter('normalized_bytes_read',normalizationStats['bytesRead'],table=normalizationStats['tableName'])
+        tracer.addCounter('normalized_bytes_written',normalizationStats['bytesWritten'],table=normalizationStats['tableName'])
+
+        normalizedFileList.append(normalizationStats['targetFileName'])
+
+    return normalizedFileList
 
-def createOptimusPrimeViews(gcpProjectName,bqDataset):
-# This function intents to create all views found in the opViews directory. The views creation must follow opViews/<filename> order
+def pivotAllMetrics(fileList,jobs=1):
+# This function pivots the files of the AWR metric tables into a compressed Avro file per wide table (see pivot_metrics.py)
+# The Avro files (oppivoted__<tableName>_pivot__.avro) are written in the same directory of the CSV files. Tables are pivoted in parallel by -jobs N worker processes
+# Returns the list of the Avro files and the list of the files of the other tables
+
+    pivotTableFiles = {}
+    otherFileList = []
+
+    for fileName in fileList:
+
+        tableName = getObjNameFromFiles(file_sources.getBaseName(fileName),'__',1)
+
+        if tableName in pivot_metrics.PIVOT_TABLES:
+            pivotTableFiles.setdefault(tableName, []).append(fileName)
+        else:
+            otherFileList.append(fileName)
+
+    if not pivotTableFiles:
+        return [], otherFileList
+
+    print ('\nPreparing to pivot the AWR metric files\n')
+
+    pivotTasks = [(tableName, sorted(tableFileList), pivot_metrics.getPivotedFileName(tableName, tableFileList)) for tableName, tableFileList in pivotTableFiles.items()]
+
+    with tracer.span('pivot metrics',tables=len(pivotTasks),jobs=jobs):
+
+        if jobs > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+                pivotResults = list(executor.map(pivot_metrics.pivotTableToAvro, *zip(*pivotTasks)))
+        else:
+            pivotResults = [pivot_metrics.pivotTableToAvro(*pivotTask) for pivotTask in pivotTasks]
+
+    for pivotStats in pivotResults:
+
+        tracer.addCounter('pivoted_rows_read',pivotStats['rowsRead'],table=pivotStats['tableName'])
+        tracer.addCounter('pivoted_rows',pivotStats['rows'],table=pivotStats['pivotTableName'])
+        tracer.addCounter('pivoted_bytes_read',pivotStats['bytesRead'],table=pivotStats['tableName'])
+        tracer.addCounter('pivoted_bytes_written',pivotStats['bytesWritten'],table=pivotStats['pivotTableName'])
+
+        print('Pivoted {} files of {} ({} rows into {} rows of {}, {} bytes to {} bytes) into {}'.format(pivotStats['files'],pivotStats['tableName'],pivotStats['rowsRead'],pivotStats['rows'],pivotStats['pivotTableName'],pivotStats['bytesRead'],pivotStats['bytesWritten'],pivotStats['targetFileName']))
+
+    return [pivotStats['targetFileName'] for pivotStats in pivotResults], otherFileList
+
+def createOptimusPrimeViews(gcpProjectName,bqDataset,viewJobs=1,updateViews=False,importCheckpoint=None,materializeViews=False,pivotMetrics=False):
+# This function intents to create all views found in the opViews directory
+# The creation order comes from the ${dataset}.<name> references of each view (see view_dependencies.py), not from the file names.
+# Views without dependencies between them are created at the same time, up to viewJobs views in parallel
+# If updateViews is True the existing views whose text changed are replaced and the unchanged ones are skipped without any API call
+# A view failing is reported and does not stop the other ones. The views done are recorded in importCheckpoint (see import_checkpoint.py)
+# after every level, and the views it has are skipped. Returns False if the views cannot be created or any of them failed
+# If materializeViews is True the views of materialized_views.MATERIALIZED_VIEWS are written into tables refreshed with the new collections
+# If pivotMetrics is True the views reading the AWR metric tables read their wide tables instead (see pivot_metrics.py)
 
     print ('\nPreparing to create Optimus Prime SQL Views\n')
-    
-    # Store all files found in the OS
-    fileList = []
+
+    # Reading all views text to find out their dependencies before any API call
+    viewLevels, viewQueries = getOptimusPrimeViews(pivotMetrics)
+
+    if viewLevels is None:
+        # Returns False if cannot create views
+        return False
+
+    client = get_bigqueryClient()
+
+    # Hash of the views already deployed in the dataset and labels of the materialized tables. A single API call lists them all with their labels
+    deployedViewHashes = None
+    tableLabels = None
+
+    if updateViews or materializeViews:
+        dataset_id = "{}.{}".format(client.project if gcpProjectName is None else gcpProjectName,bqDataset)
+        tableLabels = retryPolicy.call('List of the views of {}'.format(dataset_id),client.listTableLabels,dataset_id)
+
+    if updateViews:
+        deployedViewHashes = {tableName: labels.get(VIEW_HASH_LABEL) for tableName, labels in tableLabels.items()}
+
+    # Hash table view name -> labels of its materialized table (None if the table does not exist yet) and hash of the deployed view
+    materializedViews = None
+
+    if materializeViews:
+        materializedViews = {view_name: {'tableLabels': tableLabels.get(materialized_views.getMaterializedTableName(view_name)), 'deployedViewHash': tableLabels.get(view_name, {}).get(VIEW_HASH_LABEL)} for view_name in materialized_views.MATERIALIZED_VIEWS if view_name in viewQueries}
+
+    viewResults = []
+
+    def createLevelView(view_name):
+    # Task of the pool creating a view. Its status is recorded in the span of the task
+        viewResult = createOptimusPrimeView(client,gcpProjectName,bqDataset,view_name,viewQueries[view_name],deployedViewHashes,importCheckpoint,materializedViews)
+        tracer.setAttributes(status=viewResult['status'])
+        tracer.addCounter('views',1,status=viewResult['status'])
+        return viewResult
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(viewJobs,1)) as executor:
+
+        # A level only starts when all views of the previous level are created
+        for levelCounter, viewLevel in enumerate(viewLevels):
+
+            print ('Preparing to create level {} views: {}\n'.format(levelCounter + 1,', '.join(viewLevel)))
+
+            with tracer.span('view level',level=levelCounter + 1,views=len(viewLevel)):
+                levelFutures = [executor.submit(tracer.wrapTask('create view',createLevelView,view=view_name),view_name) for view_name in viewLevel]
+                levelResults = [levelFuture.result() for levelFuture in levelFutures]
+
+            viewResults.extend(levelResults)
+
+            if importCheckpoint is not None:
+                importCheckpoint.recordCreatedViews({viewResult['viewName']: viewResult['viewHash'] for viewResult in levelResults if viewResult['status'] != 'FAILED'})
+
+    failedViews = [viewResult['viewName'] for viewResult in viewResults if viewResult['status'] == 'FAILED']
+
+    if failedViews:
+        print ('\nERROR: {} of {} views could not be created: {}\n'.format(len(failedViews),len(viewResults),', '.join(failedViews)))
+
+    tracer.setAttributes(views=len(viewResults),failedViews=len(failedViews))
+
+    return not failedViews
+
+def getOptimusPrimeViews(pivotMetrics=False):
+# This function reads all views found in the opViews directory and sorts them in creation levels (see view_dependencies.py)
+# If pivotMetrics is True the views of opViews/pivotMetrics replace the views with the same name, so they read the wide tables of pivot_metrics.py
+# Returns the list of levels and a hash table view name -> view text, or (None, None) if the views cannot be created
 
     # Searching for all matching files in the default views location
     filePattern = 'opViews/optimus_createView*.sql'
 
     # List with all views to be created
     fileList = getAllFilesByPattern(filePattern)
-    
+
     if len(fileList) == 0:
         print('\nWARNING: No views found to be created at expected location: {}. Please make sure you the location is correct.'.format(filePattern))
-        # Returns False if cannot create views    
-        return False
-    
-    else:
+        return None, None
 
-        client = bigquery.Client(client_info=set_client_info.get_http_client_info())
+    viewQueries = {}
 
-        # Sorting list to make sure the proper view creation
-        fileList.sort()
+    for viewFileName in sorted(fileList):
 
-        # Looping to iterate all view files found in the OS to be created. Also, to extract the proper view name out of them.
-        for viewFileName in fileList:
+        # Extracting the proper view name to be created based out of OS view filename
+        view_name = str(getObjNameFromFiles(viewFileName,'__',1)).replace('.sql','')
 
-            # Extracting the proper view name to be created in Big Query based out of OS view filename
-            view_name = str(getObjNameFromFiles(viewFileName,'__',1)).replace('.sql','')
+        if view_name in viewQueries:
+            print('\nERROR: The view {} is defined by more than one file in {}. No views were created.\n'.format(view_name,filePattern))
+            return None, None
 
-            print ('Preparing to process {} and create the view name {}'.format(viewFileName,view_name))
+        with open(viewFileName, "r") as view_content:
+            viewQueries[view_name] = view_content.read()
 
-            
-            if gcpProjectName is None:
-                # In case projectname is not provided in the arguments
-                view_id = str(client.project) + '.' + str(bqDataset) + '.' + view_name
-            else:
-                # If projectname is provided in the arguments
-                view_id = str(gcpProjectName) + '.' + str(bqDataset) + '.' + view_name
-            
-            # Creating the JOB to create view in Big Query
-            view = bigquery.Table(view_id)
+    if pivotMetrics:
+
+        for viewFileName in sorted(getAllFilesByPattern(pivot_metrics.PIVOTED_VIEWS_PATTERN)):
+
+            view_name = str(getObjNameFromFiles(viewFileName,'__',1)).replace('.sql','')
+
+            if view_name not in viewQueries:
+                print('\nERROR: The view {} of {} does not replace any view of {}. No views were created.\n'.format(view_name,pivot_metrics.PIVOTED_VIEWS_PATTERN,filePattern))
+                return None, None
 
-            # Extracting the view text and replacing the string ${dataset} by the proper dataset
             with open(viewFileName, "r") as view_content:
-                view.view_query = view_content.read().replace('${dataset}',str(bqDataset))
+                viewQueries[view_name] = view_content.read()
 
-            try:
-                # Make an API request to create the view.
-                view = client.create_table(view)
-                print("Created {}: {}".format(view.table_type,str(view.reference)))
-                print("\n")
-            except Conflict as error:
-                print("View {} already exists.\n".format(str(view.reference)))
+    try:
+        viewLevels = view_dependencies.getViewLevels(viewQueries, schema_registry.getTableNames())
+    except ValueError as error:
+        print('\nERROR: {}. No views were created.\n'.format(error))
+        return None, None
+
+    return viewLevels, viewQueries
 
+def createOptimusPrimeView(client,gcpProjectName,bqDataset,view_name,viewQuery,deployedViewHashes=None,importCheckpoint=None,materializedViews=None):
+# This function creates a single view in Big Query. The string ${dataset} of the view text is replaced by the proper dataset
+# The hash of the final view text is stored in the view labels. If deployedViewHashes (view name -> deployed hash) is given,
+# an existing view is replaced only when its hash is different. A view of importCheckpoint with the same hash is skipped
+# A view of materializedViews (view name -> labels of its table and deployed view hash) is first written into its table and deployed as a SELECT of it
+# Returns a hash table with the view name, its hash and its status (CREATED, UPDATED, UNCHANGED, EXISTS, RESUMED or FAILED)
 
-        return True 
+    if gcpProjectName is None:
+        # In case projectname is not provided in the arguments
+        view_id = str(client.project) + '.' + str(bqDataset) + '.' + view_name
+    else:
+        # If projectname is provided in the arguments
+        view_id = str(gcpProjectName) + '.' + str(bqDataset) + '.' + view_name
     
+    # Replacing the string ${dataset} by the proper dataset
+    view_query = viewQuery.replace('${dataset}',str(bqDataset))
+
+    # The views built on a materialized view read its table
+    if materializedViews is not None and view_name in materializedViews:
+        view_query = materialized_views.getMaterializedViewQuery(str(bqDataset),view_name)
+
+    # Label values are limited to 63 characters, a sha1 hex digest has 40. It is only used to detect changes
+    viewHash = hashlib.sha1(view_query.encode('utf-8')).hexdigest()
+    viewLabels = {VIEW_HASH_LABEL: viewHash}
+
+    viewResult = {'viewName': view_name, 'viewHash': viewHash, 'status': None}
+
+    if importCheckpoint is not None and importCheckpoint.isViewCreated(view_name, viewHash):
+        print("View {} was created before the failure. Skipped.\n".format(view_id))
+        viewResult['status'] = 'RESUMED'
+        return viewResult
+
+    if materializedViews is not None and view_name in materializedViews:
+
+        if not refreshMaterializedTable(client,gcpProjectName,bqDataset,view_name,viewQuery.replace('${dataset}',str(bqDataset)),materializedViews[view_name]['tableLabels']):
+            viewResult['status'] = 'FAILED'
+            return viewResult
+
+    if deployedViewHashes is not None and view_name in deployedViewHashes:
+
+        if deployedViewHashes[view_name] == viewHash:
+            print("View {} is unchanged. Skipped.\n".format(view_id))
+            viewResult['status'] = 'UNCHANGED'
+            return viewResult
+
+        try:
+            # Make an API request to replace the view text.
+            retryPolicy.call('Update of view {}'.format(view_id), client.updateView, view_id, view_query, viewLabels)
+            print("Updated VIEW: {}\n".format(view_id))
+            viewResult['status'] = 'UPDATED'
+        except Exception as error:
+            print("\nERROR: The view {} could not be updated: {}\n".format(view_id,error))
+            viewResult['status'] = 'FAILED'
+
+        return viewResult
+
+    try:
+        # Make an API request to create the view.
+        retryPolicy.call('Creation of view {}'.format(view_id), client.createView, view_id, view_query, viewLabels)
+        print("Created VIEW: {}\n".format(view_id))
+        viewResult['status'] = 'CREATED'
+    except bigquery_backend.AlreadyExists as error:
+        print("View {} already exists.\n".format(view_id))
+        viewResult['status'] = 'EXISTS'
+
+        if materializedViews is not None and view_name in materializedViews and materializedViews[view_name]['deployedViewHash'] != viewHash:
+            print("WARNING: The view {} does not read its materialized table. Run it with -updateviews to replace it.\n".format(view_id))
+    except Exception as error:
+        print("\nERROR: The view {} could not be created: {}\n".format(view_id,error))
+        viewResult['status'] = 'FAILED'
+
+    return viewResult
+
+def refreshMaterializedTable(client,gcpProjectName,bqDataset,view_name,view_query,tableLabels):
+# This function writes the rows of a view (text after the ${dataset} replacement) into its materialized table (see materialized_views.py)
+# Only the collections missing from the table are added. The table is rebuilt if it does not exist or if the view text changed
+# tableLabels are the labels of the existing table, None if there is none. Returns False if the table could not be refreshed
+
+    table_id = getTableRef(bqDataset,materialized_views.getMaterializedTableName(view_name),client.project if gcpProjectName is None else gcpProjectName)
+
+    materializationHash = hashlib.sha1(view_query.encode('utf-8')).hexdigest()
+    fullRefresh = tableLabels is None or tableLabels.get(materialized_views.MATERIALIZATION_HASH_LABEL) != materializationHash
+
+    refreshQuery = materialized_views.getRefreshQuery(str(bqDataset),view_name,view_query,fullRefresh)
+
+    try:
+        # The refresh query skips the collections already in the table, so a retry never writes them twice
+        with tracer.span('materialize view',view=view_name,fullRefresh=fullRefresh) as materializeSpan:
+            rowCount = retryPolicy.call('Materialization of view {}'.format(view_name), client.materializeQuery, table_id, refreshQuery, materialized_views.CLUSTERING_FIELDS, {materialized_views.MATERIALIZATION_HASH_LABEL: materializationHash}, fullRefresh)
+            materializeSpan.setAttributes(rows=rowCount)
+    except Exception as error:
+        print("\nERROR: The materialized table {} could not be refreshed: {}\n".format(table_id,error))
+        return False
+
+    tracer.addCounter('materialized_rows',rowCount,view=view_name)
+
+    print("{} MATERIALIZED TABLE: {} ({} rows written)\n".format('Built' if fullRefresh else 'Refreshed',table_id,rowCount))
+
+    return True
+
+def importAllCSVsToLocalDB(connection,fileList,skipLeadingRows):
+# This function loads the given CSV files into the local SQLite database (see local_engine.py), a single table per table name
+# Returns False if any of the tables failed to be loaded
+
+    print ('\nPreparing to load CSV files into the local database\n')
+
+    # Grouping the files by the target table_name
+    tableFiles = {}
+    for fileName in fileList:
+        tableFiles.setdefault(getObjNameFromFiles(file_sources.getBaseName(fileName),'__',1), []).append(fileName)
+
+    loadSucceeded = True
+
+    for tableName, tableFileList in tableFiles.items():
+
+        schemaFields = schema_registry.getTableSchema(tableName,getTableSchemaVariant(tableName,tableFileList))
+
+        if schemaFields is None:
+            print ('WARNING: The table name {} cannot be loaded because it does not have table schema in Optimus Prime configuration. So, it will be skipped.'.format(tableName))
+            continue
+
+        startTime = time.time()
+
+        try:
+            loadStats = local_engine.loadLocalTable(connection,tableName,schemaFields,sorted(tableFileList),skipLeadingRows)
+        except (ValueError, sqlite3.Error) as error:
+            print ('\nERROR: The files of table {} could not be loaded into the local database: {}\n'.format(tableName,error))
+            loadSucceeded = False
+            continue
+
+        print ('Loaded {} files of {} ({} rows) in {:.2f}s'.format(loadStats['files'],tableName,loadStats['rows'],time.time() - startTime))
+
+    return loadSucceeded
+
+def createOptimusPrimeLocalViews(connection):
+# This function creates all views found in the opViews directory in the local SQLite database, translated from the Big Query dialect
+# Returns False if any of the views could not be created
+
+    print ('\nPreparing to create Optimus Prime SQL Views in the local database\n')
+
+    viewLevels, viewQueries = getOptimusPrimeViews()
+
+    if viewLevels is None:
+        return False
+
+    for viewLevel in viewLevels:
+        for view_name in viewLevel:
+
+            try:
+                local_engine.createLocalView(connection,view_name,viewQueries[view_name])
+            except sqlite3.Error as error:
+                print ('ERROR: The view {} could not be created in the local database: {}'.format(view_name,error))
+                return False
+
+            print ('Created local view: {}'.format(view_name))
+
+    return True
+
+def exportLocalReports(connection,reportViews,targetLocation):
+# This function writes the content of the given views of the local database into CSV files (opreport__<view>__.csv) in targetLocation
+
+    print ('\nPreparing to export the Optimus Prime reports\n')
+
+    for view_name in reportViews:
+
+        targetFileName = os.path.join(targetLocation, 'opreport__' + view_name + '__.csv')
+
+        try:
+            rows = local_engine.exportLocalQuery(connection,'SELECT * FROM "{}"'.format(view_name),targetFileName)
+        except sqlite3.Error as error:
+            print ('ERROR: The report {} could not be exported: {}'.format(view_name,error))
+            continue
+
+        print ('Exported {} rows of {} into {}'.format(rows,view_name,targetFileName))
+
+def exportLocalBmsSizing(connection,targetLocation):
+# This function computes the Bare Metal Solution sizing report with numpy/pandas (see bms_sizing.py) from the local database
+# and writes it to opreport__bms_sizing__.csv in targetLocation. Same content of vbms_sizing_report
+
+    print ('\nPreparing to compute the Bare Metal Solution sizing\n')
+
+    # numpy and pandas are only needed by -bmssizing
+    try:
+        import bms_sizing
+    except ImportError as error:
+        print ('ERROR: The Bare Metal Solution sizing needs numpy and pandas (pip install oracle-db-assessment[sizing]): {}'.format(error))
+        return False
+
+    startTime = time.time()
+
+    machineSizes = bms_sizing.readMachineSizes('opConfig/optconfig__optimusconfig_bms_machinesizes__.csv')
+    sizingReport = bms_sizing.getSizingReport(bms_sizing.readLocalSizingInputs(connection),machineSizes)
+
+    targetFileName = os.path.join(targetLocation, 'opreport__bms_sizing__.csv')
+    sizingReport.to_csv(targetFileName, index=False)
+
+    print ('Exported {} rows of the Bare Metal Solution sizing into {} in {:.2f}s'.format(len(sizingReport),targetFileName,time.time() - startTime))
+
+    return True
 
 def getAllFilesByPattern(filePattern):
 # This function intends to get the name of all files in the OS and return a list of strings
+# The members of the archives (.tar, .tar.gz and .zip) of the pattern directory are returned as well (see file_sources.py)
 
-    # Get all matching files and creates a list returning it   
-    return glob.glob(filePattern)
+    # Get all matching files and creates a list returning it
+    return file_sources.globFiles(filePattern)
 
-def importAllCSVsToBQ(gcpProjectName,bqDataset,fileList,skipLeadingRows):
-# This function receives a list of files to import to Big Query, then it calls importCSVToBQ to import table/file by table/file
+def importAllCSVsToBQ(gcpProjectName,bqDataset,fileList,skipLeadingRows,loadJobs=1,compressUpload=False,importResults=None,onTableImported=None,migrateTables=False):
+# This function receives a list of files to import to Big Query, then it calls importCSVToBQ to import table by table
+# The existing tables are checked first against their table schemas, and migrated if migrateTables (see checkExistingTables)
+# All files of the same table share the same schema, so they are loaded by a single Big Query job per table, or per partition
+# for the tables partitioned by collection day (see getTableLoadGroups). Up to loadJobs load jobs run at the same time
+# If importResults is a list, the result of every table (see importTableCSVsToBQ) is appended to it
+# If onTableImported is given, it is called by the main thread with the result of every table as soon as the table is done (checkpoint of -resume)
+# Returns False if any of the tables failed to be imported
 
     print ('\nPreparing to upload CSV files\n')
 
-    # Creating Hash Table with all expected table schemas to be imported
-    tableSchemas = {}
-    tableSchemas = getBQJobConfig()
-
-    # Getting the name of the target table_name to import the data based on the filename from OS
+    # Grouping the files by the target table_name to import the data based on the filename from OS
+    tableFiles = {}
     for fileName in fileList:
-        
-        # Default Big Query Job Configurations for Optimus Prime CSV files
-        autoDetect = 'True'
 
         # Final table name from the CSV file names
-        tableName = getObjNameFromFiles(fileName,'__',1)
+        tableName = getObjNameFromFiles(file_sources.getBaseName(fileName),'__',1)
+
+        tableFiles.setdefault(tableName, []).append(fileName)
+
+    tableSchemas = {tableName: schema_registry.getTableSchemas(getTableSchemaVariant(tableName,tableFileList)) for tableName, tableFileList in tableFiles.items()}
+
+    # The load jobs into a table with other columns would all fail
+    if not checkExistingTables(gcpProjectName,bqDataset,{tableName: tableSchemas[tableName][tableName] for tableName in tableFiles if tableName in tableSchemas[tableName]},migrateTables):
+        return False
+
+    # Each table is a load job to be run by the pool
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(loadJobs,1)) as executor:
+        tableFutures = [executor.submit(tracer.wrapTask('load table',importTableCSVsToBQ,table=tableName,partition=partition),gcpProjectName,bqDataset,tableName,sorted(partitionFileList),skipLeadingRows,tableSchemas[tableName],compressUpload,partition) for tableName, tableFileList in tableFiles.items() for partition, partitionFileList in getTableLoadGroups(tableName,tableFileList)]
+
+        if onTableImported is not None:
+            for tableFuture in concurrent.futures.as_completed(tableFutures):
+                onTableImported(tableFuture.result())
+
+        tableResults = [tableFuture.result() for tableFuture in tableFutures]
+
+    printImportSummary(tableResults)
+
+    if importResults is not None:
+        importResults.extend(tableResults)
+
+    return all(tableResult['status'] != 'FAILED' for tableResult in tableResults)
+
+def checkExistingTables(gcpProjectName,bqDataset,tableSchemas,migrateTables=False):
+# This function checks the columns and types of the existing tables of an import against their table schemas (tableSchemas: hash table
+# tableName -> tuple of (column name, Big Query type)), before any load job. The tables created by older versions of Optimus Prime have STRING
+# columns only and Big Query rejects the typed load jobs into them. With migrateTables their rows are rewritten into the columns and types of
+# the table schema (see the migrateTable of the backends). Otherwise, or if a table cannot be migrated, the tables are listed with what to do
+# Returns False if the import cannot go on
+
+    client = get_bigqueryClient()
+    mismatchedTables = []
+
+    for tableName, schema in sorted(tableSchemas.items()):
+
+        table_id = '{}.{}.{}'.format(client.project if gcpProjectName is None else gcpProjectName,bqDataset,tableName)
+        existingTable = retryPolicy.call('Lookup of table {}'.format(table_id), client.getTable, table_id)
+
+        if existingTable is None or not schema_registry.getSchemaDifferences(existingTable['schemaFields'], schema):
+            continue
+
+        migrationProblems = schema_registry.getMigrationProblems(existingTable['schemaFields'], schema)
+
+        # The migration writes all rows into the partition of the day
+        if existingTable['dayPartitioned']:
+            migrationProblems.append('the table is partitioned by day')
+
+        if not migrateTables or migrationProblems:
+            mismatchedTables.append((table_id, schema_registry.getSchemaDifferences(existingTable['schemaFields'], schema), migrationProblems))
+            continue
 
-        print ('\nThe filename {} is being imported to Big Query.'.format(fileName))
+        print ('Migrating the table {} to the columns and types of its table schema'.format(table_id))
 
-        # Import the given CSV fileName into 
-        importCSVToBQ(gcpProjectName,bqDataset,tableName,fileName,skipLeadingRows,autoDetect,tableSchemas)
+        with tracer.span('migrate table',table=tableName) as migrationSpan:
+            migratedRows = retryPolicy.call('Migration of table {}'.format(table_id), client.migrateTable, table_id, schema)
+            migrationSpan.setAttributes(rows=migratedRows)
+
+        print ('The table {} is migrated ({} rows)'.format(table_id,migratedRows))
+
+    if mismatchedTables:
+
+        print ('\nERROR: These tables exist with other columns than their table schemas in {}. They were probably created by an older version of Optimus Prime, and Big Query would reject the load jobs into them. Nothing was loaded.\n'.format(schema_registry.SCHEMA_FILE_NAME))
+
+        for table_id, schemaDifferences, migrationProblems in mismatchedTables:
+            print ('  {}: {}'.format(table_id,'; '.join(schemaDifferences)))
+
+            if migrateTables:
+                print ('    It cannot be migrated: {}'.format('; '.join(migrationProblems)))
+
+        if migrateTables:
+            print ('\nImport into a new dataset (-dataset), or delete these tables to load all their files again.\n')
+        else:
+            print ('\nRun the import again with -migratetables to rewrite their rows into the columns and types of the table schemas, import into a new dataset (-dataset), or delete these tables to load all their files again.\n')
+
+        return False
 
     return True
 
-def importCSVToBQ(gcpProjectName,bqDataset,tableName,fileName,skipLeadingRows,autoDetect,tableSchemas):
+def getFileCollectionDay(fileName):
+# This function returns the collection day (YYYYMMDD) of a collected file, or of a consolidated or normalized file of a single collection day
+# (see consolidateTableLogs and normalizeAllCSVs), or None if its name has no collection time
+
+    collectionFile = collection_index.parseCollectionFileName(fileName)
+
+    if collectionFile is not None:
+        return collectionFile['collectedAt'].strftime('%Y%m%d') if collectionFile['collectedAt'] is not None else None
+
+    dayFileMatch = COLLECTION_DAY_FILE_PATTERN.match(file_sources.getBaseName(fileName))
+
+    return dayFileMatch.group('collectionDay') if dayFileMatch is not None else None
+
+def getTableLoadGroups(tableName,fileList):
+# This function splits the files of a table into its load jobs and returns a list of (partition, files)
+# The files of a table partitioned by collection day (see schema_registry.getTableStorage) are loaded into the partition YYYYMMDD of their
+# collection day, a load job per day. The consolidated and normalized files of these tables are written per collection day for that
+# (see getFileCollectionDay). The files without collection time in their names (collected files not following the collector naming and
+# the consolidated files of older versions) are loaded without partition (partition None), so Big Query writes them into the partition of the load day
+
+    partitioning, clusteringFields = schema_registry.getTableStorage(tableName)
+
+    if partitioning != schema_registry.PARTITIONING_COLLECTION_DAY:
+        return [(None, fileList)]
+
+    partitionFiles = {}
+
+    for fileName in fileList:
+        partitionFiles.setdefault(getFileCollectionDay(fileName), []).append(fileName)
+
+    return sorted(partitionFiles.items(), key=lambda partitionItem: partitionItem[0] or '')
+
+def importTableCSVsToBQ(gcpProjectName,bqDataset,tableName,fileList,skipLeadingRows,tableSchemas,compressUpload=False,partition=None):
+# This function imports all files of a given table (or of a partition YYYYMMDD of the table) in a single load job and returns its status, load job ids and timing
+# A failure is recorded and does not stop the other tables being imported by the pool
+
+    # Default Big Query Job Configurations for Optimus Prime CSV files
+    autoDetect = 'True'
+
+    print ('\nThe {} files of table {} are being imported to Big Query.'.format(len(fileList),tableName if partition is None else '{}${}'.format(tableName,partition)))
+
+    startTime = time.time()
+    errorMessage = None
+    jobIds = []
+
+    try:
+        # Import the given CSV files into the table
+        jobIds = importCSVToBQ(gcpProjectName,bqDataset,tableName,fileList,skipLeadingRows,autoDetect,tableSchemas,compressUpload,partition) or []
+        status = 'LOADED' if jobIds else 'SKIPPED'
+    except Exception as error:
+        status = 'FAILED'
+        errorMessage = str(error)
+        print ('\nERROR: The files of table {} could not be imported to Big Query ({} error): {}\n'.format(tableName,'retryable' if isinstance(error, bigquery_backend.RETRYABLE_ERRORS) else 'fatal',errorMessage))
+
+    tracer.setAttributes(files=len(fileList),status=status,jobIds=jobIds)
+    tracer.addCounter('load_tables',1,status=status)
+
+    return {'tableName': tableName, 'partition': partition, 'fileList': fileList, 'status': status, 'jobIds': jobIds, 'seconds': time.time() - startTime, 'error': errorMessage}
+
+def printImportSummary(importResults):
+# This function prints the final status and timing of every table (load job) imported to Big Query along with its files
+
+    print ('\nImport summary:\n')
+
+    for importResult in importResults:
+        print ('{:<8} {:>9.2f}s  {} ({} files)'.format(importResult['status'],importResult['seconds'],importResult['tableName'] if importResult['partition'] is None else '{}${}'.format(importResult['tableName'],importResult['partition']),len(importResult['fileList'])))
+
+        for fileName in importResult['fileList']:
+            print ('{:<21}{}'.format('',fileName))
+
+    statusCounter = {}
+    for importResult in importResults:
+        statusCounter[importResult['status']] = statusCounter.get(importResult['status'], 0) + 1
+
+    print ('\nTotal load jobs: {} ({}), total files: {}\n'.format(len(importResults),', '.join('{} {}'.format(counter,status) for status, counter in sorted(statusCounter.items())),sum(len(importResult['fileList']) for importResult in importResults)))
+
+def importCSVToBQ(gcpProjectName,bqDataset,tableName,fileName,skipLeadingRows,autoDetect,tableSchemas,compressUpload=False,partition=None):
 # This function will import the CSV file into the Big Query using the proper project.dataset.tablename
-# A Big Query Job is created for it
+# fileName can also be a list of files of the same table. They are streamed as a single CSV (headers are kept for the first file only)
+# If compressUpload is True the CSV stream is gzip compressed on the fly while being uploaded
+# tableSchemas is a hash table tableName -> tuple of (column name, Big Query type) of the table schema registry (see schema_registry.py)
+# A single Big Query Job is created for it, loading into the partition YYYYMMDD of the table if partition is given. The table is created with the
+# partitioning and clustering of the table schema registry (see schema_registry.getTableStorage). An existing table keeps its own (see getLoadStorage)
+# Returns the list of the load job ids, or False if the table is skipped
+
+    fileList = fileName if isinstance(fileName, list) else [fileName]
 
     # Getting table schema
     try:
         schema = tableSchemas[tableName]
     except KeyError:
-        # In case there is not expected table schema found in getBQJobConfig function
-        print ('\nWARNING: The filename {} could not be imported to Big Query.'.format(fileName))
-        print ('The table name {} cannot be imported because it does not have table schema in Optimus Prime configuration. So, it will be skipped.\n')
+        # In case there is not expected table schema found in the table schema registry
+        print ('\nWARNING: The filename {} could not be imported to Big Query.'.format(', '.join(fileList)))
+        print ('The table name {} cannot be imported because it does not have table schema in Optimus Prime configuration. So, it will be skipped.\n'.format(tableName))
         return False
 
-    # Construct a BigQuery client object.
-    client = bigquery.Client(client_info=set_client_info.get_http_client_info())
+    # Getting the shared BigQuery client object.
+    client = get_bigqueryClient()
 
     # Adding Project and Dataset based on arguments 
     # table_id to the ID of the table to create.
@@ -293,28 +891,167 @@ def importCSVToBQ(gcpProjectName,bqDataset,tableName,fileName,skipLeadingRows,au
     else:
         table_id = str(client.project) + '.' + str(bqDataset) + '.' + str(tableName)
 
-    # table schema
-    schema = []
+    # Partitioning and clustering asked to the load jobs, and partition of the rows if the table is partitioned. An existing table must have the declared columns
+    dayPartitioned, clusteringFields, partition = getLoadStorage(client,table_id,tableName,schema,partition)
 
-    job_config = bigquery.LoadJobConfig(
-        schema=schema,
-        skip_leading_rows=skipLeadingRows,
-        # The source format defaults to CSV, so the line below is optional.
-        source_format=bigquery.SourceFormat.CSV,
-    )
+    # Destination of the load jobs: the table or one of its partitions
+    load_table_id = table_id if partition is None else '{}${}'.format(table_id,partition)
 
-    with open(fileName, "rb") as source_file:
-        load_job = client.load_table_from_file(source_file, table_id, job_config=job_config)
+    # Normalized files (see normalizeAllCSVs) are Avro files which already have the declared schema and types. One load job per Avro file
+    if fileList[0].endswith('.avro'):
 
-    load_job.result()  # Waits for the job to complete.
+        def submitAvroFile(avroFileName,jobId):
+        # Upload of an Avro file and submit of its load job
 
-    destination_table = client.get_table(table_id)  # Make an API request.
-    print("Loaded {} rows into: {}".format(destination_table.num_rows,destination_table.reference))
-    print ('The filename {} is successfully imported to Big Query.\n'.format(fileName))
+            with tracer.span('upload',table=tableName,file=avroFileName,uploadBytes=os.path.getsize(avroFileName)), open(avroFileName, "rb") as source_file:
+                load_job = client.loadTableFromFile(source_file, load_table_id, schema, bigquery_backend.SOURCE_FORMAT_AVRO, dayPartitioned=dayPartitioned, clusteringFields=clusteringFields, jobId=jobId)
 
-    # returns True if processing is successfully
-    return True
+            tracer.addCounter('upload_bytes',os.path.getsize(avroFileName),table=tableName)
+
+            return load_job
+
+        jobIds = [runLoadJob(avroFileName,tableName,functools.partial(submitAvroFile,avroFileName)).job_id for avroFileName in fileList]
+
+        printLoadedRows(client,table_id)
+        print ('The filename {} is successfully imported to Big Query.\n'.format(', '.join(fileList)))
+
+        return jobIds
+
+    # The declared table schema is enforced, so Big Query does not need to infer the columns and their types
+    # The files are normalized on the fly (padding, blank lines and repeated headers removed) to be parsed by the typed columns.
+    # The headers of the other files are stripped as well, so the stream always has a single header line (skipped by the load job)
+
+    def submitCSVFiles(jobId):
+    # Upload of the CSV stream and submit of its load job. The stream is built again at every attempt
+
+        # Counting the CSV bytes before and after the compression to report the compression ratio and the throughput
+        # The time spent reading and normalizing the files, and compressing them, is measured inside the stream: the rest of the upload is sending it
+        uploadStats = {}
+        csvChunks = log_streams.countChunks(log_streams.timeChunks(log_streams.iterNormalizedTableChunks(fileList, headerLines=skipLeadingRows), uploadStats, 'readSeconds'), uploadStats, 'csvBytes')
+
+        if compressUpload:
+            csvChunks = log_streams.gzipChunks(csvChunks)
+
+        csvChunks = log_streams.countChunks(log_streams.timeChunks(csvChunks, uploadStats, 'streamSeconds'), uploadStats, 'uploadBytes')
+
+        startTime = time.time()
+
+        with tracer.span('upload',table=tableName,files=len(fileList),compressed=compressUpload) as uploadSpan:
+
+            # Small files are read in memory to be sent in a single multipart request. The others are streamed by a resumable upload in chunks
+            if sum(file_sources.getFileSize(csvFileName) for csvFileName in fileList) <= MULTIPART_UPLOAD_MAX_BYTES:
+                uploadContent = b''.join(csvChunks)
+                with io.BytesIO(uploadContent) as source_file:
+                    load_job = client.loadTableFromFile(source_file, load_table_id, schema, bigquery_backend.SOURCE_FORMAT_CSV, log_streams.NORMALIZED_HEADER_LINES, size=len(uploadContent), dayPartitioned=dayPartitioned, clusteringFields=clusteringFields, jobId=jobId)
+            else:
+                with log_streams.TableLogStream(csvChunks) as source_file:
+                    load_job = client.loadTableFromFile(source_file, load_table_id, schema, bigquery_backend.SOURCE_FORMAT_CSV, log_streams.NORMALIZED_HEADER_LINES, dayPartitioned=dayPartitioned, clusteringFields=clusteringFields, jobId=jobId)
+
+            uploadSeconds = max(time.time() - startTime, 0.001)
+
+            uploadSpan.setAttributes(csvBytes=uploadStats['csvBytes'],uploadBytes=uploadStats['uploadBytes'],readSeconds=round(uploadStats['readSeconds'],6),compressSeconds=round(uploadStats['streamSeconds'] - uploadStats['readSeconds'],6),sendSeconds=round(uploadSeconds - uploadStats['streamSeconds'],6))
+
+        tracer.addCounter('csv_bytes',uploadStats['csvBytes'],table=tableName)
+        tracer.addCounter('upload_bytes',uploadStats['uploadBytes'],table=tableName)
+        tracer.addCounter('read_seconds',uploadStats['readSeconds'],table=tableName)
+        tracer.addCounter('send_seconds',uploadSeconds - uploadStats['streamSeconds'],table=tableName)
+
+        print ('Uploaded {} bytes ({} CSV bytes, compression ratio {:.1f}x) in {:.2f}s ({:.2f} MB/s)'.format(uploadStats['uploadBytes'],uploadStats['csvBytes'],uploadStats['csvBytes'] / max(uploadStats['uploadBytes'], 1),uploadSeconds,uploadStats['uploadBytes'] / uploadSeconds / 1024 / 1024))
+
+        return load_job
+
+    load_job = runLoadJob('table {}'.format(load_table_id),tableName,submitCSVFiles)
+
+    printLoadedRows(client,table_id)
+    print ('The filename {} is successfully imported to Big Query.\n'.format(', '.join(fileList)))
+
+    # returns the load job id if processing is successfully
+    return [load_job.job_id]
+
+
+def getLoadStorage(client,table_id,tableName,schema,partition):
+# This function returns the partitioning by day (True or False) and the clustering columns the load jobs of a table ask for, and the partition
+# they load into. They are the ones of the table schema registry when the jobs create the table. An existing table keeps its partitioning
+# and clustering, and a load job asking for others fails: the jobs ask for none, and load into the partition only if the table is partitioned by day
+# (tables created by older versions of Optimus Prime are not partitioned nor clustered)
+# Raises ValueError if an existing table does not have the columns and types of the table schema: Big Query would reject the load jobs
+# (the tables are checked before the loads by checkExistingTables, this is for a table created in between)
+
+    partitioning, clusteringFields = schema_registry.getTableStorage(tableName)
+    existingTable = retryPolicy.call('Lookup of table {}'.format(table_id), client.getTable, table_id)
+
+    if existingTable is None:
+        return partitioning is not None, clusteringFields, partition
+
+    # The tables created by older versions of Optimus Prime have STRING columns only, the typed columns cannot be loaded into them
+    schemaDifferences = schema_registry.getSchemaDifferences(existingTable['schemaFields'], schema)
+
+    if schemaDifferences:
+        raise ValueError('The table {} exists with other columns than its table schema in {} ({}). It was probably created by an older version of Optimus Prime. Run the import again with -migratetables, import into a new dataset (-dataset), or delete the table to load all its files again.'.format(table_id,schema_registry.SCHEMA_FILE_NAME,'; '.join(schemaDifferences)))
+
+    if (partitioning is not None, clusteringFields) != (existingTable['dayPartitioned'], existingTable['clusteringFields']) and table_id not in storageWarnings:
+        storageWarnings.add(table_id)
+        print ('WARNING: The table {} exists with another partitioning and clustering than the table schema registry (partitioned by day: {}, clustered on: {}. Table schema registry: {}, {}). The rows are loaded into the table as it is. Import into a new dataset to get the partitioning and clustering of the registry.'.format(table_id,'yes' if existingTable['dayPartitioned'] else 'no',', '.join(existingTable['clusteringFields']) or 'none','yes' if partitioning is not None else 'no',', '.join(clusteringFields) or 'none'))
+
+    return False, (), partition if existingTable['dayPartitioned'] else None
+
+
+def runLoadJob(loadName,tableName,submitLoadJob):
+# This function runs a load job with the retries of retryPolicy and returns it once done. submitLoadJob(jobId) uploads the file(s) and submits the job
+# A load job submitted twice would load its rows twice, so the submit and the wait are retried separately:
+# - the submit is retried with the same job id. If the job was created before the error, the id is rejected (AlreadyExists) and that job is used
+# - the wait is retried alone and polls the same job
+# - a new job, with a new id, is submitted only when the job ran and failed with a retryable error (bigquery_backend.JobFailed): it loaded nothing
+
+    client = get_bigqueryClient()
+
+    # Job ids optimus_load_<random>_<attempt>
+    jobIds = ('optimus_load_{}_{}'.format(uuid.uuid4().hex,jobAttempt) for jobAttempt in itertools.count(1))
+
+    def runJobAttempt():
+
+        jobId = next(jobIds)
+
+        def submitOrGetLoadJob():
+
+            try:
+                return submitLoadJob(jobId)
+            except bigquery_backend.AlreadyExists:
+                print ('The load job {} of {} was already submitted. Waiting for it.'.format(jobId,loadName))
+                return client.getLoadJob(jobId)
+
+        load_job = retryPolicy.call('Submit of load job {} of {}'.format(jobId,loadName), submitOrGetLoadJob)
+        retryPolicy.call('Wait of load job {}'.format(jobId), waitLoadJob, load_job, tableName)
+
+        return load_job
+
+    return retryPolicy.call('Load job of {}'.format(loadName), runJobAttempt, retryableErrors=(bigquery_backend.JobFailed,))
+
+
+def waitLoadJob(load_job,tableName):
+# This function waits for a load job to complete. The wait, the time the job was queued in Big Query and the rows loaded are recorded by the tracer
+
+    with tracer.span('job wait',table=tableName,jobId=load_job.job_id) as waitSpan:
+        load_job.result()  # Waits for the job to complete.
+        waitSpan.setAttributes(rows=load_job.output_rows,jobQueueSeconds=load_job.queue_seconds)
+
+    tracer.addCounter('job_wait_seconds',waitSpan.seconds,table=tableName)
+
+    if load_job.queue_seconds is not None:
+        tracer.addCounter('job_queue_seconds',load_job.queue_seconds,table=tableName)
+
+    if load_job.output_rows is not None:
+        tracer.addCounter('loaded_rows',load_job.output_rows,table=tableName)
 
+def printLoadedRows(client,table_id):
+# This function prints the number of rows of a table once loaded
+# The rows are already loaded, so a failure is only reported: failing the table would load its files again with -resume
+
+    try:
+        # Make an API request.
+        print("Loaded {} rows into: {}".format(retryPolicy.call('Row count of {}'.format(table_id), client.getTableRows, table_id),table_id))
+    except Exception as error:
+        print("WARNING: The rows loaded into {} could not be counted: {}".format(table_id,error))
 
 def getTableRef(dataset,tableName,projectName):
     
@@ -328,432 +1065,28 @@ def getObjNameFromFiles(fileName,splitterChar,pos):
 
     return fileName.split(splitterChar)[pos]
 
-def getBQJobConfig():
-# Stores in a hash table all table schema configuration
-# If multi database version schema is needed in the future we can include a key for the Dbversion. 
-# In future this is best implemented if coming from a configuration file like a JSON file
-# For example: bqTablesJobConfig['dbsummary']['11g']... 
-
-    bqTablesJobConfig = {}
-
-    # TableName: dbsummary
-    bqTablesJobConfig['dbsummary'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("dbid", "STRING"),
-        bigquery.SchemaField("db_name", "STRING"),
-        bigquery.SchemaField("cdb", "STRING"),
-        bigquery.SchemaField("dbversion", "STRING"),
-        bigquery.SchemaField("dbfullversion", "STRING"),
-        bigquery.SchemaField("log_mode", "STRING"),
-        bigquery.SchemaField("force_logging", "STRING"),
-        bigquery.SchemaField("redo_gb_per_day", "STRING"),
-        bigquery.SchemaField("rac_dbinstaces", "STRING"),
-        bigquery.SchemaField("characterset", "STRING"),
-        bigquery.SchemaField("platform_name", "STRING"),
-        bigquery.SchemaField("startup_time", "STRING"),
-        bigquery.SchemaField("user_schemas", "STRING"),
-        bigquery.SchemaField("buffer_cache_mb", "STRING"),
-        bigquery.SchemaField("shared_pool_mb", "STRING"),
-        bigquery.SchemaField("total_pga_allocated_mb", "STRING"),
-        bigquery.SchemaField("db_size_allocated_gb", "STRING"),
-        bigquery.SchemaField("db_size_in_use_gb", "STRING"),
-        bigquery.SchemaField("db_long_size_gb", "STRING"),
-        bigquery.SchemaField("dg_database_role", "STRING"),
-        bigquery.SchemaField("dg_protection_mode", "STRING"),
-        bigquery.SchemaField("dg_protection_level", "STRING"),
-    ]
-
-    # TableName: dboverview
-    bqTablesJobConfig['dboverview'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("metric", "STRING"),
-        bigquery.SchemaField("value", "STRING"),
-    ]
-
-    # TableName: pdbsinfo
-    bqTablesJobConfig['pdbsinfo'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("dbid", "STRING"),
-        bigquery.SchemaField("pdb_id", "STRING"),
-        bigquery.SchemaField("pdb_name", "STRING"),
-        bigquery.SchemaField("status", "STRING"),
-        bigquery.SchemaField("logging", "STRING"),
-    ]
-
-    # TableName: pdbsopenmode
-    bqTablesJobConfig['pdbsopenmode'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("name", "STRING"),
-        bigquery.SchemaField("open_mode", "STRING"),
-        bigquery.SchemaField("total_gb", "STRING"),
-    ]
-
-    # TableName: dbinstances
-    bqTablesJobConfig['dbinstances'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("inst_id", "STRING"),
-        bigquery.SchemaField("instance_name", "STRING"),
-        bigquery.SchemaField("host_name", "STRING"),
-        bigquery.SchemaField("version", "STRING"),
-        bigquery.SchemaField("status", "STRING"),
-        bigquery.SchemaField("database_status", "STRING"),
-        bigquery.SchemaField("instance_role", "STRING"),
-    ]
-
-    # TableName: usedspacedetails
-    bqTablesJobConfig['usedspacedetails'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("segment_type", "STRING"),
-        bigquery.SchemaField("tablespace_name", "STRING"),
-        bigquery.SchemaField("flash_cache", "STRING"),
-        bigquery.SchemaField("inmemory", "STRING"),
-        bigquery.SchemaField("in_con_id", "STRING"),
-        bigquery.SchemaField("in_owner", "STRING"),
-        bigquery.SchemaField("in_segment_type", "STRING"),
-        bigquery.SchemaField("in_tablespace_name", "STRING"),
-        bigquery.SchemaField("in_flash_cache", "STRING"),
-        bigquery.SchemaField("in_inmemory", "STRING"),
-        bigquery.SchemaField("size_gb", "STRING"),
-    ]
-
-    # TableName: compressbytable
-    bqTablesJobConfig['compressbytable'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("number_tables", "STRING"),
-        bigquery.SchemaField("table_gb", "STRING"),
-        bigquery.SchemaField("number_parts", "STRING"),
-        bigquery.SchemaField("part_gb", "STRING"),
-        bigquery.SchemaField("number_subparts", "STRING"),
-        bigquery.SchemaField("subpart_gb", "STRING"),
-        bigquery.SchemaField("total_gb", "STRING"),
-    ]
-
-    # TableName: compressbytype
-    bqTablesJobConfig['compressbytype'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("basic", "STRING"),
-        bigquery.SchemaField("oltp", "STRING"),
-        bigquery.SchemaField("query_low", "STRING"),
-        bigquery.SchemaField("query_high", "STRING"),
-        bigquery.SchemaField("archive_low", "STRING"),
-        bigquery.SchemaField("archive_high", "STRING"),
-        bigquery.SchemaField("total_gb", "STRING"),
-    ]
-
-    # TableName: spacebyownersegtype
-    bqTablesJobConfig['spacebyownersegtype'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("segment_type", "STRING"),
-        bigquery.SchemaField("total_gb", "STRING"),
-    ]
-
-    # TableName: spacebytablespace
-    bqTablesJobConfig['spacebytablespace'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("tablespace_name", "STRING"),
-        bigquery.SchemaField("extent_management", "STRING"),
-        bigquery.SchemaField("allocation", "STRING"),
-        bigquery.SchemaField("segment_space_manage", "STRING"),
-        bigquery.SchemaField("est_gain_mb", "STRING"),
-    ]
-
-    # TableName: freespaces
-    bqTablesJobConfig['freespaces'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("tablespace", "STRING"),
-        bigquery.SchemaField("status", "STRING"),
-        bigquery.SchemaField("total_gb", "STRING"),
-        bigquery.SchemaField("used_gb", "STRING"),
-        bigquery.SchemaField("free_gb", "STRING"),
-        bigquery.SchemaField("pct_used", "STRING"),
-        bigquery.SchemaField("graph", "STRING"),
-    ]
-
-    # TableName: dblinks
-    bqTablesJobConfig['dblinks'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("db_link", "STRING"),
-        bigquery.SchemaField("username", "STRING"),
-        bigquery.SchemaField("host", "STRING"),
-        bigquery.SchemaField("created", "STRING"),
-    ]
-
-    # TableName: dbparameters
-    bqTablesJobConfig['dbparameters'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("inst_id", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("name", "STRING"),
-        bigquery.SchemaField("value", "STRING"),
-        bigquery.SchemaField("default_value", "STRING"),
-        bigquery.SchemaField("isdefault_value", "STRING"),
-    ]
-
-    # TableName: dbfeatures
-    bqTablesJobConfig['dbfeatures'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("name", "STRING"),
-        bigquery.SchemaField("current_usage", "STRING"),
-        bigquery.SchemaField("detected_usage", "STRING"),
-        bigquery.SchemaField("total_samples", "STRING"),
-        bigquery.SchemaField("first_usage", "STRING"),
-        bigquery.SchemaField("last_usage", "STRING"),
-        bigquery.SchemaField("aux_count", "STRING"),
-    ]
-
-    # TableName: dbhwmarkstatistics
-    bqTablesJobConfig['dbhwmarkstatistics'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("description", "STRING"),
-        bigquery.SchemaField("highwater", "STRING"),
-        bigquery.SchemaField("last_value", "STRING"),
-    ]
-
-    # TableName: cpucoresusage
-    bqTablesJobConfig['cpucoresusage'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("dt", "STRING"),
-        bigquery.SchemaField("cpu_count", "STRING"),
-        bigquery.SchemaField("cpu_core_count", "STRING"),
-        bigquery.SchemaField("cpu_socket_count", "STRING"),
-    ]
-
-    # TableName: dbobjects
-    bqTablesJobConfig['dbobjects'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("objecttype", "STRING"),
-        bigquery.SchemaField("editionable", "STRING"),
-        bigquery.SchemaField("coun", "STRING"),
-        bigquery.SchemaField("in_con_id", "STRING"),
-        bigquery.SchemaField("in_owner", "STRING"),
-        bigquery.SchemaField("in_object_type", "STRING"),
-        bigquery.SchemaField("in_editionable", "STRING"),
-    ]
-
-    # TableName: sourcecode
-    bqTablesJobConfig['sourcecode'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("type", "STRING"),
-        bigquery.SchemaField("nr_lines", "STRING"),
-        bigquery.SchemaField("qt_objs", "STRING"),
-        bigquery.SchemaField("nr_lines_w_utl", "STRING"),
-        bigquery.SchemaField("nr_lines_w_dbms", "STRING"),
-        bigquery.SchemaField("nr_lines_w_exec_im", "STRING"),
-        bigquery.SchemaField("nr_lines_w_dbms_sql", "STRING"),
-        bigquery.SchemaField("nr_lines_w_dbms_utl", "STRING"),
-        bigquery.SchemaField("nr_lines_total", "STRING"),
-    ]
-
-    # TableName: partsubparttypes
-    bqTablesJobConfig['partsubparttypes'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("partition", "STRING"),
-        bigquery.SchemaField("subpartition", "STRING"),
-        bigquery.SchemaField("coun", "STRING"),
-    ]
-
-    # TableName: indexestypes
-    bqTablesJobConfig['indexestypes'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("index_type", "STRING"),
-        bigquery.SchemaField("coun", "STRING"),
-    ]
-
-    # TableName: datatypes
-    bqTablesJobConfig['datatypes'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("data_type", "STRING"),
-        bigquery.SchemaField("coun", "STRING"),
-    ]
-
-    # TableName: tablesnopk
-    bqTablesJobConfig['tablesnopk'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("owner", "STRING"),
-        bigquery.SchemaField("pk", "STRING"),
-        bigquery.SchemaField("uk", "STRING"),
-        bigquery.SchemaField("ck", "STRING"),
-        bigquery.SchemaField("ri", "STRING"),
-        bigquery.SchemaField("vwck", "STRING"),
-        bigquery.SchemaField("vmro", "STRING"),
-        bigquery.SchemaField("hashexpr", "STRING"),
-        bigquery.SchemaField("suplog", "STRING"),
-        bigquery.SchemaField("num_tables", "STRING"),
-        bigquery.SchemaField("total_cons", "STRING"),
-    ]
-
-    # TableName: systemstats
-    bqTablesJobConfig['systemstats'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("stat_type", "STRING"),
-        bigquery.SchemaField("stat_name", "STRING"),
-        bigquery.SchemaField("value1", "STRING"),
-        bigquery.SchemaField("value2", "STRING"),
-    ]
-
-    # TableName: patchlevel
-    bqTablesJobConfig['patchlevel'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("time", "STRING"),
-        bigquery.SchemaField("action", "STRING"),
-        bigquery.SchemaField("namespace", "STRING"),
-        bigquery.SchemaField("version", "STRING"),
-        bigquery.SchemaField("id", "STRING"),
-        bigquery.SchemaField("comments", "STRING"),
-    ]
-
-    # TableName: awrhistsysmetrichist
-    bqTablesJobConfig['awrhistsysmetrichist'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("dbid", "STRING"),
-        bigquery.SchemaField("instance_number", "STRING"),
-        bigquery.SchemaField("hour", "STRING"),
-        bigquery.SchemaField("metric_name", "STRING"),
-        bigquery.SchemaField("metric_unit", "STRING"),
-        bigquery.SchemaField("avg_value", "STRING"),
-        bigquery.SchemaField("mode_value", "STRING"),
-        bigquery.SchemaField("median_value", "STRING"),
-        bigquery.SchemaField("min_value", "STRING"),
-        bigquery.SchemaField("max_value", "STRING"),
-        bigquery.SchemaField("sum_value", "STRING"),
-        bigquery.SchemaField("perc50", "STRING"),
-        bigquery.SchemaField("perc75", "STRING"),
-        bigquery.SchemaField("perc90", "STRING"),
-        bigquery.SchemaField("perc95", "STRING"),
-        bigquery.SchemaField("perc100", "STRING"),
-    ]
-
-    # TableName: awrhistsystimemodel
-    bqTablesJobConfig['awrhistsystimemodel'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("total_awr_secs", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("dbid", "STRING"),
-        bigquery.SchemaField("instance_number", "STRING"),
-        bigquery.SchemaField("hour", "STRING"),
-        bigquery.SchemaField("stat_name", "STRING"),
-        bigquery.SchemaField("hour_total_secs", "STRING"),
-        bigquery.SchemaField("avg_value", "STRING"),
-        bigquery.SchemaField("mode_value", "STRING"),
-        bigquery.SchemaField("median_value", "STRING"),
-        bigquery.SchemaField("perc50", "STRING"),
-        bigquery.SchemaField("perc75", "STRING"),
-        bigquery.SchemaField("perc90", "STRING"),
-        bigquery.SchemaField("perc95", "STRING"),
-        bigquery.SchemaField("perc100", "STRING"),
-        bigquery.SchemaField("min_value", "STRING"),
-        bigquery.SchemaField("max_value", "STRING"),
-        bigquery.SchemaField("sum_value", "STRING"),
-        bigquery.SchemaField("coun", "STRING"),
-    ]
-
-    # TableName: awrhistosstat
-    bqTablesJobConfig['awrhistosstat'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("total_awr_secs", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("dbid", "STRING"),
-        bigquery.SchemaField("instance_number", "STRING"),
-        bigquery.SchemaField("hour", "STRING"),
-        bigquery.SchemaField("stat_name", "STRING"),
-        bigquery.SchemaField("hour_total_secs", "STRING"),
-        bigquery.SchemaField("avg_value", "STRING"),
-        bigquery.SchemaField("mode_value", "STRING"),
-        bigquery.SchemaField("median_value", "STRING"),
-        bigquery.SchemaField("perc50", "STRING"),
-        bigquery.SchemaField("perc75", "STRING"),
-        bigquery.SchemaField("perc90", "STRING"),
-        bigquery.SchemaField("perc95", "STRING"),
-        bigquery.SchemaField("perc100", "STRING"),
-        bigquery.SchemaField("min_value", "STRING"),
-        bigquery.SchemaField("max_value", "STRING"),
-        bigquery.SchemaField("sum_value", "STRING"),
-        bigquery.SchemaField("coun", "STRING"),
-    ]
-
-    # TableName: awrhistcmdtypes
-    bqTablesJobConfig['awrhistcmdtypes'] = [
-        bigquery.SchemaField("pkey", "STRING"),
-        bigquery.SchemaField("hour", "STRING"),
-        bigquery.SchemaField("command_type", "STRING"),
-        bigquery.SchemaField("coun", "STRING"),
-        bigquery.SchemaField("avg_buffer_gets", "STRING"),
-        bigquery.SchemaField("avg_elapsed_time", "STRING"),
-        bigquery.SchemaField("avg_rows_processed", "STRING"),
-        bigquery.SchemaField("avg_executions", "STRING"),
-        bigquery.SchemaField("avg_cpu_time", "STRING"),
-        bigquery.SchemaField("avg_iowait", "STRING"),
-        bigquery.SchemaField("avg_clwait", "STRING"),
-        bigquery.SchemaField("avg_apwait", "STRING"),
-        bigquery.SchemaField("avg_ccwait", "STRING"),
-        bigquery.SchemaField("avg_plsexec_time", "STRING"),
-    ]
-
-    # TableName: optimusconfig_bms_machinesizes
-    bqTablesJobConfig['optimusconfig_bms_machinesizes'] = [
-        bigquery.SchemaField("cores", "STRING"),
-        bigquery.SchemaField("ram_gb", "STRING"),
-        bigquery.SchemaField("machine_size", "STRING"),
-        bigquery.SchemaField("machine_size_short", "STRING"),
-        bigquery.SchemaField("processor", "STRING"),
-        bigquery.SchemaField("est_price", "STRING"),
-    ]
-
-    # TableName: optimusconfig_network_to_gcp
-    bqTablesJobConfig['optimusconfig_network_to_gcp'] = [
-        bigquery.SchemaField("network_to_gcp", "STRING"),
-        bigquery.SchemaField("gbytes_per_sec", "STRING"),
-        bigquery.SchemaField("mbytes_per_sec", "STRING"),
-    ]
-
-    # TableName: alertlog
-    bqTablesJobConfig['alertlog2'] = [
-        bigquery.SchemaField("message_time", "STRING"),
-        bigquery.SchemaField("message_text", "STRING"),
-        bigquery.SchemaField("host_id", "STRING"),
-        bigquery.SchemaField("con_id", "STRING"),
-        bigquery.SchemaField("component_id", "STRING"),
-        bigquery.SchemaField("message_type", "STRING"),
-        bigquery.SchemaField("message_level", "STRING"),
-        bigquery.SchemaField("message_id", "STRING"),
-        bigquery.SchemaField("message_group", "STRING"),
-        bigquery.SchemaField("container_name", "STRING"),
-    ]
-
-    # Returns hash table with all expected table schemas
-    return bqTablesJobConfig
+def getTableSchemaVariant(tableName,fileList):
+# This function returns the table schema variant of the collections of the files of a table (None for the current collector, see schema_registry.py)
+# If the files come from collections whose variants have different columns for the table, the current collector schema is used
+
+    schemaVariants = schema_registry.getFilesSchemaVariants(fileList)
+
+    if len(set(schema_registry.getTableSchema(tableName,schemaVariant) for schemaVariant in schemaVariants)) > 1:
+        print ('\nWARNING: The files of table {} come from collections of database versions with different columns ({}). The table schema of the current collector is used.\n'.format(tableName,', '.join(sorted(schemaVariant or 'current' for schemaVariant in schemaVariants))))
+        return None
+
+    if len(schemaVariants) == 1:
+        return schemaVariants.pop()
+
+    return None
 
 
 def createDataSet(datasetName,gcpProjectName):
 # Always try to create the dataset
+# Returns False if the dataset does not exist and could not be created
 
-    # Construct a BigQuery client object.
-    client = bigquery.Client(client_info=set_client_info.get_http_client_info())
+    # Getting the shared BigQuery client object.
+    client = get_bigqueryClient()
 
     # Set dataset_id=datasetName to the ID of the dataset to create.
     if gcpProjectName is None:
@@ -763,61 +1096,340 @@ def createDataSet(datasetName,gcpProjectName):
         # In case tge use DID pass the project name in the arguments
         dataset_id = "{}.{}".format(gcpProjectName,datasetName)
 
-    # Construct a full Dataset object to send to the API.
-    dataset = bigquery.Dataset(dataset_id)
-
-    # TODO(developer): Specify the geographic location where the dataset should reside.
-    dataset.location =  client.location
-
-    # Send the dataset to the API for creation, with an explicit timeout.
-    # Raises google.api_core.exceptions.Conflict if the Dataset already
+    # Send the dataset to the API for creation, in the location of the backend.
+    # Raises bigquery_backend.AlreadyExists if the Dataset already
     # exists within the project.
     try:
-        dataset = client.create_dataset(dataset)  # Make an API request.
-        print("Created dataset {}.{}".format(client.project, dataset.dataset_id))
+        retryPolicy.call('Creation of dataset {}'.format(dataset_id), client.createDataset, dataset_id)  # Make an API request.
+        print("Created dataset {}".format(dataset_id))
+        tracer.setAttributes(dataset=dataset_id,status='CREATED')
         
-    except Conflict as error:
+    except bigquery_backend.AlreadyExists as error:
         # If dataset already exists
         print('Dataset {} already exists.'.format(dataset_id))
-    
+        tracer.setAttributes(dataset=dataset_id,status='EXISTS')
+
+    except Exception as error:
+        print('\nERROR: The dataset {} could not be created: {}\n'.format(dataset_id,error))
+        tracer.setAttributes(dataset=dataset_id,status='FAILED')
+        return False
+
+    return True
+
+def importFilesToBQ(gcpProjectName,bqDataset,fileList,skipLeadingRows,args,normalizeFiles=False,importCheckpoint=None,pivotMetrics=False):
+# This function imports the given files to Big Query, normalizing them first into Avro files if normalizeFiles is True
+# If pivotMetrics is True the files of the AWR metric tables are pivoted and loaded into their wide tables instead (see pivot_metrics.py)
+# With -incremental only the files not imported to the dataset yet are imported (see import_manifest.py) and the tables
+# successfully loaded are recorded in the manifest file of -fileslocation
+# The files loaded before the failure of the run resumed are skipped, and the files loaded are recorded table by table in importCheckpoint
+# Returns False if any of the tables failed to be imported
+
+    importManifest = None
+
+    if getattr(args,'incremental'):
+
+        manifestFileName = os.path.join(str(getattr(args,'fileslocation')), import_manifest.MANIFEST_FILE_NAME)
+        importManifest = import_manifest.loadManifest(manifestFileName)
+
+        client = get_bigqueryClient()
+        datasetId = "{}.{}".format(client.project if gcpProjectName is None else gcpProjectName,bqDataset)
+
+        newFiles, skippedFiles, changedFiles = import_manifest.selectNewFiles(importManifest,datasetId,fileList)
+
+        for fileName, skipReason in skippedFiles:
+            print ('Skipping {}: {}'.format(fileName,skipReason))
+
+        for fileName in changedFiles:
+            print ('WARNING: The file {} changed since it was imported. It is going to be imported again and the rows imported before are kept.'.format(fileName))
+
+        fileList = list(newFiles)
+
+        if len(fileList) == 0:
+            print ('\nThere is no new file to be imported to {}.\n'.format(datasetId))
+            import_manifest.saveManifest(importManifest,manifestFileName)
+            return True
+
+    onTableImported = None
+
+    if importCheckpoint is not None:
+
+        fileList, loadedFiles = importCheckpoint.selectPendingFiles(fileList)
+
+        for fileName in loadedFiles:
+            print ('Skipping {}: loaded before the failure'.format(fileName))
+
+        if len(fileList) == 0:
+            print ('\nAll files were loaded before the failure.\n')
+            return True
+
+    # The normalized files have the same table name of their source files and the pivoted files the name of the wide table of their
+    # source files: the source files of the table, or of the partition of the table partitioned by collection day, are recorded.
+    # Otherwise the files of the load job are recorded (a table partitioned by collection day has a load job per partition)
+    sourceTableFiles = {}
+    for fileName in fileList:
+        tableName = getObjNameFromFiles(file_sources.getBaseName(fileName),'__',1)
+        tableName = (pivot_metrics.getPivotTableName(tableName) if pivotMetrics else None) or tableName
+        sourceTableFiles.setdefault((tableName, getTableLoadGroups(tableName,[fileName])[0][0]), []).append(fileName)
+
+    def getSourceFiles(importResult):
+        return sourceTableFiles.get((importResult['tableName'], importResult['partition']), []) if normalizeFiles or importResult['tableName'] in pivot_metrics.getPivotTableNames() else importResult['fileList']
+
+    if importCheckpoint is not None:
+
+        def onTableImported(importResult):
+            if importResult['status'] == 'LOADED':
+                importCheckpoint.recordLoadedFiles(getSourceFiles(importResult),importResult['tableName'],importResult['jobIds'])
+
+    # Pivoting the files of the AWR metric tables into the Avro files of their wide tables
+    pivotedFileList, importFileList = pivotAllMetrics(fileList,getattr(args,'jobs')) if pivotMetrics else ([], fileList)
+
+    # Converting the CSV files into compressed Avro files before uploading them
+    importFileList = (normalizeAllCSVs(importFileList,getattr(args,'jobs')) if normalizeFiles else importFileList) + pivotedFileList
+
+    importResults = []
+    importSucceeded = importAllCSVsToBQ(gcpProjectName,bqDataset,importFileList,skipLeadingRows,getattr(args,'loadjobs'),getattr(args,'compressupload'),importResults,onTableImported,getattr(args,'migratetables'))
+
+    if importManifest is not None:
+
+        for importResult in importResults:
+            if importResult['status'] == 'LOADED':
+                tableNewFiles = {fileName: newFiles[fileName] for fileName in getSourceFiles(importResult)}
+                import_manifest.recordImportedFiles(importManifest,datasetId,tableNewFiles,importResult['tableName'],importResult['jobIds'])
+
+        import_manifest.saveManifest(importManifest,manifestFileName)
+
+    return importSucceeded
+
+def getCollectionFiles(args):
+# This function returns the collected files of the collections selected in the arguments. It exits if there is none
+# -optimuscollectionid is 'consolidate' for the consolidated logs, 'all' for all collections or a comma separated list of collection ids.
+# The collections are found by the index of the files location (see collection_index.py), which can also limit them to a time range
+
+    collectionIdArg = str(getattr(args,'optimuscollectionid')).replace(' ','')
+    filesLocation = str(getattr(args,'fileslocation'))
+
+    if collectionIdArg == 'consolidate':
+
+        # Optimus Prime Search Pattern to find the consolidated CSV files to be processed
+        csvFilesLocationPattern = filesLocation + '/*' + collectionIdArg + '.log'
+
+        # Getting a list of files from OS based on the pattern provided
+        fileList = getAllFilesByPattern(csvFilesLocationPattern)
+
+        # In case there is no matching file in the OS
+        if len(fileList) == 0:
+            sys.exit('\nERROR: There is not matching CSV file found to be processed using: {}\n'.format(csvFilesLocationPattern))
+
+        return fileList
+
+    # The default location will be dbResults if not overwritten by the argument -fileslocation
+    collectionIndex, unknownFiles = collection_index.buildCollectionIndex(filesLocation)
+
+    collectionIds = None if collectionIdArg == 'all' else [collectionId for collectionId in collectionIdArg.split(',') if collectionId]
+    collectedFrom = getattr(args,'collectedfrom')
+    collectedTo = getattr(args,'collectedto')
+
+    selectedIds = collection_index.selectCollections(collectionIndex,collectionIds,collectedFrom,collectedTo)
+    fileList = collection_index.getCollectionsFiles(collectionIndex,selectedIds)
+
+    # Files not following the collector naming have no collection time, they can only be selected by their collection id as before
+    # They still need the opdb__<tableName>__ prefix to be imported to a table
+    if collectedFrom is None and collectedTo is None:
+        for fileName in unknownFiles:
+
+            if collectionIds is not None and not any(file_sources.getBaseName(fileName)[:-len('.log')].endswith(collectionId) for collectionId in collectionIds):
+                continue
+
+            if len(file_sources.getBaseName(fileName).split('__')) < 3:
+                print ('WARNING: The file {} does not have a table name. It will be skipped.'.format(fileName))
+                continue
+
+            print ('WARNING: The file {} does not follow the collector file naming. It is imported without collection attributes.'.format(fileName))
+            fileList.append(fileName)
+
+    # In case there is no matching file in the OS
+    if len(fileList) == 0:
+        sys.exit('\nERROR: There is not matching collection found in {} for the collection id {}\n'.format(filesLocation,collectionIdArg))
+
+    print ('\nSelected {} of {} collections ({} files) in {}\n'.format(len(selectedIds),len(collectionIndex),len(fileList),filesLocation))
+
+    return fileList
+
+def printCollectionIndex(filesLocation):
+# This function prints all collections found in the files location with their database, time and number of tables (-listcollections)
+
+    collectionIndex, unknownFiles = collection_index.buildCollectionIndex(filesLocation)
+
+    print ('\nCollections found in {}:\n'.format(filesLocation))
+
+    for collectionId in sorted(collectionIndex, key=lambda collectionId: (collectionIndex[collectionId]['collectedAt'] is None, collectionIndex[collectionId]['collectedAt'] or 0, collectionId)):
+
+        collection = collectionIndex[collectionId]
+        collectedAt = collection['collectedAt'].strftime('%Y-%m-%d %H:%M:%S') if collection['collectedAt'] is not None else 'unknown time'
+
+        print ('{}  {}  host {} database {} instance {} ({} tables)'.format(collectedAt,collectionId,collection['host'],collection['dbname'],collection['instance'],len(collection['files'])))
+
+    print ('\nTotal collections: {}'.format(len(collectionIndex)))
+
+    for fileName in unknownFiles:
+        print ('WARNING: The file {} does not follow the collector file naming.'.format(fileName))
+
+def validateTableSchemas(filesLocation):
+# This function prints the tables spooled by the collector scripts without table schema and the collected files of the files location
+# whose columns do not match their table schema (-validateschemas, see schema_coverage.py). Returns False if any of them is found
+
+    schemaCoverage = schema_coverage.getSchemaCoverage()
+    validationSucceeded = True
+
+    print ('\nTable schemas of the collector scripts:\n')
+
+    for scriptCoverage in schemaCoverage['scripts']:
+
+        print ('{}: {} tables spooled, {} without table schema'.format(scriptCoverage['scriptFileName'],len(scriptCoverage['spooledTables']),len(scriptCoverage['missingTables'])))
+
+        for tableName in scriptCoverage['missingTables']:
+            print ('ERROR: The table {} spooled by {} does not have table schema in {}. Its files would be skipped.'.format(tableName,scriptCoverage['scriptFileName'],schema_registry.SCHEMA_FILE_NAME))
+            validationSucceeded = False
+
+        for tableName, queryColumns, schemaColumns in scriptCoverage['columnMismatches']:
+            print ('ERROR: The query of table {} in {} has {} columns but its table schema in {} has {} columns.'.format(tableName,scriptCoverage['scriptFileName'],queryColumns,schema_registry.SCHEMA_FILE_NAME,schemaColumns))
+            validationSucceeded = False
+
+    for tableName in schemaCoverage['unspooledTables']:
+        print ('The table {} has a table schema but it is not spooled by the collector scripts.'.format(tableName))
+
+    fileList = file_sources.listFiles(filesLocation) if os.path.isdir(filesLocation) else []
+    fileIssues = schema_coverage.checkCollectedFiles(fileList)
+
+    print ('\nCollected files of {}: {} files, {} not matching their table schema\n'.format(filesLocation,len(fileList),len(fileIssues)))
+
+    for fileIssue in fileIssues:
+
+        if fileIssue['schemaColumns'] is None:
+            print ('ERROR: The file {} has no table schema for table {}.'.format(fileIssue['fileName'],fileIssue['tableName']))
+        else:
+            print ('ERROR: The file {} has {} columns but the table schema of {} ({}) has {} columns.'.format(fileIssue['fileName'],fileIssue['fileColumns'],fileIssue['tableName'],fileIssue['schemaVariant'] or 'current collector',fileIssue['schemaColumns']))
+
+        validationSucceeded = False
+
+    return validationSucceeded
+
+def printLocalBigQuerySummary(backend):
+# This function prints the load jobs, API calls and simulated errors of the local stand-in of Big Query (-localbigquery)
+
+    loadJobs = backend.getLoadJobs()
+
+    print ('\nLocal Big Query stand-in {}:\n'.format(backend.databaseFile))
+    print ('Load jobs: {} ({} failed), rows loaded: {}, uploaded bytes: {}'.format(len(loadJobs),sum(1 for loadJob in loadJobs if loadJob['status'] == 'FAILED'),sum(loadJob['rows'] for loadJob in loadJobs),backend.uploadedBytes))
+    print ('API calls: {}, simulated quota errors: {}, most API calls at the same time: {}\n'.format(backend.apiCalls,backend.quotaErrors,backend.maxRunningCalls))
+
+def runLocalMain(args):
+# Loads the collected files and the configuration files into the local SQLite database given in -localdb, creates the views there
+# and exports the reports given in -localreport and -bmssizing. No Big Query API call is made
+
+    connection = local_engine.openLocalDatabase(getattr(args,'localdb'))
+
+    try:
+        # STEP 1: Load customer database assessment data
+        if not importAllCSVsToLocalDB(connection,getCollectionFiles(args),2):
+            sys.exit('\nERROR: Some CSV files could not be loaded into the local database. Please check the messages above.\n')
+
+        # STEP 2: Load Optimus Prime Configuration Files
+        if not importAllCSVsToLocalDB(connection,getAllFilesByPattern('opConfig/*.csv'),1):
+            sys.exit('\nERROR: Some Optimus Prime configuration files could not be loaded into the local database. Please check the messages above.\n')
+
+        # STEP 3: Create Optimus Prime Views
+        if not createOptimusPrimeLocalViews(connection):
+            sys.exit('\nERROR: The Optimus Prime views could not be created in the local database.\n')
+
+        # STEP 4: Export the reports
+        exportLocalReports(connection,getattr(args,'localreport') or [],str(getattr(args,'fileslocation')))
+
+        if getattr(args,'bmssizing'):
+            exportLocalBmsSizing(connection,str(getattr(args,'fileslocation')))
+
+    finally:
+        connection.close()
 
 def runMain(args):
 # Main function
 
     # Pre-Tasks before trying to import any data
 
+    if getattr(args,'listcollections'):
+
+        printCollectionIndex(str(getattr(args,'fileslocation')))
+        return
+
+    # Checks the table schemas against the collector scripts and the collected files
+    if getattr(args,'validateschemas'):
+
+        if not validateTableSchemas(str(getattr(args,'fileslocation'))):
+            sys.exit('\nERROR: Some collected tables do not match the table schemas. Please check the messages above.\n')
+
+        print ('\nAll collected tables have a matching table schema.\n')
+        return
+
     if getattr(args,'consolidatelogs'):
 
         # It is True if no fatal errors were found
-        resConsolidation = consolidateLos(args)
+        with tracer.span('consolidate',jobs=getattr(args,'jobs')):
+            resConsolidation = consolidateLos(args)
     
+    # With -localdb the data is loaded and the views are created in a local SQLite database instead of Big Query
+    if getattr(args,'localdb') is not None and getattr(args,'optimuscollectionid') is not None:
+
+        runLocalMain(args)
+        return
+
     # For all cases in which those attributes are <> None it means the user wants to import data to Big Query
     # No need to further messaging for mandatory options because this is being done in argumentsParser function
     if getattr(args,'dataset') is not None and getattr(args,'optimuscollectionid') is not None:
 
         # STEP 1: Import customer database assessment data
 
-        # Optimus Prime Search Pattern to find the target CSV files to be processed
-        # The default location will be dbResults if not overwritten by the argument -fileslocation
-        csvFilesLocationPattern = str(getattr(args,'fileslocation')) + '/*' + str(getattr(args,'optimuscollectionid')).replace(' ','') + '.log'
-
-        # Getting a list of files from OS based on the pattern provided
-        # This is the default directory to have all customer database results from oracle_db_assessment.sql
-        fileList = getAllFilesByPattern(csvFilesLocationPattern)
-
-        # In case there is no matching file in the OS
-        if len(fileList) == 0:
-            sys.exit('\nERROR: There is not matching CSV file found to be processed using: {}\n'.format(csvFilesLocationPattern))
+        with tracer.span('list files') as listSpan:
+            fileList = getCollectionFiles(args)
+            listSpan.setAttributes(files=len(fileList))
 
         # Import the CSV files into Big Query
         gcpProjectName = getattr(args,'projectname')
         bqDataset = str(getattr(args,'dataset'))
         
+        # With -localbigquery the API calls go to the local stand-in of Big Query stored in the given SQLite file, no GCP access is needed
+        if getattr(args,'localbigquery') is not None:
+            setBigQueryBackend(local_bigquery.LocalBigQueryBackend(getattr(args,'localbigquery'),getattr(args,'localbqlatency'),getattr(args,'localbqquotarate')))
+
+        # Building the shared Big Query client with enough HTTP connections for all parallel load jobs (upload and job polling) and view creations
+        client = get_bigqueryClient(max(DEFAULT_HTTP_POOL_SIZE, 2 * getattr(args,'loadjobs'), getattr(args,'viewjobs')))
+
+        # Retries of the API calls failing with rate limit, quota and transient errors
+        setRetryPolicy(api_retry.RetryPolicy(getattr(args,'maxretries'),getattr(args,'retrydelay')))
+
+        # The tables loaded and the views created are recorded as they are done. With -resume the ones of the failed run are skipped
+        datasetId = "{}.{}".format(client.project if gcpProjectName is None else gcpProjectName,bqDataset)
+
+        try:
+            importCheckpoint = import_checkpoint.ImportCheckpoint(os.path.join(str(getattr(args,'fileslocation')), import_checkpoint.CHECKPOINT_FILE_NAME),datasetId,getattr(args,'resume'))
+        except ValueError as error:
+            sys.exit('\nERROR: {}\n'.format(error))
+
+        if getattr(args,'resume'):
+            print ('\nResuming the import of {}: {} files were loaded and {} views were created before the failure.\n'.format(datasetId,*importCheckpoint.getDoneCounters()))
+
         # Create the dataset to import the CSV data
-        createDataSet(bqDataset,gcpProjectName)
+        with tracer.span('create dataset'):
+            datasetCreated = createDataSet(bqDataset,gcpProjectName)
+
+        if not datasetCreated:
+            sys.exit('\nERROR: The dataset {} could not be created. Please check the messages above.\n'.format(datasetId))
 
         # Import the CSV data found in the OS
-        importAllCSVsToBQ(gcpProjectName,bqDataset,fileList,2)
+        with tracer.span('import files',files=len(fileList)):
+            filesImported = importFilesToBQ(gcpProjectName,bqDataset,fileList,2,args,getattr(args,'normalizelogs'),importCheckpoint,getattr(args,'pivotmetrics'))
+
+        if not filesImported:
+            sys.exit('\nERROR: Some CSV files could not be imported to Big Query. Please check the import summary above. Run it again with -resume to continue from the failure.\n')
 
 
         # STEP 2: Import Optimus Prime Configuration Files
@@ -830,14 +1442,31 @@ def runMain(args):
         fileList = getAllFilesByPattern(csvFilesLocationPattern)
 
         # Import all Optimus Prime CSV configutation
-        importAllCSVsToBQ(gcpProjectName,bqDataset,fileList,1)
+        with tracer.span('import configuration',files=len(fileList)):
+            configurationImported = importFilesToBQ(gcpProjectName,bqDataset,fileList,1,args,False,importCheckpoint)
+
+        if not configurationImported:
+            sys.exit('\nERROR: Some Optimus Prime configuration files could not be imported to Big Query. Please check the import summary above. Run it again with -resume to continue from the failure.\n')
 
 
         # STEP 3: Create Optimus Prime Views
 
 
         # Create Optimus Prime Views
-        createOptimusPrimeViews(gcpProjectName,bqDataset)
+        with tracer.span('create views'):
+            viewsCreated = createOptimusPrimeViews(gcpProjectName,bqDataset,getattr(args,'viewjobs'),getattr(args,'updateviews'),importCheckpoint,getattr(args,'materializeviews'),getattr(args,'pivotmetrics'))
+
+        if getattr(args,'localbigquery') is not None:
+            printLocalBigQuerySummary(client)
+
+        if retryPolicy.retries > 0:
+            print ('API calls retried: {}, given up after all retries: {}\n'.format(retryPolicy.retries,retryPolicy.exhaustedCalls))
+
+        if not viewsCreated:
+            sys.exit('\nERROR: Some Optimus Prime views could not be created. Please check the messages above. Run it again with -resume to continue from the failure.\n')
+
+        # The import is complete, there is nothing left to resume
+        importCheckpoint.remove()
 
 def argumentsParser():
 # function to handle all arguments to be used in cli mode for this code and enforces mandatory options
@@ -846,21 +1475,89 @@ def argumentsParser():
     parser = argparse.ArgumentParser()
 
     # Name of dataset to be created and have the data imported
-    parser.add_argument("-ds","-dataset", type=str, default=None, help="name of the Big Query dataset to import all CSV files. If do not exists it will be created if exists the data is appended")
+    parser.add_argument("-ds","-dataset", dest="dataset", type=str, default=None, help="name of the Big Query dataset to import all CSV files. If do not exists it will be created if exists the data is appended")
 
     # GCP project name to be used with the dataset
-    parser.add_argument("-pn","-projectname", type=str, default=None, help="name of the Google Cloud project name used for the Big Query dataset")
+    parser.add_argument("-pn","-projectname", dest="projectname", type=str, default=None, help="name of the Google Cloud project name used for the Big Query dataset")
 
     # OS csv files location to be imported to Big Query
-    parser.add_argument("-fl","-fileslocation", type=str, default='dbResults', help="optimus prime files location to be imported")
+    parser.add_argument("-fl","-fileslocation", dest="fileslocation", type=str, default='dbResults', help="optimus prime files location to be imported. The .tar, .tar.gz and .zip archives found in it are read as well")
 
     # Optimus collection ID is the number in the final part of the generated CSV files. For example: dbResults/opdb_dbfeatures_ol79-orcl-db02.ORCLCDB.ORCLCDB.180603.log. Collection ID is: 180603
-    parser.add_argument("-ocid","-optimuscollectionid", type=str, default=None, help="optimus prime collection id from CSV files OR 'consolidate' for consolidated logs")
+    parser.add_argument("-ocid","-optimuscollectionid", dest="optimuscollectionid", type=str, default=None, help="optimus prime collection id from CSV files, a comma separated list of them, 'all' for all collections OR 'consolidate' for consolidated logs")
+
+    # Collection time range of the collections selected by -optimuscollectionid (all limits included)
+    parser.add_argument("-cf","-collectedfrom", dest="collectedfrom", type=str, default=None, help="import only the collections collected from this time (YYYY-MM-DD [HH:MM[:SS]])")
+    parser.add_argument("-ct","-collectedto", dest="collectedto", type=str, default=None, help="import only the collections collected up to this time (YYYY-MM-DD [HH:MM[:SS]])")
+
+    # Lists the collections found in -fileslocation
+    parser.add_argument("-lc", "--listcollections", default=False, help="list the collections found in -fileslocation and exit", action="store_true")
+
+    # Checks that every table spooled by the collector scripts has a table schema and that the collected files match them
+    parser.add_argument("-vs", "--validateschemas", default=False, help="check the table schemas against the tables spooled by the collector scripts and the files found in -fileslocation, and exit", action="store_true")
 
     # Consolidates different collection IDs found in the OS (dbResults/*log) into a single CSV per file type. 
     # For example: dbResults has 52 files. Meaning, 2 collection IDs (each one has 26 different file types). 
     # After the consolidation it produces 26 *consolidatedlogs.log which would have data from both collection IDs 
-    parser.add_argument("-cl", "--consolidatelogs", default=False, help="consolidate all CSV files opdb*log found in dbResults/ directory", action="store_true")
+    parser.add_argument("-cl", "--consolidatelogs", default=False, help="consolidate all CSV files opdb*log found in dbResults/ directory. The tables partitioned by collection day get a consolidated file per collection day", action="store_true")
+
+    # Number of tables consolidated (-cl) or normalized (-nl) in parallel. Default is one table at a time
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of tables consolidated (-consolidatelogs) or normalized (-normalizelogs) in parallel")
+
+    # Number of Big Query load jobs running at the same time. Default is one at a time
+    parser.add_argument("-lj", "--loadjobs", type=int, default=1, help="number of tables loaded in parallel in Big Query")
+
+    # Number of views created at the same time, among the views of the same dependency level
+    parser.add_argument("-vj", "--viewjobs", type=int, default=DEFAULT_VIEW_JOBS, help="number of views created in parallel in Big Query (default {})".format(DEFAULT_VIEW_JOBS))
+
+    # Converts the CSV files into compressed Avro files typed with the declared table schemas before uploading them
+    parser.add_argument("-nl", "--normalizelogs", default=False, help="normalize the CSV files into compressed Avro files (opnormalized__<table>__.avro, or opnormalized__<table>__<YYYYMMDD>.avro per collection day for the tables partitioned by collection day) before importing them to Big Query", action="store_true")
+
+    # Pivots the AWR metric rows into a row per hour while reading the files, so the views do not pivot them at every query
+    parser.add_argument("-pm", "--pivotmetrics", default=False, help="pivot the AWR metric rows of {} into wide tables with a row per hour ({}) while reading the files and load them instead of the long rows. The views read the wide tables".format(', '.join(sorted(pivot_metrics.PIVOT_TABLES)), ', '.join(sorted(pivot_metrics.getPivotTableNames()))), action="store_true")
+
+    # Compresses the CSV files on the fly while uploading them. Useful for slow networks (see opConfig/optconfig__optimusconfig_network_to_gcp__.csv)
+    parser.add_argument("-gz", "--compressupload", default=False, help="gzip compress the CSV files on the fly while uploading them to Big Query", action="store_true")
+
+    # Replaces the views whose text changed since they were created. Unchanged views are skipped
+    parser.add_argument("-uv", "--updateviews", default=False, help="replace the existing views whose text changed and skip the unchanged ones", action="store_true")
+
+    # Writes the heavy views into tables clustered on ckey, refreshed at every import with the new collections only
+    parser.add_argument("-mv", "--materializeviews", default=False, help="materialize the views {} into tables clustered on ckey (<view>{}), refreshed with the new collections at every import".format(', '.join(materialized_views.MATERIALIZED_VIEWS), materialized_views.MATERIALIZED_TABLE_SUFFIX), action="store_true")
+
+    # Imports only the files not imported to the dataset yet, based on the manifest file of the files location
+    parser.add_argument("-inc", "--incremental", default=False, help="import only the files not imported to the dataset yet (manifest {} in -fileslocation) and skip the duplicated ones".format(import_manifest.MANIFEST_FILE_NAME), action="store_true")
+
+    # Rewrites the tables created by older versions of Optimus Prime (STRING columns only) into the typed columns of the table schemas
+    parser.add_argument("-mt", "--migratetables", default=False, help="rewrite the existing tables with other columns than their table schemas ({}), created by older versions of Optimus Prime, into the columns and types of the table schemas before loading into them. Without it the import stops before loading if there is one".format(schema_registry.SCHEMA_FILE_NAME), action="store_true")
+
+    # Runs the Optimus Prime views in a local SQLite database file instead of Big Query (offline mode)
+    parser.add_argument("-lo", "--localdb", type=str, default=None, help="load the CSV files and create the views in this local SQLite database file instead of Big Query")
+
+    # Views of the local database exported to CSV files in -fileslocation. Can be repeated
+    parser.add_argument("-lr", "--localreport", type=str, action="append", default=None, help="view of the local database (-localdb) to be exported to opreport__<view>__.csv, for instance vbms_sizing_report. Can be repeated")
+
+    # Bare Metal Solution sizing computed in python from the local database
+    parser.add_argument("-bs", "--bmssizing", default=False, help="compute the Bare Metal Solution sizing report (opreport__bms_sizing__.csv) from the local database (-localdb) with numpy/pandas", action="store_true")
+
+    # Continues a failed import from its failure: the tables loaded and the views created before it are skipped
+    parser.add_argument("-rs", "--resume", default=False, help="continue the failed import of the dataset from its failure, skipping the files loaded and the views created before it (checkpoint {} in -fileslocation)".format(import_checkpoint.CHECKPOINT_FILE_NAME), action="store_true")
+
+    # Retries of the Big Query API calls failing with rate limit, quota and transient errors, with exponential backoff and jitter
+    parser.add_argument("--maxretries", type=int, default=api_retry.DEFAULT_MAX_RETRIES, help="number of retries of a Big Query API call failing with a rate limit, quota or transient error")
+    parser.add_argument("--retrydelay", type=float, default=api_retry.DEFAULT_BASE_DELAY, help="seconds before the first retry of a Big Query API call. The wait doubles at every retry (with random jitter)")
+
+    # Runs the Big Query import against a local stand-in of Big Query (SQLite database file) instead of GCP. For tests and benchmarks
+    parser.add_argument("-lbq", "--localbigquery", type=str, default=None, help="import to a local stand-in of Big Query stored in this SQLite database file instead of GCP (load jobs are checked against the table schemas and the views are compiled)")
+
+    # Simulated latency and quota errors of the local stand-in of Big Query
+    parser.add_argument("--localbqlatency", type=float, default=0, help="seconds added to every API call of the local stand-in of Big Query (-localbigquery)")
+    parser.add_argument("--localbqquotarate", type=float, default=0, help="probability (0 to 1) of a simulated quota error in every API call of the local stand-in of Big Query (-localbigquery)")
+
+    # Instrumentation of the run: timed stages, counters and profile (see pipeline_trace.py)
+    parser.add_argument("--tracefile", type=str, default=None, help="write the spans (timed stages, load jobs and views with their attributes) and the counters (bytes, rows, waits) of the run to this JSON lines file")
+    parser.add_argument("--metricsfile", type=str, default=None, help="write the counters and the time spent in every stage of the run to this file in the Prometheus text format")
+    parser.add_argument("--profile", type=str, default=None, help="profile the run with cProfile (main thread and load and view tasks) and write the stats to this file in pstats format. The functions with the highest own time are printed")
 
     # Increase logging output level
     parser.add_argument("-v", "--verbose", help="increase output verbosity", action="store_true")
@@ -868,8 +1565,53 @@ def argumentsParser():
     # Execute the parse_args() method. Variable args is a namespace type
     args = parser.parse_args()
 
+    # In case the number of parallel jobs is not valid
+    if args.jobs < 1:
+        sys.exit('\nERROR: The parameter -jobs must be greater than zero.\n')
+
+    # In case the number of parallel load jobs is not valid
+    if args.loadjobs < 1:
+        sys.exit('\nERROR: The parameter -loadjobs must be greater than zero.\n')
+
+    # In case the number of parallel view creations is not valid
+    if args.viewjobs < 1:
+        sys.exit('\nERROR: The parameter -viewjobs must be greater than zero.\n')
+
+    # In case the retries are not valid
+    if args.maxretries < 0 or args.retrydelay < 0:
+        sys.exit('\nERROR: The parameters --maxretries and --retrydelay cannot be negative.\n')
+
+    # In case the simulated latency or quota error probability is not valid
+    if args.localbqlatency < 0 or not 0 <= args.localbqquotarate <= 1:
+        sys.exit('\nERROR: The parameter --localbqlatency cannot be negative and --localbqquotarate must be between 0 and 1.\n')
+
+    # Converting the collection time range
+    try:
+        if args.collectedfrom is not None:
+            args.collectedfrom = collection_index.parseCollectionTime(args.collectedfrom)
+
+        if args.collectedto is not None:
+            args.collectedto = collection_index.parseCollectionTime(args.collectedto, endOfDay=True)
+
+    except ValueError as error:
+        sys.exit('\nERROR: {}\n'.format(error))
+
+    # Listing the collections or validating the table schemas does not need any other parameter
+    if args.listcollections or args.validateschemas:
+        return args
+
+    # In case a report is requested without the local database
+    if (args.localreport or args.bmssizing) and args.localdb is None:
+        sys.exit('\nERROR: The parameters -localreport and -bmssizing can only be used with -localdb.\n')
+
+    # With -localdb no Big Query dataset is needed, only the collection id
+    if args.localdb is not None:
+
+        if args.optimuscollectionid is None:
+            sys.exit('\nERROR: The parameter -optimuscollectionid cannot be omitted. Please provide the collection id from CSV files.\n')
+
     # If not using -cl flag
-    if args.consolidatelogs == False:
+    elif args.consolidatelogs == False:
 
         # In case there is not dataset parameter set or with valid content in the arguments
         if (args.dataset is None or args.dataset == ''):
@@ -891,5 +1633,19 @@ if __name__ == '__main__':
     # Handling arguments
     args = argumentsParser()
 
-    # Call main function
-    runMain(args)
+    # Instrumentation of the run (--tracefile, --metricsfile and --profile)
+    try:
+        setTracer(pipeline_trace.PipelineTracer(args.tracefile,args.metricsfile,args.profile))
+    except OSError as error:
+        sys.exit('\nERROR: The trace file could not be opened: {}\n'.format(error))
+
+    try:
+        # Call main function
+        with tracer.span('import run',dataset=args.dataset,collections=args.optimuscollectionid):
+            runMain(args)
+
+    finally:
+        # The trace, metrics and profile are written even if the run fails, to see where it stopped
+        tracer.addCounter('api_retries',retryPolicy.retries)
+        tracer.addCounter('api_calls_given_up',retryPolicy.exhaustedCalls)
+        tracer.finish()
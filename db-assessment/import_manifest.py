@@ -0,0 +1,137 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Manifest of the files already imported to Big Query, used by -incremental to import only the new or changed files.
+# The manifest is a JSON file. For every dataset it keeps the imported files by absolute path, with their size, modification time,
+# content hash, table and load jobs:
+# {"version": 1, "datasets": {"<project>.<dataset>": {"<path>": {"size": ..., "mtime": ..., "sha1": ..., "tableName": ..., "jobIds": [...], "loadedAt": ...}}}}
+
+import os
+import json
+import time
+import hashlib
+
+# Streaming helpers to read the collected files
+import log_streams
+
+# Loose files and archive members
+import file_sources
+
+# Name of the manifest file written in the files location (-fileslocation)
+MANIFEST_FILE_NAME = 'opimport_manifest.json'
+
+MANIFEST_VERSION = 1
+
+
+def loadManifest(manifestFileName):
+# This function reads the manifest file. A new empty manifest is returned if the file does not exist
+
+    if not os.path.exists(manifestFileName):
+        return {'version': MANIFEST_VERSION, 'datasets': {}}
+
+    with open(manifestFileName, 'r') as manifestFile:
+        manifest = json.load(manifestFile)
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError('The manifest {} has version {} but version {} is expected'.format(manifestFileName, manifest.get('version'), MANIFEST_VERSION))
+
+    return manifest
+
+
+def saveManifest(manifest, manifestFileName):
+# This function writes the manifest file. A temporary file is renamed over the old one, so an interrupted run never leaves a truncated manifest
+
+    temporaryFileName = manifestFileName + '.tmp'
+
+    with open(temporaryFileName, 'w') as manifestFile:
+        json.dump(manifest, manifestFile, indent=1, sort_keys=True)
+
+    os.replace(temporaryFileName, manifestFileName)
+
+
+def getFileHash(fileName):
+# This function returns the sha1 hex digest of a file content, read chunk by chunk
+
+    fileHash = hashlib.sha1()
+
+    for chunk in log_streams.readFileChunks(fileName):
+        fileHash.update(chunk)
+
+    return fileHash.hexdigest()
+
+
+def selectNewFiles(manifest, datasetId, fileList):
+# This function compares the given files with the files already imported to datasetId
+# Returns a dictionary path -> file state (size, mtime, sha1) of the files to be imported, a list of (path, reason) of the files skipped
+# and the list of the files to be imported whose path was already imported with another content (the rows imported before are not removed)
+# - a file with the same path, size and modification time of an imported file is skipped without reading it
+# - otherwise its content hash is computed: a file with the content of an imported file (same path or not) is a duplicate and is skipped
+# - two files with the same content in fileList are imported only once
+
+    importedFiles = manifest['datasets'].get(datasetId, {})
+    importedHashes = {fileEntry['sha1']: filePath for filePath, fileEntry in importedFiles.items()}
+
+    newFiles = {}
+    newHashes = {}
+    skippedFiles = []
+    changedFiles = []
+
+    for fileName in fileList:
+
+        filePath = os.path.abspath(fileName)
+        fileSize, fileMTime = file_sources.getFileState(filePath)
+        fileEntry = importedFiles.get(filePath)
+
+        if fileEntry is not None and fileEntry['size'] == fileSize and fileEntry['mtime'] == fileMTime:
+            skippedFiles.append((fileName, 'already imported'))
+            continue
+
+        fileHash = getFileHash(filePath)
+
+        # Same content with a new modification time (file copied again or touched). The new time is kept so the file is not read next time
+        if fileEntry is not None and fileEntry['sha1'] == fileHash:
+            fileEntry['size'] = fileSize
+            fileEntry['mtime'] = fileMTime
+            skippedFiles.append((fileName, 'already imported'))
+            continue
+
+        if fileHash in importedHashes:
+            skippedFiles.append((fileName, 'duplicate of the imported file {}'.format(importedHashes[fileHash])))
+            continue
+
+        if fileHash in newHashes:
+            skippedFiles.append((fileName, 'duplicate of {}'.format(newHashes[fileHash])))
+            continue
+
+        if fileEntry is not None:
+            changedFiles.append(fileName)
+
+        newHashes[fileHash] = fileName
+        newFiles[fileName] = {'size': fileSize, 'mtime': fileMTime, 'sha1': fileHash}
+
+    return newFiles, skippedFiles, changedFiles
+
+
+def recordImportedFiles(manifest, datasetId, newFiles, tableName, jobIds):
+# This function adds to the manifest the files (path -> file state returned by selectNewFiles) imported to a table by the given load jobs
+
+    importedFiles = manifest['datasets'].setdefault(datasetId, {})
+    loadedAt = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+    for fileName, fileState in newFiles.items():
+
+        fileEntry = dict(fileState)
+        fileEntry.update({'tableName': tableName, 'jobIds': list(jobIds), 'loadedAt': loadedAt})
+
+        importedFiles[os.path.abspath(fileName)] = fileEntry
@@ -0,0 +1,745 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Local stand-in of Big Query (LocalBigQueryBackend) with the backend methods of bigquery_backend.py, used by -localbigquery and by
+# benchmark_import.py to run the whole Big Query import path without GCP. It is not a Big Query emulator, it does what the import needs:
+#   - datasets are SQLite databases attached with the dataset name, so the ${dataset}.<name> references of the views work as they are
+#   - load jobs read the whole upload (gzip compressed or not), check every CSV row against the declared table schema
+#     (number of columns and types) or read the Avro files written by normalize_logs.py, and append the rows to the table.
+#     A job with a bad row loads nothing and fails when its result is requested, like a Big Query load job with no bad records allowed
+#   - views are translated by local_engine.translateViewQuery and compiled, so a view referencing a missing table or column fails
+#   - materialized queries are translated like the views and written into a table. The clustering columns of the tables are indexed
+#     and the partitions are ignored: a load into table$YYYYMMDD appends the rows to the table. The partitioning and clustering
+#     a table was created with are recorded, so getTable reports them like Big Query. The column types are the ones of their SQLite affinity
+#   - every API call waits latencySeconds and fails with bigquery_backend.QuotaExceeded with the probability quotaErrorRate. A load job
+#     fails with bigquery_backend.JobFailed (simulated quota of the job) with the same probability, once uploaded
+# The datasets, the labels of the views and tables and the load jobs are recorded in the database file, so a second run sees the objects of the first one.
+
+import os
+import zlib
+import json
+import time
+import uuid
+import random
+import struct
+import sqlite3
+import threading
+
+# Streaming helpers to read the collected files
+import log_streams
+
+# Column types, value conversion and view translation of the local SQLite database
+import local_engine
+
+# Backend interface and errors
+import bigquery_backend
+
+# Project and location of the local stand-in
+LOCAL_PROJECT = 'optimus-local'
+LOCAL_LOCATION = 'US'
+
+# Tables of the main database recording the datasets, the labels of the views and the load jobs
+METADATA_STATEMENTS = [
+    'CREATE TABLE IF NOT EXISTS local_bigquery_datasets (dataset_name TEXT PRIMARY KEY, location TEXT)',
+    'CREATE TABLE IF NOT EXISTS local_bigquery_labels (dataset_name TEXT, table_name TEXT, labels TEXT, PRIMARY KEY (dataset_name, table_name))',
+    'CREATE TABLE IF NOT EXISTS local_bigquery_load_jobs (job_id TEXT PRIMARY KEY, table_id TEXT, source_format TEXT, status TEXT, rows INTEGER, bytes INTEGER, error TEXT, created_at REAL)',
+    'CREATE TABLE IF NOT EXISTS local_bigquery_tables (dataset_name TEXT, table_name TEXT, day_partitioned INTEGER, clustering TEXT, PRIMARY KEY (dataset_name, table_name))',
+]
+
+# Big Query column types of the SQLite column types of the tables (see local_engine.SQLITE_COLUMN_TYPES)
+SQLITE_FIELD_TYPES = {'INTEGER': 'INT64', 'REAL': 'FLOAT64', 'NUMERIC': 'NUMERIC'}
+
+# Big Query column types of the Avro types written by normalize_logs.py
+AVRO_COLUMN_TYPES = {'long': 'INT64', 'double': 'FLOAT64', 'string': 'STRING', 'bytes': 'NUMERIC'}
+
+
+class LoadJobFailed(bigquery_backend.BackendError):
+# The rows of a load job do not match the table schema. Nothing was loaded
+    pass
+
+
+class NotFound(bigquery_backend.BackendError):
+# The dataset, table or view does not exist
+    pass
+
+
+def decodeLong(data, position):
+# This function decodes an Avro long (zig-zag varint) and returns its value and the position after it
+
+    value = 0
+    shift = 0
+
+    while True:
+
+        byte = data[position]
+        position = position + 1
+        value = value | ((byte & 0x7F) << shift)
+        shift = shift + 7
+
+        if byte < 0x80:
+            return (value >> 1) ^ -(value & 1), position
+
+
+def decodeBytes(data, position):
+# This function decodes Avro bytes/string and returns its content and the position after it
+
+    length, position = decodeLong(data, position)
+
+    return data[position:position + length], position + length
+
+
+def getAvroFieldDecoder(avroFieldType):
+# This function returns the function decoding a value of a nullable column (union of null and the given Avro type)
+# The decoders return the value as stored in SQLite and the position after it
+
+    def decodeDouble(data, position):
+        return struct.unpack_from('<d', data, position)[0], position + 8
+
+    def decodeString(data, position):
+        value, position = decodeBytes(data, position)
+        return value.decode('utf-8', 'replace'), position
+
+    def decodeDecimal(data, position):
+        value, position = decodeBytes(data, position)
+        return int.from_bytes(value, 'big', signed=True) / 10 ** avroFieldType.get('scale', 0), position
+
+    if avroFieldType == 'long':
+        decodeValue = decodeLong
+    elif avroFieldType == 'double':
+        decodeValue = decodeDouble
+    elif avroFieldType == 'string':
+        decodeValue = decodeString
+    else:
+        decodeValue = decodeDecimal
+
+    def decodeField(data, position):
+
+        branch, position = decodeLong(data, position)
+
+        if branch == 0:
+            return None, position
+
+        return decodeValue(data, position)
+
+    return decodeField
+
+
+def readAvroFile(data, decodeRecords=True):
+# This function reads an Avro object container file written by normalize_logs.AvroWriter (records of nullable columns, null or deflate codec)
+# Returns the tuple of (column name, Big Query type) of its schema, the list of rows and the number of records
+# If decodeRecords is False the records are only counted from the block headers and the list of rows is empty
+
+    if data[:4] != b'Obj\x01':
+        raise LoadJobFailed('The upload is not an Avro object container file')
+
+    position = 4
+    metadata = {}
+
+    while True:
+
+        entries, position = decodeLong(data, position)
+
+        if entries == 0:
+            break
+
+        if entries < 0:
+            entries = -entries
+            blockSize, position = decodeLong(data, position)
+
+        for entryCounter in range(entries):
+            key, position = decodeBytes(data, position)
+            value, position = decodeBytes(data, position)
+            metadata[key.decode('utf-8')] = value
+
+    syncMarker = data[position:position + 16]
+    position = position + 16
+
+    avroSchema = json.loads(metadata['avro.schema'].decode('utf-8'))
+    codec = metadata.get('avro.codec', b'null').decode('utf-8')
+
+    if codec not in ('null', 'deflate'):
+        raise LoadJobFailed('The Avro codec {} is not supported'.format(codec))
+
+    avroFieldTypes = [[avroType for avroType in avroField['type'] if avroType != 'null'][0] for avroField in avroSchema['fields']]
+    schemaFields = tuple((avroField['name'], AVRO_COLUMN_TYPES[avroFieldType if isinstance(avroFieldType, str) else avroFieldType['type']]) for avroField, avroFieldType in zip(avroSchema['fields'], avroFieldTypes))
+    fieldDecoders = [getAvroFieldDecoder(avroFieldType) for avroFieldType in avroFieldTypes]
+
+    rows = []
+    recordCount = 0
+
+    while position < len(data):
+
+        blockRecords, position = decodeLong(data, position)
+        blockSize, position = decodeLong(data, position)
+
+        blockData = data[position:position + blockSize]
+        position = position + blockSize
+
+        if data[position:position + 16] != syncMarker:
+            raise LoadJobFailed('The Avro file is corrupted: sync marker not found after a block')
+
+        position = position + 16
+        recordCount = recordCount + blockRecords
+
+        if not decodeRecords:
+            continue
+
+        if codec == 'deflate':
+            # Avro deflate codec is raw deflate (no zlib header/checksum)
+            blockData = zlib.decompress(blockData, -15)
+
+        blockPosition = 0
+
+        for recordCounter in range(blockRecords):
+
+            row = []
+
+            for fieldDecoder in fieldDecoders:
+                value, blockPosition = fieldDecoder(blockData, blockPosition)
+                row.append(value)
+
+            rows.append(tuple(row))
+
+    return schemaFields, rows, recordCount
+
+
+def decompressUploadChunks(chunks):
+# This function yields the content of an upload chunk stream, decompressed if it is gzip compressed (see log_streams.gzipChunks)
+
+    decompressor = None
+
+    for chunk in chunks:
+
+        if decompressor is None:
+            # wbits 16 + 15 reads the gzip header and trailer, 15 a zlib stream. Gzip uploads start with 1f 8b
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b'\x1f\x8b' else False
+
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+
+        if chunk:
+            yield chunk
+
+    if decompressor:
+        yield decompressor.flush()
+
+
+def readCsvRows(chunks, tableName, schemaFields, skipLeadingRows):
+# This function returns the rows of a CSV upload as tuples of typed values, checked against the table schema
+# Empty values are loaded as NULL. Raises LoadJobFailed for the first row that does not match
+
+    valueConverters = [local_engine.getValueConverter(fieldType) for fieldName, fieldType in schemaFields]
+
+    rows = []
+    lineCounter = 0
+
+    for lines in log_streams.iterChunkLines(chunks):
+
+        for line in lines:
+
+            lineCounter = lineCounter + 1
+
+            if lineCounter <= skipLeadingRows or not line:
+                continue
+
+            fields = log_streams.splitCsvLine(line)
+
+            if len(fields) != len(valueConverters):
+                raise LoadJobFailed('Row {} of table {} has {} columns but the table schema has {} columns'.format(lineCounter, tableName, len(fields), len(valueConverters)))
+
+            try:
+                rows.append(tuple([valueConverter(field) for valueConverter, field in zip(valueConverters, fields)]))
+            except ValueError as error:
+                raise LoadJobFailed('Row {} does not match the schema of table {}: {}'.format(lineCounter, tableName, error))
+
+    return rows
+
+
+def splitObjectId(objectId):
+# This function returns the dataset name and the table name of a project.dataset.table id (the project and the partition $YYYYMMDD are not used locally)
+
+    objectParts = objectId.split('.')
+
+    if len(objectParts) < 2:
+        raise NotFound('The id {} has no dataset'.format(objectId))
+
+    return objectParts[-2], objectParts[-1].split('$')[0]
+
+
+class LocalLoadJob:
+# Load job of LocalBigQueryBackend. The rows were loaded (or rejected) when it was created, result() only reports the outcome
+
+    def __init__(self, backend, jobId, jobError, outputRows=None):
+        self.backend = backend
+        self.job_id = jobId
+        self.jobError = jobError
+
+        # Rows loaded by the job. The stand-in runs the job when it is created, it never waits in a queue
+        self.output_rows = outputRows
+        self.queue_seconds = None
+
+    def result(self):
+
+        # Polling a job is retried by the Big Query client, so it only adds latency
+        self.backend.simulateApiCall('jobs.get', quotaErrors=False)
+
+        if self.jobError is not None:
+            raise self.jobError
+
+        return self
+
+
+class LocalBigQueryBackend:
+# Local stand-in of Big Query stored in a SQLite database file (':memory:' for a temporary one)
+# latencySeconds is added to every API call and quotaErrorRate (0 to 1) is the probability of a QuotaExceeded error on every API call,
+# drawn from a random generator seeded by seed. A load job can also fail with JobFailed when its result is requested, with nothing loaded
+# If storeRows is False the uploads are only read and their lines counted (benchmark_import.py), nothing is checked nor stored
+
+    def __init__(self, databaseFile=':memory:', latencySeconds=0, quotaErrorRate=0, seed=None, storeRows=True):
+
+        self.databaseFile = databaseFile
+        self.latencySeconds = latencySeconds
+        self.quotaErrorRate = quotaErrorRate
+        self.randomGenerator = random.Random(seed)
+        self.storeRows = storeRows
+
+        self.project = LOCAL_PROJECT
+        self.location = LOCAL_LOCATION
+
+        # A single connection shared by all threads. The lock serializes its use, the latency is waited outside of it
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(databaseFile, check_same_thread=False)
+        self.connection.execute('PRAGMA synchronous = OFF')
+
+        # Same Big Query functions of the local engine (see local_engine.openLocalDatabase)
+        self.connection.create_function('substr', 2, local_engine.bqSubstr)
+        self.connection.create_function('substr', 3, local_engine.bqSubstr)
+
+        with self.connection:
+            for metadataStatement in METADATA_STATEMENTS:
+                self.connection.execute(metadataStatement)
+
+        for datasetName, in self.connection.execute('SELECT dataset_name FROM local_bigquery_datasets').fetchall():
+            self.attachDataset(datasetName)
+
+        # Row counts of the tables of the load jobs when storeRows is False
+        self.tableRows = {}
+
+        # Load jobs submitted since the backend was opened, by job id
+        self.loadJobs = {}
+
+        # The load jobs of the previous runs stay in the database file
+        self.openedAt = time.time()
+
+        self.apiCalls = 0
+        self.quotaErrors = 0
+        self.uploadedBytes = 0
+        self.runningCalls = 0
+        self.maxRunningCalls = 0
+
+    def close(self):
+
+        self.connection.close()
+
+    def getDatasetFileName(self, datasetName):
+    # This function returns the SQLite database file of a dataset, next to the main database file
+
+        if self.databaseFile == ':memory:':
+            return ':memory:'
+
+        return '{}__{}.db'.format(os.path.splitext(self.databaseFile)[0], datasetName)
+
+    def attachDataset(self, datasetName):
+
+        self.connection.execute('ATTACH DATABASE ? AS "{}"'.format(datasetName), (self.getDatasetFileName(datasetName),))
+
+    def simulateApiCall(self, callName, quotaErrors=True):
+    # This function waits the simulated latency of an API call and raises QuotaExceeded with the probability quotaErrorRate (if quotaErrors is True)
+    # It also counts the API calls and the highest number of calls running at the same time (concurrency of the import)
+
+        with self.lock:
+            self.apiCalls = self.apiCalls + 1
+            self.runningCalls = self.runningCalls + 1
+            self.maxRunningCalls = max(self.maxRunningCalls, self.runningCalls)
+            quotaError = quotaErrors and self.randomGenerator.random() < self.quotaErrorRate
+
+        try:
+            if self.latencySeconds > 0:
+                time.sleep(self.latencySeconds)
+        finally:
+            with self.lock:
+                self.runningCalls = self.runningCalls - 1
+
+        if quotaError:
+
+            with self.lock:
+                self.quotaErrors = self.quotaErrors + 1
+
+            raise bigquery_backend.QuotaExceeded('Simulated rate limit exceeded in {}'.format(callName))
+
+    def getDatasetNames(self):
+
+        return [datasetName for datasetName, in self.connection.execute('SELECT dataset_name FROM local_bigquery_datasets').fetchall()]
+
+    def getObjectType(self, datasetName, objectName):
+    # This function returns 'table', 'view' or None if the object does not exist. The lock must be held
+
+        if datasetName not in self.getDatasetNames():
+            raise NotFound('Dataset {}:{} was not found'.format(self.project, datasetName))
+
+        objectType = self.connection.execute('SELECT type FROM "{}".sqlite_master WHERE name = ?'.format(datasetName), (objectName,)).fetchone()
+
+        return objectType[0] if objectType is not None else None
+
+    def createDataset(self, datasetId):
+
+        self.simulateApiCall('datasets.insert')
+
+        datasetName = datasetId.split('.')[-1]
+
+        with self.lock:
+
+            if datasetName in self.getDatasetNames():
+                raise bigquery_backend.AlreadyExists('Already Exists: Dataset {}'.format(datasetId))
+
+            self.attachDataset(datasetName)
+
+            with self.connection:
+                self.connection.execute('INSERT INTO local_bigquery_datasets VALUES (?, ?)', (datasetName, self.location))
+
+    def loadTableFromFile(self, sourceFile, tableId, schemaFields, sourceFormat, skipLeadingRows=0, size=None, dayPartitioned=False, clusteringFields=(), jobId=None):
+    # The upload is read and checked in the calling thread, only the insert of the rows holds the lock
+    # The rows of a load are kept in memory until they are inserted: the stand-in is meant for tests and benchmarks
+
+        self.simulateApiCall('jobs.insert')
+
+        datasetName, tableName = splitObjectId(tableId)
+
+        if jobId is None:
+            jobId = 'local_job_{}'.format(uuid.uuid4().hex)
+
+        with self.lock:
+            if self.connection.execute('SELECT 1 FROM local_bigquery_load_jobs WHERE job_id = ?', (jobId,)).fetchone() is not None:
+                raise bigquery_backend.AlreadyExists('Already Exists: Job {}:{}.{}'.format(self.project, self.location, jobId))
+        jobError = None
+        rows = []
+        uploadStats = {}
+
+        # The upload is counted as sent, before its decompression
+        uploadChunks = decompressUploadChunks(log_streams.countChunks(iter(lambda: sourceFile.read(log_streams.CHUNK_SIZE), b''), uploadStats, 'uploadBytes'))
+
+        try:
+            if sourceFormat == bigquery_backend.SOURCE_FORMAT_AVRO:
+                schemaFields, rows, rowCount = readAvroFile(b''.join(uploadChunks), self.storeRows)
+
+            elif not self.storeRows:
+                rowCount = max(sum(chunk.count(b'\n') for chunk in uploadChunks) - skipLeadingRows, 0)
+
+            else:
+                rows = readCsvRows(uploadChunks, tableName, schemaFields, skipLeadingRows)
+
+        except LoadJobFailed as error:
+            jobError = error
+
+        with self.lock:
+
+            # The job itself can hit a quota once the file is uploaded
+            if jobError is None and self.randomGenerator.random() < self.quotaErrorRate:
+                jobError = bigquery_backend.JobFailed('Simulated quota exceeded in load job {}'.format(jobId))
+                self.quotaErrors = self.quotaErrors + 1
+
+            self.uploadedBytes = self.uploadedBytes + uploadStats.get('uploadBytes', 0)
+
+            if jobError is None and not self.storeRows:
+                self.tableRows[tableId] = self.tableRows.get(tableId, 0) + rowCount
+
+            elif jobError is None:
+
+                try:
+                    self.insertRows(datasetName, tableName, schemaFields, rows, dayPartitioned, clusteringFields)
+                    rowCount = len(rows)
+                except (LoadJobFailed, NotFound) as error:
+                    jobError = error
+
+            with self.connection:
+                self.connection.execute('INSERT INTO local_bigquery_load_jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (jobId, tableId, sourceFormat, 'FAILED' if jobError is not None else 'DONE', rowCount if jobError is None else 0, uploadStats.get('uploadBytes', 0), str(jobError) if jobError is not None else None, time.time()))
+
+            self.loadJobs[jobId] = LocalLoadJob(self, jobId, jobError, rowCount if jobError is None else None)
+
+            return self.loadJobs[jobId]
+
+    def getLoadJob(self, jobId):
+    # The jobs of the previous runs are rebuilt from their record. Their failure is reported as LoadJobFailed
+
+        self.simulateApiCall('jobs.get')
+
+        with self.lock:
+
+            if jobId in self.loadJobs:
+                return self.loadJobs[jobId]
+
+            jobRow = self.connection.execute('SELECT status, rows, error FROM local_bigquery_load_jobs WHERE job_id = ?', (jobId,)).fetchone()
+
+        if jobRow is None:
+            raise NotFound('Job {}:{}.{} was not found'.format(self.project, self.location, jobId))
+
+        status, rowCount, jobError = jobRow
+
+        return LocalLoadJob(self, jobId, LoadJobFailed(jobError) if status == 'FAILED' else None, rowCount if status != 'FAILED' else None)
+
+    def insertRows(self, datasetName, tableName, schemaFields, rows, dayPartitioned=False, clusteringFields=()):
+    # This function appends the rows to a table, creating it from the table schema (and an index on the clustering columns) if needed. The lock must be held
+    # The columns of an existing table must be the columns of the table schema (Big Query does not change the schema of the load jobs), and
+    # the partitioning and clustering of the load job, if any, must be the ones of the table
+
+        objectType = self.getObjectType(datasetName, tableName)
+
+        if objectType == 'view':
+            raise LoadJobFailed('{}.{} is a view, rows cannot be loaded into it'.format(datasetName, tableName))
+
+        if objectType is None:
+            self.connection.execute('CREATE TABLE "{}"."{}" ({})'.format(datasetName, tableName, ', '.join('"{}" {}'.format(fieldName, local_engine.SQLITE_COLUMN_TYPES.get(fieldType.upper(), 'TEXT')) for fieldName, fieldType in schemaFields)))
+
+            if clusteringFields:
+                self.createClusteringIndex(datasetName, tableName, clusteringFields)
+
+            self.recordTableStorage(datasetName, tableName, dayPartitioned, clusteringFields)
+
+        else:
+            tableColumns = [(column[1].lower(), column[2].upper()) for column in self.connection.execute('PRAGMA "{}".table_info("{}")'.format(datasetName, tableName)).fetchall()]
+
+            if tableColumns != [(fieldName.lower(), local_engine.SQLITE_COLUMN_TYPES.get(fieldType.upper(), 'TEXT')) for fieldName, fieldType in schemaFields]:
+                raise LoadJobFailed('Provided schema does not match table {}.{}: the table has the columns {}'.format(datasetName, tableName, ', '.join('{} {}'.format(columnName, columnType) for columnName, columnType in tableColumns)))
+
+            tableStorage = self.getTableStorage(datasetName, tableName)
+
+            if (dayPartitioned or clusteringFields) and (dayPartitioned, tuple(clusteringFields)) != (tableStorage['dayPartitioned'], tableStorage['clusteringFields']):
+                raise LoadJobFailed('Incompatible table partitioning specification for {}.{}: the table is {}partitioned by day and clustered on ({})'.format(datasetName, tableName, '' if tableStorage['dayPartitioned'] else 'not ', ', '.join(tableStorage['clusteringFields'])))
+
+        with self.connection:
+            self.connection.executemany('INSERT INTO "{}"."{}" VALUES ({})'.format(datasetName, tableName, ', '.join(['?'] * len(schemaFields))), rows)
+
+    def recordTableStorage(self, datasetName, tableName, dayPartitioned, clusteringFields):
+    # This function records the partitioning and clustering a table was created with. The lock must be held
+
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO local_bigquery_tables VALUES (?, ?, ?, ?)', (datasetName, tableName, int(dayPartitioned), json.dumps(list(clusteringFields))))
+
+    def getTableStorage(self, datasetName, tableName):
+    # This function returns the partitioning and clustering of a table (see getTable). The tables without record are plain tables. The lock must be held
+
+        storageRow = self.connection.execute('SELECT day_partitioned, clustering FROM local_bigquery_tables WHERE dataset_name = ? AND table_name = ?', (datasetName, tableName)).fetchone()
+
+        if storageRow is None:
+            return {'dayPartitioned': False, 'clusteringFields': ()}
+
+        return {'dayPartitioned': bool(storageRow[0]), 'clusteringFields': tuple(json.loads(storageRow[1]))}
+
+    def getTable(self, tableId):
+
+        self.simulateApiCall('tables.get')
+
+        datasetName, tableName = splitObjectId(tableId)
+
+        with self.lock:
+
+            try:
+                if self.getObjectType(datasetName, tableName) is None:
+                    return None
+            except NotFound:
+                return None
+
+            tableColumns = self.connection.execute('PRAGMA "{}".table_info("{}")'.format(datasetName, tableName)).fetchall()
+
+            return dict(self.getTableStorage(datasetName, tableName), schemaFields=tuple((column[1], SQLITE_FIELD_TYPES.get(column[2].upper(), 'STRING')) for column in tableColumns))
+
+    def migrateTable(self, tableId, schemaFields):
+    # The rows are copied into a new table created from the table schema, which replaces the table in the same transaction
+
+        self.simulateApiCall('jobs.insert')
+
+        datasetName, tableName = splitObjectId(tableId)
+
+        with self.lock:
+
+            if self.getObjectType(datasetName, tableName) != 'table':
+                raise NotFound('Table {} was not found'.format(tableId))
+
+            tableTypes = {column[1].lower(): column[2].upper() for column in self.connection.execute('PRAGMA "{}".table_info("{}")'.format(datasetName, tableName)).fetchall()}
+            selectList = []
+
+            for fieldName, fieldType in schemaFields:
+
+                columnType = local_engine.SQLITE_COLUMN_TYPES.get(fieldType.upper(), 'TEXT')
+
+                if fieldName.lower() not in tableTypes:
+                    selectList.append('NULL')
+                elif tableTypes[fieldName.lower()] == 'TEXT':
+                    selectList.append('CAST(NULLIF(TRIM("{}"), \'\') AS {})'.format(fieldName, columnType))
+                else:
+                    selectList.append('"{}"'.format(fieldName))
+
+            migrationName = tableName + '__migration'
+
+            self.connection.execute('BEGIN')
+
+            try:
+                self.connection.execute('CREATE TABLE "{}"."{}" ({})'.format(datasetName, migrationName, ', '.join('"{}" {}'.format(fieldName, local_engine.SQLITE_COLUMN_TYPES.get(fieldType.upper(), 'TEXT')) for fieldName, fieldType in schemaFields)))
+                rowCount = self.connection.execute('INSERT INTO "{}"."{}" SELECT {} FROM "{}"."{}"'.format(datasetName, migrationName, ', '.join(selectList), datasetName, tableName)).rowcount
+                self.connection.execute('DROP TABLE "{}"."{}"'.format(datasetName, tableName))
+                self.connection.execute('ALTER TABLE "{}"."{}" RENAME TO "{}"'.format(datasetName, migrationName, tableName))
+
+                clusteringFields = self.getTableStorage(datasetName, tableName)['clusteringFields']
+
+                if clusteringFields:
+                    self.createClusteringIndex(datasetName, tableName, clusteringFields)
+
+            except sqlite3.Error as error:
+                self.connection.rollback()
+                raise bigquery_backend.BackendError('Migration of table {}.{} failed: {}'.format(datasetName, tableName, error))
+
+            self.connection.commit()
+
+        return rowCount
+
+    def createClusteringIndex(self, datasetName, tableName, clusteringFields):
+    # This function creates the index standing in for the clustering of a table. The lock must be held
+
+        self.connection.execute('CREATE INDEX IF NOT EXISTS "{}"."{}__clustering" ON "{}" ({})'.format(datasetName, tableName, tableName, ', '.join('"{}"'.format(fieldName) for fieldName in clusteringFields)))
+
+    def getTableRows(self, tableId):
+
+        self.simulateApiCall('tables.get')
+
+        if not self.storeRows:
+            return self.tableRows.get(tableId, 0)
+
+        datasetName, tableName = splitObjectId(tableId)
+
+        with self.lock:
+
+            if self.getObjectType(datasetName, tableName) is None:
+                raise NotFound('Table {} was not found'.format(tableId))
+
+            return self.connection.execute('SELECT COUNT(*) FROM "{}"."{}"'.format(datasetName, tableName)).fetchone()[0]
+
+    def listTableLabels(self, datasetId):
+
+        self.simulateApiCall('tables.list')
+
+        datasetName = datasetId.split('.')[-1]
+
+        with self.lock:
+
+            if datasetName not in self.getDatasetNames():
+                raise NotFound('Dataset {} was not found'.format(datasetId))
+
+            tableLabels = {tableName: {} for tableName, in self.connection.execute('SELECT name FROM "{}".sqlite_master WHERE type IN (\'table\', \'view\')'.format(datasetName)).fetchall()}
+
+            for tableName, labels in self.connection.execute('SELECT table_name, labels FROM local_bigquery_labels WHERE dataset_name = ?', (datasetName,)).fetchall():
+                if tableName in tableLabels:
+                    tableLabels[tableName] = json.loads(labels)
+
+        return tableLabels
+
+    def createView(self, viewId, viewQuery, labels):
+
+        self.simulateApiCall('tables.insert')
+
+        datasetName, viewName = splitObjectId(viewId)
+
+        with self.lock:
+
+            if self.getObjectType(datasetName, viewName) is not None:
+                raise bigquery_backend.AlreadyExists('Already Exists: Table {}'.format(viewId))
+
+            self.replaceView(datasetName, viewName, viewQuery, labels)
+
+    def updateView(self, viewId, viewQuery, labels):
+
+        self.simulateApiCall('tables.patch')
+
+        datasetName, viewName = splitObjectId(viewId)
+
+        with self.lock:
+
+            if self.getObjectType(datasetName, viewName) != 'view':
+                raise NotFound('View {} was not found'.format(viewId))
+
+            self.replaceView(datasetName, viewName, viewQuery, labels)
+
+    def replaceView(self, datasetName, viewName, viewQuery, labels):
+    # This function (re)creates a view from its Big Query text and records its labels. The lock must be held
+    # The view is compiled once created, so the missing tables and columns are found like Big Query does
+
+        # SQLite runs the DDL statements in the explicit transaction, so a view that does not compile leaves the previous one in place
+        self.connection.execute('BEGIN')
+
+        try:
+            self.connection.execute('DROP VIEW IF EXISTS "{}"."{}"'.format(datasetName, viewName))
+            self.connection.execute('CREATE VIEW "{}"."{}" AS {}'.format(datasetName, viewName, local_engine.translateViewQuery(viewQuery)))
+            self.connection.execute('SELECT * FROM "{}"."{}" LIMIT 0'.format(datasetName, viewName)).fetchall()
+            self.connection.execute('INSERT OR REPLACE INTO local_bigquery_labels VALUES (?, ?, ?)', (datasetName, viewName, json.dumps(labels)))
+
+        except sqlite3.Error as error:
+            self.connection.rollback()
+            raise bigquery_backend.BackendError('Invalid view {}.{}: {}'.format(datasetName, viewName, error))
+
+        self.connection.commit()
+
+    def materializeQuery(self, tableId, query, clusteringFields, labels, replace=False):
+    # The table is created from the query the first time or when replace is True, otherwise the rows are appended
+    # An index on the clustering columns stands in for the clustering, the partitioning by ingestion day has no local equivalent
+
+        self.simulateApiCall('jobs.insert')
+
+        datasetName, tableName = splitObjectId(tableId)
+
+        with self.lock:
+
+            if self.getObjectType(datasetName, tableName) == 'view':
+                raise bigquery_backend.BackendError('{}.{} is a view, query results cannot be written into it'.format(datasetName, tableName))
+
+            tableExists = self.getObjectType(datasetName, tableName) is not None
+
+            # Like a query job, the table is left as it was if the query fails
+            self.connection.execute('BEGIN')
+
+            try:
+                if replace or not tableExists:
+                    self.connection.execute('DROP TABLE IF EXISTS "{}"."{}"'.format(datasetName, tableName))
+                    self.connection.execute('CREATE TABLE "{}"."{}" AS {}'.format(datasetName, tableName, local_engine.translateViewQuery(query)))
+                    rowCount = self.connection.execute('SELECT COUNT(*) FROM "{}"."{}"'.format(datasetName, tableName)).fetchone()[0]
+                    self.connection.execute('INSERT OR REPLACE INTO local_bigquery_tables VALUES (?, ?, 1, ?)', (datasetName, tableName, json.dumps(list(clusteringFields))))
+                else:
+                    rowCount = self.connection.execute('INSERT INTO "{}"."{}" {}'.format(datasetName, tableName, local_engine.translateViewQuery(query))).rowcount
+
+                self.createClusteringIndex(datasetName, tableName, clusteringFields)
+                self.connection.execute('INSERT OR REPLACE INTO local_bigquery_labels VALUES (?, ?, ?)', (datasetName, tableName, json.dumps(labels)))
+
+            except sqlite3.Error as error:
+                self.connection.rollback()
+                raise bigquery_backend.BackendError('Invalid query for table {}.{}: {}'.format(datasetName, tableName, error))
+
+            self.connection.commit()
+
+        return rowCount
+
+    def getLoadJobs(self, allJobs=False):
+    # This function returns the load jobs run since the backend was opened, oldest first. With allJobs the jobs of the previous runs are returned as well
+
+        with self.lock:
+            jobRows = self.connection.execute('SELECT job_id, table_id, source_format, status, rows, bytes, error FROM local_bigquery_load_jobs WHERE created_at >= ? ORDER BY created_at', (0 if allJobs else self.openedAt,)).fetchall()
+
+        return [{'jobId': jobId, 'tableId': tableId, 'sourceFormat': sourceFormat, 'status': status, 'rows': rows, 'bytes': uploadBytes, 'error': error} for jobId, tableId, sourceFormat, status, rows, uploadBytes, error in jobRows]
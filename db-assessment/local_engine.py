@@ -0,0 +1,224 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Local analytics engine: loads the collected files and the Optimus Prime configuration files into a SQLite database
+# and creates the Optimus Prime views (opViews/*.sql) there, so the sizing reports can be produced without Big Query.
+# SQLite is part of python built-in libraries, so no extra dependency is needed. The Big Query SQL dialect of the views
+# is translated by translateViewQuery and by the functions registered in openLocalDatabase.
+
+import re
+import csv
+import sqlite3
+
+# Streaming helpers to read the collected files
+import log_streams
+
+# SQLite column types of the Big Query column types. Any other Big Query type is stored as TEXT
+SQLITE_COLUMN_TYPES = {
+    'INT64': 'INTEGER',
+    'INTEGER': 'INTEGER',
+    'FLOAT64': 'REAL',
+    'FLOAT': 'REAL',
+    'NUMERIC': 'NUMERIC',
+    'DECIMAL': 'NUMERIC',
+}
+
+# Number of rows inserted by each executemany call
+INSERT_BATCH_ROWS = 10000
+
+# String literals, quoted identifiers and comments of a view text. Nothing inside them is translated
+# (a / inside them is not a division, -- and # comments end with the line)
+UNTRANSLATED_TEXT_PATTERN = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|`[^`]*`|/\*.*?\*/|--[^\n]*|#[^\n]*)""", re.DOTALL)
+
+# Big Query IF(condition, value, value) is the SQLite IIF(condition, value, value)
+IF_FUNCTION_PATTERN = re.compile(r'\bIF\s*\(', re.IGNORECASE)
+
+# Big Query reads a decimal point separated from its digits (*. 8) as a number. SQLite does not
+SPLIT_NUMBER_PATTERN = re.compile(r'([-+*/(,=<>]\s*)\.\s+(\d)')
+
+# Big Query accepts a trailing comma at the end of the select list (..., FROM). SQLite does not
+TRAILING_COMMA_PATTERN = re.compile(r',(\s*)(FROM)\b', re.IGNORECASE)
+
+
+def bqSubstr(value, position, length=None):
+# This function implements the Big Query SUBSTR: positions start at 1, 0 is the same as 1 and negative positions count from the end
+# SQLite substr(value, 0, n) returns n - 1 characters, which changes the results of SUBSTR(dbversion,0,2) for instance
+
+    if value is None or position is None:
+        return None
+
+    value = str(value)
+
+    if position > 0:
+        startPos = position - 1
+    elif position < 0:
+        startPos = max(len(value) + position, 0)
+    else:
+        startPos = 0
+
+    if length is None:
+        return value[startPos:]
+
+    if length < 0:
+        raise ValueError('SUBSTR length cannot be negative')
+
+    return value[startPos:startPos + length]
+
+
+def openLocalDatabase(databaseFile):
+# This function opens (or creates) the SQLite database file and registers the Big Query functions used by the views
+
+    connection = sqlite3.connect(databaseFile)
+
+    # The database is rebuilt from the collected files at every run, so durability is not needed while loading it
+    connection.execute('PRAGMA journal_mode = OFF')
+    connection.execute('PRAGMA synchronous = OFF')
+
+    # Application functions replace the SQLite built-in functions with the same name and number of arguments
+    connection.create_function('substr', 2, bqSubstr)
+    connection.create_function('substr', 3, bqSubstr)
+
+    return connection
+
+
+def translateViewQuery(viewQuery):
+# This function translates a Big Query view text (after the ${dataset} replacement) into SQLite SQL
+# Only the text outside the string literals, quoted identifiers and comments is changed:
+#   - IF(...) is renamed to IIF(...)
+#   - a trailing comma before FROM is removed
+#   - numbers written with blanks after the decimal point (. 8) are written as 0.8
+#   - every division is made a floating point division as in Big Query (SQLite divides integers as integers)
+# CAST(... AS INT64) and CAST(... AS NUMERIC) need no change because SQLite gets the INTEGER/NUMERIC affinity from the type name
+
+    translatedParts = []
+
+    for partCounter, queryPart in enumerate(UNTRANSLATED_TEXT_PATTERN.split(viewQuery.strip().rstrip(';'))):
+
+        # split returns the string literals, quoted identifiers and comments in the odd positions
+        if partCounter % 2 == 0:
+            queryPart = IF_FUNCTION_PATTERN.sub('IIF(', queryPart)
+            queryPart = TRAILING_COMMA_PATTERN.sub(r'\1\2', queryPart)
+            queryPart = SPLIT_NUMBER_PATTERN.sub(r'\g<1>0.\2', queryPart)
+            queryPart = queryPart.replace('/', ' * 1.0 / ')
+
+        translatedParts.append(queryPart)
+
+    return ''.join(translatedParts)
+
+
+def getValueConverter(fieldType):
+# This function returns the function converting a CSV value (bytes) into the python value stored in a column of the given Big Query type
+# Empty values are stored as NULL, the same way Big Query loads them
+
+    columnType = SQLITE_COLUMN_TYPES.get(fieldType.upper(), 'TEXT')
+
+    if columnType == 'INTEGER':
+        convertValue = int
+    elif columnType in ('REAL', 'NUMERIC'):
+        convertValue = float
+    else:
+        convertValue = lambda value: value.decode('utf-8', 'replace')
+
+    return lambda value: convertValue(value) if value else None
+
+
+def createLocalTable(connection, tableName, schemaFields):
+# This function (re)creates a table from a list of (column name, Big Query type)
+
+    connection.execute('DROP TABLE IF EXISTS "{}"'.format(tableName))
+    connection.execute('CREATE TABLE "{}" ({})'.format(tableName, ', '.join('"{}" {}'.format(fieldName, SQLITE_COLUMN_TYPES.get(fieldType.upper(), 'TEXT')) for fieldName, fieldType in schemaFields)))
+
+
+def iterTableRows(tableName, fileList, schemaFields, headerLines, chunkSize):
+# This function yields the rows of all files of a given table as tuples of typed values
+# Padding, blank lines, separators and headers are removed by log_streams.normalizeSpoolChunks
+
+    valueConverters = [getValueConverter(fieldType) for fieldName, fieldType in schemaFields]
+
+    lineCounter = 0
+
+    for lines in log_streams.iterChunkLines(log_streams.iterNormalizedTableChunks(fileList, headerLines, chunkSize)):
+
+        for line in lines:
+
+            lineCounter = lineCounter + 1
+
+            # The first normalized line is the header
+            if lineCounter <= log_streams.NORMALIZED_HEADER_LINES:
+                continue
+
+            fields = log_streams.splitCsvLine(line)
+
+            if len(fields) != len(valueConverters):
+                raise ValueError('Row {} of table {} has {} columns but the table has {} columns'.format(lineCounter, tableName, len(fields), len(valueConverters)))
+
+            try:
+                yield tuple([valueConverter(field) for valueConverter, field in zip(valueConverters, fields)])
+            except ValueError as error:
+                raise ValueError('Row {} does not match the schema of table {}: {}'.format(lineCounter, tableName, error))
+
+
+def loadLocalTable(connection, tableName, schemaFields, fileList, headerLines=log_streams.HEADER_LINES, chunkSize=log_streams.CHUNK_SIZE):
+# This function replaces the content of a table by the rows of all files of the table, streamed chunk by chunk
+# Returns a dictionary with the number of files and rows loaded
+
+    insertStatement = 'INSERT INTO "{}" VALUES ({})'.format(tableName, ', '.join(['?'] * len(schemaFields)))
+
+    rows = 0
+
+    with connection:
+
+        createLocalTable(connection, tableName, schemaFields)
+
+        rowBatch = []
+
+        for row in iterTableRows(tableName, fileList, schemaFields, headerLines, chunkSize):
+
+            rowBatch.append(row)
+
+            if len(rowBatch) >= INSERT_BATCH_ROWS:
+                connection.executemany(insertStatement, rowBatch)
+                rows = rows + len(rowBatch)
+                rowBatch = []
+
+        connection.executemany(insertStatement, rowBatch)
+        rows = rows + len(rowBatch)
+
+    return {'tableName': tableName, 'files': len(fileList), 'rows': rows}
+
+
+def createLocalView(connection, viewName, viewQuery):
+# This function (re)creates a view from its Big Query text. ${dataset}. is removed because all objects are in the same database
+
+    with connection:
+        connection.execute('DROP VIEW IF EXISTS "{}"'.format(viewName))
+        connection.execute('CREATE VIEW "{}" AS {}'.format(viewName, translateViewQuery(viewQuery.replace('${dataset}.', ''))))
+
+
+def exportLocalQuery(connection, query, targetFileName):
+# This function writes the result of a query to a CSV file with a header line and returns the number of rows written
+
+    cursor = connection.execute(query)
+    rows = 0
+
+    with open(targetFileName, 'w', newline='') as targetFile:
+
+        csvWriter = csv.writer(targetFile)
+        csvWriter.writerow([column[0] for column in cursor.description])
+
+        for row in cursor:
+            csvWriter.writerow(row)
+            rows = rows + 1
+
+    return rows
@@ -0,0 +1,366 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Streaming helpers used to read the Optimus Prime collected files (opdb*log).
+# Files are always read in fixed size chunks and never split into lines, so memory usage is flat whatever the file size.
+# The fields of the CSV lines are split as Big Query reads them: a value between double quotes can have commas ("a, b") and doubled quotes ("a ""b"""),
+# but not line endings (Big Query does not allow quoted new lines by default).
+
+import io
+import re
+import zlib
+import time
+
+# Loose files and archive members
+import file_sources
+
+# Size in bytes of every chunk read from the OS files
+CHUNK_SIZE = 1024 * 1024
+
+# Number of lines SQL*Plus spools before the data rows (blank line + column names)
+HEADER_LINES = 2
+
+# Number of header lines left by normalizeSpoolChunks (column names only)
+NORMALIZED_HEADER_LINES = 1
+
+# Field of a CSV line: unquoted text and quoted values, up to the next comma outside the quotes
+CSV_FIELD_PATTERN = re.compile(rb'(?:[^,"]+|"(?:[^"]|"")*")*')
+
+
+def translateNewlines(chunks):
+# This function converts \r\n and \r line endings into \n, the same way python text mode (universal newlines) does it
+# A trailing \r is kept aside until the next chunk because it can be the first half of a \r\n
+
+    pendingCR = False
+
+    for chunk in chunks:
+
+        if pendingCR:
+            chunk = b'\r' + chunk
+            pendingCR = False
+
+        if chunk.endswith(b'\r'):
+            chunk = chunk[:-1]
+            pendingCR = True
+
+        if b'\r' in chunk:
+            chunk = chunk.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+        if chunk:
+            yield chunk
+
+    if pendingCR:
+        yield b'\n'
+
+
+def skipLeadingLines(chunks, linesToSkip):
+# This function drops the first linesToSkip lines of a chunk stream by looking for the newline offsets inside the chunks
+
+    for chunk in chunks:
+
+        while linesToSkip > 0 and chunk:
+
+            newlinePos = chunk.find(b'\n')
+
+            if newlinePos == -1:
+                # The whole chunk belongs to a line being skipped
+                chunk = b''
+            else:
+                chunk = chunk[newlinePos + 1:]
+                linesToSkip = linesToSkip - 1
+
+        if chunk:
+            yield chunk
+
+
+def readFileChunks(fileName, chunkSize=CHUNK_SIZE):
+# This function yields the raw content of a file (or archive member, see file_sources.py) in chunks of chunkSize bytes
+
+    with file_sources.openFile(fileName) as sourceFile:
+
+        while True:
+
+            chunk = sourceFile.read(chunkSize)
+
+            if not chunk:
+                break
+
+            yield chunk
+
+
+def iterLogChunks(fileName, linesToSkip=0, chunkSize=CHUNK_SIZE):
+# This function yields the content of a collected file with normalized line endings and without its first linesToSkip lines
+
+    chunks = translateNewlines(readFileChunks(fileName, chunkSize))
+
+    if linesToSkip > 0:
+        chunks = skipLeadingLines(chunks, linesToSkip)
+
+    return chunks
+
+
+def iterTableChunks(fileList, headerLines=HEADER_LINES, chunkSize=CHUNK_SIZE, terminateLines=False):
+# This function yields the content of all files of a given table as a single stream
+# Headers are kept for the first file only. For the other files the first headerLines lines are skipped
+# If terminateLines is True a file not ending with a new line gets one, so its last row is not merged with the next file
+
+    lastByte = b'\n'
+
+    for fileCounter, fileName in enumerate(fileList):
+
+        linesToSkip = headerLines if fileCounter > 0 else 0
+
+        if terminateLines and lastByte != b'\n':
+            yield b'\n'
+
+        lastByte = b'\n'
+
+        for chunk in iterLogChunks(fileName, linesToSkip, chunkSize):
+            lastByte = chunk[-1:]
+            yield chunk
+
+
+def consolidateTable(tableName, fileList, targetFileName, headerLines=HEADER_LINES, chunkSize=CHUNK_SIZE):
+# This function merges all files of a given table into targetFileName through a single open writer
+# Returns a dictionary with the number of files, bytes and data rows (headers not included) written
+
+    bytesWritten = 0
+    linesWritten = 0
+    lastByte = b'\n'
+
+    with open(targetFileName, 'wb') as targetFile:
+
+        for chunk in iterTableChunks(fileList, headerLines, chunkSize):
+
+            targetFile.write(chunk)
+
+            bytesWritten = bytesWritten + len(chunk)
+            linesWritten = linesWritten + chunk.count(b'\n')
+            lastByte = chunk[-1:]
+
+    # Last line without line ending is still a row
+    if lastByte != b'\n':
+        linesWritten = linesWritten + 1
+
+    # The headers of the first file are the only ones written
+    rows = max(linesWritten - headerLines, 0) if fileList else 0
+
+    return {'tableName': tableName, 'targetFileName': targetFileName, 'files': len(fileList), 'bytes': bytesWritten, 'rows': rows}
+
+
+def iterChunkLines(chunks):
+# This function yields lists with the complete lines (without line ending) found in every chunk
+# A line split between two chunks is kept aside until its end is found, so only one chunk is in memory at a time
+
+    pendingLine = b''
+
+    for chunk in chunks:
+
+        lines = chunk.split(b'\n')
+        lines[0] = pendingLine + lines[0]
+        pendingLine = lines.pop()
+
+        if lines:
+            yield lines
+
+    if pendingLine:
+        yield [pendingLine]
+
+
+def splitCsvLine(line, unquoteFields=True):
+# This function returns the fields of a CSV line, split on the commas outside the double quotes
+# With unquoteFields a field between double quotes is returned without them and with its doubled quotes made single, otherwise it is returned as written
+# A quote left open takes the rest of the line into the field, Big Query rejects such a row
+
+    # Most lines have no quotes
+    if b'"' not in line:
+        return line.split(b',')
+
+    fields = []
+    fieldPos = 0
+
+    while True:
+
+        fieldEnd = CSV_FIELD_PATTERN.match(line, fieldPos).end()
+
+        if line[fieldEnd:fieldEnd + 1] == b'"':
+            fieldEnd = len(line)
+
+        fields.append(line[fieldPos:fieldEnd])
+
+        if fieldEnd >= len(line):
+            break
+
+        fieldPos = fieldEnd + 1
+
+    if unquoteFields:
+        fields = [unquoteCsvField(field) for field in fields]
+
+    return fields
+
+
+def unquoteCsvField(field):
+# This function removes the double quotes around a CSV field and makes its doubled quotes single. The blanks around the quotes are ignored
+
+    strippedField = field.strip()
+
+    if len(strippedField) >= 2 and strippedField.startswith(b'"') and strippedField.endswith(b'"'):
+        return strippedField[1:-1].replace(b'""', b'"')
+
+    return field
+
+
+def isSeparatorLine(line):
+# This function returns True for the SQL*Plus underline lines (----- ----) printed below the column names
+
+    return b'-' in line and not line.translate(None, b'-, \t')
+
+
+def normalizeSpoolChunks(chunks):
+# This function removes the SQL*Plus spool padding and artifacts from a CSV chunk stream:
+# the blanks around every field, the blank lines, the separator lines and the column names repeated on every new page (set pages)
+# Only the first header line is kept, so the output has NORMALIZED_HEADER_LINES header lines
+
+    headerLine = None
+
+    for lines in iterChunkLines(chunks):
+
+        normalizedLines = []
+
+        for line in lines:
+
+            if not line.strip() or isSeparatorLine(line):
+                continue
+
+            normalizedLine = b','.join([field.strip() for field in splitCsvLine(line, unquoteFields=False)])
+
+            if headerLine is None:
+                headerLine = normalizedLine
+            elif normalizedLine == headerLine:
+                continue
+
+            normalizedLines.append(normalizedLine)
+
+        if normalizedLines:
+            normalizedLines.append(b'')
+            yield b'\n'.join(normalizedLines)
+
+
+def iterNormalizedTableChunks(fileList, headerLines=HEADER_LINES, chunkSize=CHUNK_SIZE):
+# This function yields all files of a given table as a single normalized CSV stream with one header line
+
+    return normalizeSpoolChunks(iterTableChunks(fileList, headerLines, chunkSize, terminateLines=True))
+
+
+def countChunks(chunks, streamStats, counterName):
+# This function yields the chunks unchanged while adding their size to streamStats[counterName]
+
+    streamStats[counterName] = streamStats.get(counterName, 0)
+
+    for chunk in chunks:
+        streamStats[counterName] = streamStats[counterName] + len(chunk)
+        yield chunk
+
+
+def timeChunks(chunks, streamStats, counterName):
+# This function yields the chunks unchanged while adding the time spent producing them (reading, normalizing, compressing) to streamStats[counterName], in seconds
+
+    streamStats[counterName] = streamStats.get(counterName, 0)
+    chunkIterator = iter(chunks)
+
+    while True:
+
+        startTime = time.time()
+        chunk = next(chunkIterator, None)
+        streamStats[counterName] = streamStats[counterName] + time.time() - startTime
+
+        if chunk is None:
+            return
+
+        yield chunk
+
+
+def gzipChunks(chunks, compressLevel=6):
+# This function compresses a chunk stream in gzip format on the fly. Only the compressor state is kept in memory
+
+    # wbits 16 + 15 writes the gzip header and trailer
+    compressor = zlib.compressobj(compressLevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    for chunk in chunks:
+
+        compressedChunk = compressor.compress(chunk)
+
+        if compressedChunk:
+            yield compressedChunk
+
+    yield compressor.flush()
+
+
+class TableLogStream(io.BufferedIOBase):
+# Read only binary file object over a chunk stream, for instance all files of a given table as if they were already consolidated in a single file
+# Used to upload many files in a single Big Query load job without writing a consolidated copy to disk
+
+    def __init__(self, chunks):
+
+        super().__init__()
+
+        self.chunks = iter(chunks)
+        self.pendingChunk = b''
+        self.position = 0
+
+    def readable(self):
+
+        return True
+
+    def tell(self):
+    # Number of bytes already read. Used by the resumable uploads to know the chunk offsets
+
+        return self.position
+
+    def read(self, size=-1):
+    # Reads up to size bytes (all the remaining bytes if size is negative or None). Less than size bytes are returned only at the end of the stream
+
+        if size is None or size < 0:
+            size = float('inf')
+
+        buffers = []
+        bufferedSize = 0
+
+        while bufferedSize < size:
+
+            if not self.pendingChunk:
+                self.pendingChunk = next(self.chunks, b'')
+
+                if not self.pendingChunk:
+                    break
+
+            missingSize = size - bufferedSize
+
+            if len(self.pendingChunk) <= missingSize:
+                buffer = self.pendingChunk
+                self.pendingChunk = b''
+            else:
+                buffer = self.pendingChunk[:missingSize]
+                self.pendingChunk = self.pendingChunk[missingSize:]
+
+            buffers.append(buffer)
+            bufferedSize = bufferedSize + len(buffer)
+
+        self.position = self.position + bufferedSize
+
+        return b''.join(buffers)
+
+    def read1(self, size=-1):
+
+        return self.read(size)
@@ -0,0 +1,61 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Materialized tables of the heavy Optimus Prime views (-materializeviews).
+# The sizing views (vbms_sizing_detailperpdb up to vbms_sizing_report) are built on views that pivot whole AWR tables, so every report query
+# pivots them again. With -materializeviews the rows of these views are written once into a table <view>_mat, clustered on ckey, and the view
+# itself is deployed as a plain SELECT of its table, so the views built on it read the table and keep their names and texts.
+# The table is refreshed at every import with the rows of the collection keys (ckey) it does not have yet. It is rebuilt when the view text
+# changes (hash stored in the table labels). A collection is materialized once, when its ckey is first seen.
+# Big Query cannot partition a table on a STRING column like ckey: the tables are partitioned by ingestion day, so every refresh is written
+# to its own partition, and the clustering on ckey prunes the blocks read by the queries filtering or joining on ckey.
+
+# Views materialized by -materializeviews. All of them have the column ckey
+MATERIALIZED_VIEWS = ['vsysmetric_hist', 'vosstat_metrics', 'vdbmemory_usageperpdb']
+
+# Suffix of the name of the table materializing a view
+MATERIALIZED_TABLE_SUFFIX = '_mat'
+
+# Columns the materialized tables are clustered on
+CLUSTERING_FIELDS = ('ckey',)
+
+# Label storing the hash of the view text materialized in the table, to find out when the table must be rebuilt
+MATERIALIZATION_HASH_LABEL = 'optimus_materialization_hash'
+
+
+def getMaterializedTableName(viewName):
+# This function returns the name of the table materializing a view
+
+    return viewName + MATERIALIZED_TABLE_SUFFIX
+
+
+def getMaterializedViewQuery(bqDataset, viewName):
+# This function returns the text of the view deployed in place of a materialized view: all rows of its table
+
+    return 'SELECT * FROM {}.{}'.format(bqDataset, getMaterializedTableName(viewName))
+
+
+def getRefreshQuery(bqDataset, viewName, viewQuery, fullRefresh):
+# This function returns the query writing the rows of a view (text after the ${dataset} replacement) into its table
+# Without fullRefresh only the rows of the collection keys missing from the table are selected, so running it again after a failure
+# (or a retry of the same query) never writes a collection twice. NOT EXISTS is used instead of NOT IN, which selects nothing once
+# the table has a NULL ckey, and the NULL ckeys are compared as equal so their rows are not written again either
+
+    selectQuery = viewQuery.strip().rstrip(';')
+
+    if fullRefresh:
+        return selectQuery
+
+    return ('SELECT v.* FROM ({}) v WHERE NOT EXISTS (SELECT 1 FROM {}.{} m WHERE m.ckey = v.ckey OR (m.ckey IS NULL AND v.ckey IS NULL))'
+            .format(selectQuery, bqDataset, getMaterializedTableName(viewName)))
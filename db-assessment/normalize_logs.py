@@ -0,0 +1,203 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Normalization stage: converts the SQL*Plus spool files (opdb*log) into compressed Avro files typed with the declared table schema.
+# Avro container files (deflate codec) are written with python built-in libraries only, so no extra dependency is needed.
+
+import os
+import json
+import zlib
+import struct
+import decimal
+
+# Streaming helpers to read the collected files
+import log_streams
+
+# Loose files and archive members
+import file_sources
+
+# Number of records written in each compressed Avro block
+AVRO_BLOCK_RECORDS = 10000
+
+# Big Query NUMERIC columns are written as Avro decimals with the same precision and scale
+NUMERIC_PRECISION = 38
+NUMERIC_SCALE = 9
+
+
+def encodeLong(value):
+# This function encodes an integer as an Avro long (zig-zag varint)
+
+    value = (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+    encodedValue = bytearray()
+
+    while value > 0x7F:
+        encodedValue.append((value & 0x7F) | 0x80)
+        value = value >> 7
+
+    encodedValue.append(value)
+
+    return bytes(encodedValue)
+
+
+def encodeBytes(value):
+# This function encodes bytes (and utf-8 strings) as Avro bytes/string: length followed by the content
+
+    return encodeLong(len(value)) + value
+
+
+def encodeDecimal(value):
+# This function encodes a decimal as the two's complement big-endian unscaled value expected by the Avro decimal logical type
+
+    unscaledValue = int(value.scaleb(NUMERIC_SCALE).to_integral_value(rounding=decimal.ROUND_HALF_EVEN))
+
+    return encodeBytes(unscaledValue.to_bytes(unscaledValue.bit_length() // 8 + 1, 'big', signed=True))
+
+
+def getAvroFieldType(fieldType):
+# This function maps a Big Query column type to its Avro type
+
+    fieldType = fieldType.upper()
+
+    if fieldType in ('INT64', 'INTEGER'):
+        return 'long'
+
+    if fieldType in ('FLOAT64', 'FLOAT'):
+        return 'double'
+
+    if fieldType in ('NUMERIC', 'DECIMAL'):
+        return {'type': 'bytes', 'logicalType': 'decimal', 'precision': NUMERIC_PRECISION, 'scale': NUMERIC_SCALE}
+
+    return 'string'
+
+
+def getAvroSchema(tableName, schemaFields):
+# This function builds the Avro record schema of a table from a list of (column name, Big Query type). All columns are nullable
+
+    return {
+        'type': 'record',
+        'name': tableName,
+        'fields': [{'name': fieldName, 'type': ['null', getAvroFieldType(fieldType)], 'default': None} for fieldName, fieldType in schemaFields],
+    }
+
+
+def getFieldEncoder(fieldType):
+# This function returns the function converting a CSV value (bytes) into the Avro encoding of a nullable column of the given Big Query type
+# Union branch 0 is null and branch 1 is the value
+
+    avroFieldType = getAvroFieldType(fieldType)
+
+    if avroFieldType == 'long':
+        encodeValue = lambda value: encodeLong(int(value))
+    elif avroFieldType == 'double':
+        encodeValue = lambda value: struct.pack('<d', float(value))
+    elif avroFieldType == 'string':
+        encodeValue = encodeBytes
+    else:
+        encodeValue = lambda value: encodeDecimal(decimal.Decimal(value.decode('ascii')))
+
+    nullBranch = encodeLong(0)
+    valueBranch = encodeLong(1)
+
+    return lambda value: valueBranch + encodeValue(value) if value else nullBranch
+
+
+class AvroWriter:
+# Writes records to an Avro object container file using the deflate codec
+
+    def __init__(self, targetFile, avroSchema):
+
+        self.targetFile = targetFile
+        self.syncMarker = os.urandom(16)
+        self.blockBuffer = bytearray()
+        self.blockRecords = 0
+
+        # Header: magic, metadata map (one block with 2 entries) and sync marker
+        self.targetFile.write(b'Obj\x01')
+        self.targetFile.write(encodeLong(2))
+        self.targetFile.write(encodeBytes(b'avro.schema') + encodeBytes(json.dumps(avroSchema).encode('utf-8')))
+        self.targetFile.write(encodeBytes(b'avro.codec') + encodeBytes(b'deflate'))
+        self.targetFile.write(encodeLong(0))
+        self.targetFile.write(self.syncMarker)
+
+    def writeRecord(self, encodedRecord):
+
+        self.blockBuffer += encodedRecord
+        self.blockRecords = self.blockRecords + 1
+
+        if self.blockRecords >= AVRO_BLOCK_RECORDS:
+            self.flush()
+
+    def flush(self):
+
+        if self.blockRecords == 0:
+            return
+
+        # Avro deflate codec is raw deflate (no zlib header/checksum)
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressedBlock = compressor.compress(bytes(self.blockBuffer)) + compressor.flush()
+
+        self.targetFile.write(encodeLong(self.blockRecords))
+        self.targetFile.write(encodeLong(len(compressedBlock)))
+        self.targetFile.write(compressedBlock)
+        self.targetFile.write(self.syncMarker)
+
+        self.blockBuffer = bytearray()
+        self.blockRecords = 0
+
+
+def normalizeTableToAvro(tableName, fileList, schemaFields, targetFileName, chunkSize=log_streams.CHUNK_SIZE):
+# This function streams all files of a given table once and writes their rows to targetFileName as a compressed Avro file
+# Padding, blank lines, separators and headers are removed by log_streams.normalizeSpoolChunks. Each file is read chunk by chunk
+# Returns a dictionary with the number of files, rows, bytes read and bytes written
+
+    fieldEncoders = [getFieldEncoder(fieldType) for fieldName, fieldType in schemaFields]
+
+    rows = 0
+    bytesRead = 0
+
+    with open(targetFileName, 'wb') as targetFile:
+
+        avroWriter = AvroWriter(targetFile, getAvroSchema(tableName, schemaFields))
+
+        for fileName in fileList:
+
+            bytesRead = bytesRead + file_sources.getFileSize(fileName)
+            lineCounter = 0
+
+            for lines in log_streams.iterChunkLines(log_streams.normalizeSpoolChunks(log_streams.iterLogChunks(fileName, 0, chunkSize))):
+
+                for line in lines:
+
+                    lineCounter = lineCounter + 1
+
+                    # The first normalized line is the header
+                    if lineCounter <= log_streams.NORMALIZED_HEADER_LINES:
+                        continue
+
+                    fields = log_streams.splitCsvLine(line)
+
+                    if len(fields) != len(fieldEncoders):
+                        raise ValueError('{}: row {} has {} columns but table {} has {} columns'.format(fileName, lineCounter, len(fields), tableName, len(fieldEncoders)))
+
+                    try:
+                        avroWriter.writeRecord(b''.join([fieldEncoder(field) for fieldEncoder, field in zip(fieldEncoders, fields)]))
+                    except (ValueError, decimal.InvalidOperation) as error:
+                        raise ValueError('{}: row {} does not match the schema of table {}: {}'.format(fileName, lineCounter, tableName, error))
+
+                    rows = rows + 1
+
+        avroWriter.flush()
+
+    return {'tableName': tableName, 'targetFileName': targetFileName, 'files': len(fileList), 'rows': rows, 'bytesRead': bytesRead, 'bytesWritten': os.path.getsize(targetFileName)}
@@ -1,7 +1,7 @@
-SELECT   TRIM(a.pkey)               ckey,
+SELECT   a.pkey                     ckey,
          TRIM(a.con_id)             con_id,
-         TRIM(a.dbid)               dbid,
-         TRIM(a.instance_number)    instance_number,
+         a.dbid                     dbid,
+         a.instance_number          instance_number,
          TRIM(a.hour)               hour,
          TRIM(a.hour_total_secs)    hour_total_secs,
          Sum(num_cpus)              num_cpus,
@@ -23,43 +23,43 @@ FROM     (
                        a.hour,
                        a.hour_total_secs,
                        CASE TRIM(stat_name)
-                              WHEN 'NUM_CPUS' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'NUM_CPUS' THEN a.median_value
                        END AS num_cpus,
                        CASE TRIM(stat_name)
-                              WHEN 'NUM_CPU_CORES' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'NUM_CPU_CORES' THEN a.median_value
                        END AS num_cpu_cores,
                        CASE TRIM(stat_name)
-                              WHEN 'NUM_CPU_SOCKETS' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'NUM_CPU_SOCKETS' THEN a.median_value
                        END AS num_cpu_sockets,
                        CASE TRIM(stat_name)
-                              WHEN 'PHYSICAL_MEMORY_BYTES' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'PHYSICAL_MEMORY_BYTES' THEN a.median_value
                        END AS physical_memory_bytes,
                        CASE TRIM(stat_name)
-                              WHEN 'FREE_MEMORY_BYTES' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'FREE_MEMORY_BYTES' THEN a.median_value
                        END AS free_memory_bytes,
                        CASE TRIM(stat_name)
-                              WHEN 'BUSY_TIME' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'BUSY_TIME' THEN a.median_value
                        END AS busy_time,
                        CASE TRIM(stat_name)
-                              WHEN 'IDLE_TIME' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'IDLE_TIME' THEN a.median_value
                        END AS idle_time,
                        CASE TRIM(stat_name)
-                              WHEN 'SYS_TIME' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'SYS_TIME' THEN a.median_value
                        END AS sys_time,
                        CASE TRIM(stat_name)
-                              WHEN 'VM_IN_BYTES' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'VM_IN_BYTES' THEN a.median_value
                        END AS vm_in_bytes,
                        CASE TRIM(stat_name)
-                              WHEN 'VM_OUT_BYTES' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'VM_OUT_BYTES' THEN a.median_value
                        END AS vm_out_bytes,
                        CASE TRIM(stat_name)
-                              WHEN 'LOAD' THEN Cast(TRIM(a.median_value) AS INT64)
+                              WHEN 'LOAD' THEN a.median_value
                        END AS LOAD,
                 FROM   ${dataset}.awrhistosstat a
          ) a
-GROUP BY trim(a.pkey),
+GROUP BY a.pkey,
          trim(a.con_id),
-         trim(a.dbid),
-         trim(a.instance_number),
+         a.dbid,
+         a.instance_number,
          trim(a.hour),
          trim(a.hour_total_secs);
@@ -30,88 +30,88 @@ SELECT   ckey,
          Sum(transac_per_sec_perc95)        transac_per_sec_perc95,
          Sum(transac_per_sec_max)           transac_per_sec_max
 FROM     (
-                SELECT TRIM(pkey)            ckey,
+                SELECT pkey                  ckey,
                        TRIM(con_id)          con_id,
-                       TRIM(dbid)            dbid,
-                       TRIM(instance_number) instance_number,
+                       dbid                  dbid,
+                       instance_number       instance_number,
                        TRIM(hour)            hour,
                        CASE TRIM(metric_name)
-                              WHEN 'Average Active Sessions' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'Average Active Sessions' THEN a.perc95
                        END AS average_active_session_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'Average Active Sessions' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'Average Active Sessions' THEN a.perc100
                        END AS average_active_session_max,
                        CASE TRIM(metric_name)
-                              WHEN 'CPU Usage Per Sec' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'CPU Usage Per Sec' THEN a.perc95
                        END AS cpu_usage_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'CPU Usage Per Sec' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'CPU Usage Per Sec' THEN a.perc100
                        END AS cpu_usage_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'Background CPU Usage Per Sec' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'Background CPU Usage Per Sec' THEN a.perc95
                        END AS bkgr_cpu_usage_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'Background CPU Usage Per Sec' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'Background CPU Usage Per Sec' THEN a.perc100
                        END AS bkgr_cpu_usage_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'Host CPU Usage Per Sec' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'Host CPU Usage Per Sec' THEN a.perc95
                        END AS host_cpu_usage_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'Host CPU Usage Per Sec' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'Host CPU Usage Per Sec' THEN a.perc100
                        END AS host_cpu_usage_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'Executions Per Sec' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'Executions Per Sec' THEN a.perc95
                        END AS executions_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'Executions Per Sec' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'Executions Per Sec' THEN a.perc100
                        END AS executions_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'I/O Megabytes per Second' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'I/O Megabytes per Second' THEN a.perc95
                        END AS io_mbytes_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'I/O Megabytes per Second' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'I/O Megabytes per Second' THEN a.perc100
                        END AS io_mbytes_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'I/O Requests per Second' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'I/O Requests per Second' THEN a.perc95
                        END AS io_req_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'I/O Requests per Second' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'I/O Requests per Second' THEN a.perc100
                        END AS io_req_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'Logons Per Sec' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'Logons Per Sec' THEN a.perc95
                        END AS logons_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'Logons Per Sec' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'Logons Per Sec' THEN a.perc100
                        END AS logons_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'Physical Reads Per Sec' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'Physical Reads Per Sec' THEN a.perc95
                        END AS phy_rds_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'Physical Reads Per Sec' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'Physical Reads Per Sec' THEN a.perc100
                        END AS phy_rds_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'Physical Writes Per Sec' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'Physical Writes Per Sec' THEN a.perc95
                        END AS phy_wts_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'Physical Writes Per Sec' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'Physical Writes Per Sec' THEN a.perc100
                        END AS phy_wts_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'Redo Generated Per Sec' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'Redo Generated Per Sec' THEN a.perc95
                        END AS redo_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'Redo Generated Per Sec' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'Redo Generated Per Sec' THEN a.perc100
                        END AS redo_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'SQL Service Response Time' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'SQL Service Response Time' THEN a.perc95
                        END AS sql_rt_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'SQL Service Response Time' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'SQL Service Response Time' THEN a.perc100
                        END AS sql_rt_per_sec_max,
                        CASE TRIM(metric_name)
-                              WHEN 'User Transaction Per Sec' THEN Cast(TRIM(a.perc95) AS INT64)
+                              WHEN 'User Transaction Per Sec' THEN a.perc95
                        END AS transac_per_sec_perc95,
                        CASE TRIM(metric_name)
-                              WHEN 'User Transaction Per Sec' THEN Cast(TRIM(a.perc100) AS INT64)
+                              WHEN 'User Transaction Per Sec' THEN a.perc100
                        END AS transac_per_sec_max
                 FROM   ${dataset}.awrhistsysmetrichist a )
 GROUP BY ckey,
@@ -0,0 +1,18 @@
+SELECT ckey,
+       con_id,
+       dbid,
+       instance_number,
+       hour,
+       hour_total_secs,
+       num_cpus,
+       num_cpu_cores,
+       num_cpu_sockets,
+       physical_memory_bytes,
+       free_memory_bytes,
+       busy_time,
+       idle_time,
+       sys_time,
+       vm_in_bytes,
+       vm_out_bytes,
+       LOAD
+FROM   ${dataset}.awrhistosstat_pivot;
@@ -0,0 +1,32 @@
+SELECT ckey,
+       con_id,
+       dbid,
+       instance_number,
+       hour,
+       average_active_session_perc95,
+       average_active_session_max,
+       cpu_usage_per_sec_perc95,
+       cpu_usage_per_sec_max,
+       bkgr_cpu_usage_per_sec_perc95,
+       bkgr_cpu_usage_per_sec_max,
+       host_cpu_usage_per_sec_perc95,
+       host_cpu_usage_per_sec_max,
+       executions_per_sec_perc95,
+       executions_per_sec_max,
+       io_mbytes_per_sec_perc95,
+       io_mbytes_per_sec_max,
+       io_req_per_sec_perc95,
+       io_req_per_sec_max,
+       logons_per_sec_perc95,
+       logons_per_sec_max,
+       phy_rds_per_sec_perc95,
+       phy_rds_per_sec_max,
+       phy_wts_per_sec_perc95,
+       phy_wts_per_sec_max,
+       redo_per_sec_perc95,
+       redo_per_sec_max,
+       sql_rt_per_sec_perc95,
+       sql_rt_per_sec_max,
+       transac_per_sec_perc95,
+       transac_per_sec_max
+FROM   ${dataset}.awrhistsysmetrichist_pivot;
@@ -0,0 +1,34 @@
+SELECT     b.hostname,
+           a.hour,
+           SUM(average_active_session_perc95) average_active_session_perc95,
+           SUM(average_active_session_max)    average_active_session_max,
+           SUM(cpu_usage_per_sec_perc95)      cpu_usage_per_sec_perc95,
+           SUM(cpu_usage_per_sec_max)         cpu_usage_per_sec_max,
+           SUM(bkgr_cpu_usage_per_sec_perc95) bkgr_cpu_usage_per_sec_perc95,
+           MAX(bkgr_cpu_usage_per_sec_max)    bkgr_cpu_usage_per_sec_max,
+           SUM(host_cpu_usage_per_sec_perc95) host_cpu_usage_per_sec_perc95,
+           SUM(host_cpu_usage_per_sec_max)    host_cpu_usage_per_sec_max,
+           SUM(executions_per_sec_perc95)     executions_per_sec_perc95,
+           SUM(executions_per_sec_max)        executions_per_sec_max,
+           SUM(io_mbytes_per_sec_perc95)      io_mbytes_per_sec_perc95,
+           SUM(io_mbytes_per_sec_max)         io_mbytes_per_sec_max,
+           SUM(io_req_per_sec_perc95)         io_req_per_sec_perc95,
+           SUM(io_req_per_sec_max)            io_req_per_sec_max,
+           SUM(logons_per_sec_perc95)         logons_per_sec_perc95,
+           SUM(logons_per_sec_max)            logons_per_sec_max,
+           SUM(phy_rds_per_sec_perc95)        phy_rds_per_sec_perc95,
+           SUM(phy_rds_per_sec_max)           phy_rds_per_sec_max,
+           SUM(phy_wts_per_sec_perc95)        phy_wts_per_sec_perc95,
+           SUM(phy_wts_per_sec_max)           phy_wts_per_sec_max,
+           SUM(redo_per_sec_perc95)           redo_per_sec_perc95,
+           SUM(redo_per_sec_max)              redo_per_sec_max,
+           SUM(sql_rt_per_sec_perc95)         sql_rt_per_sec_perc95,
+           SUM(sql_rt_per_sec_max)            sql_rt_per_sec_max,
+           SUM(transac_per_sec_perc95)        transac_per_sec_perc95,
+           SUM(transac_per_sec_max)           transac_per_sec_max
+FROM       ${dataset}.awrhistsysmetrichist_pivot a
+inner join ${dataset}.vinstsummary b
+ON         a.ckey = b.ckey
+AND        a.instance_number = b.inst_id
+GROUP BY   b.hostname,
+           a.hour;
@@ -0,0 +1,290 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Instrumentation of the import runs of import_db_assessment.py (--tracefile, --metricsfile and --profile).
+# The stages of a run are recorded as spans: a named and timed block with attributes (table, files, status...), nested in the span open
+# in the same thread when it starts. The tasks of the thread pools (see PipelineTracer.wrapTask) are nested in the span that submitted them
+# and record the time they waited in the queue of the pool. Counters add up the bytes, rows and waits of the stages, labelled by table, view...
+# With a trace file every span is written as a JSON line when it ends, and the counters when the run ends:
+#   {"type": "span", "name": ..., "spanId": n, "parentId": n or null, "thread": ..., "start": <epoch seconds>, "seconds": ..., "status": "OK" or "ERROR", "attributes": {...}}
+#   {"type": "counter", "name": ..., "labels": {...}, "value": ...}
+# With a metrics file the counters (optimus_import_<name>_total) and the number and time of the spans by name are written in the Prometheus
+# text format when the run ends, to be collected by the textfile collector of node_exporter or pushed to a Pushgateway.
+# With a profile file the run is profiled by cProfile: the main thread and every task of the thread pools have their own profiler, merged
+# into a single pstats file when the run ends. The worker processes of -jobs are not profiled (profile the run with -jobs 1 to see them).
+
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import itertools
+import contextlib
+
+# Prefix of the metric names of the Prometheus text format
+METRIC_PREFIX = 'optimus_import_'
+
+# Number of functions of the profile printed when the run ends, sorted by their own time
+PROFILE_PRINT_LIMIT = 25
+
+
+class Span:
+# Timed stage of a run. Its attributes can be changed until it ends
+
+    def __init__(self, spanId, parentSpan, spanName, attributes, startTime=None):
+
+        self.spanId = spanId
+        self.parentId = parentSpan.spanId if parentSpan is not None else None
+        self.name = spanName
+        self.attributes = attributes
+        self.thread = threading.current_thread().name
+        self.startTime = time.time() if startTime is None else startTime
+        self.seconds = None
+        self.status = 'OK'
+
+    def setAttributes(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class PipelineTracer:
+# Spans and counters of an import run. A single tracer is shared by all threads of the run
+# Without any file the spans are not kept, only the counters and the totals of the spans by name (a few entries per table and view)
+
+    def __init__(self, traceFileName=None, metricsFileName=None, profileFileName=None):
+
+        self.metricsFileName = metricsFileName
+        self.profileFileName = profileFileName
+
+        self.lock = threading.Lock()
+        self.threadState = threading.local()
+        self.spanIds = itertools.count(1)
+
+        # Hash table (counter name, labels) -> value, and span name -> [number of spans, seconds]
+        self.counters = {}
+        self.spanTotals = {}
+
+        self.traceFile = open(traceFileName, 'w') if traceFileName is not None else None
+
+        # Profiler of the main thread and profiles of the tasks done
+        self.mainProfile = None
+        self.taskProfiles = []
+
+        if profileFileName is not None:
+            self.mainProfile = cProfile.Profile()
+            self.mainProfile.enable()
+
+    def getSpanStack(self):
+    # This function returns the list of the spans open in the current thread, the innermost last
+
+        if not hasattr(self.threadState, 'spans'):
+            self.threadState.spans = []
+
+        return self.threadState.spans
+
+    def getCurrentSpan(self):
+
+        spanStack = self.getSpanStack()
+
+        return spanStack[-1] if spanStack else None
+
+    def setAttributes(self, **attributes):
+    # This function sets attributes of the innermost span open in the current thread, if any
+
+        currentSpan = self.getCurrentSpan()
+
+        if currentSpan is not None:
+            currentSpan.setAttributes(**attributes)
+
+    @contextlib.contextmanager
+    def span(self, spanName, parentSpan=None, **attributes):
+    # This context manager times its block as a span nested in parentSpan, by default the innermost span open in the current thread
+    # The span ends with the status ERROR if the block raises an exception
+
+        spanStack = self.getSpanStack()
+
+        with self.lock:
+            spanId = next(self.spanIds)
+
+        currentSpan = Span(spanId, parentSpan if parentSpan is not None else self.getCurrentSpan(), spanName, attributes)
+        spanStack.append(currentSpan)
+
+        try:
+            yield currentSpan
+
+        except BaseException:
+            currentSpan.status = 'ERROR'
+            raise
+
+        finally:
+            spanStack.pop()
+            currentSpan.seconds = time.time() - currentSpan.startTime
+            self.recordSpan(currentSpan)
+
+    def addSpan(self, spanName, startTime, seconds, **attributes):
+    # This function records a span timed somewhere else (a task of a worker process), nested in the innermost span open in the current thread
+
+        with self.lock:
+            spanId = next(self.spanIds)
+
+        doneSpan = Span(spanId, self.getCurrentSpan(), spanName, attributes, startTime)
+        doneSpan.seconds = seconds
+
+        self.recordSpan(doneSpan)
+
+    def recordSpan(self, doneSpan):
+    # This function adds a span ended to the totals and writes it to the trace file
+
+        with self.lock:
+
+            spanTotal = self.spanTotals.setdefault(doneSpan.name, [0, 0.0])
+            spanTotal[0] = spanTotal[0] + 1
+            spanTotal[1] = spanTotal[1] + doneSpan.seconds
+
+            if self.traceFile is not None:
+                self.traceFile.write(json.dumps({'type': 'span', 'name': doneSpan.name, 'spanId': doneSpan.spanId, 'parentId': doneSpan.parentId, 'thread': doneSpan.thread, 'start': round(doneSpan.startTime, 6), 'seconds': round(doneSpan.seconds, 6), 'status': doneSpan.status, 'attributes': doneSpan.attributes}, default=str) + '\n')
+
+    def addCounter(self, counterName, value=1, **labels):
+    # This function adds value to a counter. The labels whose value is None are left out
+
+        counterKey = (counterName, tuple(sorted((labelName, str(labelValue)) for labelName, labelValue in labels.items() if labelValue is not None)))
+
+        with self.lock:
+            self.counters[counterKey] = self.counters.get(counterKey, 0) + value
+
+    def wrapTask(self, spanName, function, **attributes):
+    # This function returns function wrapped to run as a task of a thread pool, in a span nested in the current span of the submitting thread
+    # The time from this call to the start of the task (wait in the queue of the pool) is the attribute queueSeconds of its span and
+    # is added to the counter task_queue_seconds. Every call of the wrapped function is a task
+
+        parentSpan = self.getCurrentSpan()
+        submitTime = time.time()
+
+        def runTask(*args, **kwargs):
+
+            queueSeconds = time.time() - submitTime
+
+            self.addCounter('tasks', 1, task=spanName)
+            self.addCounter('task_queue_seconds', queueSeconds, task=spanName)
+
+            with self.profileTask(), self.span(spanName, parentSpan, queueSeconds=round(queueSeconds, 6), **attributes):
+                return function(*args, **kwargs)
+
+        return runTask
+
+    @contextlib.contextmanager
+    def profileTask(self):
+    # This context manager profiles its block with its own profiler when the run is profiled and the block runs in a pool thread
+    # Since Python 3.12 cProfile profiles all threads and a second profiler cannot be enabled: the task is then in the profile of the main thread
+
+        if self.mainProfile is None or threading.current_thread() is threading.main_thread():
+            yield
+            return
+
+        taskProfile = cProfile.Profile()
+
+        try:
+            taskProfile.enable()
+        except ValueError:
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            taskProfile.disable()
+
+            with self.lock:
+                self.taskProfiles.append(taskProfile)
+
+    def getPrometheusText(self):
+    # This function returns the counters and the totals of the spans in the Prometheus text format
+
+        def formatLabels(labels):
+
+            if not labels:
+                return ''
+
+            return '{' + ','.join('{}="{}"'.format(labelName, labelValue.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for labelName, labelValue in labels) + '}'
+
+        metricLines = []
+
+        with self.lock:
+            counterItems = sorted(self.counters.items())
+            spanItems = sorted(self.spanTotals.items())
+
+        lastCounterName = None
+
+        for (counterName, labels), value in counterItems:
+
+            metricName = METRIC_PREFIX + counterName + '_total'
+
+            if counterName != lastCounterName:
+                metricLines.append('# TYPE {} counter'.format(metricName))
+                lastCounterName = counterName
+
+            metricLines.append('{}{} {}'.format(metricName, formatLabels(labels), value))
+
+        if spanItems:
+
+            metricLines.append('# TYPE {}spans_total counter'.format(METRIC_PREFIX))
+            metricLines.extend('{}spans_total{} {}'.format(METRIC_PREFIX, formatLabels((('span', spanName),)), spanCount) for spanName, (spanCount, spanSeconds) in spanItems)
+
+            metricLines.append('# TYPE {}span_seconds_total counter'.format(METRIC_PREFIX))
+            metricLines.extend('{}span_seconds_total{} {:.6f}'.format(METRIC_PREFIX, formatLabels((('span', spanName),)), spanSeconds) for spanName, (spanCount, spanSeconds) in spanItems)
+
+        return '\n'.join(metricLines) + '\n'
+
+    def finish(self):
+    # This function ends the instrumentation of the run: writes the counters to the trace file, the metrics file and the profile file
+
+        if self.traceFile is not None:
+
+            with self.lock:
+                for (counterName, labels), value in sorted(self.counters.items()):
+                    self.traceFile.write(json.dumps({'type': 'counter', 'name': counterName, 'labels': dict(labels), 'value': value}) + '\n')
+
+                self.traceFile.close()
+                self.traceFile = None
+
+        if self.metricsFileName is not None:
+
+            # A temporary file is renamed over the old one, so a collector never reads a file being written
+            temporaryFileName = self.metricsFileName + '.tmp'
+
+            with open(temporaryFileName, 'w') as metricsFile:
+                metricsFile.write(self.getPrometheusText())
+
+            os.replace(temporaryFileName, self.metricsFileName)
+
+        if self.mainProfile is not None:
+
+            self.mainProfile.disable()
+
+            profileStats = pstats.Stats(self.mainProfile, stream=io.StringIO())
+
+            for taskProfile in self.taskProfiles:
+                profileStats.add(taskProfile)
+
+            profileStats.dump_stats(self.profileFileName)
+
+            # The time spent waiting (threads, sockets) is in the cumulative time, the own time points to the hot paths
+            profileStats.stream = io.StringIO()
+            profileStats.sort_stats('tottime').print_stats(PROFILE_PRINT_LIMIT)
+
+            print ('\nProfile of the run ({} thread pool tasks) written to {}. Functions with the highest own time:\n'.format(len(self.taskProfiles), self.profileFileName))
+            print (profileStats.stream.getvalue())
+
+            self.mainProfile = None
@@ -0,0 +1,276 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Pivot stage (-pivotmetrics): the AWR metric tables have a row per metric and hour (long layout) that the views vsysmetric_hist,
+# vsysmetric_histperhost and vosstat pivot into a column per metric with a CASE per column and a GROUP BY over all rows.
+# Here the rows are pivoted while the spool files are streamed, into a row per hour (wide layout) written as a compressed Avro file
+# (oppivoted__<table>_pivot__.avro) loaded into the table <table>_pivot instead of the long rows. The views of opViews/pivotMetrics read it.
+# The pivoted table is kept column by column: a list per column and a hash table group key -> row number, no object per row.
+# The values are aggregated like the views do (SUM, MAX for bkgr_cpu_usage_per_sec_max) and a group without a metric has NULL in its columns.
+
+import os
+
+# Streaming helpers to read the collected files
+import log_streams
+
+# Loose files and archive members
+import file_sources
+
+# Avro container files and encodings
+import normalize_logs
+
+# Table schemas of the pivoted tables
+import schema_registry
+
+# Prefix of the pivoted Avro files, written next to the collected files
+PIVOTED_FILE_PREFIX = 'oppivoted__'
+
+# Directory of the view texts replacing the views of opViews that read the long tables
+PIVOTED_VIEWS_PATTERN = 'opViews/pivotMetrics/optimus_createView*.sql'
+
+# Long table -> pivot of its rows:
+#   pivotTableName: wide table written
+#   keyColumns: group key, list of (wide column, long column). Only the long columns of OPTIONAL_KEY_COLUMNS can be missing from the files (NULL)
+#   metricColumn: long column with the metric name
+#   valueColumns: list of (wide column, metric name, long column with the value, aggregation SUM or MAX)
+PIVOT_TABLES = {
+    'awrhistsysmetrichist': {
+        'pivotTableName': 'awrhistsysmetrichist_pivot',
+        'keyColumns': [('ckey', 'pkey'), ('con_id', 'con_id'), ('dbid', 'dbid'), ('instance_number', 'instance_number'), ('hour', 'hour')],
+        'metricColumn': 'metric_name',
+        'valueColumns': [
+            ('average_active_session_perc95', 'Average Active Sessions', 'perc95', 'SUM'),
+            ('average_active_session_max', 'Average Active Sessions', 'perc100', 'SUM'),
+            ('cpu_usage_per_sec_perc95', 'CPU Usage Per Sec', 'perc95', 'SUM'),
+            ('cpu_usage_per_sec_max', 'CPU Usage Per Sec', 'perc100', 'SUM'),
+            ('bkgr_cpu_usage_per_sec_perc95', 'Background CPU Usage Per Sec', 'perc95', 'SUM'),
+            ('bkgr_cpu_usage_per_sec_max', 'Background CPU Usage Per Sec', 'perc100', 'MAX'),
+            ('host_cpu_usage_per_sec_perc95', 'Host CPU Usage Per Sec', 'perc95', 'SUM'),
+            ('host_cpu_usage_per_sec_max', 'Host CPU Usage Per Sec', 'perc100', 'SUM'),
+            ('executions_per_sec_perc95', 'Executions Per Sec', 'perc95', 'SUM'),
+            ('executions_per_sec_max', 'Executions Per Sec', 'perc100', 'SUM'),
+            ('io_mbytes_per_sec_perc95', 'I/O Megabytes per Second', 'perc95', 'SUM'),
+            ('io_mbytes_per_sec_max', 'I/O Megabytes per Second', 'perc100', 'SUM'),
+            ('io_req_per_sec_perc95', 'I/O Requests per Second', 'perc95', 'SUM'),
+            ('io_req_per_sec_max', 'I/O Requests per Second', 'perc100', 'SUM'),
+            ('logons_per_sec_perc95', 'Logons Per Sec', 'perc95', 'SUM'),
+            ('logons_per_sec_max', 'Logons Per Sec', 'perc100', 'SUM'),
+            ('phy_rds_per_sec_perc95', 'Physical Reads Per Sec', 'perc95', 'SUM'),
+            ('phy_rds_per_sec_max', 'Physical Reads Per Sec', 'perc100', 'SUM'),
+            ('phy_wts_per_sec_perc95', 'Physical Writes Per Sec', 'perc95', 'SUM'),
+            ('phy_wts_per_sec_max', 'Physical Writes Per Sec', 'perc100', 'SUM'),
+            ('redo_per_sec_perc95', 'Redo Generated Per Sec', 'perc95', 'SUM'),
+            ('redo_per_sec_max', 'Redo Generated Per Sec', 'perc100', 'SUM'),
+            ('sql_rt_per_sec_perc95', 'SQL Service Response Time', 'perc95', 'SUM'),
+            ('sql_rt_per_sec_max', 'SQL Service Response Time', 'perc100', 'SUM'),
+            ('transac_per_sec_perc95', 'User Transaction Per Sec', 'perc95', 'SUM'),
+            ('transac_per_sec_max', 'User Transaction Per Sec', 'perc100', 'SUM'),
+        ],
+    },
+    'awrhistosstat': {
+        'pivotTableName': 'awrhistosstat_pivot',
+        'keyColumns': [('ckey', 'pkey'), ('con_id', 'con_id'), ('dbid', 'dbid'), ('instance_number', 'instance_number'), ('hour', 'hour'), ('hour_total_secs', 'hour_total_secs')],
+        'metricColumn': 'stat_name',
+        'valueColumns': [
+            ('num_cpus', 'NUM_CPUS', 'median_value', 'SUM'),
+            ('num_cpu_cores', 'NUM_CPU_CORES', 'median_value', 'SUM'),
+            ('num_cpu_sockets', 'NUM_CPU_SOCKETS', 'median_value', 'SUM'),
+            ('physical_memory_bytes', 'PHYSICAL_MEMORY_BYTES', 'median_value', 'SUM'),
+            ('free_memory_bytes', 'FREE_MEMORY_BYTES', 'median_value', 'SUM'),
+            ('busy_time', 'BUSY_TIME', 'median_value', 'SUM'),
+            ('idle_time', 'IDLE_TIME', 'median_value', 'SUM'),
+            ('sys_time', 'SYS_TIME', 'median_value', 'SUM'),
+            ('vm_in_bytes', 'VM_IN_BYTES', 'median_value', 'SUM'),
+            ('vm_out_bytes', 'VM_OUT_BYTES', 'median_value', 'SUM'),
+            ('load', 'LOAD', 'median_value', 'SUM'),
+        ],
+    },
+}
+
+
+# Column heading spooled by the collector scripts -> long column of the table schema, for the headings that are not the column names
+# (awrhistosstat spools hh24, hh24_total_secs and count for hour, hour_total_secs and coun)
+COLLECTOR_COLUMN_ALIASES = {
+    'hh24': 'hour',
+    'hh24_total_secs': 'hour_total_secs',
+    'count': 'coun',
+}
+
+# Key columns the files of a collector may not have (con_id is not spooled by the 11g collector). Their value is NULL
+OPTIONAL_KEY_COLUMNS = ('con_id',)
+
+
+def getPivotTableName(tableName):
+# This function returns the wide table of a long table, or None if the table is not pivoted
+
+    pivotSpec = PIVOT_TABLES.get(tableName)
+
+    return pivotSpec['pivotTableName'] if pivotSpec is not None else None
+
+
+def getPivotTableNames():
+# This function returns the names of all wide tables
+
+    return [pivotSpec['pivotTableName'] for pivotSpec in PIVOT_TABLES.values()]
+
+
+def getPivotedFileName(tableName, fileList):
+# This function returns the Avro file of the wide table of a long table, in the directory of its first file
+
+    return os.path.join(file_sources.getFileDirectory(fileList[0]), PIVOTED_FILE_PREFIX + getPivotTableName(tableName) + '__.avro')
+
+
+def getPivotSchemaFields(tableName):
+# This function returns the tuple of (column name, Big Query type) of the wide table of a long table (see schema_registry.py)
+# Raises ValueError if its columns are not the key and value columns of the pivot
+
+    pivotSpec = PIVOT_TABLES[tableName]
+    schemaFields = schema_registry.getTableSchema(pivotSpec['pivotTableName'])
+
+    pivotColumns = [keyColumn for keyColumn, longColumn in pivotSpec['keyColumns']] + [valueColumn for valueColumn, metricName, longColumn, aggregation in pivotSpec['valueColumns']]
+
+    if schemaFields is None or [fieldName.lower() for fieldName, fieldType in schemaFields] != pivotColumns:
+        raise ValueError('The table schema of {} must have the columns {}'.format(pivotSpec['pivotTableName'], ', '.join(pivotColumns)))
+
+    return schemaFields
+
+
+def encodeNullableLong(value):
+# This function encodes an integer or None as a nullable Avro long (union branch 0 is null and branch 1 is the value)
+
+    if value is None:
+        return b'\x00'
+
+    return b'\x02' + normalize_logs.encodeLong(value)
+
+
+def pivotTableToAvro(tableName, fileList, targetFileName, chunkSize=log_streams.CHUNK_SIZE):
+# This function streams all files of a long table once, pivots their rows into the wide table and writes it to targetFileName as a compressed Avro file
+# The columns of every file are found by the names of its header, so the files of both collectors (with and without con_id) can be mixed
+# Returns a dictionary with the number of files, rows read, rows written, bytes read and bytes written
+
+    pivotSpec = PIVOT_TABLES[tableName]
+    schemaFields = getPivotSchemaFields(tableName)
+
+    keyCount = len(pivotSpec['keyColumns'])
+
+    # The wide table, column by column. groupRows is the row number of every group key
+    keyColumns = [[] for keyColumn in pivotSpec['keyColumns']]
+    valueColumns = [[] for valueColumn in pivotSpec['valueColumns']]
+    groupRows = {}
+
+    rowsRead = 0
+    bytesRead = 0
+
+    for fileName in fileList:
+
+        bytesRead = bytesRead + file_sources.getFileSize(fileName)
+        lineCounter = 0
+
+        for lines in log_streams.iterChunkLines(log_streams.normalizeSpoolChunks(log_streams.iterLogChunks(fileName, 0, chunkSize))):
+
+            for line in lines:
+
+                lineCounter = lineCounter + 1
+                fields = log_streams.splitCsvLine(line)
+
+                # The first normalized line is the header: positions of the key, metric and value columns in this file
+                if lineCounter <= log_streams.NORMALIZED_HEADER_LINES:
+
+                    columnPositions = {}
+                    for columnPosition, columnName in enumerate(fields):
+                        columnName = columnName.strip().decode('utf-8').lower()
+                        columnPositions[COLLECTOR_COLUMN_ALIASES.get(columnName, columnName)] = columnPosition
+
+                    columnCount = len(fields)
+
+                    if pivotSpec['metricColumn'] not in columnPositions:
+                        raise ValueError('{}: the header has no column {}'.format(fileName, pivotSpec['metricColumn']))
+
+                    # A missing key column would put the rows of all its values in the same group
+                    keyPositions = []
+                    for keyColumn, longColumn in pivotSpec['keyColumns']:
+
+                        if longColumn not in columnPositions and longColumn not in OPTIONAL_KEY_COLUMNS:
+                            raise ValueError('{}: the header has no column {}'.format(fileName, longColumn))
+
+                        keyPositions.append(columnPositions.get(longColumn))
+                    metricPosition = columnPositions[pivotSpec['metricColumn']]
+
+                    # Metric name -> list of (value column number, position of its value, True for MAX)
+                    metricTargets = {}
+                    for valueCounter, (valueColumn, metricName, longColumn, aggregation) in enumerate(pivotSpec['valueColumns']):
+
+                        if longColumn not in columnPositions:
+                            raise ValueError('{}: the header has no column {}'.format(fileName, longColumn))
+
+                        metricTargets.setdefault(metricName.encode('utf-8'), []).append((valueCounter, columnPositions[longColumn], aggregation == 'MAX'))
+
+                    continue
+
+                if len(fields) != columnCount:
+                    raise ValueError('{}: row {} has {} columns but its header has {} columns'.format(fileName, lineCounter, len(fields), columnCount))
+
+                rowsRead = rowsRead + 1
+
+                # Every row has a group, even when its metric is not pivoted (its columns stay NULL)
+                groupKey = tuple(fields[keyPosition].strip() if keyPosition is not None else b'' for keyPosition in keyPositions)
+                rowNumber = groupRows.get(groupKey)
+
+                if rowNumber is None:
+
+                    rowNumber = len(groupRows)
+                    groupRows[groupKey] = rowNumber
+
+                    for keyColumn, keyValue in zip(keyColumns, groupKey):
+                        keyColumn.append(keyValue)
+
+                    for valueColumn in valueColumns:
+                        valueColumn.append(None)
+
+                for valueCounter, valuePosition, maxAggregation in metricTargets.get(fields[metricPosition].strip(), ()):
+
+                    fieldValue = fields[valuePosition].strip()
+
+                    # Empty values are NULL and ignored by the aggregations
+                    if not fieldValue:
+                        continue
+
+                    try:
+                        value = int(fieldValue)
+                    except ValueError:
+                        raise ValueError('{}: row {} has the value {} that is not an integer'.format(fileName, lineCounter, fieldValue.decode('utf-8', 'replace')))
+
+                    valueColumn = valueColumns[valueCounter]
+                    currentValue = valueColumn[rowNumber]
+
+                    if currentValue is None:
+                        valueColumn[rowNumber] = value
+                    elif maxAggregation:
+                        valueColumn[rowNumber] = max(currentValue, value)
+                    else:
+                        valueColumn[rowNumber] = currentValue + value
+
+    keyEncoders = [normalize_logs.getFieldEncoder(fieldType) for fieldName, fieldType in schemaFields[:keyCount]]
+
+    with open(targetFileName, 'wb') as targetFile:
+
+        avroWriter = normalize_logs.AvroWriter(targetFile, normalize_logs.getAvroSchema(pivotSpec['pivotTableName'], schemaFields))
+
+        for rowNumber in range(len(groupRows)):
+            avroWriter.writeRecord(b''.join([keyEncoder(keyColumn[rowNumber]) for keyEncoder, keyColumn in zip(keyEncoders, keyColumns)] + [encodeNullableLong(valueColumn[rowNumber]) for valueColumn in valueColumns]))
+
+        avroWriter.flush()
+
+    return {'tableName': tableName, 'pivotTableName': pivotSpec['pivotTableName'], 'targetFileName': targetFileName, 'files': len(fileList), 'rowsRead': rowsRead, 'rows': len(groupRows), 'bytesRead': bytesRead, 'bytesWritten': os.path.getsize(targetFileName)}
@@ -0,0 +1,333 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Coverage of the collector output by the table schema registry (see schema_registry.py), used by -validateschemas.
+# The tables spooled by every collector script (spool opdb__<tableName>__&v_tag) must have a table schema in the variant of the script,
+# otherwise their files are skipped by the import, and the select list of their query (see getSpooledColumns) must have the number of
+# columns of the table schema. The collected files are checked as well: the number of columns of their header line must be the number
+# of columns of the table schema, otherwise Big Query rejects the rows.
+# The column names are not compared because the SQL*Plus headings are the aliases of the collector (HH24 for hour, COUNT for coun).
+
+import re
+
+# Streaming helpers to read the collected files
+import log_streams
+
+# Collection attributes from the collected file names
+import collection_index
+
+# Table schemas of the collected files
+import schema_registry
+
+# Wide tables written by the pivot of the AWR metric tables, not spooled by the collector
+import pivot_metrics
+
+# Collector scripts and the table schema variant of the files they spool (None for the current collector)
+COLLECTOR_SCRIPTS = [
+    ('dbSQLCollector/oracle_db_assessment.sql', None),
+    ('dbSQLCollector/oracle_db_assessment_11g.sql', '11g'),
+]
+
+# Spool statement of a collected table
+SPOOL_PATTERN = re.compile(r'^\s*spool\s+opdb__(\w+?)__', re.IGNORECASE | re.MULTILINE)
+
+# Query spooled into a collected file: the text between spool opdb__<tableName>__&v_tag and spool off
+SPOOL_BLOCK_PATTERN = re.compile(r'^\s*spool\s+opdb__(\w+?)__\S*\s*$(.*?)^\s*spool\s+off', re.IGNORECASE | re.MULTILINE | re.DOTALL)
+
+# SQL*Plus heading set by a column command (column graph format a25 heading "GRAPH (X=5%)")
+COLUMN_HEADING_PATTERN = re.compile(r'^\s*col(?:umn)?\s+(\w+)\s.*?\bheading\s+"([^"]*)"', re.IGNORECASE | re.MULTILINE)
+
+# Tokens of a query without comments and with its string literals masked (see maskSqlText): quoted identifiers, identifiers
+# with their qualifiers (a.owner, a.*), numbers, masked strings, || and any other character
+SQL_TOKEN_PATTERN = re.compile(r'"[^"]*"|[A-Za-z_][\w$#]*(?:\.(?:[A-Za-z_][\w$#]*|\*))*|\d+(?:\.\d+)?|\'\'|\|\||\S')
+
+# Tables loaded from the Optimus Prime configuration files (opConfig) instead of the collector
+CONFIG_TABLE_PREFIX = 'optimusconfig_'
+
+
+def getSpooledTables(scriptFileName):
+# This function returns the names of the tables spooled by a collector script, in the spool order
+
+    with open(scriptFileName, 'r') as scriptFile:
+        scriptText = scriptFile.read()
+
+    spooledTables = []
+
+    for tableName in SPOOL_PATTERN.findall(scriptText):
+        if tableName not in spooledTables:
+            spooledTables.append(tableName)
+
+    return spooledTables
+
+
+def maskSqlText(sqlText):
+# This function returns a SQL text without its comments and with every string literal replaced by '', so the commas, parentheses
+# and keywords found in the text are the ones of the query
+
+    maskedParts = []
+    position = 0
+
+    while position < len(sqlText):
+
+        if sqlText.startswith('--', position):
+            lineEnd = sqlText.find('\n', position)
+            position = len(sqlText) if lineEnd == -1 else lineEnd
+
+        elif sqlText.startswith('/*', position):
+            commentEnd = sqlText.find('*/', position + 2)
+            position = len(sqlText) if commentEnd == -1 else commentEnd + 2
+            maskedParts.append(' ')
+
+        elif sqlText[position] == "'":
+
+            # A quote inside a string literal is doubled
+            position = position + 1
+            while position < len(sqlText) and (sqlText[position] != "'" or sqlText.startswith("''", position)):
+                position = position + (2 if sqlText.startswith("''", position) else 1)
+
+            position = position + 1
+            maskedParts.append("''")
+
+        else:
+            maskedParts.append(sqlText[position])
+            position = position + 1
+
+    return ''.join(maskedParts)
+
+
+def getSelectListItems(sqlTokens, selectPosition):
+# This function returns the items of the select list starting after the SELECT at selectPosition, as lists of tokens, and the position of
+# the FROM ending it (None if the list has no FROM)
+
+    position = selectPosition + 1
+
+    if position < len(sqlTokens) and sqlTokens[position].upper() in ('DISTINCT', 'UNIQUE', 'ALL'):
+        position = position + 1
+
+    selectItems = [[]]
+    depth = 0
+
+    for position in range(position, len(sqlTokens)):
+
+        sqlToken = sqlTokens[position]
+
+        if sqlToken == '(':
+            depth = depth + 1
+        elif sqlToken == ')':
+            depth = depth - 1
+
+        if depth == 0 and sqlToken.upper() == 'FROM':
+            return selectItems, position
+
+        if depth == 0 and sqlToken == ',':
+            selectItems.append([])
+        else:
+            selectItems[-1].append(sqlToken)
+
+    return selectItems, None
+
+
+def getNamedQueries(sqlTokens):
+# This function returns a hash table name -> position of the SELECT of the named queries of the WITH clause of a query
+
+    namedQueries = {}
+    depth = 0
+
+    for position, sqlToken in enumerate(sqlTokens[:-3]):
+
+        if sqlToken == '(':
+            depth = depth + 1
+        elif sqlToken == ')':
+            depth = depth - 1
+
+        # WITH name AS (SELECT ...) or , name AS (SELECT ...)
+        elif depth == 0 and sqlTokens[position + 1].upper() == 'AS' and sqlTokens[position + 2] == '(' and sqlTokens[position + 3].upper() == 'SELECT':
+            namedQueries[sqlToken.lower()] = position + 3
+
+    return namedQueries
+
+
+def getSelectHeadings(sqlTokens, selectPosition, namedQueries):
+# This function returns the SQL*Plus headings of the columns of the query whose SELECT is at selectPosition, or None if they cannot be found
+# The heading of a column is its alias, its name without qualifier, or the text of the expression. A star is expanded with the columns of
+# the query it reads, an inline view or a named query of the WITH clause
+
+    selectItems, fromPosition = getSelectListItems(sqlTokens, selectPosition)
+    selectHeadings = []
+
+    for selectItem in selectItems:
+
+        if not selectItem:
+            return None
+
+        lastToken = selectItem[-1]
+
+        if lastToken == '*' or lastToken.endswith('.*'):
+
+            # The first table of the FROM clause: an inline view (FROM (SELECT ...)) or a named query
+            if fromPosition is None or fromPosition + 1 >= len(sqlTokens):
+                return None
+
+            if sqlTokens[fromPosition + 1] == '(' and fromPosition + 2 < len(sqlTokens) and sqlTokens[fromPosition + 2].upper() == 'SELECT':
+                starHeadings = getSelectHeadings(sqlTokens, fromPosition + 2, namedQueries)
+            elif sqlTokens[fromPosition + 1].lower() in namedQueries:
+                starHeadings = getSelectHeadings(sqlTokens, namedQueries[sqlTokens[fromPosition + 1].lower()], namedQueries)
+            else:
+                return None
+
+            if starHeadings is None:
+                return None
+
+            selectHeadings.extend(starHeadings)
+
+        elif lastToken.startswith('"'):
+            selectHeadings.append(lastToken[1:-1])
+
+        elif len(selectItem) == 1 and lastToken[0].isalpha():
+            selectHeadings.append(lastToken.split('.')[-1].upper())
+
+        # An alias follows AS, a closing parenthesis, a string or a column name
+        elif len(selectItem) > 1 and (lastToken[0].isalpha() or lastToken[0] == '_') and lastToken.upper() != 'END' and (selectItem[-2].upper() == 'AS' or selectItem[-2] in (')', "''") or selectItem[-2][0].isalnum() or selectItem[-2][0] in ('_', '"')):
+            selectHeadings.append(lastToken.upper())
+
+        else:
+            selectHeadings.append(''.join(selectItem).upper())
+
+    return selectHeadings
+
+
+def getSpooledColumns(scriptFileName):
+# This function returns a hash table table name -> list of the SQL*Plus headings spooled by a collector script for the table
+# (None for a table whose headings cannot be found from its query)
+
+    with open(scriptFileName, 'r') as scriptFile:
+        scriptText = scriptFile.read()
+
+    columnHeadings = {columnName.upper(): heading for columnName, heading in COLUMN_HEADING_PATTERN.findall(maskSqlText(scriptText))}
+
+    spooledColumns = {}
+
+    for tableName, spoolText in SPOOL_BLOCK_PATTERN.findall(scriptText):
+
+        sqlTokens = SQL_TOKEN_PATTERN.findall(maskSqlText(spoolText))
+        selectHeadings = None
+        depth = 0
+
+        # The query of the table is the first SELECT outside parentheses
+        for position, sqlToken in enumerate(sqlTokens):
+
+            if sqlToken == '(':
+                depth = depth + 1
+            elif sqlToken == ')':
+                depth = depth - 1
+            elif depth == 0 and sqlToken.upper() == 'SELECT':
+                selectHeadings = getSelectHeadings(sqlTokens, position, getNamedQueries(sqlTokens))
+                break
+
+        if selectHeadings is not None:
+            selectHeadings = [columnHeadings.get(heading.upper(), heading) for heading in selectHeadings]
+
+        spooledColumns.setdefault(tableName, selectHeadings)
+
+    return spooledColumns
+
+
+def getSchemaCoverage(collectorScripts=COLLECTOR_SCRIPTS):
+# This function compares the tables spooled by the collector scripts with the table schema registry. Returns a hash table with
+# - 'scripts': a list with, for every script, its name, variant, spooled tables, the spooled tables without table schema ('missingTables')
+#   and the spooled tables whose query has not the number of columns of their table schema ('columnMismatches': list of (table name, columns of the query, columns of the table schema))
+# - 'unspooledTables': the tables with a table schema not spooled by any collector script (tables of older collector versions for instance)
+#   The configuration tables and the wide tables of pivot_metrics.py are not collected, so they are not reported
+
+    scriptCoverage = []
+    allSpooledTables = set()
+
+    for scriptFileName, schemaVariant in collectorScripts:
+
+        spooledTables = getSpooledTables(scriptFileName)
+        spooledColumns = getSpooledColumns(scriptFileName)
+        allSpooledTables.update(spooledTables)
+
+        columnMismatches = []
+
+        for tableName in spooledTables:
+
+            schemaFields = schema_registry.getTableSchema(tableName, schemaVariant)
+            selectHeadings = spooledColumns.get(tableName)
+
+            if schemaFields is not None and selectHeadings is not None and len(selectHeadings) != len(schemaFields):
+                columnMismatches.append((tableName, len(selectHeadings), len(schemaFields)))
+
+        scriptCoverage.append({
+            'scriptFileName': scriptFileName,
+            'schemaVariant': schemaVariant,
+            'spooledTables': spooledTables,
+            'missingTables': [tableName for tableName in spooledTables if schema_registry.getTableSchema(tableName, schemaVariant) is None],
+            'columnMismatches': columnMismatches,
+        })
+
+    unspooledTables = [tableName for tableName in schema_registry.getTableNames() if tableName not in allSpooledTables and not tableName.startswith(CONFIG_TABLE_PREFIX) and tableName not in pivot_metrics.getPivotTableNames()]
+
+    return {'scripts': scriptCoverage, 'unspooledTables': unspooledTables}
+
+
+def getFileColumnCount(fileName):
+# This function returns the number of columns of the header line (first line with content) of a collected file, or None if the file has no rows
+
+    firstLines = b''
+
+    for chunk in log_streams.readFileChunks(fileName):
+
+        firstLines = firstLines + chunk
+
+        for line in firstLines.split(b'\n')[:-1]:
+            if line.strip():
+                return len(line.split(b','))
+
+    if firstLines.strip():
+        return len(firstLines.strip().split(b'\n')[0].split(b','))
+
+    return None
+
+
+def checkCollectedFiles(fileList):
+# This function checks the collected files against the table schema of their table and collection variant
+# Returns a list of hash tables with the file name, table name, variant, number of columns of the file and of the table schema (None if the table has no schema)
+# for the files that do not match. Files not named by the collector (consolidated files for instance) are not checked
+
+    fileIssues = []
+
+    for fileName in fileList:
+
+        collectionFile = collection_index.parseCollectionFileName(fileName)
+
+        if collectionFile is None:
+            continue
+
+        schemaVariant = schema_registry.getSchemaVariant(collectionFile['dbversion'])
+        schemaFields = schema_registry.getTableSchema(collectionFile['tableName'], schemaVariant)
+        fileColumns = getFileColumnCount(fileName)
+
+        if schemaFields is not None and fileColumns in (None, len(schemaFields)):
+            continue
+
+        fileIssues.append({
+            'fileName': fileName,
+            'tableName': collectionFile['tableName'],
+            'schemaVariant': schemaVariant,
+            'fileColumns': fileColumns,
+            'schemaColumns': len(schemaFields) if schemaFields is not None else None,
+        })
+
+    return fileIssues
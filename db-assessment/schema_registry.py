@@ -0,0 +1,234 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Registry of the Optimus Prime table schemas, read from opConfig/optprimeConfig__tableSchemas.json.
+# Every table has the fields spooled by the current collector (oracle_db_assessment.sql, 12c and later) and, when the
+# 11g collector (oracle_db_assessment_11g.sql) spools other columns, an "11g" variant with its own fields:
+# {"version": 1, "variants": {"11g": {"dbVersions": ["10", "11"]}}, "tables": {"<tableName>": {"fields": [{"name": ..., "type": ...}], "variants": {"11g": {"fields": [...]}}}}}
+# A table can also have the storage of its Big Query table, used when the load job creates it: "partitioning": "COLLECTION_DAY" (ingestion time
+# partitions by day, every collection loaded into the partition of its collection day) and "clustering": [up to 4 columns of all its variants]
+# The file is read and checked once per process. Lookups return tuples of (column name, Big Query type) that are shared by all callers.
+# No Big Query library is needed here, so the local engine and the normalization use the registry directly.
+
+import json
+import functools
+
+# Collection attributes from the collected file names
+import collection_index
+
+# Table schemas configuration file
+SCHEMA_FILE_NAME = 'opConfig/optprimeConfig__tableSchemas.json'
+
+SCHEMA_FILE_VERSION = 1
+
+# Big Query column types accepted in the configuration file
+FIELD_TYPES = ['STRING', 'INT64', 'INTEGER', 'NUMERIC', 'DECIMAL', 'FLOAT64', 'FLOAT', 'BOOL', 'BOOLEAN', 'DATE', 'DATETIME', 'TIMESTAMP']
+
+# Standard SQL names of the legacy Big Query column types (the Big Query API reports the legacy names of the table columns)
+STANDARD_FIELD_TYPES = {'INTEGER': 'INT64', 'FLOAT': 'FLOAT64', 'DECIMAL': 'NUMERIC', 'BOOLEAN': 'BOOL'}
+
+# Partitionings of the tables accepted in the configuration file
+PARTITIONING_COLLECTION_DAY = 'COLLECTION_DAY'
+PARTITIONING_TYPES = [PARTITIONING_COLLECTION_DAY]
+
+# Highest number of clustering columns of a Big Query table
+MAX_CLUSTERING_FIELDS = 4
+
+
+def parseSchemaFields(fieldList, tableName):
+# This function converts a list of {"name": ..., "type": ...} of the configuration file into a tuple of (column name, Big Query type)
+
+    schemaFields = tuple((schemaField['name'], schemaField['type'].upper()) for schemaField in fieldList)
+
+    for fieldName, fieldType in schemaFields:
+        if fieldType not in FIELD_TYPES:
+            raise ValueError('The column {} of table {} has the unknown type {}'.format(fieldName, tableName, fieldType))
+
+    fieldNames = [fieldName.lower() for fieldName, fieldType in schemaFields]
+
+    if len(set(fieldNames)) != len(fieldNames):
+        raise ValueError('The table {} has duplicated column names'.format(tableName))
+
+    return schemaFields
+
+
+def parseTableStorage(tableConfig, tableName, tableSchemas):
+# This function returns the (partitioning, tuple of clustering columns) of a table of the configuration file, or None if it has neither
+# tableSchemas are the tuples of (column name, Big Query type) of all variants of the table: the clustering columns must be in all of them
+
+    partitioning = tableConfig.get('partitioning')
+    clusteringFields = tuple(tableConfig.get('clustering', []))
+
+    if partitioning is None and not clusteringFields:
+        return None
+
+    if partitioning is not None and partitioning not in PARTITIONING_TYPES:
+        raise ValueError('The table {} has the unknown partitioning {}'.format(tableName, partitioning))
+
+    if len(clusteringFields) > MAX_CLUSTERING_FIELDS:
+        raise ValueError('The table {} has more than {} clustering columns'.format(tableName, MAX_CLUSTERING_FIELDS))
+
+    for schemaFields in tableSchemas:
+
+        missingFields = set(field.lower() for field in clusteringFields) - set(fieldName.lower() for fieldName, fieldType in schemaFields)
+
+        if missingFields:
+            raise ValueError('The clustering columns {} are not columns of table {}'.format(', '.join(sorted(missingFields)), tableName))
+
+    return partitioning, clusteringFields
+
+
+@functools.lru_cache(maxsize=None)
+def loadSchemaRegistry(schemaFileName=SCHEMA_FILE_NAME):
+# This function reads the configuration file and returns the registry: a hash table with
+# - 'tables': variant (None for the current collector) -> tableName -> tuple of (column name, Big Query type). Tables without a variant share the default tuple
+# - 'dbVersions': list of (dbversion prefix, variant)
+# - 'storage': tableName -> (partitioning, tuple of clustering columns) of the tables with a partitioning or clustering
+# The result is cached, so the file is only read by the first call
+
+    with open(schemaFileName, 'r') as schemaFile:
+        schemaConfig = json.load(schemaFile)
+
+    if schemaConfig.get('version') != SCHEMA_FILE_VERSION:
+        raise ValueError('The table schemas file {} has version {} but version {} is expected'.format(schemaFileName, schemaConfig.get('version'), SCHEMA_FILE_VERSION))
+
+    variantNames = list(schemaConfig.get('variants', {}))
+
+    defaultSchemas = {tableName: parseSchemaFields(tableConfig['fields'], tableName) for tableName, tableConfig in schemaConfig['tables'].items()}
+
+    tableSchemas = {None: defaultSchemas}
+
+    for variantName in variantNames:
+
+        variantSchemas = dict(defaultSchemas)
+
+        for tableName, tableConfig in schemaConfig['tables'].items():
+            if variantName in tableConfig.get('variants', {}):
+                variantSchemas[tableName] = parseSchemaFields(tableConfig['variants'][variantName]['fields'], tableName)
+
+        tableSchemas[variantName] = variantSchemas
+
+    for tableName, tableConfig in schemaConfig['tables'].items():
+        for variantName in tableConfig.get('variants', {}):
+            if variantName not in variantNames:
+                raise ValueError('The table {} has the variant {} that is not declared in the table schemas file {}'.format(tableName, variantName, schemaFileName))
+
+    dbVersions = [(dbVersion, variantName) for variantName, variantConfig in schemaConfig.get('variants', {}).items() for dbVersion in variantConfig.get('dbVersions', [])]
+
+    tableStorage = {}
+
+    for tableName, tableConfig in schemaConfig['tables'].items():
+
+        storage = parseTableStorage(tableConfig, tableName, [variantSchemas[tableName] for variantSchemas in tableSchemas.values()])
+
+        if storage is not None:
+            tableStorage[tableName] = storage
+
+    return {'tables': tableSchemas, 'dbVersions': dbVersions, 'storage': tableStorage}
+
+
+def getSchemaVariant(dbVersion):
+# This function returns the variant of the tables spooled by a database version (dbversion of the collected file names, for instance 112 or 190)
+# None is returned for the current collector
+
+    if not dbVersion:
+        return None
+
+    for dbVersionPrefix, variantName in loadSchemaRegistry()['dbVersions']:
+        if dbVersion.startswith(dbVersionPrefix):
+            return variantName
+
+    return None
+
+
+def getFilesSchemaVariants(fileList):
+# This function returns the set of variants of the collections of the given files. Files not named by the collector (consolidated files for instance) are ignored
+
+    schemaVariants = set()
+
+    for fileName in fileList:
+
+        collectionFile = collection_index.parseCollectionFileName(fileName)
+
+        if collectionFile is not None:
+            schemaVariants.add(getSchemaVariant(collectionFile['dbversion']))
+
+    return schemaVariants
+
+
+def getTableSchemas(variantName=None):
+# This function returns the hash table tableName -> tuple of (column name, Big Query type) of a variant. The hash table is shared, so it must not be changed
+
+    try:
+        return loadSchemaRegistry()['tables'][variantName]
+    except KeyError:
+        raise ValueError('There is no table schema variant {}'.format(variantName))
+
+
+def getTableSchema(tableName, variantName=None):
+# This function returns the tuple of (column name, Big Query type) of a table, or None if the table has no schema
+
+    return getTableSchemas(variantName).get(tableName)
+
+
+def getTableNames():
+# This function returns the names of all tables with a schema
+
+    return list(getTableSchemas())
+
+
+def getSchemaDifferences(tableFields, schemaFields):
+# This function compares the columns of an existing table with a table schema, both tuples of (column name, Big Query type)
+# Returns the list of the differences as messages (column missing, column added, type changed), empty if the load jobs of the table schema can load into the table
+
+    if [fieldName.lower() for fieldName, fieldType in tableFields] != [fieldName.lower() for fieldName, fieldType in schemaFields]:
+        return ['the table has the columns {} instead of {}'.format(', '.join(fieldName for fieldName, fieldType in tableFields), ', '.join(fieldName for fieldName, fieldType in schemaFields))]
+
+    schemaDifferences = []
+
+    for (fieldName, tableType), (schemaName, schemaType) in zip(tableFields, schemaFields):
+
+        tableType = STANDARD_FIELD_TYPES.get(tableType.upper(), tableType.upper())
+        schemaType = STANDARD_FIELD_TYPES.get(schemaType.upper(), schemaType.upper())
+
+        if tableType != schemaType:
+            schemaDifferences.append('{} is {} instead of {}'.format(fieldName, tableType, schemaType))
+
+    return schemaDifferences
+
+
+def getMigrationProblems(tableFields, schemaFields):
+# This function returns why the rows of an existing table cannot be rewritten into the columns and types of a table schema (see the migrateTable
+# of the backends), as messages, empty if they can. Every column of the table must be in the table schema, with the STRING type (tables created by older
+# versions of Optimus Prime) or the type of the table schema. The columns of the table schema missing in the table are written as NULL
+
+    schemaTypes = {fieldName.lower(): STANDARD_FIELD_TYPES.get(fieldType.upper(), fieldType.upper()) for fieldName, fieldType in schemaFields}
+    migrationProblems = []
+
+    for fieldName, tableType in tableFields:
+
+        tableType = STANDARD_FIELD_TYPES.get(tableType.upper(), tableType.upper())
+
+        if fieldName.lower() not in schemaTypes:
+            migrationProblems.append('{} is not in the table schema'.format(fieldName))
+        elif tableType not in ('STRING', schemaTypes[fieldName.lower()]):
+            migrationProblems.append('{} is {} instead of {}'.format(fieldName, tableType, schemaTypes[fieldName.lower()]))
+
+    return migrationProblems
+
+
+def getTableStorage(tableName):
+# This function returns the (partitioning, tuple of clustering columns) of the Big Query table of a table, or (None, ()) for a plain table
+
+    return loadSchemaRegistry()['storage'].get(tableName, (None, ()))
@@ -0,0 +1,58 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Shared setup of the tests of db-assessment. The modules are scripts run from the db-assessment directory: they import each other
+# by their file names and read opConfig/ and opViews/ with relative paths, so the tests run from that directory as well.
+#   cd db-assessment && python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+# Directory of the db-assessment scripts
+ASSESSMENT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ASSESSMENT_DIRECTORY)
+
+
+@pytest.fixture(autouse=True)
+def assessmentDirectory(monkeypatch):
+# Every test runs from the db-assessment directory
+
+    monkeypatch.chdir(ASSESSMENT_DIRECTORY)
+
+
+@pytest.fixture
+def writeSpoolFile(tmp_path):
+# Returns a function writing a collected file in the SQL*Plus spool format of the collector (set colsep , and trimspool on):
+# a blank line and the column names on every page of pageRows rows, and the rows with every column padded to columnWidth
+
+    def writeFile(fileName, columnNames, rows, columnWidth=16, pageRows=50000, lineEnding='\n'):
+
+        filePath = tmp_path / fileName
+        spoolLines = []
+
+        for rowCounter, row in enumerate(rows):
+
+            if rowCounter % pageRows == 0:
+                spoolLines.extend(['', ','.join(columnName.upper().ljust(columnWidth) for columnName in columnNames).rstrip()])
+
+            spoolLines.append(','.join(str(fieldValue).ljust(columnWidth) for fieldValue in row).rstrip())
+
+        filePath.write_bytes((lineEnding.join(spoolLines) + lineEnding).encode('utf-8'))
+
+        return str(filePath)
+
+    return writeFile
@@ -0,0 +1,127 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the retries of the Big Query API calls (api_retry.py). The waits are not slept: time.sleep is replaced to record them
+
+import pytest
+
+import api_retry
+import bigquery_backend
+
+
+@pytest.fixture
+def sleepDelays(monkeypatch):
+# Returns the list of the waits of the retries, in seconds
+
+    recordedDelays = []
+    monkeypatch.setattr(api_retry.time, 'sleep', recordedDelays.append)
+
+    return recordedDelays
+
+
+def getFailingCall(errors, result='done'):
+# This function returns a call raising the given errors, one per attempt, and then returning result. The call records its attempts
+
+    pendingErrors = list(errors)
+    attempts = []
+
+    def failingCall(*args, **kwargs):
+
+        attempts.append((args, kwargs))
+
+        if pendingErrors:
+            raise pendingErrors.pop(0)
+
+        return result
+
+    return failingCall, attempts
+
+
+def test_retryableErrorsAreRetried(sleepDelays):
+
+    failingCall, attempts = getFailingCall([bigquery_backend.QuotaExceeded('quota'), bigquery_backend.TransientError('backend error')])
+    retryPolicy = api_retry.RetryPolicy(maxRetries=5, baseDelay=1, maxDelay=60, seed=1)
+
+    assert retryPolicy.call('Test call', failingCall, 'table', size=3) == 'done'
+    assert attempts == [(('table',), {'size': 3})] * 3
+    assert len(sleepDelays) == 2
+    assert retryPolicy.retries == 2
+    assert retryPolicy.exhaustedCalls == 0
+
+
+def test_callIsGivenUpAfterMaxRetries(sleepDelays):
+
+    lastError = bigquery_backend.QuotaExceeded('still over quota')
+    failingCall, attempts = getFailingCall([bigquery_backend.QuotaExceeded('quota')] * 3 + [lastError])
+    retryPolicy = api_retry.RetryPolicy(maxRetries=3, seed=1)
+
+    with pytest.raises(bigquery_backend.QuotaExceeded) as raisedError:
+        retryPolicy.call('Test call', failingCall)
+
+    assert raisedError.value is lastError
+    assert len(attempts) == 4
+    assert retryPolicy.retries == 3
+    assert retryPolicy.exhaustedCalls == 1
+
+
+def test_fatalErrorsAreNotRetried(sleepDelays):
+
+    failingCall, attempts = getFailingCall([ValueError('bad schema')])
+    retryPolicy = api_retry.RetryPolicy(seed=1)
+
+    with pytest.raises(ValueError):
+        retryPolicy.call('Test call', failingCall)
+
+    assert len(attempts) == 1
+
+    failingCall, attempts = getFailingCall([bigquery_backend.AlreadyExists('exists')])
+
+    with pytest.raises(bigquery_backend.AlreadyExists):
+        retryPolicy.call('Test call', failingCall)
+
+    assert len(attempts) == 1
+    assert sleepDelays == []
+    assert retryPolicy.retries == 0
+
+
+def test_noRetries(sleepDelays):
+
+    failingCall, attempts = getFailingCall([bigquery_backend.TransientError('backend error')])
+
+    with pytest.raises(bigquery_backend.TransientError):
+        api_retry.RetryPolicy(maxRetries=0).call('Test call', failingCall)
+
+    assert len(attempts) == 1
+    assert sleepDelays == []
+
+
+def test_delaysAreExponentialWithJitter():
+# The wait before the retry n is drawn between 0 and min(maxDelay, baseDelay * 2 ** (n - 1))
+
+    retryPolicy = api_retry.RetryPolicy(baseDelay=0.5, maxDelay=10, seed=7)
+
+    for retryCounter in range(1, 10):
+
+        retryDelays = [retryPolicy.getDelay(retryCounter) for drawCounter in range(200)]
+
+        assert all(0 <= retryDelay <= min(10, 0.5 * 2 ** (retryCounter - 1)) for retryDelay in retryDelays)
+
+        # The delays are spread over the range, not all the same
+        assert max(retryDelays) > min(10, 0.5 * 2 ** (retryCounter - 1)) / 2
+
+    # The same seed gives the same delays
+    firstPolicy = api_retry.RetryPolicy(seed=3)
+    secondPolicy = api_retry.RetryPolicy(seed=3)
+
+    assert [firstPolicy.getDelay(retryCounter) for retryCounter in range(1, 6)] == [secondPolicy.getDelay(retryCounter) for retryCounter in range(1, 6)]
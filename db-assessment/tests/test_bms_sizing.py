@@ -0,0 +1,139 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the Bare Metal Solution sizing computed with numpy/pandas (bms_sizing.py). A small local database (-localdb) is built from
+# collected files of a few hosts and databases, and the report of getSizingReport must have the same rows of the view vbms_sizing_report.
+
+import math
+import random
+
+import pytest
+
+# numpy and pandas are optional dependencies, only needed by bms_sizing.py
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+import bms_sizing
+import import_db_assessment
+import local_engine
+
+# Collections of the test database: collection key, database name and version, instances (instance number, host name)
+COLLECTIONS = [
+    ('host1_db1_0517', 'DB1', '12.2.0.1', [('1', 'host1')]),
+    ('host1_db2_0517', 'DB2', '19.0.0.0', [('1', 'host1')]),
+    ('host2_db3_0517', 'DB3', '19.0.0.0', [('1', 'host2'), ('2', 'host3')]),
+]
+
+# Hours and PDBs (con_id) collected
+HOURS = range(4)
+CON_IDS = ['0', '3']
+
+# Metrics used by the sizing (awrhistsysmetrichist) and their range of values
+SYSMETRIC_VALUES = {
+    'CPU Usage Per Sec': (50, 900),
+    'Background CPU Usage Per Sec': (5, 90),
+    'Host CPU Usage Per Sec': (100, 2500),
+    'I/O Requests per Second': (100, 30000),
+}
+
+
+def getCollectedRows(randomGenerator):
+# This function returns the rows of the collected tables used by the sizing views, with random values
+
+    collectedRows = {tableName: [] for tableName in ['dbsummary', 'dbinstances', 'dbparameters', 'awrhistosstat', 'awrhistsysmetrichist']}
+
+    for collectionKey, dbName, dbVersion, instances in COLLECTIONS:
+
+        dbid = str(randomGenerator.randint(1000, 9999))
+        collectedRows['dbsummary'].append([collectionKey, dbid, dbName, 'YES', dbVersion, 'Oracle Database ' + dbVersion, 'ARCHIVELOG', 'NO', 10, len(instances), 'AL32UTF8', 'Linux x86 64-bit', '2021-05-01', 20, 512, 256, 1024, randomGenerator.randint(100, 5000), 100, '0', 'PRIMARY', 'MAXIMUM PERFORMANCE', 'MAXIMUM PERFORMANCE'])
+
+        for instanceNumber, hostName in instances:
+
+            collectedRows['dbinstances'].append([collectionKey, instanceNumber, dbName.lower() + instanceNumber, hostName, dbVersion, 'OPEN', 'ACTIVE', 'PRIMARY_INSTANCE'])
+
+            for conId in CON_IDS:
+                for parameterName, parameterGb in [('memory_max_target', 0), ('sga_max_size', randomGenerator.randint(4, 64)), ('pga_aggregate_target', randomGenerator.randint(1, 16))]:
+                    collectedRows['dbparameters'].append([collectionKey, instanceNumber, conId, parameterName, parameterGb * 1024 ** 3, 0, 'FALSE'])
+
+            numCpuCores = randomGenerator.choice([4, 8, 16])
+
+            for hour in HOURS:
+
+                busyTime = randomGenerator.randint(1000, 9000)
+
+                for statName, statValue in [('NUM_CPU_CORES', numCpuCores), ('NUM_CPUS', numCpuCores * 2), ('BUSY_TIME', busyTime), ('IDLE_TIME', 10000 - busyTime), ('PHYSICAL_MEMORY_BYTES', 256 * 1024 ** 3)]:
+                    collectedRows['awrhistosstat'].append([collectionKey, 86400, '0', dbid, instanceNumber, hour, statName, 3600] + [statValue] * 11 + [1])
+
+                for conId in CON_IDS:
+                    for metricName, (minValue, maxValue) in SYSMETRIC_VALUES.items():
+                        metricValue = randomGenerator.randint(minValue, maxValue)
+                        collectedRows['awrhistsysmetrichist'].append([collectionKey, conId, dbid, instanceNumber, hour, metricName, 'per second', metricValue, metricValue, metricValue, 0, metricValue, metricValue, metricValue, metricValue, metricValue, metricValue, metricValue])
+
+    return collectedRows
+
+
+@pytest.fixture
+def localDatabase(writeSpoolFile):
+# This fixture returns a local database with the collected files of COLLECTIONS, the configuration files and all Optimus Prime views
+
+    connection = local_engine.openLocalDatabase(':memory:')
+
+    fileList = []
+
+    for tableName, tableRows in getCollectedRows(random.Random(7)).items():
+        columnNames = [fieldName for fieldName, fieldType in import_db_assessment.schema_registry.getTableSchema(tableName)]
+        fileList.append(writeSpoolFile('opdb__{}__190.log'.format(tableName), columnNames, tableRows, columnWidth=24))
+
+    assert import_db_assessment.importAllCSVsToLocalDB(connection, fileList, 2)
+    assert import_db_assessment.importAllCSVsToLocalDB(connection, import_db_assessment.getAllFilesByPattern('opConfig/*.csv'), 1)
+    assert import_db_assessment.createOptimusPrimeLocalViews(connection)
+
+    yield connection
+
+    connection.close()
+
+
+def getComparableRow(row):
+# This function returns a report row with the numbers as floats and the missing values as None, as SQLite and pandas type them differently
+
+    comparableRow = []
+
+    for fieldValue in row:
+
+        if isinstance(fieldValue, (int, float)) and not isinstance(fieldValue, bool):
+            fieldValue = None if math.isnan(fieldValue) else float(fieldValue)
+
+        comparableRow.append(fieldValue)
+
+    return tuple(comparableRow)
+
+
+def getSortedRows(rows):
+
+    return sorted((getComparableRow(row) for row in rows), key=lambda row: [(fieldValue is None, str(fieldValue)) for fieldValue in row])
+
+
+def test_sizingReportMatchesView(localDatabase):
+
+    viewRows = getSortedRows(localDatabase.execute('SELECT {} FROM vbms_sizing_report'.format(', '.join(bms_sizing.REPORT_COLUMNS))).fetchall())
+
+    sizingReport = bms_sizing.getSizingReport(bms_sizing.readLocalSizingInputs(localDatabase), bms_sizing.readMachineSizes('opConfig/optconfig__optimusconfig_bms_machinesizes__.csv'))
+    reportRows = getSortedRows(sizingReport.astype(object).where(sizingReport.notna(), None).itertuples(index=False, name=None))
+
+    # The rows of the databases and of the hosts are compared. DB3 needs more cores than the catalog offers, so it has no row in either report
+    assert {viewRow[0] for viewRow in viewRows} == {'BMS Sizing Per Database (All Instances Included)', 'BMS Sizing Per Host (All Databases Included)'}
+    assert len(reportRows) == len(viewRows)
+
+    for reportRow, viewRow in zip(reportRows, viewRows):
+        assert reportRow == viewRow
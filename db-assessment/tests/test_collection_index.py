@@ -0,0 +1,145 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the collection index built from the collected file names (collection_index.py): the parsing of the names,
+# the collection time range arguments and the selection of the collections by id and by collection time.
+
+import datetime
+
+import pytest
+
+import collection_index
+
+# Collections of the test files location: collection id and collection time
+COLLECTIONS = [
+    ('122_0.1.0_dbhost.ORCL.ORCL1.051721143005', datetime.datetime(2021, 5, 17, 14, 30, 5)),
+    ('122_0.1.0_db.host.example.ORCL.ORCL1.051821000000', datetime.datetime(2021, 5, 18, 0, 0, 0)),
+    ('190_0.1.0_dbhost2.SALES.SALES2.051821235959', datetime.datetime(2021, 5, 18, 23, 59, 59)),
+    ('190_0.1.0_dbhost2.SALES.SALES2.133221000000', None),
+]
+
+
+@pytest.mark.parametrize('fileName, expectedAttributes', [
+    ('opdb__dbsummary__122_0.1.0_dbhost.ORCL.ORCL1.051721143005.log',
+     {'tableName': 'dbsummary', 'collectionId': '122_0.1.0_dbhost.ORCL.ORCL1.051721143005', 'dbversion': '122', 'version': '0.1.0', 'host': 'dbhost', 'dbname': 'ORCL', 'instance': 'ORCL1', 'hora': '051721143005', 'collectedAt': datetime.datetime(2021, 5, 17, 14, 30, 5)}),
+    ('opdb__awrhistsysmetrichist__190_0.1.0_db.host.example.SALES.SALES2.123120235959.log',
+     {'tableName': 'awrhistsysmetrichist', 'host': 'db.host.example', 'dbname': 'SALES', 'instance': 'SALES2', 'collectedAt': datetime.datetime(2020, 12, 31, 23, 59, 59)}),
+    ('/data/collections.tar.gz!collection/opdb__dbsummary__122_0.1.0_dbhost.ORCL.ORCL1.010121000000.log',
+     {'tableName': 'dbsummary', 'collectionId': '122_0.1.0_dbhost.ORCL.ORCL1.010121000000', 'collectedAt': datetime.datetime(2021, 1, 1, 0, 0, 0)}),
+    ('opdb__dbsummary__122_0.1.0_dbhost.ORCL.ORCL1.133221000000.log',
+     {'hora': '133221000000', 'collectedAt': None}),
+])
+def test_parseCollectionFileName(fileName, expectedAttributes):
+# A collection time that is not a valid date keeps the file in its collection, with an unknown collection time
+
+    collectionFile = collection_index.parseCollectionFileName(fileName)
+
+    assert {attributeName: collectionFile[attributeName] for attributeName in expectedAttributes} == expectedAttributes
+
+
+@pytest.mark.parametrize('fileName', [
+    'opdb__dbsummary__122_0.1.0_dbhost.ORCL.ORCL1.0517211430.log',
+    'opdb__dbsummary__122_0.1.0_dbhost.ORCL.ORCL1.05172114300a.log',
+    'opdb__dbsummary__122_0.1.0_dbhost.ORCL.051721143005.log',
+    'opdb__dbsummary__122_0.1.0_dbhost.ORCL.ORCL1.051721143005.csv',
+    'opdb__dbsummary__122_0.1.0_dbhost.ORCL.ORCL1.051721143005.log.gz',
+    'opdb__dbsummary__1220.1.0dbhost.ORCL.ORCL1.051721143005.log',
+    'opdb__dbsummary.log',
+    'opalldb__dbsummary__122_0.1.0_dbhost.ORCL.ORCL1.051721143005.log',
+])
+def test_parseMalformedCollectionFileName(fileName):
+
+    assert collection_index.parseCollectionFileName(fileName) is None
+
+
+@pytest.mark.parametrize('collectionTime, endOfDay, expectedTime', [
+    ('2021-05-17', False, datetime.datetime(2021, 5, 17, 0, 0, 0)),
+    ('2021-05-17', True, datetime.datetime(2021, 5, 17, 23, 59, 59)),
+    (' 2021-05-17 14:30 ', True, datetime.datetime(2021, 5, 17, 14, 30, 0)),
+    ('2021-05-17 14:30:05', False, datetime.datetime(2021, 5, 17, 14, 30, 5)),
+])
+def test_parseCollectionTime(collectionTime, endOfDay, expectedTime):
+
+    assert collection_index.parseCollectionTime(collectionTime, endOfDay) == expectedTime
+
+
+@pytest.mark.parametrize('collectionTime', ['17/05/2021', '2021-05-32', '2021-05-17T14:30', ''])
+def test_parseInvalidCollectionTime(collectionTime):
+
+    with pytest.raises(ValueError):
+        collection_index.parseCollectionTime(collectionTime)
+
+
+@pytest.fixture
+def collectionIndex(tmp_path):
+# This fixture builds the index of a files location with two tables of every collection of COLLECTIONS and some other files
+
+    for collectionId, collectedAt in COLLECTIONS:
+        for tableName in ['dbsummary', 'dbparameters']:
+            (tmp_path / 'opdb__{}__{}.log'.format(tableName, collectionId)).write_text('\n')
+
+    (tmp_path / 'opdb__dbsummary__unknown.log').write_text('\n')
+    (tmp_path / 'opalldb__dbsummary__20210517_consolidate.log').write_text('\n')
+    (tmp_path / 'notes.txt').write_text('\n')
+
+    return collection_index.buildCollectionIndex(str(tmp_path))
+
+
+def test_buildCollectionIndex(collectionIndex, tmp_path):
+
+    collections, unknownFiles = collectionIndex
+
+    assert {collectionId: collection['collectedAt'] for collectionId, collection in collections.items()} == dict(COLLECTIONS)
+    assert sorted(collections[COLLECTIONS[1][0]]['files']) == ['dbparameters', 'dbsummary']
+    assert collections[COLLECTIONS[1][0]]['host'] == 'db.host.example'
+    assert unknownFiles == [str(tmp_path / 'opdb__dbsummary__unknown.log')]
+    assert len(collection_index.getCollectionsFiles(collections, [COLLECTIONS[0][0], COLLECTIONS[2][0]])) == 4
+
+
+@pytest.mark.parametrize('collectionIds, expectedCollections', [
+    (None, [0, 1, 2, 3]),
+    (['122_0.1.0_dbhost.ORCL.ORCL1.051721143005'], [0]),
+    (['051821000000'], [1]),
+    (['SALES2.051821235959', '051721143005'], [0, 2]),
+    (['ORCL1'], []),
+    (['051721'], []),
+])
+def test_selectCollectionsById(collectionIndex, collectionIds, expectedCollections):
+# An id selects the collections whose id ends with it
+
+    assert collection_index.selectCollections(collectionIndex[0], collectionIds) == sorted(COLLECTIONS[collectionCounter][0] for collectionCounter in expectedCollections)
+
+
+@pytest.mark.parametrize('collectedFrom, collectedTo, expectedCollections', [
+    ('2021-05-17 14:30:05', None, [0, 1, 2]),
+    ('2021-05-17 14:30:06', None, [1, 2]),
+    (None, '2021-05-18 00:00:00', [0, 1]),
+    (None, '2021-05-17 23:59:59', [0]),
+    ('2021-05-18', '2021-05-18', [1, 2]),
+    ('2021-05-19', None, []),
+])
+def test_selectCollectionsByTime(collectionIndex, collectedFrom, collectedTo, expectedCollections):
+# Both ends of the range are included, a date without time ends the range at the last second of the day.
+# The collection with an unknown collection time is never selected by a range
+
+    selectedIds = collection_index.selectCollections(collectionIndex[0],
+                                                     collectedFrom=None if collectedFrom is None else collection_index.parseCollectionTime(collectedFrom),
+                                                     collectedTo=None if collectedTo is None else collection_index.parseCollectionTime(collectedTo, endOfDay=True))
+
+    assert selectedIds == sorted(COLLECTIONS[collectionCounter][0] for collectionCounter in expectedCollections)
+
+
+def test_selectCollectionsByIdAndTime(collectionIndex):
+
+    assert collection_index.selectCollections(collectionIndex[0], ['SALES2.051821235959', '051721143005'], collection_index.parseCollectionTime('2021-05-18')) == [COLLECTIONS[2][0]]
@@ -0,0 +1,151 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the archive members read as collected files (file_sources.py). The members of a compressed tar read in the archive order
+# must be read from the same open tar file, so the archive is decompressed once and not once per member.
+
+import io
+import tarfile
+
+import pytest
+
+import file_sources
+
+# Number of members of the test archives
+MEMBER_COUNT = 50
+
+
+@pytest.fixture(autouse=True)
+def emptyTarPool():
+# Closes the open tar files left in the pool by a test
+
+    yield
+
+    for archiveName, tarFile in file_sources.TarArchive.openTarFiles:
+        tarFile.close()
+
+    del file_sources.TarArchive.openTarFiles[:]
+
+
+@pytest.fixture
+def countTarOpens(monkeypatch):
+# Counts the calls to tarfile.open reading an archive
+
+    tarOpens = []
+    tarOpen = tarfile.open
+
+    def countedOpen(archiveName, mode='r', *args, **kwargs):
+
+        if mode.startswith('r'):
+            tarOpens.append(archiveName)
+
+        return tarOpen(archiveName, mode, *args, **kwargs)
+
+    monkeypatch.setattr(tarfile, 'open', countedOpen)
+
+    return tarOpens
+
+
+def getMemberContent(memberCounter):
+
+    return 'opdb__t{}__1.log\n'.format(memberCounter).encode() * 100
+
+
+def writeArchive(tmp_path):
+# This function writes a .tar.gz with MEMBER_COUNT members and returns their file names (archive!member), in the archive order
+
+    archiveName = str(tmp_path / 'opdb_collection.tar.gz')
+
+    with tarfile.open(archiveName, 'w:gz') as archiveFile:
+
+        for memberCounter in range(MEMBER_COUNT):
+
+            memberContent = getMemberContent(memberCounter)
+            tarInfo = tarfile.TarInfo('collection/opdb__t{}__1.log'.format(memberCounter))
+            tarInfo.size = len(memberContent)
+            archiveFile.addfile(tarInfo, io.BytesIO(memberContent))
+
+    return [archiveName + file_sources.ARCHIVE_MEMBER_SEPARATOR + 'collection/opdb__t{}__1.log'.format(memberCounter) for memberCounter in range(MEMBER_COUNT)]
+
+
+def readFile(fileName):
+
+    with file_sources.openFile(fileName) as sourceFile:
+        return sourceFile.read()
+
+
+def test_tarMembersInArchiveOrder(tmp_path, countTarOpens):
+
+    fileNames = writeArchive(tmp_path)
+
+    for memberCounter, fileName in enumerate(fileNames):
+        assert readFile(fileName) == getMemberContent(memberCounter)
+
+    # One open to list the members and one to read them all
+    assert len(countTarOpens) == 2
+
+
+def test_tarMembersBackwards(tmp_path, countTarOpens):
+
+    fileNames = writeArchive(tmp_path)
+
+    assert readFile(fileNames[10]) == getMemberContent(10)
+    assert readFile(fileNames[5]) == getMemberContent(5)
+    assert readFile(fileNames[20]) == getMemberContent(20)
+
+    # The tar file positioned after member 10 cannot read member 5, the one after member 5 reads member 20
+    assert len(countTarOpens) == 3
+    assert len(file_sources.TarArchive.openTarFiles) == 2
+
+
+def test_tarMembersOpenTogether(tmp_path):
+
+    fileNames = writeArchive(tmp_path)
+
+    with file_sources.openFile(fileNames[1]) as firstFile, file_sources.openFile(fileNames[2]) as secondFile:
+        assert firstFile.read(10) == getMemberContent(1)[:10]
+        assert secondFile.read() == getMemberContent(2)
+        assert firstFile.read() == getMemberContent(1)[10:]
+
+
+def test_tarPoolSize(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(file_sources, 'TAR_POOL_SIZE', 2)
+
+    fileNames = writeArchive(tmp_path)
+
+    with file_sources.openFile(fileNames[1]), file_sources.openFile(fileNames[2]), file_sources.openFile(fileNames[3]):
+        pass
+
+    assert len(file_sources.TarArchive.openTarFiles) == 2
+
+
+def test_splitArchiveMember():
+
+    assert file_sources.splitArchiveMember('/data/opdb.tar.gz!collection/opdb__t1__1.log') == ('/data/opdb.tar.gz', 'collection/opdb__t1__1.log')
+    assert file_sources.splitArchiveMember('/data!old/opdb.zip!opdb__t1__1.log') == ('/data!old/opdb.zip', 'opdb__t1__1.log')
+    assert file_sources.splitArchiveMember('/data!old/opdb__t1__1.log') == (None, None)
+    assert file_sources.splitArchiveMember('/data/opdb__t1__1.log') == (None, None)
+
+
+def test_archiveInDirectoryWithSeparator(tmp_path):
+
+    archiveDirectory = tmp_path / 'collections!2021'
+    archiveDirectory.mkdir()
+
+    fileNames = writeArchive(archiveDirectory)
+
+    assert sorted(file_sources.listFiles(str(archiveDirectory))) == sorted(fileNames)
+    assert readFile(fileNames[5]) == getMemberContent(5)
+    assert file_sources.getFileSize(fileNames[5]) == len(getMemberContent(5))
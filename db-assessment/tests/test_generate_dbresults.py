@@ -0,0 +1,68 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the synthetic collected files (generate_dbresults.py)
+
+import glob
+import os
+
+import pytest
+
+import generate_dbresults
+import pivot_metrics
+import schema_coverage
+
+fastavro = pytest.importorskip('fastavro')
+
+
+def readHeader(fileName):
+# This function returns the column names of a spool file (second line, after the blank line)
+
+    with open(fileName, 'r') as spoolFile:
+        return [columnName.strip() for columnName in spoolFile.read().split('\n')[1].split(',')]
+
+
+@pytest.mark.parametrize('dbVersion, scriptFileName', [('190', schema_coverage.COLLECTOR_SCRIPTS[0][0]), ('112', schema_coverage.COLLECTOR_SCRIPTS[1][0])])
+def test_generatedHeadersAreCollectorHeadings(tmp_path, dbVersion, scriptFileName):
+# The files have the headings of the collector queries, not the column names of the table schemas
+
+    generationStats = generate_dbresults.generateDbResults(str(tmp_path), days=1, dbVersion=dbVersion)
+    spooledColumns = schema_coverage.getSpooledColumns(scriptFileName)
+
+    assert generationStats['files'] == len(schema_coverage.getSpooledTables(scriptFileName))
+
+    for fileName in glob.glob(str(tmp_path / 'opdb__*.log')):
+        tableName = os.path.basename(fileName).split('__')[1]
+        assert readHeader(fileName) == spooledColumns[tableName], tableName
+
+    assert 'HH24' in readHeader(glob.glob(str(tmp_path / 'opdb__awrhistosstat__*.log'))[0])
+
+
+def test_generatedFilesArePivoted(tmp_path):
+# The generated files pivot like real files: a row per instance and hour with the CPUs of the host
+
+    generate_dbresults.generateDbResults(str(tmp_path), instances=2, days=1)
+
+    fileList = glob.glob(str(tmp_path / 'opdb__awrhistosstat__*.log'))
+    targetFileName = str(tmp_path / 'oppivoted__awrhistosstat_pivot__.avro')
+
+    pivotStats = pivot_metrics.pivotTableToAvro('awrhistosstat', fileList, targetFileName)
+
+    with open(targetFileName, 'rb') as avroFile:
+        numCpus = {(record['instance_number'], record['hour']): record['num_cpus'] for record in fastavro.reader(avroFile)}
+
+    assert pivotStats['rows'] == 48
+    assert len(numCpus) == 48
+    assert len(set(numCpus.values())) == 1
+    assert set(numCpus.values()) <= {8, 16, 32, 64}
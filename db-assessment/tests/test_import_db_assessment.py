@@ -0,0 +1,346 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the Big Query client shared by the import (get_bigqueryClient), of the retries of the load jobs (runLoadJob) and of the load
+# of the existing and partitioned tables
+
+import os
+import time
+import threading
+from unittest import mock
+
+import pytest
+
+import api_retry
+import bigquery_backend
+import import_db_assessment
+import local_bigquery
+
+# Number of threads asking for the client at the same time
+CLIENT_THREADS = 16
+
+
+def test_sharedClientIsBuiltOnce(monkeypatch):
+# Many load threads asking for the client at the same time get the same client, built by a single bigquery.Client call
+
+    monkeypatch.setattr(import_db_assessment, 'client', None)
+
+    def buildClient(*args, **kwargs):
+        # A slow construction (credentials discovery) leaves time to the other threads to try building their own client
+        time.sleep(0.05)
+        return mock.MagicMock(project='test-project', location='US')
+
+    startBarrier = threading.Barrier(CLIENT_THREADS)
+    threadClients = []
+
+    def getClient():
+        startBarrier.wait()
+        threadClients.append(import_db_assessment.get_bigqueryClient(32))
+
+    with mock.patch('google.cloud.bigquery.Client', side_effect=buildClient) as clientClass:
+
+        clientThreads = [threading.Thread(target=getClient) for threadCounter in range(CLIENT_THREADS)]
+
+        for clientThread in clientThreads:
+            clientThread.start()
+
+        for clientThread in clientThreads:
+            clientThread.join()
+
+        assert clientClass.call_count == 1
+
+        # Later calls reuse the client as well
+        assert import_db_assessment.get_bigqueryClient() is threadClients[0]
+        assert clientClass.call_count == 1
+
+    assert len(threadClients) == CLIENT_THREADS
+    assert all(threadClient is threadClients[0] for threadClient in threadClients)
+    assert threadClients[0].project == 'test-project'
+
+
+def test_sharedClientKeepsConnectionPool(monkeypatch):
+# The HTTP session of the client keeps httpPoolSize connections alive for the parallel load jobs
+
+    monkeypatch.setattr(import_db_assessment, 'client', None)
+
+    with mock.patch('google.cloud.bigquery.Client') as clientClass:
+        import_db_assessment.get_bigqueryClient(32)
+
+    mountedAdapters = [mountCall.args[1] for mountCall in clientClass.return_value._http.mount.call_args_list]
+
+    assert len(mountedAdapters) == 2
+    assert all(mountedAdapter._pool_maxsize == 32 for mountedAdapter in mountedAdapters)
+
+
+def test_backendReplacesClient(monkeypatch):
+# A backend set by setBigQueryBackend is returned without building any client
+
+    monkeypatch.setattr(import_db_assessment, 'client', None)
+
+    backend = mock.MagicMock()
+    import_db_assessment.setBigQueryBackend(backend)
+
+    with mock.patch('google.cloud.bigquery.Client') as clientClass:
+        assert import_db_assessment.get_bigqueryClient() is backend
+
+    assert clientClass.call_count == 0
+
+
+# Table loaded by the load job tests, with the rows of LOAD_FILE_ROWS
+LOAD_TABLE_SCHEMAS = {'loadtest': (('pkey', 'STRING'), ('value', 'INT64'))}
+LOAD_FILE_ROWS = 5
+
+
+class FailingBackend:
+# Local stand-in whose load jobs fail once in the given way: 'submit' (the job is created but the response is lost),
+# 'poll' (the wait for the job fails) or 'job' (the job runs and fails, loading nothing)
+
+    def __init__(self, backend, failure):
+        self.backend = backend
+        self.failure = failure
+        self.project = backend.project
+        self.submittedJobIds = []
+
+    def loadTableFromFile(self, *args, **kwargs):
+
+        self.submittedJobIds.append(kwargs['jobId'])
+
+        if self.failure == 'job':
+            self.failure = None
+            failedJob = mock.MagicMock(job_id=kwargs['jobId'], output_rows=None, queue_seconds=None)
+            failedJob.result.side_effect = bigquery_backend.JobFailed('backendError')
+            return failedJob
+
+        load_job = self.backend.loadTableFromFile(*args, **kwargs)
+
+        if self.failure == 'submit':
+            self.failure = None
+            raise bigquery_backend.TransientError('Connection aborted')
+
+        if self.failure == 'poll':
+            self.failure = None
+            pollErrors = [bigquery_backend.TransientError('Read timed out')]
+            jobResult = load_job.result
+
+            def pollJob():
+                if pollErrors:
+                    raise pollErrors.pop()
+                return jobResult()
+
+            load_job.result = pollJob
+
+        return load_job
+
+    def __getattr__(self, attributeName):
+        return getattr(self.backend, attributeName)
+
+
+@pytest.fixture
+def loadBackend(monkeypatch, tmp_path):
+# This fixture returns a function setting a failing local stand-in with the dataset loadds as the backend of the import, and the CSV file to load
+
+    monkeypatch.setattr(import_db_assessment, 'retryPolicy', api_retry.RetryPolicy(maxRetries=3, baseDelay=0))
+
+    csvFile = tmp_path / 'opdb__loadtest__190.log'
+    csvFile.write_text('\nPKEY ,VALUE\n' + ''.join('key{} ,{}\n'.format(rowCounter, rowCounter) for rowCounter in range(LOAD_FILE_ROWS)))
+
+    def setBackend(failure):
+
+        localBackend = local_bigquery.LocalBigQueryBackend()
+        localBackend.createDataset('optimus-local.loadds')
+
+        backend = FailingBackend(localBackend, failure)
+        monkeypatch.setattr(import_db_assessment, 'client', backend)
+
+        return backend, str(csvFile)
+
+    return setBackend
+
+
+@pytest.mark.parametrize('failure', ['submit', 'poll'])
+def test_loadJobIsNotSubmittedTwice(loadBackend, failure):
+# A submit whose job was created, or a wait that failed, is retried with the same job: the rows are loaded once
+
+    backend, csvFileName = loadBackend(failure)
+
+    jobIds = import_db_assessment.importCSVToBQ(None, 'loadds', 'loadtest', csvFileName, 2, False, LOAD_TABLE_SCHEMAS)
+
+    assert backend.getTableRows('optimus-local.loadds.loadtest') == LOAD_FILE_ROWS
+    assert [loadJob['jobId'] for loadJob in backend.getLoadJobs()] == jobIds
+    assert len(set(backend.submittedJobIds)) == 1
+
+
+def test_failedLoadJobIsSubmittedAgain(loadBackend):
+# A job that ran and failed loaded nothing: a new job with a new id loads the rows
+
+    backend, csvFileName = loadBackend('job')
+
+    jobIds = import_db_assessment.importCSVToBQ(None, 'loadds', 'loadtest', csvFileName, 2, False, LOAD_TABLE_SCHEMAS)
+
+    assert backend.getTableRows('optimus-local.loadds.loadtest') == LOAD_FILE_ROWS
+    assert len(set(backend.submittedJobIds)) == 2
+    assert jobIds == backend.submittedJobIds[-1:]
+    assert import_db_assessment.retryPolicy.retries == 1
+
+
+@pytest.mark.parametrize('jobState, errorResult, raisedError', [('DONE', {'reason': 'backendError'}, bigquery_backend.JobFailed), ('RUNNING', None, bigquery_backend.TransientError)])
+def test_bigQueryLoadJobErrors(jobState, errorResult, raisedError):
+# A load job done with an error failed, any other error is a failure to poll it
+
+    from google.api_core import exceptions
+
+    loadJob = mock.MagicMock(job_id='job', state=jobState, error_result=errorResult)
+    loadJob.result.side_effect = exceptions.InternalServerError('backendError')
+
+    with pytest.raises(raisedError):
+        bigquery_backend.BigQueryLoadJob(loadJob).result()
+
+
+@pytest.fixture
+def partitionedLoadTest(monkeypatch):
+# The load test table is partitioned by collection day and clustered on pkey in the table schema registry
+
+    monkeypatch.setattr(import_db_assessment.schema_registry, 'getTableStorage', lambda tableName: ('COLLECTION_DAY', ('pkey',)))
+    monkeypatch.setattr(import_db_assessment, 'storageWarnings', set())
+
+
+def test_newTableGetsRegistryStorage(loadBackend, partitionedLoadTest):
+
+    backend, csvFileName = loadBackend(None)
+
+    import_db_assessment.importCSVToBQ(None, 'loadds', 'loadtest', csvFileName, 2, False, LOAD_TABLE_SCHEMAS, partition='20210517')
+
+    assert backend.getTable('optimus-local.loadds.loadtest') == {'schemaFields': LOAD_TABLE_SCHEMAS['loadtest'], 'dayPartitioned': True, 'clusteringFields': ('pkey',)}
+    assert backend.getTableRows('optimus-local.loadds.loadtest') == LOAD_FILE_ROWS
+
+
+def test_existingTableKeepsItsStorage(loadBackend, partitionedLoadTest, capsys):
+# A table created without partitioning nor clustering (older versions) gets the rows of every collection, without partition
+
+    backend, csvFileName = loadBackend(None)
+
+    with open(csvFileName, 'rb') as csvFile:
+        backend.backend.loadTableFromFile(csvFile, 'optimus-local.loadds.loadtest', LOAD_TABLE_SCHEMAS['loadtest'], bigquery_backend.SOURCE_FORMAT_CSV, 2).result()
+
+    # Big Query rejects a load job asking for another partitioning or clustering
+    with open(csvFileName, 'rb') as csvFile:
+        with pytest.raises(local_bigquery.LoadJobFailed, match='Incompatible table partitioning'):
+            backend.backend.loadTableFromFile(csvFile, 'optimus-local.loadds.loadtest$20210517', LOAD_TABLE_SCHEMAS['loadtest'], bigquery_backend.SOURCE_FORMAT_CSV, 2, dayPartitioned=True, clusteringFields=('pkey',)).result()
+
+    for partition in ('20210517', '20210518'):
+        import_db_assessment.importCSVToBQ(None, 'loadds', 'loadtest', csvFileName, 2, False, LOAD_TABLE_SCHEMAS, partition=partition)
+
+    assert backend.getTable('optimus-local.loadds.loadtest') == {'schemaFields': LOAD_TABLE_SCHEMAS['loadtest'], 'dayPartitioned': False, 'clusteringFields': ()}
+    assert backend.getTableRows('optimus-local.loadds.loadtest') == 3 * LOAD_FILE_ROWS
+    assert [loadJob['tableId'] for loadJob in backend.getLoadJobs() if loadJob['status'] == 'DONE'] == ['optimus-local.loadds.loadtest'] * 3
+    assert capsys.readouterr().out.count('WARNING: The table optimus-local.loadds.loadtest exists with another partitioning and clustering than the table schema registry (partitioned by day: no, clustered on: none. Table schema registry: yes, pkey)') == 1
+
+
+def test_existingTableWithOtherTypesIsRejected(loadBackend):
+# A table created with STRING columns only (older versions) cannot get the typed rows: the load fails before any upload, with a clear message
+
+    backend, csvFileName = loadBackend(None)
+
+    with open(csvFileName, 'rb') as csvFile:
+        backend.backend.loadTableFromFile(csvFile, 'optimus-local.loadds.loadtest', (('pkey', 'STRING'), ('value', 'STRING')), bigquery_backend.SOURCE_FORMAT_CSV, 2).result()
+
+    with pytest.raises(ValueError, match=r'exists with other columns than its table schema .*\(value is STRING instead of INT64\).*new dataset'):
+        import_db_assessment.importCSVToBQ(None, 'loadds', 'loadtest', csvFileName, 2, False, LOAD_TABLE_SCHEMAS)
+
+    assert backend.submittedJobIds == []
+    assert backend.getTableRows('optimus-local.loadds.loadtest') == LOAD_FILE_ROWS
+
+
+@pytest.fixture
+def stringTable(loadBackend, monkeypatch):
+# This fixture returns the failing local stand-in with the table loadtest created with STRING columns only (older versions), and the CSV file to load
+
+    monkeypatch.setattr(import_db_assessment.schema_registry, 'getTableSchemas', lambda schemaVariant=None: LOAD_TABLE_SCHEMAS)
+
+    backend, csvFileName = loadBackend(None)
+
+    with open(csvFileName, 'rb') as csvFile:
+        backend.backend.loadTableFromFile(csvFile, 'optimus-local.loadds.loadtest', (('pkey', 'STRING'), ('value', 'STRING')), bigquery_backend.SOURCE_FORMAT_CSV, 2).result()
+
+    return backend, csvFileName
+
+
+def test_existingTableWithOtherTypesStopsImport(stringTable, capsys):
+# The tables to be migrated are listed before any load job, with what to do
+
+    backend, csvFileName = stringTable
+
+    assert import_db_assessment.importAllCSVsToBQ(None, 'loadds', [csvFileName], 2) is False
+
+    output = capsys.readouterr().out
+
+    assert 'optimus-local.loadds.loadtest: value is STRING instead of INT64' in output
+    assert 'Run the import again with -migratetables' in output
+    assert backend.submittedJobIds == []
+
+
+def test_existingTableIsMigrated(stringTable):
+# With -migratetables the padded STRING values of the table are trimmed and cast before the typed rows are loaded
+
+    backend, csvFileName = stringTable
+
+    assert import_db_assessment.importAllCSVsToBQ(None, 'loadds', [csvFileName], 2, migrateTables=True) is True
+
+    assert backend.getTable('optimus-local.loadds.loadtest')['schemaFields'] == LOAD_TABLE_SCHEMAS['loadtest']
+    assert backend.backend.connection.execute('SELECT pkey, value, COUNT(*) FROM loadds.loadtest GROUP BY pkey, value ORDER BY value').fetchall() == [('key{}'.format(rowCounter), rowCounter, 2) for rowCounter in range(LOAD_FILE_ROWS)]
+
+
+def test_existingTableWithOtherColumnsIsNotMigrated(stringTable, monkeypatch, capsys):
+# A column of the table missing in the table schema would be lost by the migration
+
+    backend, csvFileName = stringTable
+    monkeypatch.setitem(LOAD_TABLE_SCHEMAS, 'loadtest', (('pkey', 'STRING'), ('amount', 'INT64')))
+
+    assert import_db_assessment.importAllCSVsToBQ(None, 'loadds', [csvFileName], 2, migrateTables=True) is False
+
+    assert 'It cannot be migrated: value is not in the table schema' in capsys.readouterr().out
+    assert backend.getTable('optimus-local.loadds.loadtest')['schemaFields'] == (('pkey', 'STRING'), ('value', 'STRING'))
+
+
+def test_loadGroupsByCollectionDay(partitionedLoadTest):
+# The collected files, and the consolidated and normalized files of a single collection day, are loaded into the partition of their collection day
+
+    fileList = [
+        'dbResults/opdb__loadtest__190_0.1.0_dbhost.ORCL.ORCL1.051721143105.log',
+        'dbResults/opdb__loadtest__190_0.1.0_dbhost.ORCL.ORCL1.051821143105.log',
+        'dbResults/opalldb__loadtest__20210517_consolidate.log',
+        'dbResults/opnormalized__loadtest__20210518.avro',
+        'dbResults/opalldb__loadtest__consolidate.log',
+    ]
+
+    assert import_db_assessment.getTableLoadGroups('loadtest', fileList) == [
+        (None, ['dbResults/opalldb__loadtest__consolidate.log']),
+        ('20210517', ['dbResults/opdb__loadtest__190_0.1.0_dbhost.ORCL.ORCL1.051721143105.log', 'dbResults/opalldb__loadtest__20210517_consolidate.log']),
+        ('20210518', ['dbResults/opdb__loadtest__190_0.1.0_dbhost.ORCL.ORCL1.051821143105.log', 'dbResults/opnormalized__loadtest__20210518.avro']),
+    ]
+
+
+def test_consolidationByCollectionDay(partitionedLoadTest, writeSpoolFile, tmp_path):
+# A table partitioned by collection day gets a consolidated file per day, and the consolidated file of a previous run is removed
+
+    for collectionTag in ('051721143105', '051721150000', '051821143105'):
+        writeSpoolFile('opdb__loadtest__190_0.1.0_dbhost.ORCL.ORCL1.{}.log'.format(collectionTag), ['pkey', 'value'], [['key' + collectionTag, 1]])
+
+    (tmp_path / 'opalldb__loadtest__consolidate.log').write_text('PKEY,VALUE\n')
+
+    consolidationResults = import_db_assessment.consolidateTableLogs(str(tmp_path), 'loadtest')
+
+    assert [(os.path.basename(consolidationStats['targetFileName']), consolidationStats['files'], consolidationStats['rows']) for consolidationStats in consolidationResults['targetFiles']] == [('opalldb__loadtest__20210517_consolidate.log', 2, 2), ('opalldb__loadtest__20210518_consolidate.log', 1, 1)]
+    assert consolidationResults['removedFiles'] == [str(tmp_path / 'opalldb__loadtest__consolidate.log')]
+    assert sorted(fileName.name for fileName in tmp_path.glob('opalldb__*')) == ['opalldb__loadtest__20210517_consolidate.log', 'opalldb__loadtest__20210518_consolidate.log']
@@ -0,0 +1,141 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the manifest of the imported files (import_manifest.py) used by -incremental: a file already imported is skipped,
+# and a file is imported again once its size, modification time and content hash show that it changed.
+
+import json
+import os
+
+import pytest
+
+import import_manifest
+
+# Dataset the test files are imported to
+DATASET_ID = 'optimus-local.manifestds'
+
+# Modification time (ns) of the test files when they are imported
+IMPORT_MTIME = 1621260000 * 10 ** 9
+
+
+@pytest.fixture
+def importedFile(tmp_path):
+# This fixture returns a manifest with one imported file, and the file name
+
+    fileName = str(tmp_path / 'opdb__dbsummary__190.log')
+
+    with open(fileName, 'w') as collectedFile:
+        collectedFile.write('\nPKEY ,DB_NAME\nkey1 ,ORCL\n')
+
+    os.utime(fileName, ns=(IMPORT_MTIME, IMPORT_MTIME))
+
+    manifest = import_manifest.loadManifest(str(tmp_path / import_manifest.MANIFEST_FILE_NAME))
+    newFiles, skippedFiles, changedFiles = import_manifest.selectNewFiles(manifest, DATASET_ID, [fileName])
+
+    assert list(newFiles) == [fileName] and skippedFiles == [] and changedFiles == []
+
+    import_manifest.recordImportedFiles(manifest, DATASET_ID, newFiles, 'dbsummary', ['job1'])
+
+    return manifest, fileName
+
+
+def rewriteFile(fileName, fileContent, mtime=IMPORT_MTIME):
+
+    with open(fileName, 'w') as collectedFile:
+        collectedFile.write(fileContent)
+
+    os.utime(fileName, ns=(mtime, mtime))
+
+
+def test_unchangedFileIsSkipped(importedFile, monkeypatch):
+# A file with the size and modification time of the manifest is skipped without reading its content
+
+    manifest, fileName = importedFile
+
+    monkeypatch.setattr(import_manifest, 'getFileHash', lambda fileName: pytest.fail('The content of {} was read'.format(fileName)))
+
+    assert import_manifest.selectNewFiles(manifest, DATASET_ID, [fileName]) == ({}, [(fileName, 'already imported')], [])
+
+
+def test_touchedFileIsSkipped(importedFile):
+# A file with a new modification time and the same content is skipped, and its new time is kept in the manifest
+
+    manifest, fileName = importedFile
+
+    os.utime(fileName, ns=(IMPORT_MTIME + 10 ** 9, IMPORT_MTIME + 10 ** 9))
+
+    assert import_manifest.selectNewFiles(manifest, DATASET_ID, [fileName]) == ({}, [(fileName, 'already imported')], [])
+    assert manifest['datasets'][DATASET_ID][os.path.abspath(fileName)]['mtime'] == IMPORT_MTIME + 10 ** 9
+
+
+@pytest.mark.parametrize('fileContent, mtime', [
+    ('\nPKEY ,DB_NAME\nkey1 ,ORCL\nkey2 ,SALES\n', IMPORT_MTIME),
+    ('\nPKEY ,DB_NAME\nkey1 ,ORCX\n', IMPORT_MTIME + 10 ** 9),
+])
+def test_changedFileIsImported(importedFile, fileContent, mtime):
+# A file is imported again when its size changes, or when its modification time and its content hash change
+
+    manifest, fileName = importedFile
+
+    rewriteFile(fileName, fileContent, mtime)
+
+    newFiles, skippedFiles, changedFiles = import_manifest.selectNewFiles(manifest, DATASET_ID, [fileName])
+
+    assert newFiles == {fileName: {'size': len(fileContent), 'mtime': mtime, 'sha1': import_manifest.getFileHash(fileName)}}
+    assert skippedFiles == [] and changedFiles == [fileName]
+
+
+def test_duplicatedFilesAreSkipped(importedFile, tmp_path):
+# A copy of an imported file and a second copy of a new file are not imported
+
+    manifest, fileName = importedFile
+
+    copyFileName = str(tmp_path / 'copy' / 'opdb__dbsummary__190.log')
+    os.mkdir(os.path.dirname(copyFileName))
+    rewriteFile(copyFileName, '\nPKEY ,DB_NAME\nkey1 ,ORCL\n')
+
+    newFileNames = [str(tmp_path / 'opdb__dbparameters__190_{}.log'.format(fileCounter)) for fileCounter in range(2)]
+    for newFileName in newFileNames:
+        rewriteFile(newFileName, '\nPKEY ,NAME\nkey1 ,sga_target\n')
+
+    newFiles, skippedFiles, changedFiles = import_manifest.selectNewFiles(manifest, DATASET_ID, [copyFileName] + newFileNames)
+
+    assert list(newFiles) == newFileNames[:1]
+    assert skippedFiles == [(copyFileName, 'duplicate of the imported file {}'.format(os.path.abspath(fileName))), (newFileNames[1], 'duplicate of {}'.format(newFileNames[0]))]
+    assert changedFiles == []
+
+
+def test_otherDatasetImportsAllFiles(importedFile):
+
+    manifest, fileName = importedFile
+
+    assert list(import_manifest.selectNewFiles(manifest, 'optimus-local.otherds', [fileName])[0]) == [fileName]
+
+
+def test_manifestIsSavedAndLoaded(importedFile, tmp_path):
+
+    manifest, fileName = importedFile
+    manifestFileName = str(tmp_path / import_manifest.MANIFEST_FILE_NAME)
+
+    import_manifest.saveManifest(manifest, manifestFileName)
+
+    assert import_manifest.loadManifest(manifestFileName) == manifest
+    assert manifest['datasets'][DATASET_ID][os.path.abspath(fileName)]['jobIds'] == ['job1']
+    assert not os.path.exists(manifestFileName + '.tmp')
+
+    with open(manifestFileName, 'w') as manifestFile:
+        json.dump({'version': import_manifest.MANIFEST_VERSION + 1, 'datasets': {}}, manifestFile)
+
+    with pytest.raises(ValueError):
+        import_manifest.loadManifest(manifestFileName)
@@ -0,0 +1,57 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the translation of the Big Query views into SQLite SQL (local_engine.py). The translated queries are run in SQLite,
+# so a translation error shows as a wrong result or a syntax error.
+
+import pytest
+
+import local_engine
+
+
+@pytest.fixture
+def connection():
+
+    localConnection = local_engine.openLocalDatabase(':memory:')
+
+    yield localConnection
+
+    localConnection.close()
+
+
+def test_translateViewQuery():
+
+    assert local_engine.translateViewQuery('SELECT IF(a > 1, b, c), d / e, x *. 8, FROM t;') == 'SELECT IIF(a > 1, b, c), d  * 1.0 /  e, x *0.8 FROM t'
+
+
+@pytest.mark.parametrize('viewQuery', [
+    "SELECT 'a/b' AS c",
+    "SELECT 'it''s a/b' AS c",
+    'SELECT "a/b" AS c',
+    'SELECT /* a/b, IF(c) */ 1 AS c',
+    'SELECT 1 AS c -- a/b\n',
+    'SELECT 1 AS c # a/b\n',
+    'SELECT 1 AS `a/b`',
+])
+def test_translateViewQueryUntranslatedText(viewQuery):
+# The string literals, quoted identifiers and comments are not translated
+
+    assert local_engine.translateViewQuery(viewQuery) == viewQuery.strip()
+
+
+def test_translateViewQueryDivision(connection):
+
+    viewQuery = "SELECT 7 / 2 AS ratio, '7/2' AS label /* 7/2 */ -- 7/2\n, 1 / 4 AS quarter"
+
+    assert connection.execute(local_engine.translateViewQuery(viewQuery)).fetchall() == [(3.5, '7/2', 0.25)]
@@ -0,0 +1,176 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the streaming helpers reading the collected files (log_streams.py). Every helper must give the same result whatever
+# the chunk boundaries: the files are read with chunk sizes from 1 byte, so lines, \r\n pairs and headers are split between chunks.
+
+import gzip
+
+import pytest
+
+import log_streams
+
+# Chunk sizes used to read the files, 1 byte splits every line ending and header
+CHUNK_SIZES = [1, 2, 3, 5, 8, 64, log_streams.CHUNK_SIZE]
+
+
+def splitChunks(content, chunkSize):
+# This function returns content as a list of chunks of chunkSize bytes
+
+    return [content[chunkPos:chunkPos + chunkSize] for chunkPos in range(0, len(content), chunkSize)]
+
+
+@pytest.mark.parametrize('chunkSize', CHUNK_SIZES)
+def test_translateNewlines(chunkSize):
+
+    content = b'a,b\r\nc,d\re,f\n\r\ng\r'
+
+    assert b''.join(log_streams.translateNewlines(splitChunks(content, chunkSize))) == b'a,b\nc,d\ne,f\n\ng\n'
+
+
+@pytest.mark.parametrize('chunkSize', CHUNK_SIZES)
+def test_skipLeadingLines(chunkSize):
+
+    content = b'\nHEADER\nrow1\nrow2\n'
+
+    assert b''.join(log_streams.skipLeadingLines(splitChunks(content, chunkSize), 2)) == b'row1\nrow2\n'
+    assert b''.join(log_streams.skipLeadingLines(splitChunks(content, chunkSize), 5)) == b''
+
+
+@pytest.mark.parametrize('chunkSize', CHUNK_SIZES)
+def test_iterChunkLines(chunkSize):
+
+    content = b'first line\n\nthird,line\nlast line without ending'
+
+    lines = [line for chunkLines in log_streams.iterChunkLines(splitChunks(content, chunkSize)) for line in chunkLines]
+
+    assert lines == [b'first line', b'', b'third,line', b'last line without ending']
+
+
+@pytest.mark.parametrize('chunkSize', CHUNK_SIZES)
+def test_iterTableChunksKeepsFirstHeader(writeSpoolFile, chunkSize):
+# The headers of the files after the first one are skipped, and a file without line ending at its end is not merged with the next one
+
+    firstFile = writeSpoolFile('opdb__t__1.log', ['pkey', 'value'], [['k1', 1], ['k2', 2]], columnWidth=6, lineEnding='\r\n')
+    secondFile = writeSpoolFile('opdb__t__2.log', ['pkey', 'value'], [['k3', 3]], columnWidth=6)
+
+    # The last row of the second file has no line ending
+    with open(secondFile, 'rb+') as spoolFile:
+        spoolFile.truncate(len(spoolFile.read()) - 1)
+
+    tableContent = b''.join(log_streams.iterTableChunks([firstFile, secondFile], chunkSize=chunkSize, terminateLines=True))
+
+    assert tableContent == b'\nPKEY  ,VALUE\nk1    ,1\nk2    ,2\nk3    ,3'
+
+
+@pytest.mark.parametrize('chunkSize', CHUNK_SIZES)
+def test_normalizeSpoolChunks(chunkSize):
+# Padding, blank lines, separator lines and the column names repeated on every page are removed
+
+    content = b'\nPKEY  ,VALUE\n------,-----\nk1    ,   1\n\nPKEY  ,VALUE\n------,-----\nk2    ,   2\n  \n'
+
+    assert b''.join(log_streams.normalizeSpoolChunks(splitChunks(content, chunkSize))) == b'PKEY,VALUE\nk1,1\nk2,2\n'
+
+
+@pytest.mark.parametrize('chunkSize', CHUNK_SIZES)
+def test_normalizeSpoolChunksQuotedValues(chunkSize):
+# The commas and blanks between the quotes are part of the value
+
+    content = b'\nPKEY  ,NAME          ,VALUE\n------,--------------,-----\nk1    ,"a, b  ,c"    ,   1\n'
+
+    assert b''.join(log_streams.normalizeSpoolChunks(splitChunks(content, chunkSize))) == b'PKEY,NAME,VALUE\nk1,"a, b  ,c",1\n'
+
+
+@pytest.mark.parametrize('line, fields', [
+    (b'a,b,', [b'a', b'b', b'']),
+    (b'a,"b,c",d', [b'a', b'b,c', b'd']),
+    (b'"a ""b"", c",', [b'a "b", c', b'']),
+    (b' "a,b" ,c', [b'a,b', b'c']),
+    (b'a,"b,c', [b'a', b'"b,c']),
+])
+def test_splitCsvLine(line, fields):
+
+    assert log_streams.splitCsvLine(line) == fields
+
+
+@pytest.mark.parametrize('chunkSize', CHUNK_SIZES)
+def test_iterNormalizedTableChunks(writeSpoolFile, chunkSize):
+
+    fileList = [
+        writeSpoolFile('opdb__t__1.log', ['pkey', 'value'], [['k{}'.format(rowCounter), rowCounter] for rowCounter in range(7)], pageRows=3, lineEnding='\r\n'),
+        writeSpoolFile('opdb__t__2.log', ['pkey', 'value'], [['k7', 7]]),
+    ]
+
+    normalizedContent = b''.join(log_streams.iterNormalizedTableChunks(fileList, chunkSize=chunkSize))
+
+    assert normalizedContent == b'PKEY,VALUE\n' + b''.join('k{},{}\n'.format(rowCounter, rowCounter).encode('ascii') for rowCounter in range(8))
+
+
+@pytest.mark.parametrize('chunkSize', CHUNK_SIZES)
+def test_consolidateTable(writeSpoolFile, tmp_path, chunkSize):
+
+    fileList = [
+        writeSpoolFile('opdb__t__1.log', ['pkey', 'value'], [['k1', 1], ['k2', 2]]),
+        writeSpoolFile('opdb__t__2.log', ['pkey', 'value'], [['k3', 3]]),
+    ]
+
+    targetFileName = str(tmp_path / 'opalldb__t__consolidate.log')
+    consolidationStats = log_streams.consolidateTable('t', fileList, targetFileName, chunkSize=chunkSize)
+
+    with open(targetFileName, 'rb') as targetFile:
+        consolidatedLines = targetFile.read().split(b'\n')
+
+    assert consolidatedLines[:2] == [b'', b'PKEY            ,VALUE']
+    assert [line.split(b',')[0].strip() for line in consolidatedLines[2:] if line] == [b'k1', b'k2', b'k3']
+    assert consolidationStats['files'] == 2
+    assert consolidationStats['rows'] == 3
+
+
+def test_countAndTimeChunks():
+
+    streamStats = {}
+    chunks = list(log_streams.timeChunks(log_streams.countChunks(iter([b'abc', b'', b'de']), streamStats, 'bytes'), streamStats, 'seconds'))
+
+    assert chunks == [b'abc', b'', b'de']
+    assert streamStats['bytes'] == 5
+    assert streamStats['seconds'] >= 0
+
+
+def test_gzipChunks():
+
+    content = b''.join('row {}\n'.format(rowCounter).encode('ascii') for rowCounter in range(10000))
+
+    assert gzip.decompress(b''.join(log_streams.gzipChunks(splitChunks(content, 1000)))) == content
+
+
+@pytest.mark.parametrize('readSize', [1, 3, 7, 100, -1])
+def test_tableLogStream(readSize):
+# Reads of any size return the stream content in order, and tell() is the number of bytes read
+
+    content = b'0123456789' * 5
+    tableStream = log_streams.TableLogStream(splitChunks(content, 4))
+
+    readContent = b''
+
+    while True:
+
+        buffer = tableStream.read(readSize)
+
+        if not buffer:
+            break
+
+        readContent = readContent + buffer
+        assert tableStream.tell() == len(readContent)
+
+    assert readContent == content
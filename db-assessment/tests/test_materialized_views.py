@@ -0,0 +1,64 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the refresh queries of the materialized views (materialized_views.py), run against the local stand-in of Big Query.
+# A refresh writes the rows of the collection keys missing from the table, once, whatever keys (NULL included) the table has already.
+
+import pytest
+
+import local_bigquery
+import materialized_views
+
+# View materialized by the tests and the query it stands for
+VIEW_NAME = 'vtest'
+VIEW_QUERY = 'SELECT ckey, value FROM matds.source'
+
+
+@pytest.fixture
+def backend():
+
+    localBackend = local_bigquery.LocalBigQueryBackend()
+    localBackend.createDataset('optimus-local.matds')
+    localBackend.connection.execute('CREATE TABLE matds.source (ckey TEXT, value INTEGER)')
+    localBackend.connection.executemany('INSERT INTO matds.source VALUES (?, ?)', [('c1', 1), (None, 2)])
+    localBackend.connection.commit()
+
+    return localBackend
+
+
+def refreshView(backend, fullRefresh):
+# This function refreshes the materialized table of the test view and returns the number of rows written
+
+    refreshQuery = materialized_views.getRefreshQuery('matds', VIEW_NAME, VIEW_QUERY, fullRefresh)
+
+    return backend.materializeQuery('optimus-local.matds.' + materialized_views.getMaterializedTableName(VIEW_NAME), refreshQuery,
+                                    materialized_views.CLUSTERING_FIELDS, {}, fullRefresh)
+
+
+def getMaterializedRows(backend):
+
+    return backend.connection.execute('SELECT ckey, value FROM matds.{} ORDER BY value'.format(materialized_views.getMaterializedTableName(VIEW_NAME))).fetchall()
+
+
+def test_refreshWritesNewCollections(backend):
+# The table has a NULL ckey: the rows of the new collection are written anyway, the rows already in the table are not written again
+
+    assert refreshView(backend, True) == 2
+
+    backend.connection.execute("INSERT INTO matds.source VALUES ('c2', 3)")
+    backend.connection.commit()
+
+    assert refreshView(backend, False) == 1
+    assert refreshView(backend, False) == 0
+    assert getMaterializedRows(backend) == [('c1', 1), (None, 2), ('c2', 3)]
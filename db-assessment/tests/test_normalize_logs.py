@@ -0,0 +1,117 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the normalization of the collected files into Avro files (normalize_logs.py). The Avro files are written without any
+# Avro library, so they are read back with fastavro, an independent reader, to check they are valid container files with the right values.
+
+import decimal
+
+import pytest
+
+import normalize_logs
+
+fastavro = pytest.importorskip('fastavro')
+
+SCHEMA_FIELDS = (('pkey', 'STRING'), ('value', 'INT64'), ('ratio', 'FLOAT64'), ('amount', 'NUMERIC'))
+
+
+def readAvroFile(fileName):
+# This function returns the writer schema and the records of an Avro file read by fastavro
+
+    with open(fileName, 'rb') as avroFile:
+        avroReader = fastavro.reader(avroFile)
+        return avroReader.writer_schema, list(avroReader)
+
+
+@pytest.mark.parametrize('chunkSize', [1, 7, 1024 * 1024])
+def test_normalizeTableToAvro(writeSpoolFile, tmp_path, chunkSize):
+
+    fileList = [
+        writeSpoolFile('opdb__t__1.log', [fieldName for fieldName, fieldType in SCHEMA_FIELDS], [['k1', 1, 0.5, '12.25'], ['k2', -300, '', '-0.000000001'], ['', '', '1.5E+10', '']], pageRows=2),
+        writeSpoolFile('opdb__t__2.log', [fieldName for fieldName, fieldType in SCHEMA_FIELDS], [['k4', 2 ** 40, 3, '99999999999999999999']], lineEnding='\r\n'),
+    ]
+
+    targetFileName = str(tmp_path / 'opnormalized__t__.avro')
+    normalizationStats = normalize_logs.normalizeTableToAvro('t', fileList, SCHEMA_FIELDS, targetFileName, chunkSize)
+
+    writerSchema, records = readAvroFile(targetFileName)
+
+    assert [avroField['name'] for avroField in writerSchema['fields']] == [fieldName for fieldName, fieldType in SCHEMA_FIELDS]
+    assert records == [
+        {'pkey': 'k1', 'value': 1, 'ratio': 0.5, 'amount': decimal.Decimal('12.250000000')},
+        {'pkey': 'k2', 'value': -300, 'ratio': None, 'amount': decimal.Decimal('-1E-9')},
+        {'pkey': None, 'value': None, 'ratio': 1.5e10, 'amount': None},
+        {'pkey': 'k4', 'value': 2 ** 40, 'ratio': 3.0, 'amount': decimal.Decimal('99999999999999999999')},
+    ]
+    assert normalizationStats['rows'] == 4
+    assert normalizationStats['files'] == 2
+
+
+def test_normalizeTableToAvroBlocks(writeSpoolFile, tmp_path, monkeypatch):
+# Tables with more rows than a block are written in many compressed blocks
+
+    monkeypatch.setattr(normalize_logs, 'AVRO_BLOCK_RECORDS', 10)
+
+    fileName = writeSpoolFile('opdb__t__1.log', ['pkey', 'value', 'ratio', 'amount'], [['k{}'.format(rowCounter), rowCounter, rowCounter, rowCounter] for rowCounter in range(95)])
+    targetFileName = str(tmp_path / 'opnormalized__t__.avro')
+
+    normalize_logs.normalizeTableToAvro('t', [fileName], SCHEMA_FIELDS, targetFileName)
+
+    with open(targetFileName, 'rb') as avroFile:
+        avroBlocks = list(fastavro.block_reader(avroFile))
+
+    assert len(avroBlocks) == 10
+    assert [record['value'] for avroBlock in avroBlocks for record in avroBlock] == list(range(95))
+
+
+def test_normalizeTableToAvroQuotedValues(writeSpoolFile, tmp_path):
+# A value between double quotes can have commas, as in the Big Query CSV loads
+
+    targetFileName = str(tmp_path / 'opnormalized__t__.avro')
+
+    fileName = writeSpoolFile('opdb__t__1.log', ['pkey', 'value', 'ratio', 'amount'], [['"k1, ""x"""', 1, 0.5, 2]])
+
+    normalize_logs.normalizeTableToAvro('t', [fileName], SCHEMA_FIELDS, targetFileName)
+
+    assert [record['pkey'] for record in readAvroFile(targetFileName)[1]] == ['k1, "x"']
+
+
+def test_normalizeTableToAvroRejectsBadRows(writeSpoolFile, tmp_path):
+
+    targetFileName = str(tmp_path / 'opnormalized__t__.avro')
+
+    fileName = writeSpoolFile('opdb__t__1.log', ['pkey', 'value', 'ratio', 'amount'], [['k1', 'not a number', 1, 1]])
+
+    with pytest.raises(ValueError, match='row 2 does not match the schema of table t'):
+        normalize_logs.normalizeTableToAvro('t', [fileName], SCHEMA_FIELDS, targetFileName)
+
+    fileName = writeSpoolFile('opdb__t__2.log', ['pkey', 'value', 'ratio'], [['k1', 1, 1]])
+
+    with pytest.raises(ValueError, match='row 2 has 3 columns but table t has 4 columns'):
+        normalize_logs.normalizeTableToAvro('t', [fileName], SCHEMA_FIELDS, targetFileName)
+
+
+@pytest.mark.parametrize('value', [0, 1, -1, 63, -64, 64, 2 ** 31, -2 ** 63, 2 ** 63 - 1])
+def test_encodeLong(value, tmp_path):
+# The zig-zag varint encoding is the one of the Avro specification
+
+    avroSchema = normalize_logs.getAvroSchema('t', (('value', 'INT64'),))
+    targetFileName = str(tmp_path / 'long.avro')
+
+    with open(targetFileName, 'wb') as targetFile:
+        avroWriter = normalize_logs.AvroWriter(targetFile, avroSchema)
+        avroWriter.writeRecord(normalize_logs.getFieldEncoder('INT64')(str(value).encode('ascii')))
+        avroWriter.flush()
+
+    assert readAvroFile(targetFileName)[1] == [{'value': value}]
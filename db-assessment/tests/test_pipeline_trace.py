@@ -0,0 +1,148 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the instrumentation of the import runs (pipeline_trace.py). A traced import of two tables runs against the local stand-in of
+# Big Query, and the spans and counters written to the trace file (--tracefile) and to the metrics file (--metricsfile) are checked.
+
+import json
+
+import pytest
+
+import api_retry
+import import_db_assessment
+import local_bigquery
+import pipeline_trace
+
+# Rows of the collected files of the traced import, by table
+TABLE_ROWS = {
+    'dbsummary': [['host1_db1_0517', '1234', 'DB1', 'NO', '19.0.0.0']],
+    'dbinstances': [['host1_db1_0517', '1', 'db11', 'host1', '19.0.0.0'], ['host1_db1_0517', '2', 'db12', 'host2', '19.0.0.0']],
+}
+
+
+@pytest.fixture
+def tracedImport(monkeypatch, tmp_path, writeSpoolFile):
+# This fixture runs a traced import of the files of TABLE_ROWS into the local stand-in of Big Query, two tables at a time,
+# and returns the records of the trace file and the lines of the metrics file
+
+    monkeypatch.setattr(import_db_assessment, 'retryPolicy', api_retry.RetryPolicy(maxRetries=3, baseDelay=0))
+
+    localBackend = local_bigquery.LocalBigQueryBackend()
+    localBackend.createDataset('optimus-local.traceds')
+    monkeypatch.setattr(import_db_assessment, 'client', localBackend)
+
+    fileList = []
+
+    for tableName, tableRows in TABLE_ROWS.items():
+        columnNames = [fieldName for fieldName, fieldType in import_db_assessment.schema_registry.getTableSchema(tableName)]
+        fileList.append(writeSpoolFile('opdb__{}__190.log'.format(tableName), columnNames, [tableRow + [''] * (len(columnNames) - len(tableRow)) for tableRow in tableRows]))
+
+    traceFileName = str(tmp_path / 'trace.jsonl')
+    metricsFileName = str(tmp_path / 'metrics.prom')
+
+    pipelineTracer = pipeline_trace.PipelineTracer(traceFileName, metricsFileName)
+    monkeypatch.setattr(import_db_assessment, 'tracer', pipelineTracer)
+
+    with pipelineTracer.span('import run', dataset='traceds'):
+        assert import_db_assessment.importAllCSVsToBQ(None, 'traceds', fileList, 2, loadJobs=2)
+
+    pipelineTracer.finish()
+
+    with open(traceFileName) as traceFile:
+        traceRecords = [json.loads(traceLine) for traceLine in traceFile]
+
+    with open(metricsFileName) as metricsFile:
+        metricsLines = metricsFile.read().splitlines()
+
+    return traceRecords, metricsLines
+
+
+def test_traceFileSpans(tracedImport):
+# Every table is loaded in a span nested in the run, with its upload and its job wait nested in the load span
+
+    traceRecords, metricsLines = tracedImport
+
+    spans = [traceRecord for traceRecord in traceRecords if traceRecord['type'] == 'span']
+    runSpan, = [span for span in spans if span['name'] == 'import run']
+    loadSpans = {span['attributes']['table']: span for span in spans if span['name'] == 'load table'}
+
+    assert runSpan['parentId'] is None and runSpan['attributes'] == {'dataset': 'traceds'}
+    assert sorted(loadSpans) == sorted(TABLE_ROWS)
+
+    for tableName, loadSpan in loadSpans.items():
+
+        assert loadSpan['parentId'] == runSpan['spanId']
+        assert loadSpan['status'] == 'OK'
+        assert loadSpan['attributes']['status'] == 'LOADED' and loadSpan['attributes']['files'] == 1 and len(loadSpan['attributes']['jobIds']) == 1
+        assert loadSpan['attributes']['queueSeconds'] >= 0 and loadSpan['thread'] != runSpan['thread']
+
+        childSpans = sorted(span['name'] for span in spans if span['parentId'] == loadSpan['spanId'])
+        assert childSpans == ['job wait', 'upload']
+
+        assert runSpan['start'] <= loadSpan['start'] and loadSpan['start'] + loadSpan['seconds'] <= runSpan['start'] + runSpan['seconds'] + 1e-3
+
+    # The spans are written when they end, the counters when the run ends
+    assert [traceRecord['type'] for traceRecord in traceRecords] == ['span'] * len(spans) + ['counter'] * (len(traceRecords) - len(spans))
+    assert spans[-1] == runSpan
+
+
+def test_traceFileCounters(tracedImport):
+
+    traceRecords, metricsLines = tracedImport
+
+    counters = {(traceRecord['name'], tuple(sorted(traceRecord['labels'].items()))): traceRecord['value'] for traceRecord in traceRecords if traceRecord['type'] == 'counter'}
+
+    assert counters[('load_tables', (('status', 'LOADED'),))] == len(TABLE_ROWS)
+    assert counters[('tasks', (('task', 'load table'),))] == len(TABLE_ROWS)
+
+    for tableName, tableRows in TABLE_ROWS.items():
+        assert counters[('loaded_rows', (('table', tableName),))] == len(tableRows)
+        assert counters[('upload_bytes', (('table', tableName),))] > 0
+
+
+def test_metricsFile(tracedImport):
+# The metrics file has the counters and the number of spans by name in the Prometheus text format
+
+    traceRecords, metricsLines = tracedImport
+
+    assert '# TYPE optimus_import_loaded_rows_total counter' in metricsLines
+    assert 'optimus_import_load_tables_total{status="LOADED"} 2' in metricsLines
+    assert 'optimus_import_spans_total{span="load table"} 2' in metricsLines
+    assert 'optimus_import_spans_total{span="import run"} 1' in metricsLines
+
+    for tableName, tableRows in TABLE_ROWS.items():
+        assert 'optimus_import_loaded_rows_total{{table="{}"}} {}'.format(tableName, len(tableRows)) in metricsLines
+
+    spanSeconds = [metricsLine for metricsLine in metricsLines if metricsLine.startswith('optimus_import_span_seconds_total{span="load table"} ')]
+    assert len(spanSeconds) == 1 and float(spanSeconds[0].split()[-1]) >= 0
+
+
+def test_failedSpan(tmp_path):
+# A span whose block raises ends with the status ERROR and the exception goes on
+
+    traceFileName = str(tmp_path / 'trace.jsonl')
+    pipelineTracer = pipeline_trace.PipelineTracer(traceFileName)
+
+    with pytest.raises(RuntimeError):
+        with pipelineTracer.span('import run'), pipelineTracer.span('load table', table='dbsummary'):
+            raise RuntimeError('load failed')
+
+    pipelineTracer.addCounter('load_tables', status='FAILED', table=None)
+    pipelineTracer.finish()
+
+    with open(traceFileName) as traceFile:
+        traceRecords = [json.loads(traceLine) for traceLine in traceFile]
+
+    assert [(traceRecord['name'], traceRecord.get('status'), traceRecord.get('parentId')) for traceRecord in traceRecords] == [('load table', 'ERROR', 1), ('import run', 'ERROR', None), ('load_tables', None, None)]
+    assert traceRecords[-1]['labels'] == {'status': 'FAILED'}
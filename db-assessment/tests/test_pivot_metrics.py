@@ -0,0 +1,153 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the pivot of the AWR metric tables into their wide tables (pivot_metrics.py). The Avro files are read back with fastavro
+
+import pytest
+
+import pivot_metrics
+
+fastavro = pytest.importorskip('fastavro')
+
+# Columns spooled by the collector scripts for awrhistsysmetrichist (the 11g collector has no con_id)
+SYSMETRIC_COLUMNS = ['pkey', 'con_id', 'dbid', 'instance_number', 'hour', 'metric_name', 'metric_unit', 'avg_value', 'mode_value', 'median_value', 'min_value', 'max_value', 'sum_value', 'perc50', 'perc75', 'perc90', 'perc95', 'perc100']
+
+
+def getSysmetricRow(instanceNumber, hour, metricName, perc95, perc100, conId='0'):
+# This function returns a row of awrhistsysmetrichist with the given percentiles
+
+    sysmetricRow = ['host_db_210517143005', conId, '1234', instanceNumber, hour, metricName, 'Unit', 1, 1, 1, 1, 1, 1, 1, 1, 1, perc95, perc100]
+
+    return sysmetricRow if conId is not None else sysmetricRow[:1] + sysmetricRow[2:]
+
+
+def readPivotedRows(fileName):
+# This function returns the records of a pivoted Avro file read by fastavro, sorted by their key
+
+    with open(fileName, 'rb') as avroFile:
+        return sorted(fastavro.reader(avroFile), key=lambda record: (record['instance_number'], record['hour']))
+
+
+@pytest.mark.parametrize('chunkSize', [1, 5, 1024 * 1024])
+def test_pivotSysmetricHistory(writeSpoolFile, tmp_path, chunkSize):
+# The metric rows of an hour are pivoted into a row. The values of the same metric and hour are added up, except for the maximum of
+# the background CPU usage. The metrics not pivoted create their row without values and an empty value is NULL
+
+    sysmetricRows = [
+        getSysmetricRow('1', '00', 'CPU Usage Per Sec', 10, 20),
+        getSysmetricRow('1', '00', 'CPU Usage Per Sec', 5, 7),
+        getSysmetricRow('1', '00', 'Background CPU Usage Per Sec', 3, 40),
+        getSysmetricRow('1', '00', 'Background CPU Usage Per Sec', 4, 30),
+        getSysmetricRow('1', '01', 'Logons Per Sec', '', 9),
+        getSysmetricRow('2', '00', 'Unknown Metric', 1, 1),
+    ]
+
+    fileName = writeSpoolFile('opdb__awrhistsysmetrichist__190.log', SYSMETRIC_COLUMNS, sysmetricRows, pageRows=4)
+    targetFileName = str(tmp_path / 'oppivoted__awrhistsysmetrichist_pivot__.avro')
+
+    pivotStats = pivot_metrics.pivotTableToAvro('awrhistsysmetrichist', [fileName], targetFileName, chunkSize)
+
+    pivotedRows = readPivotedRows(targetFileName)
+
+    assert pivotStats['rowsRead'] == 6
+    assert pivotStats['rows'] == 3
+    assert [(pivotedRow['ckey'], pivotedRow['con_id'], pivotedRow['dbid'], pivotedRow['instance_number'], pivotedRow['hour']) for pivotedRow in pivotedRows] == [
+        ('host_db_210517143005', '0', '1234', '1', '00'),
+        ('host_db_210517143005', '0', '1234', '1', '01'),
+        ('host_db_210517143005', '0', '1234', '2', '00'),
+    ]
+
+    assert pivotedRows[0]['cpu_usage_per_sec_perc95'] == 15
+    assert pivotedRows[0]['cpu_usage_per_sec_max'] == 27
+    assert pivotedRows[0]['bkgr_cpu_usage_per_sec_perc95'] == 7
+    assert pivotedRows[0]['bkgr_cpu_usage_per_sec_max'] == 40
+    assert pivotedRows[0]['logons_per_sec_max'] is None
+
+    assert pivotedRows[1]['logons_per_sec_perc95'] is None
+    assert pivotedRows[1]['logons_per_sec_max'] == 9
+
+    assert all(fieldValue is None for fieldName, fieldValue in pivotedRows[2].items() if fieldName.endswith(('_perc95', '_max')))
+
+
+def test_pivotMixesCollectors(writeSpoolFile, tmp_path):
+# The files of the 11g collector have no con_id: their rows are pivoted with a NULL con_id, in their own rows
+
+    fileList = [
+        writeSpoolFile('opdb__awrhistsysmetrichist__190.log', SYSMETRIC_COLUMNS, [getSysmetricRow('1', '00', 'Logons Per Sec', 1, 2)]),
+        writeSpoolFile('opdb__awrhistsysmetrichist__112.log', [columnName for columnName in SYSMETRIC_COLUMNS if columnName != 'con_id'], [getSysmetricRow('1', '00', 'Logons Per Sec', 3, 4, conId=None)]),
+    ]
+
+    targetFileName = str(tmp_path / 'oppivoted__awrhistsysmetrichist_pivot__.avro')
+    pivot_metrics.pivotTableToAvro('awrhistsysmetrichist', fileList, targetFileName)
+
+    pivotedRows = readPivotedRows(targetFileName)
+
+    assert sorted((pivotedRow['con_id'] or '', pivotedRow['logons_per_sec_max']) for pivotedRow in pivotedRows) == [('', 4), ('0', 2)]
+
+
+def test_pivotRejectsBadFiles(writeSpoolFile, tmp_path):
+
+    targetFileName = str(tmp_path / 'oppivoted__awrhistsysmetrichist_pivot__.avro')
+
+    fileName = writeSpoolFile('opdb__awrhistsysmetrichist__1.log', SYSMETRIC_COLUMNS, [getSysmetricRow('1', '00', 'Logons Per Sec', 'x', 2)])
+
+    with pytest.raises(ValueError, match='not an integer'):
+        pivot_metrics.pivotTableToAvro('awrhistsysmetrichist', [fileName], targetFileName)
+
+    fileName = writeSpoolFile('opdb__awrhistsysmetrichist__2.log', SYSMETRIC_COLUMNS[:-1], [getSysmetricRow('1', '00', 'Logons Per Sec', 1, 2)[:-1]])
+
+    with pytest.raises(ValueError, match='the header has no column perc100'):
+        pivot_metrics.pivotTableToAvro('awrhistsysmetrichist', [fileName], targetFileName)
+
+
+def test_pivotSchemasMatchSpecs():
+# The wide tables of the schema registry have the key and value columns of their pivot
+
+    for tableName in pivot_metrics.PIVOT_TABLES:
+        assert pivot_metrics.getPivotSchemaFields(tableName)
+
+
+# Column headings spooled by the collector scripts for awrhistosstat (hh24, hh24_total_secs and count are not the names of the table schema)
+OSSTAT_COLUMNS = ['PKEY', 'TOTAL_AWR_SECS', 'CON_ID', 'DBID', 'INSTANCE_NUMBER', 'HH24', 'STAT_NAME', 'HH24_TOTAL_SECS', 'AVG_VALUE', 'MODE_VALUE', 'MEDIAN_VALUE', 'PERC50', 'PERC75', 'PERC90', 'PERC95', 'PERC100', 'MIN_VALUE', 'MAX_VALUE', 'SUM_VALUE', 'COUNT']
+
+
+def test_pivotOsstatCollectorHeadings(writeSpoolFile, tmp_path):
+# Every hour of every instance is a row of its own: 8 CPUs per hour, not the CPUs of all hours added up
+
+    osstatRows = []
+    for instanceNumber in ('1', '2'):
+        for hour in range(24):
+            osstatRows.append(['host_db_210517143005', '86400', '0', '1234', instanceNumber, '{:02d}'.format(hour), 'NUM_CPUS', '3600', 8, 8, 8, 8, 8, 8, 8, 8, 8, 8, 48, 6])
+            osstatRows.append(['host_db_210517143005', '86400', '0', '1234', instanceNumber, '{:02d}'.format(hour), 'LOAD', '3600', 1, 1, 2, 1, 1, 1, 1, 1, 1, 1, 6, 6])
+
+    fileName = writeSpoolFile('opdb__awrhistosstat__190.log', OSSTAT_COLUMNS, osstatRows)
+    targetFileName = str(tmp_path / 'oppivoted__awrhistosstat_pivot__.avro')
+
+    pivotStats = pivot_metrics.pivotTableToAvro('awrhistosstat', [fileName], targetFileName)
+
+    pivotedRows = readPivotedRows(targetFileName)
+
+    assert pivotStats['rows'] == 48
+    assert [pivotedRow['hour'] for pivotedRow in pivotedRows if pivotedRow['instance_number'] == '1'] == ['{:02d}'.format(hour) for hour in range(24)]
+    assert {pivotedRow['hour_total_secs'] for pivotedRow in pivotedRows} == {'3600'}
+    assert {(pivotedRow['num_cpus'], pivotedRow['load']) for pivotedRow in pivotedRows} == {(8, 2)}
+
+
+def test_pivotRejectsMissingKeyColumns(writeSpoolFile, tmp_path):
+# Only con_id can be missing: without the hour every row of an instance would be in the same group
+
+    fileName = writeSpoolFile('opdb__awrhistsysmetrichist__190.log', [columnName for columnName in SYSMETRIC_COLUMNS if columnName != 'hour'], [getSysmetricRow('1', '00', 'Logons Per Sec', 1, 2)[:4] + getSysmetricRow('1', '00', 'Logons Per Sec', 1, 2)[5:]])
+
+    with pytest.raises(ValueError, match='the header has no column hour'):
+        pivot_metrics.pivotTableToAvro('awrhistsysmetrichist', [fileName], str(tmp_path / 'oppivoted__awrhistsysmetrichist_pivot__.avro'))
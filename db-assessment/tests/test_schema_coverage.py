@@ -0,0 +1,102 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the coverage of the collector scripts by the table schema registry (schema_coverage.py)
+
+import pytest
+
+import schema_coverage
+import schema_registry
+
+SCRIPT_TEXT = '''
+column graph format a25 heading "GRAPH (X=5%)"
+spool opdb__headings__&v_tag
+
+SELECT '&&v_host' || '_' || '&&v_hora' AS pkey,
+       a.con_id,
+       '&&v_total_secs'          total_awr_secs, -- seconds, of the AWR history
+       TO_CHAR(begin_time, 'hh24') hh24,
+       COUNT(1),
+       SUM(value) / 1024 "Size, KB",
+       CASE WHEN value > 0 THEN 'X' END graph,
+       /* value, */ value
+FROM   dba_hist_osstat a
+WHERE  stat_name IN ('A, B', 'C');
+
+spool off
+spool opdb__stars__&v_tag
+
+WITH named_query AS (SELECT owner, COUNT(1) count FROM dba_objects GROUP BY owner)
+SELECT '&&v_host' AS pkey, a.*
+FROM   named_query a;
+
+spool off
+spool opdb__inline__&v_tag
+
+SELECT *
+FROM   (SELECT owner, MAX(created) last_created FROM dba_objects GROUP BY owner)
+WHERE  ROWNUM < 10;
+
+spool off
+'''
+
+
+@pytest.fixture
+def scriptFileName(tmp_path):
+
+    scriptFile = tmp_path / 'collector.sql'
+    scriptFile.write_text(SCRIPT_TEXT)
+
+    return str(scriptFile)
+
+
+def test_spooledColumnHeadings(scriptFileName):
+# The headings are the aliases, the column names without qualifier, the text of the expressions without alias and the headings of the
+# column commands. The commas of the comments, strings and function calls do not split the columns
+
+    spooledColumns = schema_coverage.getSpooledColumns(scriptFileName)
+
+    assert spooledColumns['headings'] == ['PKEY', 'CON_ID', 'TOTAL_AWR_SECS', 'HH24', 'COUNT(1)', 'Size, KB', 'GRAPH (X=5%)', 'VALUE']
+
+
+def test_spooledColumnStars(scriptFileName):
+# A star is expanded with the columns of the named query or the inline view read by the query
+
+    spooledColumns = schema_coverage.getSpooledColumns(scriptFileName)
+
+    assert spooledColumns['stars'] == ['PKEY', 'OWNER', 'COUNT']
+    assert spooledColumns['inline'] == ['OWNER', 'LAST_CREATED']
+    assert schema_coverage.getSpooledTables(scriptFileName) == ['headings', 'stars', 'inline']
+
+
+def test_maskSqlText():
+
+    assert schema_coverage.maskSqlText("SELECT 'it''s, a' x, -- a, b\n y /* c, d */ FROM t") == "SELECT '' x, \n y   FROM t"
+
+
+@pytest.mark.parametrize('scriptFileName, schemaVariant', schema_coverage.COLLECTOR_SCRIPTS)
+def test_collectorQueriesMatchSchemas(scriptFileName, schemaVariant):
+# Every table spooled by the collector scripts has a table schema with the columns of its query
+
+    spooledColumns = schema_coverage.getSpooledColumns(scriptFileName)
+
+    for tableName in schema_coverage.getSpooledTables(scriptFileName):
+
+        schemaFields = schema_registry.getTableSchema(tableName, schemaVariant)
+
+        assert schemaFields is not None, tableName
+        assert spooledColumns[tableName] is not None, tableName
+        assert len(spooledColumns[tableName]) == len(schemaFields), tableName
+
+    assert [scriptCoverage['columnMismatches'] for scriptCoverage in schema_coverage.getSchemaCoverage()['scripts']] == [[], []]
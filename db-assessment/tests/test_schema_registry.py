@@ -0,0 +1,37 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the table schema registry (schema_registry.py)
+
+import schema_registry
+
+
+def test_schemaDifferences():
+# The legacy type names reported by the Big Query API are the same types as the standard names of the registry
+
+    schemaFields = (('pkey', 'STRING'), ('value', 'INT64'), ('size', 'NUMERIC'), ('ratio', 'FLOAT64'))
+
+    assert schema_registry.getSchemaDifferences((('PKEY', 'STRING'), ('value', 'INTEGER'), ('size', 'NUMERIC'), ('ratio', 'FLOAT')), schemaFields) == []
+    assert schema_registry.getSchemaDifferences((('pkey', 'STRING'), ('value', 'STRING'), ('size', 'STRING'), ('ratio', 'FLOAT')), schemaFields) == ['value is STRING instead of INT64', 'size is STRING instead of NUMERIC']
+    assert schema_registry.getSchemaDifferences((('pkey', 'STRING'), ('value', 'INTEGER')), schemaFields) == ['the table has the columns pkey, value instead of pkey, value, size, ratio']
+
+
+def test_migrationProblems():
+# STRING columns are cast, the columns of the registry missing in the table are NULL. Other columns and types would lose values
+
+    schemaFields = (('pkey', 'STRING'), ('value', 'INT64'), ('ratio', 'FLOAT64'))
+
+    assert schema_registry.getMigrationProblems((('PKEY', 'STRING'), ('value', 'STRING'), ('ratio', 'FLOAT')), schemaFields) == []
+    assert schema_registry.getMigrationProblems((('pkey', 'STRING'), ('value', 'STRING')), schemaFields) == []
+    assert schema_registry.getMigrationProblems((('pkey', 'STRING'), ('value', 'FLOAT64'), ('amount', 'STRING')), schemaFields) == ['value is FLOAT64 instead of INT64', 'amount is not in the table schema']
@@ -0,0 +1,86 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the creation levels of the Optimus Prime views (view_dependencies.py): a view is created in a later level than all views it
+# references, the views of opViews/ are sorted without errors and the views that cannot be sorted raise ValueError.
+
+import pytest
+
+import import_db_assessment
+import view_dependencies
+
+# Tables of the dataset referenced by the test views
+TABLE_NAMES = ['dbsummary', 'dbparameters']
+
+
+def test_getViewReferences():
+
+    assert view_dependencies.getViewReferences('SELECT a.x FROM ${dataset}.va a JOIN ${dataset}.dbsummary b ON a.ckey = b.pkey JOIN ${dataset}.va c USING (ckey)') == {'va', 'dbsummary'}
+    assert view_dependencies.getViewReferences('SELECT 1 FROM dataset.va') == set()
+
+
+@pytest.mark.parametrize('viewQueries, expectedLevels', [
+    ({'va': 'SELECT * FROM ${dataset}.dbsummary'}, [['va']]),
+    ({
+        'vd': 'SELECT * FROM ${dataset}.vb JOIN ${dataset}.vc USING (ckey)',
+        'vc': 'SELECT * FROM ${dataset}.va JOIN ${dataset}.dbparameters USING (ckey)',
+        'vb': 'SELECT * FROM ${dataset}.va',
+        'va': 'SELECT * FROM ${dataset}.dbsummary',
+        've': 'SELECT * FROM ${dataset}.dbparameters',
+    }, [['va', 've'], ['vb', 'vc'], ['vd']]),
+    ({
+        'vc': 'SELECT * FROM ${dataset}.va JOIN ${dataset}.vb USING (ckey)',
+        'vb': 'SELECT * FROM ${dataset}.va',
+        'va': 'SELECT * FROM ${dataset}.dbsummary',
+    }, [['va'], ['vb'], ['vc']]),
+    ({}, []),
+])
+def test_getViewLevels(viewQueries, expectedLevels):
+# A view is in the level after the last level of the views it references, and the views of a level are sorted by name
+
+    assert view_dependencies.getViewLevels(viewQueries, TABLE_NAMES) == expectedLevels
+
+
+@pytest.mark.parametrize('viewQueries, errorMessage', [
+    ({'va': 'SELECT * FROM ${dataset}.vb', 'vb': 'SELECT * FROM ${dataset}.va'}, 'cycle or depend on one: va, vb'),
+    ({'va': 'SELECT * FROM ${dataset}.vb', 'vb': 'SELECT * FROM ${dataset}.vc', 'vc': 'SELECT * FROM ${dataset}.va', 'vd': 'SELECT * FROM ${dataset}.va', 've': 'SELECT * FROM ${dataset}.dbsummary'},
+     'cycle or depend on one: va, vb, vc, vd'),
+    ({'va': 'SELECT * FROM ${dataset}.va'}, 'va references itself'),
+    ({'va': 'SELECT * FROM ${dataset}.dbsummary JOIN ${dataset}.vmissing USING (ckey) JOIN ${dataset}.awrmissing USING (ckey)'}, 'neither views nor tables: awrmissing, vmissing'),
+])
+def test_getViewLevelsErrors(viewQueries, errorMessage):
+
+    with pytest.raises(ValueError, match=errorMessage):
+        view_dependencies.getViewLevels(viewQueries, TABLE_NAMES)
+
+
+@pytest.mark.parametrize('pivotMetrics', [False, True])
+def test_optimusPrimeViewLevels(pivotMetrics):
+# The views of opViews/ (and opViews/pivotMetrics) only reference tables of the schema registry and views created in the previous levels
+
+    viewLevels, viewQueries = import_db_assessment.getOptimusPrimeViews(pivotMetrics)
+
+    assert viewLevels is not None
+    assert sorted(viewName for viewLevel in viewLevels for viewName in viewLevel) == sorted(viewQueries)
+
+    createdViews = set()
+
+    for viewLevel in viewLevels:
+
+        for viewName in viewLevel:
+            assert view_dependencies.getViewReferences(viewQueries[viewName]) & set(viewQueries) <= createdViews
+
+        createdViews.update(viewLevel)
+
+    assert len(viewLevels) > 1
@@ -0,0 +1,64 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Dependency graph of the Optimus Prime views (opViews/*.sql).
+# Every ${dataset}.<name> found in a view text is a dependency on another view or on an imported table.
+
+import re
+
+# Matches the objects referenced by a view, for instance ${dataset}.vdbsummary
+DATASET_REFERENCE_PATTERN = re.compile(r'\$\{dataset\}\.([A-Za-z_][A-Za-z0-9_]*)')
+
+
+def getViewReferences(viewQuery):
+# This function returns the set of object names referenced by a view text (before the ${dataset} replacement)
+
+    return set(DATASET_REFERENCE_PATTERN.findall(viewQuery))
+
+
+def getViewLevels(viewQueries, tableNames):
+# This function sorts the views in levels: a view only depends on tables and on views of the previous levels,
+# so all views of the same level can be created at the same time
+# viewQueries is a dictionary view name -> view text and tableNames are the tables expected in the dataset
+# Raises ValueError if a view references an unknown object or if there is a cycle between views
+
+    viewDependencies = {}
+
+    for viewName, viewQuery in viewQueries.items():
+
+        viewReferences = getViewReferences(viewQuery)
+
+        missingReferences = viewReferences - set(viewQueries) - set(tableNames)
+        if missingReferences:
+            raise ValueError('The view {} references objects that are neither views nor tables: {}'.format(viewName, ', '.join(sorted(missingReferences))))
+
+        viewDependencies[viewName] = (viewReferences & set(viewQueries)) - {viewName}
+
+        if viewName in viewReferences:
+            raise ValueError('The view {} references itself'.format(viewName))
+
+    viewLevels = []
+    createdViews = set()
+
+    while len(createdViews) < len(viewDependencies):
+
+        viewLevel = sorted(viewName for viewName, dependencies in viewDependencies.items() if viewName not in createdViews and dependencies <= createdViews)
+
+        if not viewLevel:
+            raise ValueError('These views are part of a dependency cycle or depend on one: {}'.format(', '.join(sorted(set(viewDependencies) - createdViews))))
+
+        viewLevels.append(viewLevel)
+        createdViews.update(viewLevel)
+
+    return viewLevels
@@ -33,7 +33,12 @@ with open("requirements.txt", "r") as fp:
         if not line.strip().startswith("#"):
             dependencies.append(line.strip())
 
-extras_require = {}
+extras_require = {
+    # Bare Metal Solution sizing computed in python (-bmssizing)
+    "sizing": ["numpy", "pandas"],
+    # Unit tests of db-assessment/tests (python -m pytest db-assessment/tests)
+    "test": ["pytest", "fastavro"],
+}
 
 packages = setuptools.find_packages()
 